@@ -0,0 +1,136 @@
+# Times search_repository over a catalogue of 10M albums: whole words
+# common and rare, two words, type-ahead prefixes as they are typed one
+# letter at a time, and a word that matches nothing, then what the search
+# triggers add to saving an album and renaming an artist. Titles, names and
+# genres are made up from a vocabulary where a few words are very common,
+# as they are in real titles.
+#
+# Run from the app folder against a scratch database loaded from
+# db/music_library.sql; it empties artists and albums first:
+#
+#   DATABASE_URL="dbname='music_library_bench'" python -m benchmarks.search_benchmark --albums 10000000
+#
+# With DB_BACKEND=sqlite it times the in-memory index instead, which is
+# meant for test databases; it holds every word of every row in memory, so
+# try --albums 100000 there. The first search builds it and is timed apart.
+
+import argparse
+import itertools
+import random
+import time
+
+import shared.db.config as config
+from shared.benchmarks import report_latencies
+from shared.db.run_sql import run_sql
+
+from models.album import Album
+from models.artist import Artist
+import repositories.album_repository as album_repository
+import repositories.artist_repository as artist_repository
+import repositories.search_repository as search_repository
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "sen", "tu", "vo", "zel", "an", "dor", "el", "fi", "gar", "ho", "in", "jum"]
+GENRES = ["Rock", "Pop", "Jazz", "Blues", "Folk", "Metal", "Punk", "Soul", "Funk", "Reggae", "Techno", "House",
+          "Ambient", "Classical", "Country", "Hip Hop", "Britpop", "Grunge", "Disco", "Gospel"]
+GIN_INDEXES = {
+    "artists_search_vector_idx": "artists USING GIN (search_vector)",
+    "albums_search_vector_idx": "albums USING GIN (search_vector)",
+}
+
+
+def vocabulary(size):
+    words = ("".join(parts) for length in (2, 3, 4) for parts in itertools.product(SYLLABLES, repeat=length))
+    return list(itertools.islice(words, size))
+
+
+def phrase(words, picks, most):
+    # Cubing a uniform random number makes the first words far the commonest
+    return " ".join(words[int(len(words) * picks.random() ** 3)] for _ in range(picks.randint(1, most))).title()
+
+
+def seed(words, artists, albums, batch):
+    run_sql("DELETE FROM albums")
+    run_sql("DELETE FROM artists")
+    picks = random.Random(0)
+    if config.DATABASE_BACKEND == "postgres":
+        # Building a GIN index once is much faster than growing it 10M times
+        for name in GIN_INDEXES:
+            run_sql(f"DROP INDEX IF EXISTS {name}")
+    artist_ids = [artist.id for artist in artist_repository.save_many([Artist(phrase(words, picks, 2)) for _ in range(artists)])]
+    for start in range(0, albums, batch):
+        count = min(batch, albums - start)
+        album_repository.save_many([
+            Album(phrase(words, picks, 4), picks.choice(artist_ids), picks.choice(GENRES)) for _ in range(count)
+        ])
+    if config.DATABASE_BACKEND == "postgres":
+        for name, columns in GIN_INDEXES.items():
+            run_sql(f"CREATE INDEX {name} ON {columns}")
+        run_sql("ANALYZE artists")
+        run_sql("ANALYZE albums")
+    return artist_ids
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:<45} {time.perf_counter() - start:10.1f} s")
+    return result
+
+
+def measure_searches(words, requests):
+    common = words[0]
+    rare = words[-1]
+    middle = words[len(words) // 4]
+    cases = [
+        (f"search {common!r}, commonest word", lambda: search_repository.search(common)),
+        (f"search {rare!r}, rarest word", lambda: search_repository.search(rare)),
+        (f"search {common + ' ' + middle!r}", lambda: search_repository.search(f"{common} {middle}")),
+        ("search 'Jazz', a genre", lambda: search_repository.search("Jazz")),
+        ("search 'qqq', no match", lambda: search_repository.search("qqq")),
+    ]
+    cases += [(f"suggest {middle[:n]!r}", lambda text=middle[:n]: search_repository.suggest(text)) for n in range(1, len(middle) + 1)]
+    for label, function in cases:
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            results = function()
+            latencies.append(time.perf_counter() - start)
+        report_latencies(f"{label}, {len(results)} results", latencies)
+
+
+def measure_writes(words, artist_ids, requests):
+    picks = random.Random(1)
+    latencies = []
+    for _ in range(requests):
+        album = Album(phrase(words, picks, 4), picks.choice(artist_ids), picks.choice(GENRES))
+        start = time.perf_counter()
+        album_repository.save(album)
+        latencies.append(time.perf_counter() - start)
+    report_latencies("album_repository.save", latencies)
+    latencies = []
+    for id in picks.sample(artist_ids, min(requests, len(artist_ids))):
+        start = time.perf_counter()
+        artist_repository.update(Artist(phrase(words, picks, 2), id))
+        latencies.append(time.perf_counter() - start)
+    report_latencies("artist_repository.update, redoes their albums", latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--albums", type=int, default=10000000)
+    parser.add_argument("--artists", type=int, default=500000)
+    parser.add_argument("--words", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    words = vocabulary(args.words)
+    artist_ids = timed(f"seed {args.albums} albums, {args.artists} artists", lambda: seed(words, args.artists, args.albums, args.batch))
+    if config.DATABASE_BACKEND == "sqlite":
+        timed("build the in-memory index", lambda: search_repository.search(words[0]))
+    measure_searches(words, args.requests)
+    measure_writes(words, artist_ids, args.requests)
+
+
+if __name__ == '__main__':
+    main()
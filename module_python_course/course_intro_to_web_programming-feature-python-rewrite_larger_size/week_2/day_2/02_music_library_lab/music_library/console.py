@@ -12,9 +12,8 @@ artist_1 = Artist('Oasis')
 artist_repository.save(artist_1)
 
 album_1 = Album("Roll With It", artist_1.id, "Rock")
-album_repository.save(album_1)
 album_2 = Album("Another Album", artist_1.id, "Pop")
-album_repository.save(album_2)
+album_repository.save_many([album_1, album_2])
 
 
 
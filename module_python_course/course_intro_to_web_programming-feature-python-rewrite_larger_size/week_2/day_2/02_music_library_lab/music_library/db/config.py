@@ -0,0 +1,3 @@
+# This app's database: dbname='music_library' on Postgres, db/music_library.sqlite3 on
+# SQLite. Every other setting is in shared/db/config.py
+DATABASE_NAME = "music_library"
@@ -0,0 +1,91 @@
+-- Adds the search_vector columns, their triggers and GIN indexes from
+-- music_library.sql to an existing database, and fills them in:
+--
+--   psql -d music_library -f db/migrations/001_search_vectors.sql
+--
+-- The triggers go live first, so rows written during the backfill are
+-- covered by them. The backfill then commits every 10,000 rows, so it
+-- never holds more than that many row locks or one long transaction, and
+-- the indexes are built CONCURRENTLY after it without blocking writes.
+-- Run it with psql as above rather than through run_sql. Safe to run more
+-- than once.
+
+\set ON_ERROR_STOP on
+
+BEGIN;
+
+ALTER TABLE artists ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+ALTER TABLE albums ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE OR REPLACE FUNCTION search_text(value TEXT) RETURNS TEXT AS $$
+  SELECT regexp_replace(coalesce(value, ''), '[^[:alnum:]]+', ' ', 'g');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION artist_search_vector(name TEXT) RETURNS TSVECTOR AS $$
+  SELECT setweight(to_tsvector('simple', search_text(name)), 'A');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION album_search_vector(title TEXT, artist_name TEXT, genre TEXT) RETURNS TSVECTOR AS $$
+  SELECT setweight(to_tsvector('simple', search_text(title)), 'A')
+      || setweight(to_tsvector('simple', search_text(artist_name)), 'B')
+      || setweight(to_tsvector('simple', search_text(genre)), 'C');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION set_artist_search_vector() RETURNS trigger AS $$
+BEGIN
+  NEW.search_vector := artist_search_vector(NEW.name);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION set_album_search_vector() RETURNS trigger AS $$
+BEGIN
+  NEW.search_vector := album_search_vector(NEW.title, (SELECT name FROM artists WHERE id = NEW.artist_id), NEW.genre);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_artist_album_search_vectors() RETURNS trigger AS $$
+BEGIN
+  UPDATE albums SET search_vector = album_search_vector(title, NEW.name, genre) WHERE artist_id = NEW.id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS artists_search_vector ON artists;
+CREATE TRIGGER artists_search_vector BEFORE INSERT OR UPDATE OF name ON artists
+FOR EACH ROW EXECUTE FUNCTION set_artist_search_vector();
+
+DROP TRIGGER IF EXISTS artists_album_search_vectors ON artists;
+CREATE TRIGGER artists_album_search_vectors AFTER UPDATE OF name ON artists
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION update_artist_album_search_vectors();
+
+DROP TRIGGER IF EXISTS albums_search_vector ON albums;
+CREATE TRIGGER albums_search_vector BEFORE INSERT OR UPDATE OF title, artist_id, genre ON albums
+FOR EACH ROW EXECUTE FUNCTION set_album_search_vector();
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS albums_artist_id_idx ON albums (artist_id);
+
+UPDATE artists SET search_vector = artist_search_vector(name) WHERE search_vector IS NULL;
+
+DO $$
+DECLARE
+  last_id INT := 0;
+  top_id INT;
+BEGIN
+  SELECT MAX(id) INTO top_id FROM albums;
+  WHILE last_id < coalesce(top_id, 0) LOOP
+    UPDATE albums SET search_vector = album_search_vector(title, (SELECT name FROM artists WHERE id = albums.artist_id), genre)
+    WHERE id > last_id AND id <= last_id + 10000 AND search_vector IS NULL;
+    last_id := last_id + 10000;
+    COMMIT;
+  END LOOP;
+END;
+$$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS artists_search_vector_idx ON artists USING GIN (search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS albums_search_vector_idx ON albums USING GIN (search_vector);
+ANALYZE artists;
+ANALYZE albums;
@@ -12,3 +12,66 @@ CREATE TABLE albums (
   artist_id INT REFERENCES artists(id) ON DELETE CASCADE,
   genre VARCHAR(255)
 );
+
+CREATE INDEX albums_artist_id_idx ON albums (artist_id);
+
+-- postgres only
+-- Full-text search, see repositories/search_repository.py. Each row keeps a
+-- tsvector of its words, weighted A for an artist's name or an album's
+-- title, B for the album's artist and C for its genre, which triggers keep
+-- current and GIN indexes look up. Words are split on anything that is not
+-- a letter or digit, as db/text_index.py splits them on SQLite, and use the
+-- 'simple' configuration, with no stemming or stop words, since names and
+-- titles are not prose: "The The" has to be found.
+ALTER TABLE artists ADD COLUMN search_vector TSVECTOR;
+ALTER TABLE albums ADD COLUMN search_vector TSVECTOR;
+
+CREATE OR REPLACE FUNCTION search_text(value TEXT) RETURNS TEXT AS $$
+  SELECT regexp_replace(coalesce(value, ''), '[^[:alnum:]]+', ' ', 'g');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION artist_search_vector(name TEXT) RETURNS TSVECTOR AS $$
+  SELECT setweight(to_tsvector('simple', search_text(name)), 'A');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION album_search_vector(title TEXT, artist_name TEXT, genre TEXT) RETURNS TSVECTOR AS $$
+  SELECT setweight(to_tsvector('simple', search_text(title)), 'A')
+      || setweight(to_tsvector('simple', search_text(artist_name)), 'B')
+      || setweight(to_tsvector('simple', search_text(genre)), 'C');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION set_artist_search_vector() RETURNS trigger AS $$
+BEGIN
+  NEW.search_vector := artist_search_vector(NEW.name);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION set_album_search_vector() RETURNS trigger AS $$
+BEGIN
+  NEW.search_vector := album_search_vector(NEW.title, (SELECT name FROM artists WHERE id = NEW.artist_id), NEW.genre);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- An album's vector has its artist's name in it, so renaming the artist
+-- redoes all of theirs
+CREATE OR REPLACE FUNCTION update_artist_album_search_vectors() RETURNS trigger AS $$
+BEGIN
+  UPDATE albums SET search_vector = album_search_vector(title, NEW.name, genre) WHERE artist_id = NEW.id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER artists_search_vector BEFORE INSERT OR UPDATE OF name ON artists
+FOR EACH ROW EXECUTE FUNCTION set_artist_search_vector();
+
+CREATE TRIGGER artists_album_search_vectors AFTER UPDATE OF name ON artists
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION update_artist_album_search_vectors();
+
+CREATE TRIGGER albums_search_vector BEFORE INSERT OR UPDATE OF title, artist_id, genre ON albums
+FOR EACH ROW EXECUTE FUNCTION set_album_search_vector();
+
+CREATE INDEX artists_search_vector_idx ON artists USING GIN (search_vector);
+CREATE INDEX albums_search_vector_idx ON albums USING GIN (search_vector);
+-- end postgres only
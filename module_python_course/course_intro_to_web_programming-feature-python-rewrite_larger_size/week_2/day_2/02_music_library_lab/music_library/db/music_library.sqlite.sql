@@ -0,0 +1,47 @@
+-- SQLite's version of what music_library.sql marks postgres only, run by
+-- "python -m shared.db.sqlite_backend db/music_library.sql" after that file.
+--
+-- SQLite has no tsvector, so search uses the in-memory index in
+-- db/text_index.py instead. These triggers log which rows change in
+-- search_changes, and each process reads the log before it searches to
+-- bring its index up to date, whichever process made the change.
+
+DROP TABLE IF EXISTS search_changes;
+CREATE TABLE search_changes (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  table_name TEXT NOT NULL,
+  row_id INT NOT NULL
+);
+
+CREATE TRIGGER artists_search_inserted AFTER INSERT ON artists
+BEGIN
+  INSERT INTO search_changes (table_name, row_id) VALUES ('artists', NEW.id);
+END;
+
+CREATE TRIGGER artists_search_deleted AFTER DELETE ON artists
+BEGIN
+  INSERT INTO search_changes (table_name, row_id) VALUES ('artists', OLD.id);
+END;
+
+-- An album's entry has its artist's name in it, so renaming the artist
+-- logs all of theirs too
+CREATE TRIGGER artists_search_updated AFTER UPDATE OF name ON artists
+BEGIN
+  INSERT INTO search_changes (table_name, row_id) VALUES ('artists', NEW.id);
+  INSERT INTO search_changes (table_name, row_id) SELECT 'albums', id FROM albums WHERE artist_id = NEW.id;
+END;
+
+CREATE TRIGGER albums_search_inserted AFTER INSERT ON albums
+BEGIN
+  INSERT INTO search_changes (table_name, row_id) VALUES ('albums', NEW.id);
+END;
+
+CREATE TRIGGER albums_search_deleted AFTER DELETE ON albums
+BEGIN
+  INSERT INTO search_changes (table_name, row_id) VALUES ('albums', OLD.id);
+END;
+
+CREATE TRIGGER albums_search_updated AFTER UPDATE OF title, artist_id, genre ON albums
+BEGIN
+  INSERT INTO search_changes (table_name, row_id) VALUES ('albums', NEW.id);
+END;
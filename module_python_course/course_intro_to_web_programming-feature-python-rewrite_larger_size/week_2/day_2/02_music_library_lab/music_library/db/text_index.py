@@ -0,0 +1,93 @@
+import bisect
+import heapq
+import re
+
+# An in-memory inverted index for full-text search where there is no
+# tsvector, such as on SQLite. It splits text into words the way
+# search_text() in db/music_library.sql does for Postgres, and scores a
+# match by the weights of the fields each query word was found in, with
+# Postgres's default ts_rank weights, so results come back in much the
+# same order on both, though the numbers differ.
+
+WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.2, "D": 0.1}
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def terms(text):
+    # The lower-cased words in text, in order
+    return _WORD.findall((text or "").lower())
+
+
+class InvertedIndex:
+
+    def __init__(self):
+        # term -> {id: score}, and id -> its terms, for removing it again
+        self.postings = {}
+        self.documents = {}
+        # The terms in order, for prefix lookups, or None until next needed
+        self._sorted = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, id, fields):
+        # fields is a list of (text, weight), weight one of WEIGHTS' keys.
+        # Adding an id that is already there replaces it.
+        self.remove(id)
+        scores = {}
+        for text, weight in fields:
+            for term in terms(text):
+                scores[term] = scores.get(term, 0) + WEIGHTS[weight]
+        for term, score in scores.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                self._sorted = None
+            posting[id] = score
+        self.documents[id] = tuple(scores)
+
+    def remove(self, id):
+        for term in self.documents.pop(id, ()):
+            posting = self.postings[term]
+            del posting[id]
+            if not posting:
+                del self.postings[term]
+                self._sorted = None
+
+    def search(self, words, prefix=False, limit=None):
+        # (id, score) for the ids with every word in words, best first, then
+        # by id. With prefix the last word only has to start a term, for
+        # type-ahead.
+        if not words:
+            return []
+        matches = [self._matches(word, False) for word in words[:-1]]
+        matches.append(self._matches(words[-1], prefix))
+        matches.sort(key=len)
+        scores = dict(matches[0])
+        for match in matches[1:]:
+            scores = {id: score + match[id] for id, score in scores.items() if id in match}
+            if not scores:
+                return []
+        ranked = ((-score, id) for id, score in scores.items())
+        if limit is None:
+            ranked = sorted(ranked)
+        else:
+            ranked = heapq.nsmallest(limit, ranked)
+        return [(id, -score) for score, id in ranked]
+
+    def _matches(self, word, prefix):
+        if not prefix:
+            return self.postings.get(word, {})
+        # Every term starting with word, each id scored by its best one
+        if self._sorted is None:
+            self._sorted = sorted(self.postings)
+        matches = {}
+        index = bisect.bisect_left(self._sorted, word)
+        while index < len(self._sorted) and self._sorted[index].startswith(word):
+            term = self._sorted[index]
+            index += 1
+            for id, score in self.postings[term].items():
+                if score > matches.get(id, 0):
+                    matches[id] = score
+        return matches
@@ -1,4 +1,6 @@
 class Album:
+    __slots__ = ("title", "artist_id", "genre", "id")
+
     def __init__(self, title, artist_id, genre, id = None):
         self.title = title
         self.artist_id = artist_id
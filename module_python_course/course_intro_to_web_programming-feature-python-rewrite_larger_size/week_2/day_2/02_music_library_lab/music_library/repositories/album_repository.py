@@ -1,4 +1,5 @@
-from db.run_sql import run_sql
+import shared.db.bulk as bulk
+from shared.db.run_sql import run_sql
 
 from models.album import Album
 from models.artist import Artist
@@ -12,17 +13,18 @@ def save(album):
     return album
 
 
-def select_all():
-    albums = []
-
-    sql = "SELECT * FROM albums"
-    results = run_sql(sql)
+def save_many(albums):
+    values = [[album.title, album.artist_id, album.genre] for album in albums]
+    ids = bulk.insert_many("albums", ["title", "artist_id", "genre"], values)
+    for album, id in zip(albums, ids):
+        album.id = id
+    return albums
 
-    for row in results:
-        album = Album(row['title'], row['artist_id'], row['genre'], row['id'])
-        albums.append(album)
 
-    return albums
+def select_all():
+    # Plain tuples in Album's argument order, with no dict per row
+    sql = "SELECT title, artist_id, genre, id FROM albums"
+    return [Album(*row) for row in run_sql(sql, tuples=True)]
 
 
 def artist(album):
@@ -51,6 +53,10 @@ def delete(id):
     run_sql(sql, values)
 
 
+def delete_many(ids):
+    bulk.delete_many("albums", ids)
+
+
 def select(id):
     album = None
 
@@ -1,4 +1,5 @@
-from db.run_sql import run_sql
+import shared.db.bulk as bulk
+from shared.db.run_sql import run_sql
 
 from models.artist import Artist
 from models.album import Album
@@ -12,16 +13,18 @@ def save(artist):
     return artist
 
 
-def select_all():
-    artists = []
+def save_many(artists):
+    values = [[artist.name] for artist in artists]
+    ids = bulk.insert_many("artists", ["name"], values)
+    for artist, id in zip(artists, ids):
+        artist.id = id
+    return artists
 
-    sql = "SELECT * FROM artists"
-    results = run_sql(sql)
 
-    for row in results:
-        artist = Artist(row['name'], row['id'] )
-        artists.append(artist)
-    return artists
+def select_all():
+    # Plain tuples in Artist's argument order, with no dict per row
+    sql = "SELECT name, id FROM artists"
+    return [Artist(*row) for row in run_sql(sql, tuples=True)]
 
 
 def albums(artist):
@@ -49,6 +52,10 @@ def delete(id):
     run_sql(sql, values)
 
 
+def delete_many(ids):
+    bulk.delete_many("artists", ids)
+
+
 def select(id):
     artist = None
 
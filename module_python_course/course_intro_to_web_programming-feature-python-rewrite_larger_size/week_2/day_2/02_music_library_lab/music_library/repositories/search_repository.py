@@ -0,0 +1,187 @@
+import threading
+
+import shared.db.config as config
+from shared.db.run_sql import run_sql, stream_sql
+
+import db.text_index as text_index
+
+from models.album import Album
+from models.artist import Artist
+
+# Ranked full-text search over artists' names and albums' titles, artists
+# and genres. On Postgres it reads the search_vector columns that triggers
+# keep current (see db/music_library.sql) through their GIN indexes. On
+# SQLite each process keeps a db/text_index.py index of both tables in
+# memory, built on the first search and brought up to date before every
+# search from the search_changes log that triggers write.
+#
+# All the words in a query have to match. With prefix=True the last one
+# only has to start a word, for type-ahead as the user types.
+
+SEARCH_LIMIT = 20
+
+# A prefix shorter than SEARCH_PREFIX_LENGTH, such as "a" with prefix=True,
+# can match most of a 10M row table, so only the first SEARCH_CANDIDATES
+# matches that Postgres finds are ranked and a few keystrokes stay fast.
+# Those results are the best of an arbitrary sample and may miss better
+# matches; type-ahead refines them as more is typed. Every other query
+# ranks all of its matches.
+SEARCH_CANDIDATES = 10000
+SEARCH_PREFIX_LENGTH = 3
+
+# search_changes rows older than this many are deleted; a process that far
+# behind rebuilds its index from the tables instead
+SEARCH_CHANGES_KEPT = 10000
+
+SELECT_ARTISTS = """
+    SELECT name, id, ts_rank(search_vector, query) AS rank
+    FROM (
+        SELECT name, id, search_vector, query
+        FROM artists, to_tsquery('simple', %s) AS query
+        WHERE search_vector @@ query
+        LIMIT %s
+    ) AS matches
+    ORDER BY rank DESC, id
+    LIMIT %s
+"""
+
+SELECT_ALBUMS = """
+    SELECT title, artist_id, genre, id, ts_rank(search_vector, query) AS rank
+    FROM (
+        SELECT title, artist_id, genre, id, search_vector, query
+        FROM albums, to_tsquery('simple', %s) AS query
+        WHERE search_vector @@ query
+        LIMIT %s
+    ) AS matches
+    ORDER BY rank DESC, id
+    LIMIT %s
+"""
+
+SELECT_ARTIST_TEXT = "SELECT id, name FROM artists"
+SELECT_ALBUM_TEXT = "SELECT albums.id, albums.title, artists.name, albums.genre FROM albums LEFT JOIN artists ON artists.id = albums.artist_id"
+
+_lock = threading.Lock()
+_indexes = {"artists": text_index.InvertedIndex(), "albums": text_index.InvertedIndex()}
+# The SQLite file the indexes are of, and the last search_changes id in them
+_indexed = {"path": None, "position": 0}
+
+
+def artists(text, limit=SEARCH_LIMIT, prefix=False):
+    # (artist, rank) for the artists whose names match, best first
+    words = text_index.terms(text)
+    if not words:
+        return []
+    if config.DATABASE_BACKEND == "sqlite":
+        ranked = _search("artists", words, prefix, limit)
+        sql = "SELECT name, id FROM artists WHERE id = ANY(%s)"
+        artists = {row[1]: Artist(*row) for row in run_sql(sql, [[id for id, rank in ranked]], tuples=True)}
+        return [(artists[id], rank) for id, rank in ranked if id in artists]
+    values = [tsquery(words, prefix), candidates(words, prefix), limit]
+    return [(Artist(*row[:2]), row[2]) for row in run_sql(SELECT_ARTISTS, values, tuples=True)]
+
+
+def albums(text, limit=SEARCH_LIMIT, prefix=False):
+    # (album, rank) for the albums whose title, artist or genre match, best
+    # first, a match on the title counting for most
+    words = text_index.terms(text)
+    if not words:
+        return []
+    if config.DATABASE_BACKEND == "sqlite":
+        ranked = _search("albums", words, prefix, limit)
+        sql = "SELECT title, artist_id, genre, id FROM albums WHERE id = ANY(%s)"
+        albums = {row[3]: Album(*row) for row in run_sql(sql, [[id for id, rank in ranked]], tuples=True)}
+        return [(albums[id], rank) for id, rank in ranked if id in albums]
+    values = [tsquery(words, prefix), candidates(words, prefix), limit]
+    return [(Album(*row[:4]), row[4]) for row in run_sql(SELECT_ALBUMS, values, tuples=True)]
+
+
+def search(text, limit=SEARCH_LIMIT, prefix=False):
+    # Artists and albums together, best first, an artist before an album
+    # with the same rank
+    results = [(0, artist, rank) for artist, rank in artists(text, limit, prefix)]
+    results += [(1, album, rank) for album, rank in albums(text, limit, prefix)]
+    results.sort(key=lambda result: (-result[2], result[0], result[1].id))
+    return [(model, rank) for kind, model, rank in results[:limit]]
+
+
+def suggest(text, limit=SEARCH_LIMIT):
+    # For type-ahead, the last word typed may be unfinished
+    return search(text, limit, prefix=True)
+
+
+def candidates(words, prefix=False):
+    # The inner LIMIT of SELECT_ARTISTS and SELECT_ALBUMS; NULL is no limit
+    if prefix and len(words[-1]) < SEARCH_PREFIX_LENGTH:
+        return SEARCH_CANDIDATES
+    return None
+
+
+def tsquery(words, prefix=False):
+    # words are only letters and digits, from text_index.terms, so they can
+    # go into to_tsquery's syntax as they are
+    query = " & ".join(words)
+    if prefix:
+        query += ":*"
+    return query
+
+
+def _search(table, words, prefix, limit):
+    with _lock:
+        _catch_up()
+        return _indexes[table].search(words, prefix, limit)
+
+
+def _catch_up():
+    if _indexed["path"] != config.SQLITE_PATH:
+        _rebuild()
+        return
+    position = _indexed["position"]
+    sql = "SELECT id, table_name, row_id FROM search_changes WHERE id > %s ORDER BY id"
+    changes = run_sql(sql, [position], tuples=True)
+    if not changes:
+        return
+    # Ids run on without gaps, so a gap means the rows this process still
+    # needed were deleted as too old
+    if changes[0][0] != position + 1:
+        _rebuild()
+        return
+    changed = {"artists": set(), "albums": set()}
+    for id, table, row_id in changes:
+        changed[table].add(row_id)
+    _reindex("artists", changed["artists"], f"{SELECT_ARTIST_TEXT} WHERE id = ANY(%s)")
+    _reindex("albums", changed["albums"], f"{SELECT_ALBUM_TEXT} WHERE albums.id = ANY(%s)")
+    _indexed["position"] = changes[-1][0]
+    # Once every SEARCH_CHANGES_KEPT changes or so, the old ones go
+    if _indexed["position"] % SEARCH_CHANGES_KEPT < len(changes):
+        run_sql("DELETE FROM search_changes WHERE id <= %s", [_indexed["position"] - SEARCH_CHANGES_KEPT])
+
+
+def _reindex(table, ids, sql):
+    if not ids:
+        return
+    index = _indexes[table]
+    for id in ids:
+        index.remove(id)
+    for row in run_sql(sql, [list(ids)], tuples=True):
+        _add(table, row)
+
+
+def _rebuild():
+    # The position is read first, so a change made while the tables are
+    # read is applied again next time rather than missed
+    position = run_sql("SELECT MAX(id) FROM search_changes", tuples=True)[0][0] or 0
+    for table, sql in [("artists", SELECT_ARTIST_TEXT), ("albums", SELECT_ALBUM_TEXT)]:
+        _indexes[table] = text_index.InvertedIndex()
+        for row in stream_sql(sql, tuples=True):
+            _add(table, row)
+    _indexed["path"] = config.SQLITE_PATH
+    _indexed["position"] = position
+
+
+def _add(table, row):
+    if table == "artists":
+        id, name = row
+        _indexes[table].add(id, [(name, "A")])
+    else:
+        id, title, artist_name, genre = row
+        _indexes[table].add(id, [(title, "A"), (artist_name, "B"), (genre, "C")])
@@ -0,0 +1,7 @@
+import unittest
+
+from tests.search_test import TestSearch, TestTextIndex
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+from shared.db.connection_pool import close_pool
+from shared.db.run_sql import run_sql
+
+from db.text_index import InvertedIndex, terms
+from models.album import Album
+from models.artist import Artist
+import repositories.album_repository as album_repository
+import repositories.artist_repository as artist_repository
+import repositories.search_repository as search_repository
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "db", "music_library.sql")
+
+
+class TestTextIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.add(1, [("Morning Glory", "A"), ("Oasis", "B")])
+        self.index.add(2, [("Glory Days", "A"), ("Morning Star", "C")])
+        self.index.add(3, [("Mornington Crescent", "A")])
+
+
+    def test_terms_split_on_anything_but_letters_and_digits(self):
+        self.assertEqual(["what", "s", "the", "story", "1995"], terms("(What's the_Story) 1995!"))
+        self.assertEqual([], terms(None))
+
+
+    def test_every_word_must_match_and_the_best_field_ranks_first(self):
+        self.assertEqual([(1, 2.0), (2, 1.2)], self.index.search(["morning", "glory"]))
+        self.assertEqual([], self.index.search(["morning", "crescent"]))
+        self.assertEqual([(3, 1.0)], self.index.search(["mornington"], limit=1))
+
+
+    def test_prefix_matches_the_start_of_the_last_word_only(self):
+        self.assertEqual([1, 3, 2], [id for id, score in self.index.search(["morn"], prefix=True)])
+        self.assertEqual([], self.index.search(["morn", "glory"], prefix=True))
+
+
+    def test_adding_again_replaces_and_remove_forgets_terms(self):
+        self.index.add(1, [("Be Here Now", "A")])
+        self.assertEqual([(2, 1.0)], self.index.search(["glory"]))
+        self.index.remove(3)
+        self.assertNotIn("crescent", self.index.postings)
+        self.assertEqual(2, len(self.index))
+
+
+# The in-memory fallback on a real SQLite file, where triggers log changes
+class TestSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original = (config.DATABASE_BACKEND, config.SQLITE_PATH)
+        config.DATABASE_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(self.directory.name, "music_library.sqlite3")
+        close_pool()
+        sqlite_backend.load_schema(SCHEMA)
+        self.oasis, self.blur = artist_repository.save_many([Artist("Oasis"), Artist("Blur")])
+        self.glory, self.roll, self.parklife = album_repository.save_many([
+            Album("(What's the Story) Morning Glory?", self.oasis.id, "Britpop"),
+            Album("Roll With It", self.oasis.id, "Rock"),
+            Album("Parklife", self.blur.id, "Britpop"),
+        ])
+
+    def tearDown(self):
+        close_pool()
+        config.DATABASE_BACKEND, config.SQLITE_PATH = self.original
+        self.directory.cleanup()
+
+    def names(self, results):
+        return [getattr(model, "name", None) or model.title for model, rank in results]
+
+
+    def test_search_ranks_names_and_titles_over_artists_and_genres(self):
+        self.assertEqual(["Oasis", "(What's the Story) Morning Glory?", "Roll With It"], self.names(search_repository.search("oasis")))
+        self.assertEqual(["Roll With It"], self.names(search_repository.albums("ROCK")))
+        self.assertEqual([], search_repository.search("?!"))
+
+
+    def test_suggest_matches_an_unfinished_last_word(self):
+        self.assertEqual(["(What's the Story) Morning Glory?", "Parklife"], self.names(search_repository.suggest("brit")))
+        self.assertEqual(["(What's the Story) Morning Glory?"], self.names(search_repository.suggest("story mor")))
+        self.assertEqual([], search_repository.search("brit"))
+
+
+    def test_writes_from_anywhere_reach_the_index(self):
+        search_repository.search("oasis")
+        album_repository.update(Album("Be Here Now", self.oasis.id, "Britpop", self.roll.id))
+        run_sql("UPDATE artists SET name = 'Gorillaz' WHERE id = %s", [self.blur.id])
+        artist_repository.delete(self.oasis.id)
+        self.assertEqual([], search_repository.search("oasis"))
+        self.assertEqual([], search_repository.search("here now"))
+        self.assertEqual(["Gorillaz", "Parklife"], self.names(search_repository.search("gorillaz")))
+
+
+    def test_index_is_rebuilt_when_the_changes_it_needs_are_gone(self):
+        search_repository.search("oasis")
+        album_repository.save(Album("Modern Life Is Rubbish", self.blur.id, "Britpop"))
+        run_sql("DELETE FROM search_changes")
+        album_repository.save(Album("The Great Escape", self.blur.id, "Britpop"))
+        self.assertEqual(["Modern Life Is Rubbish"], self.names(search_repository.search("rubbish")))
+
+
+    def test_postgres_queries_go_to_the_search_vectors(self):
+        queries = []
+        def fake_run_sql(sql, values=None, tuples=False):
+            queries.append((sql, values))
+            return [("Oasis", 1, 0.6)]
+        original = search_repository.run_sql
+        search_repository.run_sql = fake_run_sql
+        config.DATABASE_BACKEND = "postgres"
+        try:
+            results = search_repository.artists("Morning  glo", prefix=True)
+        finally:
+            search_repository.run_sql = original
+            config.DATABASE_BACKEND = "sqlite"
+        self.assertEqual([("Oasis", 1, 0.6)], [(artist.name, artist.id, rank) for artist, rank in results])
+        self.assertEqual([(search_repository.SELECT_ARTISTS, ["morning & glo:*", None, search_repository.SEARCH_LIMIT])], queries)
+
+
+    def test_only_short_prefixes_rank_a_capped_sample(self):
+        self.assertEqual(search_repository.SEARCH_CANDIDATES, search_repository.candidates(["morning", "g"], prefix=True))
+        self.assertIsNone(search_repository.candidates(["morning", "glo"], prefix=True))
+        self.assertIsNone(search_repository.candidates(["a"]))
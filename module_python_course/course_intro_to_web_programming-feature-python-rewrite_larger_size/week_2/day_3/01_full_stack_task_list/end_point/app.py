@@ -1,8 +1,21 @@
+import os
+
 from flask import Flask, render_template
 
+import shared.db.instrumentation as instrumentation
+import shared.db.unit_of_work as unit_of_work
+import shared.pagination as pagination
+
 from controllers.tasks_controller import tasks_blueprint
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+unit_of_work.init_app(app)
+pagination.init_app(app)
+
+# Comma separated endpoints whose index pages are streamed, e.g.
+# STREAMED_ROUTES="tasks.tasks"
+app.config["STREAMED_ROUTES"] = set(filter(None, os.environ.get("STREAMED_ROUTES", "").split(",")))
 
 app.register_blueprint(tasks_blueprint)
 
@@ -10,5 +23,6 @@ app.register_blueprint(tasks_blueprint)
 def home():
     return render_template('index.html')
 
+# Development server only, see gunicorn.conf.py for serving in production
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,60 @@
+# Compares the joined task_repository.select_all with the old one-query-per-row approach.
+#
+# Run from the app folder against a scratch database, it empties all tables:
+#
+#   DATABASE_URL="dbname='task_manager_bench'" python -m benchmarks.select_all_benchmark --rows 100000
+
+import argparse
+import sys
+
+from shared.benchmarks import count_queries, report, time_calls
+from shared.db.run_sql import run_sql
+
+from models.task import Task
+import repositories.task_repository as task_repository
+import repositories.user_repository as user_repository
+
+REPOSITORIES = [task_repository, user_repository]
+
+
+def seed(rows):
+    users = max(rows // 10, 1)
+    run_sql("TRUNCATE tasks, users RESTART IDENTITY CASCADE")
+    run_sql("INSERT INTO users (first_name, last_name) SELECT 'First ' || n, 'Last ' || n FROM generate_series(1, %s) AS n", [users])
+    run_sql("INSERT INTO tasks (description, duration, completed, user_id) SELECT 'Task ' || n, mod(n, 120), mod(n, 2) = 0, 1 + mod(n, %s) FROM generate_series(1, %s) AS n", [users, rows])
+    run_sql("ANALYZE")
+
+
+# The previous implementation, kept here as the baseline
+def select_all_tasks_per_row():
+    tasks = []
+    for row in run_sql("SELECT * FROM tasks"):
+        user = user_repository.select(row['user_id'])
+        tasks.append(Task(row['description'], user, row['duration'], row['completed'], row['id']))
+    return tasks
+
+
+def measure(label, function, repeat):
+    with count_queries(sys.modules[__name__], *REPOSITORIES) as counter:
+        function()
+    timings = time_calls(function, repeat)
+    report(label, timings, counter["queries"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-per-row", action="store_true", help="only time the joined query")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    print(f"{args.rows} tasks")
+
+    measure("task_repository.select_all (join)", task_repository.select_all, args.repeat)
+    if not args.skip_per_row:
+        measure("tasks, one query per row", select_all_tasks_per_row, 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from flask import Flask, render_template, request, redirect
 from flask import Blueprint
+from controllers.rendering import render_index
 from models.task import Task
 import repositories.task_repository as task_repository
 import repositories.user_repository as user_repository
@@ -8,8 +9,7 @@ tasks_blueprint = Blueprint("tasks", __name__)
 
 @tasks_blueprint.route("/tasks")
 def tasks():
-    tasks = task_repository.select_all() # NEW
-    return render_template("tasks/index.html", all_tasks = tasks)
+    return render_index("tasks/index.html", "all_tasks", task_repository)
 
 # NEW
 # GET '/tasks/new'
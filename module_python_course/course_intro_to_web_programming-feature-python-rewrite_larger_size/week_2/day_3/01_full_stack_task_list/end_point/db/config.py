@@ -0,0 +1,3 @@
+# This app's database: dbname='task_manager' on Postgres, db/task_manager.sqlite3 on
+# SQLite. Every other setting is in shared/db/config.py
+DATABASE_NAME = "task_manager"
@@ -1,4 +1,5 @@
 class Task:
+    __slots__ = ("description", "user", "duration", "completed", "id")
 
     def __init__(self, description, user, duration, completed = False,  id = None, ):
         self.description = description
@@ -1,4 +1,6 @@
 class User:
+    __slots__ = ("first_name", "last_name", "id")
+
     def __init__(self, first_name, last_name, id = None):
         self.first_name = first_name
         self.last_name = last_name
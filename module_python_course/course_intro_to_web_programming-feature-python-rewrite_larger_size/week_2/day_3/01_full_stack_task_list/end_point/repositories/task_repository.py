@@ -1,9 +1,24 @@
-from db.run_sql import run_sql
+from shared.db.run_sql import run_sql, stream_sql
+import shared.pagination as pagination
 
 from models.task import Task
 from models.user import User
 import repositories.user_repository as user_repository
 
+SELECT_TASKS = """
+    SELECT tasks.*, users.first_name, users.last_name
+    FROM tasks
+    LEFT JOIN users ON users.id = tasks.user_id
+"""
+
+# The same in the order task_from_tuple reads them
+SELECT_TASK_TUPLES = """
+    SELECT tasks.description, tasks.duration, tasks.completed, tasks.id,
+           users.first_name, users.last_name, tasks.user_id
+    FROM tasks
+    LEFT JOIN users ON users.id = tasks.user_id
+"""
+
 
 def save(task):
     sql = "INSERT INTO tasks (description, user_id, duration, completed) VALUES (%s, %s, %s, %s) RETURNING *"
@@ -15,18 +30,54 @@ def save(task):
 
 
 def select_all():
-    tasks = []
+    sql = SELECT_TASK_TUPLES + " ORDER BY tasks.id"
+    users = {}
+    return [task_from_tuple(row, users) for row in run_sql(sql, tuples=True)]
+
+
+def select_page(after=None, before=None, limit=pagination.PAGE_SIZE):
+    where, order, values = pagination.keyset("tasks.id", after, before, limit)
+    sql = f"{SELECT_TASKS} {where} ORDER BY tasks.id {order} LIMIT %s"
+    results = run_sql(sql, values)
+    return pagination.page(tasks_from_rows(results), after, before, limit)
 
-    sql = "SELECT * FROM tasks"
-    results = run_sql(sql)
 
+def iterate_all(batch_size=2000):
+    sql = SELECT_TASK_TUPLES + " ORDER BY tasks.id"
+    for row in stream_sql(sql, batch_size=batch_size, tuples=True):
+        yield task_from_tuple(row, {})
+
+
+def tasks_from_rows(results):
+    # Each user is built once and shared by all of their tasks
+    tasks = []
+    users = {}
     for row in results:
-        user = user_repository.select(row['user_id'])
-        task = Task(row['description'], user, row['duration'], row['completed'], row['id'] )
+        task = task_from_row(row, users)
         tasks.append(task)
     return tasks
 
 
+def task_from_row(row, users):
+    user = None
+    if row['user_id'] is not None:
+        user = users.get(row['user_id'])
+        if user is None:
+            user = User(row['first_name'], row['last_name'], row['user_id'])
+            users[user.id] = user
+    return Task(row['description'], user, row['duration'], row['completed'], row['id'] )
+
+
+def task_from_tuple(row, users):
+    description, duration, completed, id, first_name, last_name, user_id = row
+    user = None
+    if user_id is not None:
+        user = users.get(user_id)
+        if user is None:
+            user = users[user_id] = User(first_name, last_name, user_id)
+    return Task(description, user, duration, completed, id)
+
+
 
 def select(id):
     task = None
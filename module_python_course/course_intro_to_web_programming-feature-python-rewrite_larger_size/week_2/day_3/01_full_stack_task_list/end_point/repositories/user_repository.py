@@ -1,4 +1,4 @@
-from db.run_sql import run_sql
+from shared.db.run_sql import run_sql
 
 from models.user import User
 from models.task import Task
@@ -14,15 +14,9 @@ def save(user):
 
 
 def select_all():
-    users = []
-
-    sql = "SELECT * FROM users"
-    results = run_sql(sql)
-
-    for row in results:
-        user = User(row['first_name'], row['last_name'], row['id'] )
-        users.append(user)
-    return users
+    # Plain tuples in User's argument order, with no dict per row
+    sql = "SELECT first_name, last_name, id FROM users"
+    return [User(*row) for row in run_sql(sql, tuples=True)]
 
 
 def select(id):
@@ -1,7 +1,8 @@
 import unittest
  
+from tests.streaming_test import TestStreamedTasks
 from tests.task_test import TestTask
  
  
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,88 @@
+import re
+import unittest
+
+from shared.pagination import PAGE_SIZE
+
+from app import app
+import controllers.rendering as rendering
+import repositories.task_repository as task_repository
+
+# More than a page, and more HTML than one streamed chunk holds
+ROWS = [
+    {"id": id, "description": f"Task <{id}>", "duration": id * 5, "completed": id % 2 == 0, "user_id": 1 + id % 2, "first_name": "Jack", "last_name": "Jarvis"}
+    for id in range(1, PAGE_SIZE * 2 + 21)
+]
+
+# The order SELECT_TASK_TUPLES selects its columns in
+COLUMNS = ["description", "duration", "completed", "id", "first_name", "last_name", "user_id"]
+
+
+def as_tuple(row):
+    return tuple(row[column] for column in COLUMNS)
+
+
+class TestStreamedTasks(unittest.TestCase):
+
+    def setUp(self):
+        self.streamed = []
+        self.original_run_sql = task_repository.run_sql
+        self.original_stream_sql = task_repository.stream_sql
+        self.original_routes = app.config["STREAMED_ROUTES"]
+        task_repository.run_sql = self.fake_run_sql
+        task_repository.stream_sql = self.fake_stream_sql
+
+    def tearDown(self):
+        task_repository.run_sql = self.original_run_sql
+        task_repository.stream_sql = self.original_stream_sql
+        app.config["STREAMED_ROUTES"] = self.original_routes
+
+    def fake_run_sql(self, sql, values=None, tuples=False):
+        # The first page's query, which asks for one row more than a page
+        rows = ROWS[:values[-1]]
+        return [as_tuple(row) for row in rows] if tuples else list(rows)
+
+    def fake_stream_sql(self, sql, values=None, batch_size=2000, tuples=False):
+        self.streamed.append(sql)
+        for row in ROWS:
+            yield as_tuple(row) if tuples else row
+
+    def get(self, streamed_routes):
+        app.config["STREAMED_ROUTES"] = streamed_routes
+        response = app.test_client().get("/tasks")
+        chunks = [chunk.decode() for chunk in response.response]
+        response.close()
+        return chunks
+
+    def tasks(self, html):
+        # The HTML of each task in the list, in order
+        return re.findall(r'<div class="task">.*?\n  </div>', html, re.DOTALL)
+
+
+    def test_buffered_route_renders_one_page(self):
+        html = "".join(self.get(set()))
+        self.assertEqual([], self.streamed)
+        self.assertEqual(PAGE_SIZE, len(self.tasks(html)))
+        self.assertIn(f"Task &lt;{PAGE_SIZE}&gt;", html)
+        self.assertNotIn(f"Task &lt;{PAGE_SIZE + 1}&gt;", html)
+        self.assertIn(f'href="/tasks?after={PAGE_SIZE}"', html)
+
+
+    def test_streamed_route_renders_every_row_in_chunks(self):
+        chunks = self.get({"tasks.tasks"})
+        html = "".join(chunks)
+        self.assertEqual(1, len(self.streamed))
+        self.assertEqual(len(ROWS), len(self.tasks(html)))
+        self.assertIn(f"Task &lt;{len(ROWS)}&gt;", html)
+        self.assertNotIn('class="pagination"', html)
+        self.assertGreater(len(chunks), 1)
+        # Each chunk is sent once it reaches STREAM_CHUNK_SIZE, so only the
+        # last can be shorter, and none is much longer
+        for chunk in chunks[:-1]:
+            self.assertGreaterEqual(len(chunk), rendering.STREAM_CHUNK_SIZE)
+            self.assertLess(len(chunk), rendering.STREAM_CHUNK_SIZE * 2)
+
+
+    def test_streamed_rows_render_as_the_buffered_page_does(self):
+        buffered = self.tasks("".join(self.get(set())))
+        streamed = self.tasks("".join(self.get({"tasks.tasks"})))
+        self.assertEqual(buffered, streamed[:PAGE_SIZE])
@@ -1,8 +1,15 @@
 from flask import Flask, render_template
 
+import shared.db.instrumentation as instrumentation
+import shared.db.unit_of_work as unit_of_work
+import shared.pagination as pagination
+
 from controllers.books_controller import books_blueprint
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+unit_of_work.init_app(app)
+pagination.init_app(app)
 
 app.register_blueprint(books_blueprint)
 
@@ -10,5 +17,6 @@ app.register_blueprint(books_blueprint)
 def home():
     return render_template('index.html')
 
+# Development server only, see gunicorn.conf.py for serving in production
 if __name__ == '__main__':
     app.run(debug=True)
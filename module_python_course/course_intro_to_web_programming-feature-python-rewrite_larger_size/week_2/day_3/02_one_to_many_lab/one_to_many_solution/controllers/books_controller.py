@@ -8,8 +8,10 @@ books_blueprint = Blueprint("books", __name__)
 
 @books_blueprint.route("/books")
 def books():
-    books = book_repository.select_all() # NEW
-    return render_template("books/index.html", all_books = books)
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    page = book_repository.select_page(after, before)
+    return render_template("books/index.html", all_books = page.items, page = page)
 
 # NEW
 # GET '/books/new'
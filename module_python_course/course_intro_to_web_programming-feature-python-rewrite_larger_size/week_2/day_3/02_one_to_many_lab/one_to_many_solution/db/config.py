@@ -0,0 +1,3 @@
+# This app's database: dbname='book_manager' on Postgres, db/book_manager.sqlite3 on
+# SQLite. Every other setting is in shared/db/config.py
+DATABASE_NAME = "book_manager"
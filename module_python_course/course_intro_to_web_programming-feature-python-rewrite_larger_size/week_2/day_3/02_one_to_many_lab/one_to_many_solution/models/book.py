@@ -1,4 +1,5 @@
 class Book:
+    __slots__ = ("title", "genre", "publisher", "author", "id")
 
     def __init__(self, title, genre, publisher, author,  id = None, ):
         self.title = title
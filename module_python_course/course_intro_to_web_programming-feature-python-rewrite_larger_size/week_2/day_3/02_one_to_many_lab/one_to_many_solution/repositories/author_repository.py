@@ -1,4 +1,4 @@
-from db.run_sql import run_sql
+from shared.db.run_sql import run_sql
 
 from models.author import Author
 from models.book import Book
@@ -14,15 +14,9 @@ def save(author):
 
 
 def select_all():
-    authors = []
-
-    sql = "SELECT * FROM authors"
-    results = run_sql(sql)
-
-    for row in results:
-        author = Author(row['first_name'], row['last_name'], row['id'] )
-        authors.append(author)
-    return authors
+    # Plain tuples in Author's argument order, with no dict per row
+    sql = "SELECT first_name, last_name, id FROM authors"
+    return [Author(*row) for row in run_sql(sql, tuples=True)]
 
 
 def select(id):
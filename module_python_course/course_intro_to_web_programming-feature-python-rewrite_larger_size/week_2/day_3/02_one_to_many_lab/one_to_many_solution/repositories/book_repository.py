@@ -1,9 +1,24 @@
-from db.run_sql import run_sql
+from shared.db.run_sql import run_sql, stream_sql
+import shared.pagination as pagination
 
 from models.book import Book
 from models.author import Author
 import repositories.author_repository as author_repository
 
+SELECT_BOOKS = """
+    SELECT books.*, authors.first_name, authors.last_name
+    FROM books
+    LEFT JOIN authors ON authors.id = books.author_id
+"""
+
+# The same in the order book_from_tuple reads them
+SELECT_BOOK_TUPLES = """
+    SELECT books.title, books.genre, books.publisher, books.id,
+           authors.first_name, authors.last_name, books.author_id
+    FROM books
+    LEFT JOIN authors ON authors.id = books.author_id
+"""
+
 
 def save(book):
     sql = "INSERT INTO books (title, genre, publisher, author_id) VALUES (%s, %s, %s, %s) RETURNING *"
@@ -15,18 +30,54 @@ def save(book):
 
 
 def select_all():
-    books = []
+    sql = SELECT_BOOK_TUPLES + " ORDER BY books.id"
+    authors = {}
+    return [book_from_tuple(row, authors) for row in run_sql(sql, tuples=True)]
+
+
+def select_page(after=None, before=None, limit=pagination.PAGE_SIZE):
+    where, order, values = pagination.keyset("books.id", after, before, limit)
+    sql = f"{SELECT_BOOKS} {where} ORDER BY books.id {order} LIMIT %s"
+    results = run_sql(sql, values)
+    return pagination.page(books_from_rows(results), after, before, limit)
 
-    sql = "SELECT * FROM books"
-    results = run_sql(sql)
 
+def iterate_all(batch_size=2000):
+    sql = SELECT_BOOK_TUPLES + " ORDER BY books.id"
+    for row in stream_sql(sql, batch_size=batch_size, tuples=True):
+        yield book_from_tuple(row, {})
+
+
+def books_from_rows(results):
+    # Each author is built once and shared by all of their books
+    books = []
+    authors = {}
     for row in results:
-        author = author_repository.select(row['author_id'])
-        book = Book(row['title'], row['genre'], row['publisher'], author, row['id'] )
+        book = book_from_row(row, authors)
         books.append(book)
     return books
 
 
+def book_from_row(row, authors):
+    author = None
+    if row['author_id'] is not None:
+        author = authors.get(row['author_id'])
+        if author is None:
+            author = Author(row['first_name'], row['last_name'], row['author_id'])
+            authors[author.id] = author
+    return Book(row['title'], row['genre'], row['publisher'], author, row['id'] )
+
+
+def book_from_tuple(row, authors):
+    title, genre, publisher, id, first_name, last_name, author_id = row
+    author = None
+    if author_id is not None:
+        author = authors.get(author_id)
+        if author is None:
+            author = authors[author_id] = Author(first_name, last_name, author_id)
+    return Book(title, genre, publisher, author, id)
+
+
 
 def select(id):
     book = None
@@ -1,10 +1,19 @@
 from flask import Flask, render_template
 
+import shared.db.instrumentation as instrumentation
+import shared.db.table_cache as table_cache
+import shared.db.unit_of_work as unit_of_work
+import shared.pagination as pagination
+
 from controllers.visit_controller import visits_blueprint
 from controllers.location_controller import locations_blueprint
 from controllers.user_controller import users_blueprint
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+unit_of_work.init_app(app)
+table_cache.init_app(app)
+pagination.init_app(app)
 
 app.register_blueprint(visits_blueprint)
 app.register_blueprint(locations_blueprint)
@@ -14,5 +23,6 @@ app.register_blueprint(users_blueprint)
 def home():
     return render_template('index.html')
 
+# Development server only, see gunicorn.conf.py for serving in production
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,90 @@
+# Times user_repository.locations and location_repository.users, each a
+# page of visit counts, against a large visits table, without and then with
+# the join indexes from db/migrations/001_visits_join_indexes.sql.
+#
+# Run from the app folder against a scratch database, it empties all tables:
+#
+#   DATABASE_URL="dbname='quest_advisor_bench'" python -m benchmarks.join_index_benchmark --rows 1000000
+
+import argparse
+import random
+import time
+
+from shared.benchmarks import report_latencies
+from shared.db.run_sql import run_sql
+
+from models.location import Location
+from models.user import User
+import repositories.location_repository as location_repository
+import repositories.partition_repository as partition_repository
+import repositories.user_repository as user_repository
+
+INDEXES = {
+    "visits_user_id_location_id_idx": "visits (user_id, location_id)",
+    "visits_location_id_user_id_idx": "visits (location_id, user_id)",
+}
+
+
+def seed(rows, users, locations):
+    run_sql("TRUNCATE visits, users, locations RESTART IDENTITY CASCADE")
+    # The visits below are all stamped now, in this month's partition
+    partition_repository.create_ahead(0)
+    run_sql("INSERT INTO users (name) SELECT 'User ' || n FROM generate_series(1, %s) AS n", [users])
+    run_sql("INSERT INTO locations (name, category) SELECT 'Location ' || n, 'Category ' || mod(n, 10) FROM generate_series(1, %s) AS n", [locations])
+    # Multiplying by primes scatters each user's visits through the table, the
+    # way rows written over time would be, but the same way on every run
+    run_sql(
+        "INSERT INTO visits (user_id, location_id, review) SELECT 1 + mod(n * 7919, %s), 1 + mod(n * 104729, %s), 'Review ' || n FROM generate_series(1, %s) AS n",
+        [users, locations, rows],
+    )
+
+
+def drop_indexes():
+    for name in INDEXES:
+        run_sql(f"DROP INDEX IF EXISTS {name}")
+    run_sql("ANALYZE visits")
+
+
+def create_indexes():
+    for name, columns in INDEXES.items():
+        run_sql(f"CREATE INDEX {name} ON {columns}")
+    run_sql("ANALYZE visits")
+
+
+def latencies(function, ids):
+    timings = []
+    for id in ids:
+        start = time.perf_counter()
+        function(id)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure(label, user_ids, location_ids):
+    report_latencies(f"user_repository.locations, {label}", latencies(lambda id: user_repository.locations(User("", id)), user_ids))
+    report_latencies(f"location_repository.users, {label}", latencies(lambda id: location_repository.users(Location("", "", id)), location_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--locations", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    seed(args.rows, args.users, args.locations)
+    print(f"{args.rows} visits, {args.users} users, {args.locations} locations")
+    user_ids = [random.randint(1, args.users) for _ in range(args.lookups)]
+    location_ids = [random.randint(1, args.locations) for _ in range(args.lookups)]
+
+    drop_indexes()
+    measure("no indexes", user_ids, location_ids)
+    create_indexes()
+    measure("join indexes", user_ids, location_ids)
+
+
+if __name__ == '__main__':
+    main()
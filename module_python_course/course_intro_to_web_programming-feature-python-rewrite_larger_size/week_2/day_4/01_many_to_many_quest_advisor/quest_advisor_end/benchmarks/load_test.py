@@ -0,0 +1,93 @@
+# Measures requests per second through gunicorn (see gunicorn.conf.py) as the
+# number of worker processes goes up, by default 1, 2, 4, ... up to the
+# number of cores. Start it from the app folder with a seeded database:
+#
+#   DATABASE_URL="dbname='quest_advisor_bench'" python -m benchmarks.load_test --seconds 10
+#
+# The load comes from --clients processes on the same machine, each sending
+# requests one after another over a keep-alive connection, so leave some
+# cores free for them or the numbers will flatten out early.
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+PATHS = ["/visits", "/users", "/locations", "/visits/new"]
+
+
+def start_server(workers, threads, port):
+    env = dict(os.environ, WEB_WORKERS=str(workers), WEB_THREADS=str(threads), BIND=f"127.0.0.1:{port}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start listening within 30 seconds")
+
+
+def client(port, paths, seconds):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    requests = 0
+    errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        conn.request("GET", paths[requests % len(paths)])
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            errors += 1
+        requests += 1
+    conn.close()
+    return requests, errors
+
+
+def measure(workers, args):
+    server = start_server(workers, args.threads, args.port)
+    try:
+        with multiprocessing.Pool(args.clients) as clients:
+            # A short run first so every worker has connected and compiled
+            # its code paths before the measured one
+            clients.starmap(client, [(args.port, args.paths, 1)] * args.clients)
+            results = clients.starmap(client, [(args.port, args.paths, args.seconds)] * args.clients)
+    finally:
+        server.terminate()
+        server.wait()
+    requests = sum(result[0] for result in results)
+    errors = sum(result[1] for result in results)
+    print(f"{workers:>3} workers x {args.threads} threads   {requests / args.seconds:10.1f} requests/s   {errors} errors")
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", help="worker counts to try")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=2 * cores)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--path", dest="paths", action="append", help="pages to request in turn")
+    args = parser.parse_args()
+    args.paths = args.paths or PATHS
+    workers = args.workers or [2 ** n for n in range(cores.bit_length()) if 2 ** n <= cores]
+
+    print(f"{cores} cores, {args.clients} clients requesting {', '.join(args.paths)}")
+    for count in workers:
+        measure(count, args)
+
+
+if __name__ == '__main__':
+    main()
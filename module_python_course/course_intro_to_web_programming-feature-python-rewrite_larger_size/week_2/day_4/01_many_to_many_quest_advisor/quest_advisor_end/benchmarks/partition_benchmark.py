@@ -0,0 +1,111 @@
+# Times the /visits and /users/<id> routes over years of visit history, with
+# visits as one plain table and then partitioned by month as in
+# db/quest_advisor.sql, each with and without a one month window. Requests go
+# through Flask's test client, so the numbers are database and rendering time
+# with no HTTP server in between.
+#
+# Run from the app folder against a scratch database. It drops and recreates
+# visits for each layout, so reload db/quest_advisor.sql when it is done:
+#
+#   DATABASE_URL="dbname='quest_advisor_bench'" python -m benchmarks.partition_benchmark --rows 50000000
+
+import argparse
+import random
+import time
+
+from shared.benchmarks import report_latencies
+from shared.db.run_sql import run_sql
+
+from app import app
+import repositories.partition_repository as partition_repository
+
+COLUMNS = """
+    id SERIAL,
+    user_id INT REFERENCES users(id) ON DELETE CASCADE,
+    location_id INT REFERENCES locations(id) ON DELETE CASCADE,
+    review TEXT,
+    rating SMALLINT,
+    visited_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC')
+"""
+
+LAYOUTS = {
+    "plain": f"CREATE TABLE visits ({COLUMNS}, PRIMARY KEY (id))",
+    "partitioned": f"CREATE TABLE visits ({COLUMNS}, PRIMARY KEY (id, visited_at)) PARTITION BY RANGE (visited_at)",
+}
+
+INDEXES = [
+    "CREATE INDEX visits_user_id_location_id_idx ON visits (user_id, location_id)",
+    "CREATE INDEX visits_location_id_user_id_idx ON visits (location_id, user_id)",
+    "CREATE INDEX visits_visited_at_idx ON visits (visited_at)",
+]
+
+
+def create_visits(layout, months):
+    run_sql("DROP TABLE IF EXISTS visits CASCADE")
+    run_sql(LAYOUTS[layout])
+    partition_repository.forget()
+    if layout == "partitioned":
+        first = partition_repository.add_months(partition_repository.month_start(partition_repository.now()), -months)
+        partition_repository.ensure(partition_repository.add_months(first, n) for n in range(months + 1))
+
+
+def seed(rows, users, locations, months):
+    run_sql("TRUNCATE users, locations RESTART IDENTITY CASCADE")
+    run_sql("INSERT INTO users (name) SELECT 'User ' || n FROM generate_series(1, %s) AS n", [users])
+    run_sql("INSERT INTO locations (name, category) SELECT 'Location ' || n, 'Category ' || mod(n, 10) FROM generate_series(1, %s) AS n", [locations])
+    # Spread evenly over the months up to now, oldest first as they would
+    # have been written, with each user's visits scattered through them
+    run_sql(
+        """
+        INSERT INTO visits (user_id, location_id, review, rating, visited_at)
+        SELECT 1 + mod(n * 7919, %s), 1 + mod(n * 104729, %s), 'Review ' || n, mod(n, 6),
+               (now() AT TIME ZONE 'UTC') - make_interval(months => %s) + (make_interval(months => %s) * n / %s)
+        FROM generate_series(1, %s) AS n
+        """,
+        [users, locations, months, months, rows, rows],
+    )
+    for index in INDEXES:
+        run_sql(index)
+    run_sql("ANALYZE")
+
+
+def measure(layout, client, paths, requests):
+    for label, path in paths:
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.get(path())
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"{label} answered {response.status_code} with {layout} visits")
+        report_latencies(f"{layout:<12} {label}", latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--layouts", default="plain,partitioned")
+    parser.add_argument("--rows", type=int, default=50000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--locations", type=int, default=10000)
+    parser.add_argument("--months", type=int, default=60, help="months of history before this one")
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    last_month = partition_repository.add_months(partition_repository.month_start(partition_repository.now()), -1).date()
+    users = random.Random(0)
+    paths = [
+        ("GET /visits", lambda: "/visits"),
+        ("GET /visits since last month", lambda: f"/visits?since={last_month}"),
+        ("GET /users/<id>", lambda: f"/users/{users.randint(1, args.users)}"),
+        ("GET /users/<id> since last month", lambda: f"/users/{users.randint(1, args.users)}?since={last_month}"),
+    ]
+    client = app.test_client()
+    print(f"{args.rows} visits over {args.months + 1} months")
+    for layout in args.layouts.split(","):
+        create_visits(layout, args.months)
+        seed(args.rows, args.users, args.locations, args.months)
+        measure(layout, client, paths, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Times /locations/<id> and /users/<id> with their recommendations over a
+# catalogue of 100,000 locations, how long saving a visit takes with the
+# location_covisits triggers doing their share, and how long a full rebuild
+# and check take. Requests go through Flask's test client, so the numbers
+# are database and rendering time with no HTTP server in between.
+#
+# Run from the app folder against a scratch database loaded from
+# db/quest_advisor.sql; it empties users, locations and visits first:
+#
+#   DATABASE_URL="dbname='quest_advisor_bench'" python -m benchmarks.recommendation_benchmark --locations 100000
+
+import argparse
+import random
+import time
+
+from shared.benchmarks import report_latencies
+from shared.db.run_sql import run_sql
+
+from app import app
+from models.location import Location
+from models.user import User
+from models.visit import Visit
+import repositories.partition_repository as partition_repository
+import repositories.rating_repository as rating_repository
+import repositories.recommendation_repository as recommendation_repository
+import repositories.visit_repository as visit_repository
+
+
+def seed(users, locations, visits):
+    run_sql("TRUNCATE users, locations, visits RESTART IDENTITY CASCADE")
+    partition_repository.create_ahead(0)
+    run_sql("INSERT INTO users (name) SELECT 'User ' || n FROM generate_series(1, %s) AS n", [users])
+    run_sql("INSERT INTO locations (name, category) SELECT 'Location ' || n, 'Category ' || mod(n, 10) FROM generate_series(1, %s) AS n", [locations])
+    # Counted once at the end by the rebuilds rather than by the triggers.
+    # Squaring a uniform random number makes low ids popular, as a few
+    # places are in any real catalogue.
+    run_sql("ALTER TABLE visits DISABLE TRIGGER USER")
+    run_sql(
+        """
+        INSERT INTO visits (user_id, location_id, review, rating)
+        SELECT 1 + mod(n * 7919, %s), 1 + floor(%s * power(random(), 2))::INT, 'Review ' || n, mod(n, 6)
+        FROM generate_series(1, %s) AS n
+        """,
+        [users, locations, visits],
+    )
+    run_sql("ALTER TABLE visits ENABLE TRIGGER USER")
+    run_sql("ANALYZE")
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:<45} {time.perf_counter() - start:10.1f} s")
+    return result
+
+
+def measure_pages(client, users, locations, requests):
+    picks = random.Random(0)
+    paths = [
+        ("GET /locations/<id>", lambda: f"/locations/{picks.randint(1, locations)}"),
+        ("GET /users/<id>", lambda: f"/users/{picks.randint(1, users)}"),
+    ]
+    for label, path in paths:
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.get(path())
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"{label} answered {response.status_code}")
+        report_latencies(label, latencies)
+
+
+def measure_saves(users, locations, requests):
+    picks = random.Random(1)
+    latencies = []
+    for _ in range(requests):
+        visit = Visit(User("", picks.randint(1, users)), Location("", "", picks.randint(1, locations)), "4 stars")
+        start = time.perf_counter()
+        visit_repository.save(visit)
+        latencies.append(time.perf_counter() - start)
+    report_latencies("visit_repository.save", latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--locations", type=int, default=100000)
+    parser.add_argument("--visits", type=int, default=2000000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    seed(args.users, args.locations, args.visits)
+    timed("rating_repository.rebuild", rating_repository.rebuild)
+    timed("recommendation_repository.rebuild", recommendation_repository.rebuild)
+    pairs = run_sql("SELECT COUNT(*) FROM location_covisits", tuples=True)[0][0]
+    print(f"{args.visits} visits by {args.users} users to {args.locations} locations, {pairs} stored pairs")
+    measure_pages(app.test_client(), args.users, args.locations, args.requests)
+    measure_saves(args.users, args.locations, args.requests)
+    problems = timed("recommendation_repository.check", recommendation_repository.check)
+    print(f"{len(problems)} pairs miscounted")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Compares visit_repository.select_all, whose users and locations are lazy and
+# batch loaded, with one joined query and the old one-query-per-row approach.
+# Every variant reads every visit's user and location name.
+#
+# Run from the app folder against a scratch database, it empties all tables:
+#
+#   DATABASE_URL="dbname='quest_advisor_bench'" python -m benchmarks.select_all_benchmark --rows 100000
+
+import argparse
+import sys
+
+from shared.benchmarks import count_queries, report, time_calls
+from shared.db.run_sql import run_sql
+
+from models.visit import Visit
+import repositories.location_repository as location_repository
+import repositories.partition_repository as partition_repository
+import repositories.user_repository as user_repository
+import repositories.visit_repository as visit_repository
+
+REPOSITORIES = [location_repository, user_repository, visit_repository]
+
+
+def seed(rows):
+    users = max(rows // 10, 1)
+    locations = max(rows // 100, 1)
+    run_sql("TRUNCATE visits, users, locations RESTART IDENTITY CASCADE")
+    # The visits below are all stamped now, in this month's partition
+    partition_repository.create_ahead(0)
+    run_sql("INSERT INTO users (name) SELECT 'User ' || n FROM generate_series(1, %s) AS n", [users])
+    run_sql("INSERT INTO locations (name, category) SELECT 'Location ' || n, 'Category ' || mod(n, 10) FROM generate_series(1, %s) AS n", [locations])
+    run_sql("INSERT INTO visits (user_id, location_id, review) SELECT 1 + mod(n, %s), 1 + mod(n, %s), 'Review ' || n FROM generate_series(1, %s) AS n", [users, locations, rows])
+    run_sql("ANALYZE")
+
+
+# The previous implementation, kept here as the baseline
+def select_all_visits_per_row():
+    visits = []
+    for row in run_sql("SELECT * FROM visits"):
+        user = user_repository.select(row['user_id'])
+        location = location_repository.select(row['location_id'])
+        visits.append(Visit(user, location, row['review'], row['id']))
+    return visits
+
+
+def select_all_lazy():
+    visits = visit_repository.select_all()
+    for visit in visits:
+        visit.user.name, visit.location.name
+    return visits
+
+
+def select_all_joined():
+    users = {}
+    locations = {}
+    sql = visit_repository.SELECT_VISIT_TUPLES + " ORDER BY visits.id"
+    return [visit_repository.visit_from_tuple(row, users, locations) for row in run_sql(sql, tuples=True)]
+
+
+def measure(label, function, repeat):
+    with count_queries(sys.modules[__name__], *REPOSITORIES) as counter:
+        function()
+    timings = time_calls(function, repeat)
+    report(label, timings, counter["queries"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-per-row", action="store_true", help="only time the lazy and joined queries")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    print(f"{args.rows} visits")
+
+    measure("visit_repository.select_all (lazy, batched)", select_all_lazy, args.repeat)
+    measure("visits joined to users and locations", select_all_joined, args.repeat)
+    if not args.skip_per_row:
+        measure("visits, one query per row", select_all_visits_per_row, 1)
+
+
+if __name__ == '__main__':
+    main()
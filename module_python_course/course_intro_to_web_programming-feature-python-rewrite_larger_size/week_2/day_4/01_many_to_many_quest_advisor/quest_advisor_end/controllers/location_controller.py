@@ -1,17 +1,30 @@
+from datetime import date
+
 from flask import Flask, render_template, request, redirect
 from flask import Blueprint
 from models.location import Location
 import repositories.location_repository as location_repository
+import repositories.rating_repository as rating_repository
+import repositories.recommendation_repository as recommendation_repository
 
 locations_blueprint = Blueprint("locations", __name__)
 
 @locations_blueprint.route("/locations")
 def locations():
     locations = location_repository.select_all() # NEW
-    return render_template("locations/index.html", locations = locations)
+    category = request.args.get('category') or None
+    rankings = rating_repository.top_locations(category)
+    categories = sorted({location.category for location in locations if location.category})
+    return render_template("locations/index.html", locations = locations, rankings = rankings, category = category, categories = categories)
 
 @locations_blueprint.route("/locations/<id>")
 def show(id):
     location = location_repository.select(id)
-    users = location_repository.users(location)
-    return render_template("locations/show.html", location=location, users=users)
+    since = request.args.get('since', type=date.fromisoformat)
+    until = request.args.get('until', type=date.fromisoformat)
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    page = location_repository.users(location, since, until, after, before)
+    page_args = {name: value.isoformat() for name, value in [('since', since), ('until', until)] if value is not None}
+    similar = recommendation_repository.similar_locations(location)
+    return render_template("locations/show.html", location=location, users=page.items, page=page, page_args=dict(page_args, id=id), similar=similar, since=since, until=until)
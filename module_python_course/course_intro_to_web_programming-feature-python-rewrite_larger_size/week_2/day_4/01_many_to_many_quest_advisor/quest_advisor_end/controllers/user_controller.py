@@ -1,6 +1,9 @@
+from datetime import date
+
 from flask import Flask, render_template, request, redirect
 from flask import Blueprint
 from models.user import User
+import repositories.recommendation_repository as recommendation_repository
 import repositories.user_repository as user_repository
 
 users_blueprint = Blueprint("users", __name__)
@@ -13,5 +16,11 @@ def users():
 @users_blueprint.route("/users/<id>")
 def show(id):
     user = user_repository.select(id)
-    locations = user_repository.locations(user)
-    return render_template("users/show.html", user=user, locations=locations)
+    since = request.args.get('since', type=date.fromisoformat)
+    until = request.args.get('until', type=date.fromisoformat)
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    page = user_repository.locations(user, since, until, after, before)
+    page_args = {name: value.isoformat() for name, value in [('since', since), ('until', until)] if value is not None}
+    suggestions = recommendation_repository.suggested_locations(user)
+    return render_template("users/show.html", user=user, locations=page.items, page=page, page_args=dict(page_args, id=id), suggestions=suggestions, since=since, until=until)
@@ -1,3 +1,5 @@
+from datetime import date
+
 from flask import Flask, render_template, request, redirect
 from flask import Blueprint
 from models.visit import Visit
@@ -9,8 +11,14 @@ visits_blueprint = Blueprint("visits", __name__)
 
 @visits_blueprint.route("/visits")
 def visits():
-    visits = visit_repository.select_all() # NEW
-    return render_template("visits/index.html", visits = visits)
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    # ?since=2024-01-01&until=2024-02-01 only shows visits from January
+    since = request.args.get('since', type=date.fromisoformat)
+    until = request.args.get('until', type=date.fromisoformat)
+    page = visit_repository.select_page(after, before, since=since, until=until)
+    page_args = {name: value.isoformat() for name, value in [('since', since), ('until', until)] if value is not None}
+    return render_template("visits/index.html", visits = page.items, page = page, page_args = page_args, since = since, until = until)
 
 # NEW
 # GET '/visits/new'
@@ -27,9 +35,11 @@ def create_task():
     user_id = request.form['user_id']
     location_id = request.form['location_id']
     review = request.form['review']
+    # Left blank, the rating is read from the review when it is saved
+    rating = request.form.get('rating', type=int)
     user = user_repository.select(user_id)
     location = location_repository.select(location_id)
-    visit = Visit(user, location, review)
+    visit = Visit(user, location, review, rating=rating)
     visit_repository.save(visit)
     return redirect('/visits')
 
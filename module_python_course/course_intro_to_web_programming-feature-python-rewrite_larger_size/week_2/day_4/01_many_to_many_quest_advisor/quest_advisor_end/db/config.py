@@ -0,0 +1,3 @@
+# This app's database: dbname='quest_advisor' on Postgres, db/quest_advisor.sqlite3 on
+# SQLite. Every other setting is in shared/db/config.py
+DATABASE_NAME = "quest_advisor"
@@ -0,0 +1,11 @@
+-- Adds the join indexes from quest_advisor.sql to an existing database without
+-- locking visits against writes while they build:
+--
+--   psql -d quest_advisor -f db/migrations/001_visits_join_indexes.sql
+--
+-- CONCURRENTLY cannot run inside a transaction, so run it with psql as above
+-- rather than through run_sql. Safe to run more than once.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS visits_user_id_location_id_idx ON visits (user_id, location_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS visits_location_id_user_id_idx ON visits (location_id, user_id);
+ANALYZE visits;
@@ -0,0 +1,119 @@
+-- Adds visits.rating and location_ratings with the triggers that keep it up to
+-- date (see quest_advisor.sql) to an existing database:
+--
+--   psql -d quest_advisor -f db/migrations/002_visit_ratings.sql
+--   python -m repositories.rating_repository --backfill
+--
+-- The new column is NULL for every existing visit, so the second command
+-- parses a rating out of each old review, a batch at a time, and the triggers
+-- add them to location_ratings as it goes. location_ratings is built in one
+-- transaction holding a SHARE lock on visits, which blocks writes but not
+-- reads, so no rating can land between the recount and the triggers going
+-- live. Safe to run more than once; a second run recounts from scratch.
+
+-- Adding a nullable column without a default only changes the catalog. The
+-- check is added NOT VALID and validated after the COMMIT, which reads
+-- visits without blocking writes.
+ALTER TABLE visits ADD COLUMN IF NOT EXISTS rating SMALLINT;
+DO $$
+BEGIN
+  ALTER TABLE visits ADD CONSTRAINT visits_rating_check CHECK (rating BETWEEN 0 AND 5) NOT VALID;
+EXCEPTION WHEN duplicate_object THEN
+  NULL;
+END;
+$$;
+
+BEGIN;
+
+LOCK TABLE visits IN SHARE MODE;
+
+CREATE TABLE IF NOT EXISTS location_ratings (
+  location_id INT PRIMARY KEY REFERENCES locations(id) ON DELETE CASCADE,
+  category VARCHAR(255),
+  ratings INT NOT NULL,
+  rating_sum INT NOT NULL,
+  average DOUBLE PRECISION GENERATED ALWAYS AS (CAST(rating_sum AS DOUBLE PRECISION) / NULLIF(ratings, 0)) STORED
+);
+
+CREATE INDEX IF NOT EXISTS location_ratings_average_idx ON location_ratings (average DESC, ratings DESC, location_id);
+CREATE INDEX IF NOT EXISTS location_ratings_category_average_idx ON location_ratings (category, average DESC, ratings DESC, location_id);
+
+-- Statement triggers see every row a statement changed at once, so a bulk
+-- insert or a backfill batch updates each location's totals once rather than
+-- once a row. New totals are upserted in location_id order, so concurrent
+-- writers lock the rows they share in the same order rather than deadlocking.
+CREATE OR REPLACE FUNCTION total_ratings() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'TRUNCATE' THEN
+    DELETE FROM location_ratings;
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    UPDATE location_ratings AS totals
+    SET ratings = totals.ratings - removed.ratings, rating_sum = totals.rating_sum - removed.rating_sum
+    FROM (
+      SELECT location_id, COUNT(*) AS ratings, SUM(rating) AS rating_sum
+      FROM old_visits WHERE rating IS NOT NULL GROUP BY location_id
+    ) AS removed
+    WHERE totals.location_id = removed.location_id;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO location_ratings (location_id, category, ratings, rating_sum)
+    SELECT locations.id, locations.category, added.ratings, added.rating_sum
+    FROM (
+      SELECT location_id, COUNT(*) AS ratings, SUM(rating) AS rating_sum
+      FROM new_visits WHERE rating IS NOT NULL GROUP BY location_id
+    ) AS added
+    INNER JOIN locations ON locations.id = added.location_id
+    ORDER BY locations.id
+    ON CONFLICT (location_id) DO UPDATE
+    SET ratings = location_ratings.ratings + EXCLUDED.ratings, rating_sum = location_ratings.rating_sum + EXCLUDED.rating_sum;
+  END IF;
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    DELETE FROM location_ratings
+    WHERE ratings = 0 AND location_id IN (SELECT location_id FROM old_visits);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS visits_rating_inserted ON visits;
+CREATE TRIGGER visits_rating_inserted AFTER INSERT ON visits
+  REFERENCING NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+DROP TRIGGER IF EXISTS visits_rating_deleted ON visits;
+CREATE TRIGGER visits_rating_deleted AFTER DELETE ON visits
+  REFERENCING OLD TABLE AS old_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+DROP TRIGGER IF EXISTS visits_rating_updated ON visits;
+CREATE TRIGGER visits_rating_updated AFTER UPDATE ON visits
+  REFERENCING OLD TABLE AS old_visits NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+DROP TRIGGER IF EXISTS visits_rating_truncated ON visits;
+CREATE TRIGGER visits_rating_truncated AFTER TRUNCATE ON visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+
+CREATE OR REPLACE FUNCTION copy_location_category() RETURNS trigger AS $$
+BEGIN
+  UPDATE location_ratings SET category = NEW.category WHERE location_id = NEW.id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS locations_copy_category ON locations;
+CREATE TRIGGER locations_copy_category AFTER UPDATE OF category ON locations
+  FOR EACH ROW WHEN (OLD.category IS DISTINCT FROM NEW.category)
+  EXECUTE FUNCTION copy_location_category();
+
+DELETE FROM location_ratings;
+INSERT INTO location_ratings (location_id, category, ratings, rating_sum)
+SELECT locations.id, locations.category, COUNT(*), SUM(visits.rating)
+FROM visits
+INNER JOIN locations ON locations.id = visits.location_id
+WHERE visits.rating IS NOT NULL
+GROUP BY locations.id;
+
+COMMIT;
+
+ALTER TABLE visits VALIDATE CONSTRAINT visits_rating_check;
+ANALYZE location_ratings;
@@ -0,0 +1,100 @@
+-- Turns an existing visits table into the monthly partitioned one from
+-- quest_advisor.sql, after 002_visit_ratings.sql:
+--
+--   psql -d quest_advisor -f db/migrations/003_partition_visits.sql
+--
+-- Rather than copying every row, the old table becomes one partition,
+-- visits_legacy, covering everything up to the end of this month, and monthly
+-- partitions start from next month. Nothing recorded when the old visits
+-- happened, so they are all stamped with the time of the migration. Adding the
+-- column that way only changes the catalog, but the primary key has to gain
+-- visited_at, which rebuilds its index, and attaching the old table reads it
+-- once to check its rows fit. visits is locked for all of that, so run it in a
+-- maintenance window. It all happens in one transaction, so it either all
+-- happens or none of it does; it stops at the first error.
+
+\set ON_ERROR_STOP on
+
+BEGIN;
+
+LOCK TABLE visits IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE visits RENAME TO visits_legacy;
+ALTER INDEX visits_user_id_location_id_idx RENAME TO visits_legacy_user_id_location_id_idx;
+ALTER INDEX visits_location_id_user_id_idx RENAME TO visits_legacy_location_id_user_id_idx;
+DROP TRIGGER IF EXISTS visits_rating_inserted ON visits_legacy;
+DROP TRIGGER IF EXISTS visits_rating_deleted ON visits_legacy;
+DROP TRIGGER IF EXISTS visits_rating_updated ON visits_legacy;
+DROP TRIGGER IF EXISTS visits_rating_truncated ON visits_legacy;
+
+ALTER TABLE visits_legacy ADD COLUMN visited_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC');
+ALTER TABLE visits_legacy ALTER COLUMN visited_at DROP DEFAULT;
+ALTER TABLE visits_legacy DROP CONSTRAINT visits_pkey;
+ALTER TABLE visits_legacy ADD CONSTRAINT visits_legacy_pkey PRIMARY KEY (id, visited_at);
+
+CREATE TABLE visits (
+  id INT NOT NULL DEFAULT nextval('visits_id_seq'),
+  user_id INT REFERENCES users(id) ON DELETE CASCADE,
+  location_id INT REFERENCES locations(id) ON DELETE CASCADE,
+  review TEXT,
+  rating SMALLINT CONSTRAINT visits_rating_check CHECK (rating BETWEEN 0 AND 5),
+  visited_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+  PRIMARY KEY (id, visited_at)
+) PARTITION BY RANGE (visited_at);
+ALTER SEQUENCE visits_id_seq OWNED BY visits.id;
+
+-- Attaching adopts the old table's matching indexes instead of building more
+CREATE INDEX visits_user_id_location_id_idx ON visits (user_id, location_id);
+CREATE INDEX visits_location_id_user_id_idx ON visits (location_id, user_id);
+
+DO $$
+BEGIN
+  EXECUTE format(
+    'ALTER TABLE visits ATTACH PARTITION visits_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+    date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '1 month'
+  );
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION create_visits_partition(moment TIMESTAMP) RETURNS TEXT AS $$
+DECLARE
+  month_start TIMESTAMP := date_trunc('month', moment);
+  partition_name TEXT := 'visits_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+  IF to_regclass(partition_name) IS NOT NULL THEN
+    RETURN partition_name;
+  END IF;
+  EXECUTE format(
+    'CREATE TABLE IF NOT EXISTS %I PARTITION OF visits FOR VALUES FROM (%L) TO (%L)',
+    partition_name, month_start, month_start + INTERVAL '1 month'
+  );
+  RETURN partition_name;
+EXCEPTION
+  -- Overlaps a partition with another name
+  WHEN invalid_object_definition THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_visits_partition(month)
+FROM generate_series(date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '1 month', date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '3 months', INTERVAL '1 month') AS month;
+
+CREATE SCHEMA IF NOT EXISTS visits_archive;
+
+-- The location_ratings triggers from 002_visit_ratings.sql, now on the
+-- partitioned table; total_ratings() itself is unchanged
+CREATE TRIGGER visits_rating_inserted AFTER INSERT ON visits
+  REFERENCING NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+CREATE TRIGGER visits_rating_deleted AFTER DELETE ON visits
+  REFERENCING OLD TABLE AS old_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+CREATE TRIGGER visits_rating_updated AFTER UPDATE ON visits
+  REFERENCING OLD TABLE AS old_visits NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+CREATE TRIGGER visits_rating_truncated AFTER TRUNCATE ON visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+
+COMMIT;
+
+ANALYZE visits;
@@ -0,0 +1,71 @@
+-- Adds the triggers that tell shared/db/table_cache.py in every worker
+-- process which users and locations changed (see quest_advisor.sql) to an
+-- existing database:
+--
+--   psql -d quest_advisor -f db/migrations/004_notify_table_changes.sql
+--
+-- Creating a trigger only takes a brief SHARE ROW EXCLUSIVE lock on its table.
+-- Safe to run more than once.
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS users_notify_inserted ON users;
+DROP TRIGGER IF EXISTS users_notify_deleted ON users;
+DROP TRIGGER IF EXISTS users_notify_updated ON users;
+DROP TRIGGER IF EXISTS users_notify_truncated ON users;
+DROP TRIGGER IF EXISTS locations_notify_inserted ON locations;
+DROP TRIGGER IF EXISTS locations_notify_deleted ON locations;
+DROP TRIGGER IF EXISTS locations_notify_updated ON locations;
+DROP TRIGGER IF EXISTS locations_notify_truncated ON locations;
+
+-- Tells every worker process which rows of its cached tables changed, see
+-- shared/db/table_cache.py. One notification per statement, sent when the
+-- transaction commits, with the ids it changed; a statement that changed
+-- too many to fit in a notification, or a TRUNCATE, sends * for all of them.
+CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+DECLARE
+  ids TEXT;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT string_agg(id::TEXT, ',') INTO ids FROM new_rows;
+  ELSIF TG_OP = 'UPDATE' THEN
+    SELECT string_agg(id::TEXT, ',') INTO ids FROM (SELECT id FROM old_rows UNION SELECT id FROM new_rows) AS changed;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT string_agg(id::TEXT, ',') INTO ids FROM old_rows;
+  END IF;
+  IF ids IS NULL AND TG_OP <> 'TRUNCATE' THEN
+    RETURN NULL;
+  END IF;
+  IF ids IS NULL OR length(ids) > 7000 THEN
+    ids := '*';
+  END IF;
+  PERFORM pg_notify('table_changes', TG_TABLE_NAME || ':' || extract(epoch FROM clock_timestamp()) || ':' || ids);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_notify_inserted AFTER INSERT ON users
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER users_notify_deleted AFTER DELETE ON users
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER users_notify_updated AFTER UPDATE ON users
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER users_notify_truncated AFTER TRUNCATE ON users
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
+CREATE TRIGGER locations_notify_inserted AFTER INSERT ON locations
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER locations_notify_deleted AFTER DELETE ON locations
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER locations_notify_updated AFTER UPDATE ON locations
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER locations_notify_truncated AFTER TRUNCATE ON locations
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
+COMMIT;
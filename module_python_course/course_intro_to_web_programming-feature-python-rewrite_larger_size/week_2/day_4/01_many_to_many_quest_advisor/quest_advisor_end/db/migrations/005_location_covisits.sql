@@ -0,0 +1,172 @@
+-- Adds location_covisits and the triggers that keep it up to date (see
+-- quest_advisor.sql) to an existing database, after
+-- 004_notify_table_changes.sql, and counts it from visits:
+--
+--   psql -d quest_advisor -f db/migrations/005_location_covisits.sql
+--
+-- It all runs in one transaction holding a SHARE lock on visits, which
+-- blocks writes but not reads, so no visit can land between the count and
+-- the triggers going live. Counting pairs every location each user has
+-- been to with every other, so on a big database expect it to take a
+-- while. Safe to run more than once; a second run recounts from scratch.
+
+\set ON_ERROR_STOP on
+
+BEGIN;
+
+LOCK TABLE visits IN SHARE MODE;
+
+CREATE TABLE IF NOT EXISTS location_covisits (
+  location_id INT REFERENCES locations(id) ON DELETE CASCADE,
+  other_location_id INT NOT NULL,
+  users INT NOT NULL,
+  PRIMARY KEY (location_id, other_location_id)
+);
+
+CREATE INDEX IF NOT EXISTS location_covisits_users_idx ON location_covisits (location_id, users DESC, other_location_id);
+-- Only ever holds the pairs a trigger has just taken down to no users
+CREATE INDEX IF NOT EXISTS location_covisits_unshared_idx ON location_covisits (location_id) WHERE users = 0;
+
+-- Applies a change in the number of visits each (user, location) has, with
+-- visits already changed. Only the locations a user has gained or lost
+-- change any pairs, so a user's cost is those times the number of
+-- locations they have been to, not the square of it.
+CREATE OR REPLACE FUNCTION count_covisits(changed_users INT[], changed_locations INT[], changes BIGINT[]) RETURNS void AS $$
+BEGIN
+  -- Counted for one transaction at a time per user, otherwise two saving
+  -- new locations for the same user at once would each miss the other's
+  PERFORM 1 FROM users WHERE id = ANY(changed_users) ORDER BY id FOR NO KEY UPDATE;
+  WITH changed AS (
+    SELECT user_id, location_id, SUM(change) AS change
+    FROM unnest(changed_users, changed_locations, changes) AS changed(user_id, location_id, change)
+    GROUP BY user_id, location_id
+  ),
+  visited AS (
+    SELECT user_id, location_id,
+           COALESCE(visits_now.visits, 0) > 0 AS visited_after,
+           COALESCE(visits_now.visits, 0) - COALESCE(changed.change, 0) > 0 AS visited_before
+    FROM (
+      SELECT user_id, location_id, COUNT(*) AS visits
+      FROM visits WHERE user_id = ANY(changed_users)
+      GROUP BY user_id, location_id
+    ) AS visits_now
+    FULL OUTER JOIN changed USING (user_id, location_id)
+  ),
+  gained AS (SELECT user_id, location_id FROM visited WHERE visited_after AND NOT visited_before),
+  lost AS (SELECT user_id, location_id FROM visited WHERE visited_before AND NOT visited_after),
+  pairs AS (
+    SELECT location_id, other_location_id, SUM(change) AS change
+    FROM (
+      SELECT gained.location_id, visited.location_id AS other_location_id, 1 AS change
+      FROM gained INNER JOIN visited ON visited.user_id = gained.user_id
+      WHERE visited.visited_after AND visited.location_id <> gained.location_id
+      UNION ALL
+      SELECT visited.location_id, gained.location_id, 1
+      FROM gained INNER JOIN visited ON visited.user_id = gained.user_id
+      WHERE visited.visited_after AND visited.visited_before
+      UNION ALL
+      SELECT lost.location_id, visited.location_id, -1
+      FROM lost INNER JOIN visited ON visited.user_id = lost.user_id
+      WHERE visited.visited_before AND visited.location_id <> lost.location_id
+      UNION ALL
+      SELECT visited.location_id, lost.location_id, -1
+      FROM lost INNER JOIN visited ON visited.user_id = lost.user_id
+      WHERE visited.visited_after AND visited.visited_before
+    ) AS changed_pairs
+    GROUP BY location_id, other_location_id
+    HAVING SUM(change) <> 0
+  ),
+  -- A pair only goes down when it is already stored, and never both up
+  -- and down in one go, so the two halves touch different rows
+  taken_down AS (
+    UPDATE location_covisits AS covisits SET users = covisits.users + pairs.change
+    FROM pairs
+    WHERE pairs.change < 0
+      AND covisits.location_id = pairs.location_id
+      AND covisits.other_location_id = pairs.other_location_id
+  )
+  INSERT INTO location_covisits (location_id, other_location_id, users)
+  SELECT location_id, other_location_id, change FROM pairs WHERE change > 0
+  ORDER BY location_id, other_location_id
+  ON CONFLICT (location_id, other_location_id) DO UPDATE SET users = location_covisits.users + EXCLUDED.users;
+  DELETE FROM location_covisits WHERE users = 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION count_visit_covisits() RETURNS trigger AS $$
+DECLARE
+  changed_users INT[];
+  changed_locations INT[];
+  changes BIGINT[];
+BEGIN
+  IF TG_OP = 'TRUNCATE' THEN
+    DELETE FROM location_covisits;
+    RETURN NULL;
+  END IF;
+  IF TG_OP = 'INSERT' THEN
+    SELECT array_agg(user_id), array_agg(location_id), array_agg(change)
+    INTO changed_users, changed_locations, changes
+    FROM (
+      SELECT user_id, location_id, COUNT(*) AS change FROM new_visits
+      WHERE user_id IS NOT NULL AND location_id IS NOT NULL
+      GROUP BY user_id, location_id
+    ) AS changed;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT array_agg(user_id), array_agg(location_id), array_agg(change)
+    INTO changed_users, changed_locations, changes
+    FROM (
+      SELECT user_id, location_id, -COUNT(*) AS change FROM old_visits
+      WHERE user_id IS NOT NULL AND location_id IS NOT NULL
+      GROUP BY user_id, location_id
+    ) AS changed;
+  ELSE
+    -- Most updates, like rating backfills, move no visit and change nothing
+    SELECT array_agg(user_id), array_agg(location_id), array_agg(change)
+    INTO changed_users, changed_locations, changes
+    FROM (
+      SELECT user_id, location_id, SUM(change) AS change
+      FROM (
+        SELECT user_id, location_id, 1 AS change FROM new_visits
+        UNION ALL
+        SELECT user_id, location_id, -1 FROM old_visits
+      ) AS moved
+      WHERE user_id IS NOT NULL AND location_id IS NOT NULL
+      GROUP BY user_id, location_id
+      HAVING SUM(change) <> 0
+    ) AS changed;
+  END IF;
+  IF changed_users IS NOT NULL THEN
+    PERFORM count_covisits(changed_users, changed_locations, changes);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS visits_covisits_inserted ON visits;
+DROP TRIGGER IF EXISTS visits_covisits_deleted ON visits;
+DROP TRIGGER IF EXISTS visits_covisits_updated ON visits;
+DROP TRIGGER IF EXISTS visits_covisits_truncated ON visits;
+
+CREATE TRIGGER visits_covisits_inserted AFTER INSERT ON visits
+  REFERENCING NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION count_visit_covisits();
+CREATE TRIGGER visits_covisits_deleted AFTER DELETE ON visits
+  REFERENCING OLD TABLE AS old_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION count_visit_covisits();
+CREATE TRIGGER visits_covisits_updated AFTER UPDATE ON visits
+  REFERENCING OLD TABLE AS old_visits NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION count_visit_covisits();
+CREATE TRIGGER visits_covisits_truncated AFTER TRUNCATE ON visits
+  FOR EACH STATEMENT EXECUTE FUNCTION count_visit_covisits();
+
+DELETE FROM location_covisits;
+INSERT INTO location_covisits (location_id, other_location_id, users)
+SELECT visited.location_id, other.location_id, COUNT(*)
+FROM (SELECT DISTINCT user_id, location_id FROM visits) AS visited
+INNER JOIN (SELECT DISTINCT user_id, location_id FROM visits) AS other
+  ON other.user_id = visited.user_id AND other.location_id <> visited.location_id
+GROUP BY visited.location_id, other.location_id;
+
+COMMIT;
+
+ANALYZE location_covisits;
@@ -1,3 +1,5 @@
+DROP TABLE location_covisits;
+DROP TABLE location_ratings;
 DROP TABLE visits;
 DROP TABLE users;
 DROP TABLE locations;
@@ -13,9 +15,333 @@ CREATE TABLE locations (
   name VARCHAR(255)
 );
 
+-- postgres only
+-- Visits are range partitioned by month of visited_at (a UTC timestamp), so a
+-- query given a date window only reads the months it covers, and old months
+-- can be detached whole to the visits_archive schema (see
+-- repositories/partition_repository.py) rather than deleted row by row.
+-- The primary key of a partitioned table has to include visited_at. Indexes
+-- made on visits are made on every partition, present and future.
+-- SQLite has no partitions and gets a plain visits in quest_advisor.sqlite.sql.
 CREATE TABLE visits (
-  id SERIAL PRIMARY KEY,
+  id SERIAL,
   user_id INT REFERENCES users(id) ON DELETE CASCADE,
   location_id INT REFERENCES locations(id) ON DELETE CASCADE,
-  review TEXT
+  review TEXT,
+  -- 0 to 5 stars, or NULL when the review gives none
+  rating SMALLINT CONSTRAINT visits_rating_check CHECK (rating BETWEEN 0 AND 5),
+  visited_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+  PRIMARY KEY (id, visited_at)
+) PARTITION BY RANGE (visited_at);
+
+-- One index for each direction of the join, user to locations and location to users
+CREATE INDEX visits_user_id_location_id_idx ON visits (user_id, location_id);
+CREATE INDEX visits_location_id_user_id_idx ON visits (location_id, user_id);
+
+-- Creates the partition visits_YYYY_MM for the month of a timestamp unless it
+-- is already there, and returns its name, or NULL if another partition
+-- already covers the month (e.g. the visits_legacy one from
+-- migrations/003_partition_visits.sql). Creating a partition briefly locks
+-- visits, so partition_repository.create_ahead makes them in advance.
+CREATE OR REPLACE FUNCTION create_visits_partition(moment TIMESTAMP) RETURNS TEXT AS $$
+DECLARE
+  month_start TIMESTAMP := date_trunc('month', moment);
+  partition_name TEXT := 'visits_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+  IF to_regclass(partition_name) IS NOT NULL THEN
+    RETURN partition_name;
+  END IF;
+  EXECUTE format(
+    'CREATE TABLE IF NOT EXISTS %I PARTITION OF visits FOR VALUES FROM (%L) TO (%L)',
+    partition_name, month_start, month_start + INTERVAL '1 month'
+  );
+  RETURN partition_name;
+EXCEPTION
+  -- Overlaps a partition with another name
+  WHEN invalid_object_definition THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_visits_partition(month)
+FROM generate_series(date_trunc('month', now() AT TIME ZONE 'UTC'), date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '2 months', INTERVAL '1 month') AS month;
+
+CREATE SCHEMA IF NOT EXISTS visits_archive;
+-- end postgres only
+
+-- The number and sum of each location's ratings, kept up to date by the
+-- triggers below so that rankings never have to read visits. category is
+-- copied from locations so a ranking for one category is a single index
+-- range. Rows go when a location's last rating does, so average is never NULL.
+CREATE TABLE location_ratings (
+  location_id INT PRIMARY KEY REFERENCES locations(id) ON DELETE CASCADE,
+  category VARCHAR(255),
+  ratings INT NOT NULL,
+  rating_sum INT NOT NULL,
+  average DOUBLE PRECISION GENERATED ALWAYS AS (CAST(rating_sum AS DOUBLE PRECISION) / NULLIF(ratings, 0)) STORED
+);
+
+CREATE INDEX location_ratings_average_idx ON location_ratings (average DESC, ratings DESC, location_id);
+CREATE INDEX location_ratings_category_average_idx ON location_ratings (category, average DESC, ratings DESC, location_id);
+
+-- postgres only
+-- Statement triggers see every row a statement changed at once, so a bulk
+-- insert or a backfill batch updates each location's totals once rather than
+-- once a row. New totals are upserted in location_id order, so concurrent
+-- writers lock the rows they share in the same order rather than deadlocking.
+CREATE OR REPLACE FUNCTION total_ratings() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'TRUNCATE' THEN
+    DELETE FROM location_ratings;
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    UPDATE location_ratings AS totals
+    SET ratings = totals.ratings - removed.ratings, rating_sum = totals.rating_sum - removed.rating_sum
+    FROM (
+      SELECT location_id, COUNT(*) AS ratings, SUM(rating) AS rating_sum
+      FROM old_visits WHERE rating IS NOT NULL GROUP BY location_id
+    ) AS removed
+    WHERE totals.location_id = removed.location_id;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO location_ratings (location_id, category, ratings, rating_sum)
+    SELECT locations.id, locations.category, added.ratings, added.rating_sum
+    FROM (
+      SELECT location_id, COUNT(*) AS ratings, SUM(rating) AS rating_sum
+      FROM new_visits WHERE rating IS NOT NULL GROUP BY location_id
+    ) AS added
+    INNER JOIN locations ON locations.id = added.location_id
+    ORDER BY locations.id
+    ON CONFLICT (location_id) DO UPDATE
+    SET ratings = location_ratings.ratings + EXCLUDED.ratings, rating_sum = location_ratings.rating_sum + EXCLUDED.rating_sum;
+  END IF;
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    DELETE FROM location_ratings
+    WHERE ratings = 0 AND location_id IN (SELECT location_id FROM old_visits);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER visits_rating_inserted AFTER INSERT ON visits
+  REFERENCING NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+CREATE TRIGGER visits_rating_deleted AFTER DELETE ON visits
+  REFERENCING OLD TABLE AS old_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+CREATE TRIGGER visits_rating_updated AFTER UPDATE ON visits
+  REFERENCING OLD TABLE AS old_visits NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+CREATE TRIGGER visits_rating_truncated AFTER TRUNCATE ON visits
+  FOR EACH STATEMENT EXECUTE FUNCTION total_ratings();
+
+CREATE OR REPLACE FUNCTION copy_location_category() RETURNS trigger AS $$
+BEGIN
+  UPDATE location_ratings SET category = NEW.category WHERE location_id = NEW.id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER locations_copy_category AFTER UPDATE OF category ON locations
+  FOR EACH ROW WHEN (OLD.category IS DISTINCT FROM NEW.category)
+  EXECUTE FUNCTION copy_location_category();
+
+-- Tells every worker process which rows of its cached tables changed, see
+-- shared/db/table_cache.py. One notification per statement, sent when the
+-- transaction commits, with the ids it changed; a statement that changed
+-- too many to fit in a notification, or a TRUNCATE, sends * for all of them.
+CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+DECLARE
+  ids TEXT;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT string_agg(id::TEXT, ',') INTO ids FROM new_rows;
+  ELSIF TG_OP = 'UPDATE' THEN
+    SELECT string_agg(id::TEXT, ',') INTO ids FROM (SELECT id FROM old_rows UNION SELECT id FROM new_rows) AS changed;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT string_agg(id::TEXT, ',') INTO ids FROM old_rows;
+  END IF;
+  IF ids IS NULL AND TG_OP <> 'TRUNCATE' THEN
+    RETURN NULL;
+  END IF;
+  IF ids IS NULL OR length(ids) > 7000 THEN
+    ids := '*';
+  END IF;
+  PERFORM pg_notify('table_changes', TG_TABLE_NAME || ':' || extract(epoch FROM clock_timestamp()) || ':' || ids);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_notify_inserted AFTER INSERT ON users
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER users_notify_deleted AFTER DELETE ON users
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER users_notify_updated AFTER UPDATE ON users
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER users_notify_truncated AFTER TRUNCATE ON users
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
+CREATE TRIGGER locations_notify_inserted AFTER INSERT ON locations
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER locations_notify_deleted AFTER DELETE ON locations
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER locations_notify_updated AFTER UPDATE ON locations
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER locations_notify_truncated AFTER TRUNCATE ON locations
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+-- end postgres only
+
+-- How many users have visited both location_id and other_location_id, for
+-- "visitors here also went to" and suggestions (see
+-- repositories/recommendation_repository.py), kept up to date by the
+-- triggers below. A user counts once per pair however often they went.
+-- Every pair is stored both ways round, so a location's most shared
+-- neighbours are one index range however big the catalogue is, and a pair
+-- goes when no one shares it any more. other_location_id has no foreign key:
+-- deleting a location deletes its visits, which takes it out of every pair.
+CREATE TABLE location_covisits (
+  location_id INT REFERENCES locations(id) ON DELETE CASCADE,
+  other_location_id INT NOT NULL,
+  users INT NOT NULL,
+  PRIMARY KEY (location_id, other_location_id)
 );
+
+CREATE INDEX location_covisits_users_idx ON location_covisits (location_id, users DESC, other_location_id);
+-- Only ever holds the pairs a trigger has just taken down to no users
+CREATE INDEX location_covisits_unshared_idx ON location_covisits (location_id) WHERE users = 0;
+
+-- postgres only
+-- Applies a change in the number of visits each (user, location) has, with
+-- visits already changed. Only the locations a user has gained or lost
+-- change any pairs, so a user's cost is those times the number of
+-- locations they have been to, not the square of it.
+CREATE OR REPLACE FUNCTION count_covisits(changed_users INT[], changed_locations INT[], changes BIGINT[]) RETURNS void AS $$
+BEGIN
+  -- Counted for one transaction at a time per user, otherwise two saving
+  -- new locations for the same user at once would each miss the other's
+  PERFORM 1 FROM users WHERE id = ANY(changed_users) ORDER BY id FOR NO KEY UPDATE;
+  WITH changed AS (
+    SELECT user_id, location_id, SUM(change) AS change
+    FROM unnest(changed_users, changed_locations, changes) AS changed(user_id, location_id, change)
+    GROUP BY user_id, location_id
+  ),
+  visited AS (
+    SELECT user_id, location_id,
+           COALESCE(visits_now.visits, 0) > 0 AS visited_after,
+           COALESCE(visits_now.visits, 0) - COALESCE(changed.change, 0) > 0 AS visited_before
+    FROM (
+      SELECT user_id, location_id, COUNT(*) AS visits
+      FROM visits WHERE user_id = ANY(changed_users)
+      GROUP BY user_id, location_id
+    ) AS visits_now
+    FULL OUTER JOIN changed USING (user_id, location_id)
+  ),
+  gained AS (SELECT user_id, location_id FROM visited WHERE visited_after AND NOT visited_before),
+  lost AS (SELECT user_id, location_id FROM visited WHERE visited_before AND NOT visited_after),
+  pairs AS (
+    SELECT location_id, other_location_id, SUM(change) AS change
+    FROM (
+      SELECT gained.location_id, visited.location_id AS other_location_id, 1 AS change
+      FROM gained INNER JOIN visited ON visited.user_id = gained.user_id
+      WHERE visited.visited_after AND visited.location_id <> gained.location_id
+      UNION ALL
+      SELECT visited.location_id, gained.location_id, 1
+      FROM gained INNER JOIN visited ON visited.user_id = gained.user_id
+      WHERE visited.visited_after AND visited.visited_before
+      UNION ALL
+      SELECT lost.location_id, visited.location_id, -1
+      FROM lost INNER JOIN visited ON visited.user_id = lost.user_id
+      WHERE visited.visited_before AND visited.location_id <> lost.location_id
+      UNION ALL
+      SELECT visited.location_id, lost.location_id, -1
+      FROM lost INNER JOIN visited ON visited.user_id = lost.user_id
+      WHERE visited.visited_after AND visited.visited_before
+    ) AS changed_pairs
+    GROUP BY location_id, other_location_id
+    HAVING SUM(change) <> 0
+  ),
+  -- A pair only goes down when it is already stored, and never both up
+  -- and down in one go, so the two halves touch different rows
+  taken_down AS (
+    UPDATE location_covisits AS covisits SET users = covisits.users + pairs.change
+    FROM pairs
+    WHERE pairs.change < 0
+      AND covisits.location_id = pairs.location_id
+      AND covisits.other_location_id = pairs.other_location_id
+  )
+  INSERT INTO location_covisits (location_id, other_location_id, users)
+  SELECT location_id, other_location_id, change FROM pairs WHERE change > 0
+  ORDER BY location_id, other_location_id
+  ON CONFLICT (location_id, other_location_id) DO UPDATE SET users = location_covisits.users + EXCLUDED.users;
+  DELETE FROM location_covisits WHERE users = 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION count_visit_covisits() RETURNS trigger AS $$
+DECLARE
+  changed_users INT[];
+  changed_locations INT[];
+  changes BIGINT[];
+BEGIN
+  IF TG_OP = 'TRUNCATE' THEN
+    DELETE FROM location_covisits;
+    RETURN NULL;
+  END IF;
+  IF TG_OP = 'INSERT' THEN
+    SELECT array_agg(user_id), array_agg(location_id), array_agg(change)
+    INTO changed_users, changed_locations, changes
+    FROM (
+      SELECT user_id, location_id, COUNT(*) AS change FROM new_visits
+      WHERE user_id IS NOT NULL AND location_id IS NOT NULL
+      GROUP BY user_id, location_id
+    ) AS changed;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT array_agg(user_id), array_agg(location_id), array_agg(change)
+    INTO changed_users, changed_locations, changes
+    FROM (
+      SELECT user_id, location_id, -COUNT(*) AS change FROM old_visits
+      WHERE user_id IS NOT NULL AND location_id IS NOT NULL
+      GROUP BY user_id, location_id
+    ) AS changed;
+  ELSE
+    -- Most updates, like rating backfills, move no visit and change nothing
+    SELECT array_agg(user_id), array_agg(location_id), array_agg(change)
+    INTO changed_users, changed_locations, changes
+    FROM (
+      SELECT user_id, location_id, SUM(change) AS change
+      FROM (
+        SELECT user_id, location_id, 1 AS change FROM new_visits
+        UNION ALL
+        SELECT user_id, location_id, -1 FROM old_visits
+      ) AS moved
+      WHERE user_id IS NOT NULL AND location_id IS NOT NULL
+      GROUP BY user_id, location_id
+      HAVING SUM(change) <> 0
+    ) AS changed;
+  END IF;
+  IF changed_users IS NOT NULL THEN
+    PERFORM count_covisits(changed_users, changed_locations, changes);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER visits_covisits_inserted AFTER INSERT ON visits
+  REFERENCING NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION count_visit_covisits();
+CREATE TRIGGER visits_covisits_deleted AFTER DELETE ON visits
+  REFERENCING OLD TABLE AS old_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION count_visit_covisits();
+CREATE TRIGGER visits_covisits_updated AFTER UPDATE ON visits
+  REFERENCING OLD TABLE AS old_visits NEW TABLE AS new_visits
+  FOR EACH STATEMENT EXECUTE FUNCTION count_visit_covisits();
+CREATE TRIGGER visits_covisits_truncated AFTER TRUNCATE ON visits
+  FOR EACH STATEMENT EXECUTE FUNCTION count_visit_covisits();
+-- end postgres only
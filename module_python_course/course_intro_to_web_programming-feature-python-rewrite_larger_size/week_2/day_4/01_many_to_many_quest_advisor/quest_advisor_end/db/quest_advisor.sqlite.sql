@@ -0,0 +1,115 @@
+-- SQLite's version of what quest_advisor.sql marks postgres only, run by
+-- "python -m shared.db.sqlite_backend db/quest_advisor.sql" after that file.
+--
+-- SQLite has no partitioned tables, so visits is a plain table with an index
+-- on visited_at, and archiving moves rows to visits_archive. It only has row
+-- triggers too, so each rating is added to location_ratings, and each visit
+-- to location_covisits, as it is written.
+
+CREATE TABLE visits (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INT REFERENCES users(id) ON DELETE CASCADE,
+  location_id INT REFERENCES locations(id) ON DELETE CASCADE,
+  review TEXT,
+  rating SMALLINT CONSTRAINT visits_rating_check CHECK (rating BETWEEN 0 AND 5),
+  visited_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX visits_user_id_location_id_idx ON visits (user_id, location_id);
+CREATE INDEX visits_location_id_user_id_idx ON visits (location_id, user_id);
+CREATE INDEX visits_visited_at_idx ON visits (visited_at);
+
+DROP TABLE IF EXISTS visits_archive;
+CREATE TABLE visits_archive (
+  id INTEGER PRIMARY KEY,
+  user_id INT,
+  location_id INT,
+  review TEXT,
+  rating SMALLINT,
+  visited_at TIMESTAMP NOT NULL
+);
+
+CREATE TRIGGER visits_rating_inserted AFTER INSERT ON visits
+WHEN NEW.rating IS NOT NULL
+BEGIN
+  INSERT INTO location_ratings (location_id, category, ratings, rating_sum)
+  SELECT id, category, 1, NEW.rating FROM locations WHERE id = NEW.location_id
+  ON CONFLICT (location_id) DO UPDATE SET ratings = ratings + 1, rating_sum = rating_sum + excluded.rating_sum;
+END;
+
+CREATE TRIGGER visits_rating_deleted AFTER DELETE ON visits
+WHEN OLD.rating IS NOT NULL
+BEGIN
+  UPDATE location_ratings SET ratings = ratings - 1, rating_sum = rating_sum - OLD.rating
+  WHERE location_id = OLD.location_id;
+  DELETE FROM location_ratings WHERE location_id = OLD.location_id AND ratings = 0;
+END;
+
+CREATE TRIGGER visits_rating_updated AFTER UPDATE OF rating, location_id ON visits
+BEGIN
+  UPDATE location_ratings SET ratings = ratings - 1, rating_sum = rating_sum - OLD.rating
+  WHERE location_id = OLD.location_id AND OLD.rating IS NOT NULL;
+  INSERT INTO location_ratings (location_id, category, ratings, rating_sum)
+  SELECT id, category, 1, NEW.rating FROM locations WHERE id = NEW.location_id AND NEW.rating IS NOT NULL
+  ON CONFLICT (location_id) DO UPDATE SET ratings = ratings + 1, rating_sum = rating_sum + excluded.rating_sum;
+  DELETE FROM location_ratings WHERE location_id = OLD.location_id AND ratings = 0;
+END;
+
+CREATE TRIGGER locations_copy_category AFTER UPDATE OF category ON locations
+WHEN OLD.category IS NOT NEW.category
+BEGIN
+  UPDATE location_ratings SET category = NEW.category WHERE location_id = NEW.id;
+END;
+
+-- A user's first visit to a location pairs it with every other location
+-- they have been to, and their last one unpairs it again
+CREATE TRIGGER visits_covisits_inserted AFTER INSERT ON visits
+WHEN NOT EXISTS (SELECT 1 FROM visits WHERE user_id = NEW.user_id AND location_id = NEW.location_id AND id <> NEW.id)
+BEGIN
+  INSERT INTO location_covisits (location_id, other_location_id, users)
+  SELECT DISTINCT NEW.location_id, location_id, 1 FROM visits
+  WHERE user_id = NEW.user_id AND location_id <> NEW.location_id
+  ON CONFLICT (location_id, other_location_id) DO UPDATE SET users = users + 1;
+  INSERT INTO location_covisits (location_id, other_location_id, users)
+  SELECT DISTINCT location_id, NEW.location_id, 1 FROM visits
+  WHERE user_id = NEW.user_id AND location_id <> NEW.location_id
+  ON CONFLICT (location_id, other_location_id) DO UPDATE SET users = users + 1;
+END;
+
+CREATE TRIGGER visits_covisits_deleted AFTER DELETE ON visits
+WHEN NOT EXISTS (SELECT 1 FROM visits WHERE user_id = OLD.user_id AND location_id = OLD.location_id)
+BEGIN
+  UPDATE location_covisits SET users = users - 1
+  WHERE location_id = OLD.location_id
+    AND other_location_id IN (SELECT location_id FROM visits WHERE user_id = OLD.user_id);
+  UPDATE location_covisits SET users = users - 1
+  WHERE other_location_id = OLD.location_id
+    AND location_id IN (SELECT location_id FROM visits WHERE user_id = OLD.user_id);
+  DELETE FROM location_covisits WHERE users = 0;
+END;
+
+-- The same as deleting the old visit and inserting the new one, with the
+-- user's other visits being every one but this
+CREATE TRIGGER visits_covisits_updated AFTER UPDATE OF user_id, location_id ON visits
+WHEN OLD.user_id IS NOT NEW.user_id OR OLD.location_id IS NOT NEW.location_id
+BEGIN
+  UPDATE location_covisits SET users = users - 1
+  WHERE location_id = OLD.location_id
+    AND other_location_id IN (SELECT location_id FROM visits WHERE user_id = OLD.user_id AND id <> NEW.id)
+    AND NOT EXISTS (SELECT 1 FROM visits WHERE user_id = OLD.user_id AND location_id = OLD.location_id AND id <> NEW.id);
+  UPDATE location_covisits SET users = users - 1
+  WHERE other_location_id = OLD.location_id
+    AND location_id IN (SELECT location_id FROM visits WHERE user_id = OLD.user_id AND id <> NEW.id)
+    AND NOT EXISTS (SELECT 1 FROM visits WHERE user_id = OLD.user_id AND location_id = OLD.location_id AND id <> NEW.id);
+  DELETE FROM location_covisits WHERE users = 0;
+  INSERT INTO location_covisits (location_id, other_location_id, users)
+  SELECT DISTINCT NEW.location_id, location_id, 1 FROM visits
+  WHERE user_id = NEW.user_id AND location_id <> NEW.location_id AND id <> NEW.id
+    AND NOT EXISTS (SELECT 1 FROM visits WHERE user_id = NEW.user_id AND location_id = NEW.location_id AND id <> NEW.id)
+  ON CONFLICT (location_id, other_location_id) DO UPDATE SET users = users + 1;
+  INSERT INTO location_covisits (location_id, other_location_id, users)
+  SELECT DISTINCT location_id, NEW.location_id, 1 FROM visits
+  WHERE user_id = NEW.user_id AND location_id <> NEW.location_id AND id <> NEW.id
+    AND NOT EXISTS (SELECT 1 FROM visits WHERE user_id = NEW.user_id AND location_id = NEW.location_id AND id <> NEW.id)
+  ON CONFLICT (location_id, other_location_id) DO UPDATE SET users = users + 1;
+END;
@@ -0,0 +1,75 @@
+# Lazy relationship attributes: a Lazy stands in for a related model that is
+# only known by its id, e.g. visit.user straight after a visits query. Reading
+# .id costs nothing; reading any other attribute loads the model the first
+# time and passes the attribute through to it.
+#
+# A Lazy made by a Batch loads together with every other one from the same
+# Batch that is still pending, so a page of visits costs one IN query for all
+# of its users however many visits there are.
+
+
+class Lazy:
+    __slots__ = ("id", "_load", "_batch", "_target")
+
+    def __init__(self, id, load=None, batch=None):
+        # load(id) returns the model, or None if there is no row
+        self.id = id
+        self._load = load
+        self._batch = batch
+        self._target = None
+
+    def __getattr__(self, name):
+        # Special names such as __html__ or the copy and pickle hooks are
+        # asked of the proxy itself, and must not load the row
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "pending"
+        return f"<Lazy {self.id} {state}>"
+
+    @property
+    def loaded(self):
+        return self._target is not None
+
+    def resolve(self):
+        if self._target is None:
+            if self._batch is not None:
+                self._batch.load()
+            else:
+                self._target = self._load(self.id)
+            if self._target is None:
+                raise LookupError(f"no row with id {self.id}")
+        return self._target
+
+
+class Batch:
+
+    def __init__(self, load_many):
+        # load_many(ids) returns the models for those ids, in any order
+        self.load_many = load_many
+        self.proxies = {}
+        self.pending = set()
+
+    def proxy(self, id):
+        # The same id always gets the same Lazy, and so the same model
+        proxy = self.proxies.get(id)
+        if proxy is None:
+            proxy = self.proxies[id] = Lazy(id, batch=self)
+            self.pending.add(id)
+        return proxy
+
+    def load(self):
+        if not self.pending:
+            return
+        ids, self.pending = sorted(self.pending), set()
+        for model in self.load_many(ids):
+            self.proxies[model.id]._target = model
+
+
+def resolve(value):
+    # The model itself, whether value is a Lazy or already a model
+    if isinstance(value, Lazy):
+        return value.resolve()
+    return value
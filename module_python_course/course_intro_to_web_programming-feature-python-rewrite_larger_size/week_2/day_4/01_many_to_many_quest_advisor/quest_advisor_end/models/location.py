@@ -1,4 +1,5 @@
 class Location:
+    __slots__ = ("name", "category", "id")
 
     def __init__(self, name, category, id = None):
       self.name = name
@@ -1,4 +1,5 @@
 class User:
+    __slots__ = ("name", "id")
 
     def __init__(self, name, id = None):
       self.name = name
@@ -1,7 +1,10 @@
 class Visit:
+    __slots__ = ("user", "location", "review", "id", "rating", "visited_at")
 
-    def __init__( self, user, location, review, id = None ):
+    def __init__( self, user, location, review, id = None, rating = None, visited_at = None ):
         self.user = user
         self.location = location
         self.review = review
         self.id = id
+        self.rating = rating
+        self.visited_at = visited_at
@@ -1,29 +1,52 @@
-from db.run_sql import run_sql
+import shared.db.bulk as bulk
+from shared.db.run_sql import run_sql
+import shared.db.table_cache as table_cache
+import shared.pagination as pagination
 
 from models.location import Location
 from models.user import User
+import repositories.partition_repository as partition_repository
 
 def save(location):
     sql = "INSERT INTO locations(name, category) VALUES ( %s, %s ) RETURNING id"
     values = [location.name, location.category]
     results = run_sql( sql, values )
     location.id = results[0]['id']
+    table_cache.evict("locations", [location.id])
     return location
 
 
+def save_many(locations):
+    values = [[location.name, location.category] for location in locations]
+    ids = bulk.insert_many("locations", ["name", "category"], values)
+    for location, id in zip(locations, ids):
+        location.id = id
+    table_cache.evict("locations", ids)
+    return locations
+
+
 def select_all():
-    locations = []
+    # A copy of the list, since the cached one is shared by every thread
+    return list(table_cache.fetch("locations", table_cache.ALL, _select_all))
 
-    sql = "SELECT * FROM locations"
-    results = run_sql(sql)
 
-    for row in results:
-        location = Location(row['name'], row['category'], row['id'])
-        locations.append(location)
-    return locations
+def _select_all():
+    # Plain tuples in Location's argument order, with no dict per row
+    sql = "SELECT name, category, id FROM locations"
+    return [Location(*row) for row in run_sql(sql, tuples=True)]
+
+
+def select_many(ids):
+    # One query however many ids, in no particular order
+    sql = "SELECT name, category, id FROM locations WHERE id = ANY(%s)"
+    return [Location(*row) for row in run_sql(sql, [list(ids)], tuples=True)]
 
 
 def select(id):
+    return table_cache.fetch("locations", id, lambda: _select(id))
+
+
+def _select(id):
     location = None
     sql = "SELECT * FROM locations WHERE id = %s"
     values = [id]
@@ -34,20 +57,44 @@ def select(id):
     return location
 
 
-def users(location):
-    users = []
-
-    sql = "SELECT users.* FROM users INNER JOIN visits ON visits.user_id = users.id WHERE location_id = %s"
-    values = [location.id]
-    results = run_sql(sql, values)
-
-    for row in results:
-        user = User(row['name'], row['id'])
-        users.append(user)
-
-    return users
+# One row per user with how often and when last they came here, counted
+# from visits before users is joined, as for user_repository.locations
+SELECT_USER_COUNTS = """
+    SELECT users.name, users.id, counts.visits, counts.last_visited_at
+    FROM (
+        SELECT visits.user_id, COUNT(*) AS visits, MAX(visits.visited_at) AS last_visited_at
+        FROM visits {where}
+        GROUP BY visits.user_id
+        ORDER BY visits.user_id {order}
+        LIMIT %s
+    ) AS counts
+    INNER JOIN users ON users.id = counts.user_id
+    ORDER BY users.id {order}
+"""
+
+
+def users(location, since=None, until=None, after=None, before=None, limit=pagination.PAGE_SIZE):
+    # A page of (user, visits, last_visited_at), one for each user who
+    # visited the location, by user id, with the same window as
+    # user_repository.locations
+    conditions, window = partition_repository.window(since, until)
+    where, order, values = pagination.keyset(
+        "visits.user_id", after, before, limit, ["visits.location_id = %s"] + conditions, [location.id] + window
+    )
+    results = run_sql(SELECT_USER_COUNTS.format(where=where, order=order), values, tuples=True)
+    users = [
+        (User(name, id), visits, partition_repository.as_datetime(last_visited_at))
+        for name, id, visits, last_visited_at in results
+    ]
+    return pagination.page(users, after, before, limit, key=lambda row: row[0].id)
 
 
 def delete_all():
     sql = "DELETE FROM locations"
     run_sql(sql)
+    table_cache.evict("locations")
+
+
+def delete_many(ids):
+    bulk.delete_many("locations", ids)
+    table_cache.evict("locations", ids)
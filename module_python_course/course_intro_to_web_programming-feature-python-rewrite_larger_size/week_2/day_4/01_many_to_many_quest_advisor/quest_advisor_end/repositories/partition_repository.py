@@ -0,0 +1,207 @@
+import argparse
+import re
+from datetime import date, datetime, time, timezone
+
+import shared.db.config as config
+from shared.db.run_sql import run_sql
+import shared.db.unit_of_work as unit_of_work
+
+# On Postgres visits is partitioned by month of visited_at (see
+# db/quest_advisor.sql), one table per month named visits_YYYY_MM. This
+# module makes the partitions before visits land in them, builds the date
+# window conditions that let Postgres skip the months a query does not need,
+# and archives old months. On SQLite there are no partitions; windows are
+# plain conditions on an indexed column and archiving moves rows.
+#
+# Only partitions named by month are archived, so visits_legacy, which
+# migrations/003_partition_visits.sql makes of the unpartitioned table, is
+# left for a person to dump and detach.
+#
+# Run it monthly from cron to keep partitions ahead of the calendar:
+#
+#   python -m repositories.partition_repository --ahead 3 --archive-before 2024-01-01
+
+PARTITION_NAME = re.compile(r"visits_(\d{4})_(\d{2})")
+
+SELECT_PARTITIONS = """
+    SELECT child.relname
+    FROM pg_inherits
+    INNER JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = 'visits'::regclass
+    ORDER BY child.relname
+"""
+
+# Takes a month's ratings back out of location_ratings before it is detached,
+# as deleting its visits would have done through the triggers
+UNCOUNT_RATINGS = """
+    UPDATE location_ratings AS totals
+    SET ratings = totals.ratings - archived.ratings, rating_sum = totals.rating_sum - archived.rating_sum
+    FROM (
+        SELECT location_id, COUNT(*) AS ratings, SUM(rating) AS rating_sum
+        FROM {partition} WHERE rating IS NOT NULL GROUP BY location_id
+    ) AS archived
+    WHERE totals.location_id = archived.location_id
+"""
+
+# Takes a detached month's visits back out of location_covisits, as
+# deleting them would have done through the triggers
+UNCOUNT_COVISITS = """
+    SELECT count_covisits(array_agg(user_id), array_agg(location_id), array_agg(-visits))
+    FROM (
+        SELECT user_id, location_id, COUNT(*) AS visits
+        FROM {partition} WHERE user_id IS NOT NULL AND location_id IS NOT NULL
+        GROUP BY user_id, location_id
+    ) AS archived
+"""
+
+# How long archive waits for the lock DETACH needs on visits before giving
+# up, so that it never holds up the app's queries queued behind it for long
+ARCHIVE_LOCK_TIMEOUT = "5s"
+
+# Months this process knows have a partition, see ensure
+_known_months = set()
+
+
+def now():
+    # visited_at is UTC without a time zone
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month, months):
+    year, index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return datetime(year, index + 1, 1)
+
+
+def window(since=None, until=None, column="visits.visited_at"):
+    # Conditions for visits from since up to but not including until, either
+    # of which can be a date, a datetime or None, and the values for them
+    conditions = []
+    values = []
+    if since is not None:
+        conditions.append(f"{column} >= %s")
+        values.append(as_datetime(since))
+    if until is not None:
+        conditions.append(f"{column} < %s")
+        values.append(as_datetime(until))
+    return conditions, values
+
+
+def window_where(since=None, until=None, column="visits.visited_at"):
+    # The same as a WHERE clause, or "" for no window
+    conditions, values = window(since, until, column)
+    if not conditions:
+        return "", values
+    return "WHERE " + " AND ".join(conditions), values
+
+
+def window_and(since=None, until=None, column="visits.visited_at"):
+    # The same as " AND ..." to add to a query that already has a WHERE
+    conditions, values = window(since, until, column)
+    return "".join(f" AND {condition}" for condition in conditions), values
+
+
+def as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    # SQLite hands back MAX(visited_at) and the like as text
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return datetime.combine(value, time())
+
+
+def ensure(moments):
+    # Makes sure every month these visited_at values fall in has a partition.
+    # Months are remembered once made, but only outside a transaction, where
+    # the partition is committed as soon as it is made; inside one it could
+    # still be rolled back, so it is checked again next time.
+    if config.DATABASE_BACKEND != "postgres":
+        return
+    for month in sorted({month_start(moment) for moment in moments} - _known_months):
+        run_sql("SELECT create_visits_partition(%s)", [month])
+        if unit_of_work.current() is None:
+            _known_months.add(month)
+
+
+def forget():
+    # For after visits has been dropped and made again
+    _known_months.clear()
+
+
+def create_ahead(months=3):
+    # The partitions for this month and the next ones, so that visits being
+    # saved never have to wait for one to be made
+    this_month = month_start(now())
+    ensure([add_months(this_month, n) for n in range(months + 1)])
+
+
+def partitions():
+    # (name, first moment of its month) for each monthly partition, oldest first
+    if config.DATABASE_BACKEND != "postgres":
+        return []
+    months = []
+    for (name,) in run_sql(SELECT_PARTITIONS, tuples=True):
+        match = PARTITION_NAME.fullmatch(name)
+        if match:
+            months.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return months
+
+
+def archive(before):
+    # Archives every month that ends on or before the start of the month of
+    # before. On Postgres each month's partition is detached and moved to the
+    # visits_archive schema in its own transaction, where it can be dumped
+    # and dropped; on SQLite the rows move to the visits_archive table.
+    # Archived visits leave location_ratings and location_covisits either
+    # way. Returns the months.
+    cutoff = month_start(as_datetime(before))
+    if config.DATABASE_BACKEND != "postgres":
+        return _archive_rows(cutoff)
+    archived = []
+    for name, month in partitions():
+        if month >= cutoff:
+            break
+        with unit_of_work.transaction():
+            run_sql("SELECT set_config('lock_timeout', %s, true)", [ARCHIVE_LOCK_TIMEOUT])
+            # No visit can land in the month while its ratings are taken out
+            run_sql(f"LOCK TABLE {name} IN SHARE MODE")
+            run_sql(UNCOUNT_RATINGS.format(partition=name))
+            run_sql("DELETE FROM location_ratings WHERE ratings = 0")
+            run_sql(f"ALTER TABLE visits DETACH PARTITION {name}")
+            # Only once detached, since it counts what visits has left
+            run_sql(UNCOUNT_COVISITS.format(partition=name))
+            run_sql(f"ALTER TABLE {name} SET SCHEMA visits_archive")
+        _known_months.discard(month)
+        archived.append(month)
+    return archived
+
+
+def _archive_rows(cutoff):
+    months = run_sql(
+        "SELECT DISTINCT strftime('%%Y-%%m', visited_at) FROM visits WHERE visited_at < %s ORDER BY 1",
+        [cutoff],
+        tuples=True,
+    )
+    with unit_of_work.transaction():
+        run_sql("INSERT INTO visits_archive SELECT id, user_id, location_id, review, rating, visited_at FROM visits WHERE visited_at < %s", [cutoff])
+        run_sql("DELETE FROM visits WHERE visited_at < %s", [cutoff])
+    return [datetime.strptime(month, "%Y-%m") for (month,) in months]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ahead", type=int, default=3, help="months of partitions to make after this one")
+    parser.add_argument("--archive-before", type=date.fromisoformat, help="archive the months before this date's month")
+    args = parser.parse_args()
+    create_ahead(args.ahead)
+    print(f"partitions ready up to {add_months(month_start(now()), args.ahead):%Y-%m}")
+    if args.archive_before is not None:
+        for month in archive(args.archive_before):
+            print(f"archived visits for {month:%Y-%m}")
+
+
+if __name__ == '__main__':
+    main()
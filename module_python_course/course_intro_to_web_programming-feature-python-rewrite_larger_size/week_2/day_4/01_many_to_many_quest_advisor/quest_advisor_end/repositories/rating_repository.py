@@ -0,0 +1,150 @@
+import argparse
+import re
+from collections import defaultdict
+
+import shared.db.config as config
+from shared.db.run_sql import run_sql
+import shared.db.unit_of_work as unit_of_work
+
+from models.location import Location
+
+# Rankings read location_ratings, which triggers on visits keep up to date
+# (see db/quest_advisor.sql), so the top locations cost an index range scan
+# of limit rows however many visits there are. Entries are (location,
+# average, ratings) tuples, best average first, ties going to the location
+# with more ratings.
+
+# "0 stars, far too hot", "1 star", "I'd give it 4/5"
+RATING = re.compile(r"\b([0-5])(?:\s*stars?\b|\s*/\s*5\b)", re.IGNORECASE)
+
+TOP_LOCATIONS = 10
+
+SELECT_RANKING = """
+    SELECT locations.name, locations.category, locations.id, totals.average, totals.ratings
+    FROM location_ratings AS totals
+    INNER JOIN locations ON locations.id = totals.location_id
+"""
+
+# Every location whose stored totals differ from a recount of visits
+SELECT_MISCOUNTS = """
+    SELECT COALESCE(totals.location_id, actual.location_id),
+           COALESCE(totals.ratings, 0), COALESCE(totals.rating_sum, 0),
+           COALESCE(actual.ratings, 0), COALESCE(actual.rating_sum, 0)
+    FROM location_ratings AS totals
+    FULL OUTER JOIN (
+        SELECT location_id, COUNT(*) AS ratings, SUM(rating) AS rating_sum
+        FROM visits WHERE rating IS NOT NULL GROUP BY location_id
+    ) AS actual ON actual.location_id = totals.location_id
+    WHERE COALESCE(totals.ratings, 0) <> COALESCE(actual.ratings, 0)
+       OR COALESCE(totals.rating_sum, 0) <> COALESCE(actual.rating_sum, 0)
+    ORDER BY 1
+"""
+
+SELECT_MISCATEGORISED = """
+    SELECT totals.location_id
+    FROM location_ratings AS totals
+    INNER JOIN locations ON locations.id = totals.location_id
+    WHERE totals.category IS DISTINCT FROM locations.category
+    ORDER BY 1
+"""
+
+
+def parse_rating(review):
+    # The first star rating in a review, or None if it does not give one
+    match = RATING.search(review or "")
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
+def top_locations(category=None, limit=TOP_LOCATIONS):
+    values = []
+    where = ""
+    if category is not None:
+        where = "WHERE totals.category = %s"
+        values.append(category)
+    values.append(limit)
+    sql = f"""{SELECT_RANKING} {where}
+        ORDER BY totals.average DESC, totals.ratings DESC, totals.location_id
+        LIMIT %s
+    """
+    return [(Location(*row[:3]), row[3], row[4]) for row in run_sql(sql, values, tuples=True)]
+
+
+def backfill(batch_size=1000):
+    # Parses a rating out of every visit saved without one. Each batch is its
+    # own transaction so visits is never locked for long, and is one UPDATE
+    # per star value rather than one per visit. Returns how many were rated.
+    rated = 0
+    last_id = 0
+    while True:
+        sql = "SELECT id, review FROM visits WHERE id > %s AND rating IS NULL ORDER BY id LIMIT %s"
+        rows = run_sql(sql, [last_id, batch_size], tuples=True)
+        if not rows:
+            return rated
+        ids_by_rating = defaultdict(list)
+        for id, review in rows:
+            rating = parse_rating(review)
+            if rating is not None:
+                ids_by_rating[rating].append(id)
+        with unit_of_work.transaction():
+            for rating, ids in sorted(ids_by_rating.items()):
+                run_sql("UPDATE visits SET rating = %s WHERE id = ANY(%s) AND rating IS NULL", [rating, ids])
+                rated += len(ids)
+        last_id = rows[-1][0]
+
+
+def check():
+    # Recounts every location's ratings from visits and returns a list of
+    # (location_id, stored, actual) for each total the triggers got wrong,
+    # where stored and actual are (ratings, rating_sum) pairs, plus
+    # (location_id, None, None) for a category that was not copied
+    miscounts = [
+        (location_id, (ratings, rating_sum), (actual_ratings, actual_sum))
+        for location_id, ratings, rating_sum, actual_ratings, actual_sum in run_sql(SELECT_MISCOUNTS, tuples=True)
+    ]
+    miscategorised = [(row[0], None, None) for row in run_sql(SELECT_MISCATEGORISED, tuples=True)]
+    return miscounts + miscategorised
+
+
+def rebuild():
+    # In one transaction, with visits locked against writes on Postgres
+    # (SQLite only ever has one writer), so no rating is missed or counted twice
+    with unit_of_work.transaction():
+        if config.DATABASE_BACKEND == "postgres":
+            run_sql("LOCK TABLE visits IN SHARE MODE")
+        run_sql("DELETE FROM location_ratings")
+        run_sql("""
+            INSERT INTO location_ratings (location_id, category, ratings, rating_sum)
+            SELECT locations.id, locations.category, COUNT(*), SUM(visits.rating)
+            FROM visits
+            INNER JOIN locations ON locations.id = visits.location_id
+            WHERE visits.rating IS NOT NULL
+            GROUP BY locations.id
+        """)
+
+
+def main():
+    # python -m repositories.rating_repository [--backfill] [--rebuild]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backfill", action="store_true", help="rate visits saved before they had ratings")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rebuild", action="store_true", help="recount from visits if the check fails")
+    args = parser.parse_args()
+    if args.backfill:
+        print(f"rated {backfill(args.batch_size)} visits from their reviews")
+    problems = check()
+    for location_id, stored, actual in problems:
+        if stored is None:
+            print(f"location {location_id}: stored category is out of date")
+        else:
+            print(f"location {location_id}: stored {stored[0]} ratings totalling {stored[1]}, visits has {actual[0]} totalling {actual[1]}")
+    if not problems:
+        print("location_ratings matches visits")
+    elif args.rebuild:
+        rebuild()
+        print("rebuilt location_ratings from visits")
+
+
+if __name__ == '__main__':
+    main()
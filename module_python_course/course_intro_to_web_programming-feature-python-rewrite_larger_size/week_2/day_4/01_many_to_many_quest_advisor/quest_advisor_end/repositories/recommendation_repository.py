@@ -0,0 +1,146 @@
+import argparse
+
+import shared.db.config as config
+from shared.db.run_sql import run_sql
+import shared.db.unit_of_work as unit_of_work
+
+from models.location import Location
+
+# "Visitors here also went to" and suggestions for a user, both read from
+# location_covisits, the number of users who have visited each pair of
+# locations, which triggers on visits keep up to date (see
+# db/quest_advisor.sql). Neither reads visits beyond one user's, so they
+# cost the same with 100 locations or 100,000.
+
+SIMILAR_LOCATIONS = 5
+SUGGESTED_LOCATIONS = 5
+
+# Suggestions start from the user's most recently visited locations and
+# add up each one's most shared neighbours, so a user who has been
+# everywhere costs no more than one who has been to SUGGESTION_SEEDS places
+SUGGESTION_SEEDS = 20
+SUGGESTION_NEIGHBOURS = 20
+
+SELECT_SIMILAR = """
+    SELECT locations.name, locations.category, locations.id, covisits.users
+    FROM location_covisits AS covisits
+    INNER JOIN locations ON locations.id = covisits.other_location_id
+    WHERE covisits.location_id = %s
+    ORDER BY covisits.users DESC, covisits.other_location_id
+    LIMIT %s
+"""
+
+SELECT_SEEDS = """
+    SELECT location_id FROM visits WHERE user_id = %s
+    GROUP BY location_id ORDER BY MAX(visited_at) DESC, location_id LIMIT %s
+"""
+
+SELECT_SUGGESTIONS = f"""
+    SELECT locations.name, locations.category, locations.id, SUM(neighbours.users) AS score
+    FROM ({SELECT_SEEDS}) AS seeds
+    CROSS JOIN LATERAL (
+        SELECT other_location_id, users FROM location_covisits
+        WHERE location_covisits.location_id = seeds.location_id
+        ORDER BY users DESC, other_location_id
+        LIMIT %s
+    ) AS neighbours
+    INNER JOIN locations ON locations.id = neighbours.other_location_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM visits WHERE visits.user_id = %s AND visits.location_id = neighbours.other_location_id
+    )
+    GROUP BY locations.id
+    ORDER BY score DESC, locations.id
+    LIMIT %s
+"""
+
+# SQLite has no LATERAL, so it ranks every neighbour of the seeds instead
+SELECT_SUGGESTIONS_SQLITE = f"""
+    SELECT locations.name, locations.category, locations.id, SUM(neighbours.users) AS score
+    FROM (
+        SELECT other_location_id, users,
+               ROW_NUMBER() OVER (PARTITION BY location_id ORDER BY users DESC, other_location_id) AS rank
+        FROM location_covisits
+        WHERE location_id IN ({SELECT_SEEDS})
+    ) AS neighbours
+    INNER JOIN locations ON locations.id = neighbours.other_location_id
+    WHERE neighbours.rank <= %s AND NOT EXISTS (
+        SELECT 1 FROM visits WHERE visits.user_id = %s AND visits.location_id = neighbours.other_location_id
+    )
+    GROUP BY locations.id
+    ORDER BY score DESC, locations.id
+    LIMIT %s
+"""
+
+# Every pair of locations and how many users visited both, from visits
+COUNT_COVISITS = """
+    SELECT visited.location_id, other.location_id AS other_location_id, COUNT(*) AS users
+    FROM (SELECT DISTINCT user_id, location_id FROM visits) AS visited
+    INNER JOIN (SELECT DISTINCT user_id, location_id FROM visits) AS other
+        ON other.user_id = visited.user_id AND other.location_id <> visited.location_id
+    GROUP BY visited.location_id, other.location_id
+"""
+
+SELECT_MISCOUNTS = f"""
+    SELECT COALESCE(stored.location_id, actual.location_id),
+           COALESCE(stored.other_location_id, actual.other_location_id),
+           COALESCE(stored.users, 0), COALESCE(actual.users, 0)
+    FROM location_covisits AS stored
+    FULL OUTER JOIN ({COUNT_COVISITS}) AS actual
+        ON actual.location_id = stored.location_id AND actual.other_location_id = stored.other_location_id
+    WHERE COALESCE(stored.users, 0) <> COALESCE(actual.users, 0)
+    ORDER BY 1, 2
+"""
+
+
+def similar_locations(location, limit=SIMILAR_LOCATIONS):
+    # (location, users) for the locations most visited by this one's
+    # visitors, the most shared first
+    rows = run_sql(SELECT_SIMILAR, [location.id, limit], tuples=True)
+    return [(Location(*row[:3]), row[3]) for row in rows]
+
+
+def suggested_locations(user, limit=SUGGESTED_LOCATIONS):
+    # (location, score) for locations the user has not been to, scored by
+    # how many visitors they share with the places the user went lately
+    if config.DATABASE_BACKEND == "sqlite":
+        sql = SELECT_SUGGESTIONS_SQLITE
+    else:
+        sql = SELECT_SUGGESTIONS
+    values = [user.id, SUGGESTION_SEEDS, SUGGESTION_NEIGHBOURS, user.id, limit]
+    return [(Location(*row[:3]), row[3]) for row in run_sql(sql, values, tuples=True)]
+
+
+def check():
+    # Recounts every pair from visits and returns a list of
+    # (location_id, other_location_id, stored, actual) for each count the
+    # triggers got wrong. It reads all of visits, so run it off-peak.
+    return [tuple(row) for row in run_sql(SELECT_MISCOUNTS, tuples=True)]
+
+
+def rebuild():
+    # In one transaction, with visits locked against writes on Postgres
+    # (SQLite only ever has one writer), so no visit is missed or counted twice
+    with unit_of_work.transaction():
+        if config.DATABASE_BACKEND == "postgres":
+            run_sql("LOCK TABLE visits IN SHARE MODE")
+        run_sql("DELETE FROM location_covisits")
+        run_sql(f"INSERT INTO location_covisits (location_id, other_location_id, users) {COUNT_COVISITS}")
+
+
+def main():
+    # python -m repositories.recommendation_repository [--rebuild]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="recount from visits if the check fails")
+    args = parser.parse_args()
+    problems = check()
+    for location_id, other_location_id, stored, actual in problems:
+        print(f"locations {location_id} and {other_location_id}: stored {stored} shared visitors, visits has {actual}")
+    if not problems:
+        print("location_covisits matches visits")
+    elif args.rebuild:
+        rebuild()
+        print("rebuilt location_covisits from visits")
+
+
+if __name__ == '__main__':
+    main()
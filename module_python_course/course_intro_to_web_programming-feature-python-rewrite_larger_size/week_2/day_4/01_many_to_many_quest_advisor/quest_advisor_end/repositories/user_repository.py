@@ -1,28 +1,52 @@
-from db.run_sql import run_sql
+import shared.db.bulk as bulk
+from shared.db.run_sql import run_sql
+import shared.db.table_cache as table_cache
+import shared.pagination as pagination
 
 from models.location import Location
 from models.user import User
+import repositories.partition_repository as partition_repository
 
 def save(user):
     sql = "INSERT INTO users( name ) VALUES ( %s ) RETURNING id"
     values = [user.name]
     results = run_sql( sql, values )
     user.id = results[0]['id']
+    table_cache.evict("users", [user.id])
     return user
 
 
+def save_many(users):
+    values = [[user.name] for user in users]
+    ids = bulk.insert_many("users", ["name"], values)
+    for user, id in zip(users, ids):
+        user.id = id
+    table_cache.evict("users", ids)
+    return users
+
+
 def select_all():
-    users = []
+    # A copy of the list, since the cached one is shared by every thread
+    return list(table_cache.fetch("users", table_cache.ALL, _select_all))
+
+
+def _select_all():
+    # Plain tuples in User's argument order, with no dict per row
+    sql = "SELECT name, id FROM users"
+    return [User(*row) for row in run_sql(sql, tuples=True)]
 
-    sql = "SELECT * FROM users"
-    results = run_sql(sql)
-    for row in results:
-        user = User(row['name'], row['id'])
-        users.append(user)
-    return users
+
+def select_many(ids):
+    # One query however many ids, in no particular order
+    sql = "SELECT name, id FROM users WHERE id = ANY(%s)"
+    return [User(*row) for row in run_sql(sql, [list(ids)], tuples=True)]
 
 
 def select(id):
+    return table_cache.fetch("users", id, lambda: _select(id))
+
+
+def _select(id):
     user = None
     sql = "SELECT * FROM users WHERE id = %s"
     values = [id]
@@ -33,20 +57,46 @@ def select(id):
     return user
 
 
-def locations(user):
-    locations = []
+# One row per location with how often and when last the user went there,
+# counted from visits before locations is joined, so a user with 500 visits
+# to Mordor costs one row rather than 500
+SELECT_LOCATION_COUNTS = """
+    SELECT locations.name, locations.category, locations.id, counts.visits, counts.last_visited_at
+    FROM (
+        SELECT visits.location_id, COUNT(*) AS visits, MAX(visits.visited_at) AS last_visited_at
+        FROM visits {where}
+        GROUP BY visits.location_id
+        ORDER BY visits.location_id {order}
+        LIMIT %s
+    ) AS counts
+    INNER JOIN locations ON locations.id = counts.location_id
+    ORDER BY locations.id {order}
+"""
 
-    sql = "SELECT locations.* FROM locations INNER JOIN visits ON visits.location_id = locations.id WHERE user_id = %s"
-    values = [user.id]
-    results = run_sql(sql, values)
 
-    for row in results:
-        location = Location(row['name'], row['category'], row['id'])
-        locations.append(location)
-
-    return locations
+def locations(user, since=None, until=None, after=None, before=None, limit=pagination.PAGE_SIZE):
+    # A page of (location, visits, last_visited_at), one for each location
+    # the user visited, by location id. Only visits in the since and until
+    # window count, if given, which on Postgres only reads the visits
+    # partitions for those months.
+    conditions, window = partition_repository.window(since, until)
+    where, order, values = pagination.keyset(
+        "visits.location_id", after, before, limit, ["visits.user_id = %s"] + conditions, [user.id] + window
+    )
+    results = run_sql(SELECT_LOCATION_COUNTS.format(where=where, order=order), values, tuples=True)
+    locations = [
+        (Location(name, category, id), visits, partition_repository.as_datetime(last_visited_at))
+        for name, category, id, visits, last_visited_at in results
+    ]
+    return pagination.page(locations, after, before, limit, key=lambda row: row[0].id)
 
 
 def delete_all():
     sql = "DELETE FROM users"
     run_sql(sql)
+    table_cache.evict("users")
+
+
+def delete_many(ids):
+    bulk.delete_many("users", ids)
+    table_cache.evict("users", ids)
@@ -1,54 +1,140 @@
-from db.run_sql import run_sql
+import shared.db.bulk as bulk
+import shared.db.config as config
+from shared.db.run_sql import run_sql, stream_sql
+import shared.pagination as pagination
 
+import models.lazy as lazy
 from models.visit import Visit
 from models.location import Location
 from models.user import User
 import repositories.user_repository as user_repository
 import repositories.location_repository as location_repository
+import repositories.partition_repository as partition_repository
+import repositories.rating_repository as rating_repository
+
+# Just the visits: their users and locations are loaded lazily, see
+# visits_from_tuples
+SELECT_VISIT_IDS = """
+    SELECT visits.id, visits.review, visits.user_id, visits.location_id, visits.rating, visits.visited_at
+    FROM visits
+"""
+
+# Visits joined to their users and locations, in the order visit_from_tuple
+# reads them
+SELECT_VISIT_TUPLES = """
+    SELECT visits.id, visits.review, users.name, users.id,
+           locations.name, locations.category, locations.id, visits.rating, visits.visited_at
+    FROM visits
+    INNER JOIN users ON users.id = visits.user_id
+    INNER JOIN locations ON locations.id = visits.location_id
+"""
 
 def save(visit):
-    sql = "INSERT INTO visits ( user_id, location_id, review ) VALUES ( %s, %s, %s ) RETURNING id"
-    values = [visit.user.id, visit.location.id, visit.review]
+    rate(visit)
+    stamp([visit])
+    sql = "INSERT INTO visits ( user_id, location_id, review, rating, visited_at ) VALUES ( %s, %s, %s, %s, %s ) RETURNING id"
+    values = [visit.user.id, visit.location.id, visit.review, visit.rating, visit.visited_at]
     results = run_sql( sql, values )
     visit.id = results[0]['id']
     return visit
 
 
-def select_all():
-    visits = []
+def save_many(visits):
+    for visit in visits:
+        rate(visit)
+    stamp(visits)
+    values = [[visit.user.id, visit.location.id, visit.review, visit.rating, visit.visited_at] for visit in visits]
+    ids = bulk.insert_many("visits", ["user_id", "location_id", "review", "rating", "visited_at"], values)
+    for visit, id in zip(visits, ids):
+        visit.id = id
+    return visits
 
-    sql = "SELECT * FROM visits"
-    results = run_sql(sql)
 
-    for row in results:
-        user = user_repository.select(row['user_id'])
-        location = location_repository.select(row['location_id'])
-        visit = Visit(user, location, row['review'], row['id'])
-        visits.append(visit)
-    return visits
+def rate(visit):
+    # A visit saved without a rating gets the one its review gives, if any
+    if visit.rating is None:
+        visit.rating = rating_repository.parse_rating(visit.review)
+
+
+def stamp(visits):
+    # Visits are saved with the time they are saved unless they say when
+    # they were, and need their month's partition to exist first
+    for visit in visits:
+        if visit.visited_at is None:
+            visit.visited_at = partition_repository.now()
+    partition_repository.ensure(visit.visited_at for visit in visits)
+
+
+# The select functions take an optional since and until, dates or datetimes,
+# to only return visits from that window. On Postgres that only reads the
+# monthly partitions the window covers.
+
+def select_all(since=None, until=None):
+    where, values = partition_repository.window_where(since, until)
+    sql = f"{SELECT_VISIT_IDS} {where} ORDER BY visits.id"
+    return visits_from_tuples(run_sql(sql, values, tuples=True))
+
+
+def select_page(after=None, before=None, limit=pagination.PAGE_SIZE, since=None, until=None):
+    conditions, window = partition_repository.window(since, until)
+    where, order, values = pagination.keyset("visits.id", after, before, limit, conditions, window)
+    sql = f"{SELECT_VISIT_IDS} {where} ORDER BY visits.id {order} LIMIT %s"
+    results = run_sql(sql, values, tuples=True)
+    return pagination.page(visits_from_tuples(results), after, before, limit)
+
+
+def iterate_all(batch_size=2000, since=None, until=None):
+    where, values = partition_repository.window_where(since, until)
+    sql = f"{SELECT_VISIT_TUPLES} {where} ORDER BY visits.id"
+    for row in stream_sql(sql, values, batch_size=batch_size, tuples=True):
+        yield visit_from_tuple(row, {}, {})
+
+
+def visits_from_tuples(rows):
+    # Users and locations are Lazy proxies from one Batch each, so the first
+    # visit.user.name read loads the users of every visit in rows in one
+    # query, and a page that never reads them never loads them
+    users = lazy.Batch(user_repository.select_many)
+    locations = lazy.Batch(location_repository.select_many)
+    return [
+        Visit(users.proxy(user_id), locations.proxy(location_id), review, id, rating, visited_at)
+        for id, review, user_id, location_id, rating, visited_at in rows
+    ]
+
+
+def visit_from_tuple(row, users, locations):
+    id, review, user_name, user_id, location_name, category, location_id, rating, visited_at = row
+    user = users.get(user_id)
+    if user is None:
+        user = users[user_id] = User(user_name, user_id)
+    location = locations.get(location_id)
+    if location is None:
+        location = locations[location_id] = Location(location_name, category, location_id)
+    return Visit(user, location, review, id, rating, visited_at)
 
 
 def location(visit):
-    sql = "SELECT * FROM locations WHERE id = %s"
-    values = [visit.location.id]
-    results = run_sql(sql, values)[0]
-    location = Location(results['name'], results['category'], results['id'])
-    return location
+    # Loads it only if nothing has read it yet
+    return lazy.resolve(visit.location)
 
 
 def user(visit):
-    sql = "SELECT * FROM users WHERE id = %s"
-    values = [visit.user.id]
-    results = run_sql(sql, values)[0]
-    user = User(results['name'], results['id'])
-    return user
+    return lazy.resolve(visit.user)
 
 
 def delete_all():
-    sql = "DELETE FROM visits"
+    # TRUNCATE empties every partition without reading a row
+    if config.DATABASE_BACKEND == "postgres":
+        sql = "TRUNCATE visits"
+    else:
+        sql = "DELETE FROM visits"
     run_sql(sql)
 
 def delete(id):
     sql = "DELETE FROM visits WHERE id = %s"
     values = [id]
     run_sql(sql, values)
+
+
+def delete_many(ids):
+    bulk.delete_many("visits", ids)
@@ -0,0 +1,12 @@
+import unittest
+
+from tests.lazy_test import TestLazyRelationships
+from tests.partition_test import TestPartitions, TestVisitWindows
+from tests.rating_test import TestRatings
+from tests.recommendation_test import TestRecommendations
+from tests.table_cache_test import TestTableCache
+from tests.visit_counts_test import TestVisitCounts
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import copy
+import os
+import tempfile
+import unittest
+
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+from shared.db.connection_pool import close_pool
+
+from app import app
+import models.lazy as lazy
+from models.location import Location
+from models.user import User
+from models.visit import Visit
+import repositories.location_repository as location_repository
+import repositories.user_repository as user_repository
+import repositories.visit_repository as visit_repository
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "db", "quest_advisor.sql")
+
+REPOSITORIES = [location_repository, user_repository, visit_repository]
+
+
+class TestLazyRelationships(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original = (config.DATABASE_BACKEND, config.SQLITE_PATH)
+        config.DATABASE_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(self.directory.name, "quest_advisor.sqlite3")
+        close_pool()
+        sqlite_backend.load_schema(SCHEMA)
+        self.queries = []
+        self.originals = [(module, module.run_sql) for module in REPOSITORIES]
+        for module, original in self.originals:
+            module.run_sql = self.counting(original)
+
+    def tearDown(self):
+        for module, original in self.originals:
+            module.run_sql = original
+        close_pool()
+        config.DATABASE_BACKEND, config.SQLITE_PATH = self.original
+        self.directory.cleanup()
+
+    def counting(self, run_sql):
+        def counting_run_sql(sql, values=None, tuples=False):
+            self.queries.append(sql)
+            return run_sql(sql, values, tuples)
+        return counting_run_sql
+
+    def seed(self, visits):
+        users = user_repository.save_many([User(f"User {n}") for n in range(5)])
+        locations = location_repository.save_many([Location(f"Location {n}", "Tavern") for n in range(3)])
+        visit_repository.save_many([
+            Visit(users[n % 5], locations[n % 3], f"Review {n}") for n in range(visits)
+        ])
+        del self.queries[:]
+
+    def statements_on_visits_page(self):
+        with self.assertLogs("db.queries", "INFO") as logs:
+            response = app.test_client().get("/visits")
+        self.assertEqual(200, response.status_code)
+        summary = [record.query for record in logs.records if record.query["event"] == "request_sql"][0]
+        return summary["statements"], response.get_data(as_text=True)
+
+
+    def test_visits_page_runs_the_same_queries_for_any_number_of_visits(self):
+        self.seed(3)
+        few, html = self.statements_on_visits_page()
+        self.assertIn("User 2 - Location 2", html)
+        visit_repository.delete_all()
+        self.seed(40)
+        many, html = self.statements_on_visits_page()
+        self.assertIn("User 4 - Location 0", html)
+        # The visits, then one IN query each for their users and locations
+        self.assertEqual(3, few)
+        self.assertEqual(3, many)
+
+
+    def test_reading_id_does_not_load(self):
+        self.seed(2)
+        visit = visit_repository.select_all()[0]
+        self.assertEqual(1, len(self.queries))
+        self.assertIsInstance(visit.user.id, int)
+        self.assertFalse(visit.user.loaded)
+        self.assertEqual(1, len(self.queries))
+
+
+    def test_special_names_do_not_load(self):
+        self.seed(2)
+        visit = visit_repository.select_all()[0]
+        self.assertFalse(hasattr(visit.user, "__html__"))
+        copied = copy.copy(visit.user)
+        self.assertEqual(visit.user.id, copied.id)
+        self.assertFalse(visit.user.loaded)
+        self.assertEqual(1, len(self.queries))
+
+
+    def test_first_read_loads_every_pending_row_in_one_query(self):
+        self.seed(10)
+        visits = visit_repository.select_all()
+        self.assertEqual("User 0", visits[0].user.name)
+        self.assertEqual(2, len(self.queries))
+        self.assertIn("ANY", self.queries[1])
+        self.assertEqual([f"User {n % 5}" for n in range(10)], [visit.user.name for visit in visits])
+        self.assertEqual(2, len(self.queries))
+        self.assertIs(lazy.resolve(visits[0].user), lazy.resolve(visits[5].user))
+
+
+    def test_user_and_location_reuse_loaded_rows(self):
+        self.seed(4)
+        visits = visit_repository.select_page().items
+        [visit.location.name for visit in visits]
+        queries = len(self.queries)
+        location = visit_repository.location(visits[3])
+        self.assertIsInstance(location, Location)
+        self.assertEqual("Location 0", location.name)
+        self.assertEqual(queries, len(self.queries))
+        self.assertEqual("User 3", visit_repository.user(visits[3]).name)
+        self.assertEqual(queries + 1, len(self.queries))
+
+
+    def test_unbatched_proxy_loads_on_its_own(self):
+        user = user_repository.save(User("Samwise"))
+        proxy = lazy.Lazy(user.id, load=user_repository.select)
+        self.assertEqual("Samwise", proxy.name)
+        self.assertEqual("Samwise", proxy.name)
+        self.assertEqual(2, len(self.queries))
+
+
+    def test_missing_row_raises_lookup_error(self):
+        batch = lazy.Batch(user_repository.select_many)
+        with self.assertRaises(LookupError):
+            batch.proxy(99).name
@@ -0,0 +1,185 @@
+import os
+import tempfile
+import unittest
+from contextlib import nullcontext
+from datetime import date, datetime
+
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+import shared.db.unit_of_work as unit_of_work
+from shared.db.connection_pool import close_pool
+from shared.db.run_sql import run_sql
+
+from app import app
+from models.location import Location
+from models.user import User
+from models.visit import Visit
+import repositories.location_repository as location_repository
+import repositories.partition_repository as partition_repository
+import repositories.rating_repository as rating_repository
+import repositories.user_repository as user_repository
+import repositories.visit_repository as visit_repository
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "db", "quest_advisor.sql")
+
+
+# Date windows and archiving on a real SQLite file, where visits is one table
+class TestVisitWindows(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original = (config.DATABASE_BACKEND, config.SQLITE_PATH)
+        config.DATABASE_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(self.directory.name, "quest_advisor.sqlite3")
+        close_pool()
+        sqlite_backend.load_schema(SCHEMA)
+        self.frodo, self.sam = user_repository.save_many([User("Frodo Baggins"), User("Samwise Gamgee")])
+        self.mordor, self.pony = location_repository.save_many([Location("Mordor", "Attractions"), Location("The Prancing Pony", "Tavern")])
+        self.visits = visit_repository.save_many([
+            Visit(self.frodo, self.pony, "4 stars", visited_at=datetime(2024, 1, 15, 20, 0)),
+            Visit(self.sam, self.pony, "2 stars", visited_at=datetime(2024, 2, 1, 0, 0)),
+            Visit(self.frodo, self.mordor, "0 stars", visited_at=datetime(2024, 3, 31, 23, 59)),
+        ])
+
+    def tearDown(self):
+        close_pool()
+        config.DATABASE_BACKEND, config.SQLITE_PATH = self.original
+        self.directory.cleanup()
+
+    def reviews(self, visits):
+        return [visit.review for visit in visits]
+
+
+    def test_save_stamps_visits_with_now(self):
+        before = partition_repository.now().replace(microsecond=0)
+        visit = visit_repository.save(Visit(self.sam, self.mordor, "5 stars"))
+        self.assertGreaterEqual(visit.visited_at, before)
+        stored = visit_repository.select_all(since=before)
+        self.assertEqual(["5 stars"], self.reviews(stored))
+        self.assertIsInstance(stored[0].visited_at, datetime)
+
+
+    def test_select_all_window(self):
+        self.assertEqual(["4 stars", "2 stars", "0 stars"], self.reviews(visit_repository.select_all()))
+        self.assertEqual(["2 stars", "0 stars"], self.reviews(visit_repository.select_all(since=date(2024, 2, 1))))
+        self.assertEqual(["4 stars"], self.reviews(visit_repository.select_all(until=date(2024, 2, 1))))
+        self.assertEqual(["2 stars"], self.reviews(visit_repository.select_all(date(2024, 2, 1), date(2024, 3, 1))))
+
+
+    def test_select_page_and_iterate_all_window(self):
+        page = visit_repository.select_page(limit=1, since=date(2024, 2, 1))
+        self.assertEqual(["2 stars"], self.reviews(page.items))
+        page = visit_repository.select_page(after=page.next_cursor, limit=1, since=date(2024, 2, 1))
+        self.assertEqual(["0 stars"], self.reviews(page.items))
+        self.assertIsNone(page.next_cursor)
+        self.assertEqual(["4 stars"], self.reviews(visit_repository.iterate_all(until=date(2024, 2, 1))))
+
+
+    def test_join_queries_window(self):
+        self.assertEqual(["Mordor", "The Prancing Pony"], [location.name for location, visits, last in user_repository.locations(self.frodo).items])
+        self.assertEqual(["Mordor"], [location.name for location, visits, last in user_repository.locations(self.frodo, since=date(2024, 2, 1)).items])
+        self.assertEqual(["Samwise Gamgee"], [user.name for user, visits, last in location_repository.users(self.pony, date(2024, 2, 1), date(2024, 3, 1)).items])
+
+
+    def test_routes_take_a_window(self):
+        client = app.test_client()
+        html = client.get("/visits?since=2024-02-01&until=2024-03-01").get_data(as_text=True)
+        self.assertIn("2 stars", html)
+        self.assertNotIn("4 stars", html)
+        html = client.get(f"/users/{self.frodo.id}?since=2024-03-01").get_data(as_text=True)
+        self.assertIn("Mordor", html)
+        self.assertNotIn("The Prancing Pony", html)
+        # A bad date is ignored rather than failing the page
+        html = client.get("/visits?since=yesterday").get_data(as_text=True)
+        self.assertIn("4 stars", html)
+
+
+    def test_pagination_links_keep_the_window(self):
+        visit_repository.save_many([
+            Visit(self.sam, self.mordor, f"Review {n}", visited_at=datetime(2024, 2, 2)) for n in range(60)
+        ])
+        html = app.test_client().get("/visits?since=2024-02-01").get_data(as_text=True)
+        self.assertIn("since=2024-02-01", html.split('class="pagination"')[1])
+
+
+    def test_archive_moves_old_visits_and_their_ratings(self):
+        months = partition_repository.archive(date(2024, 3, 15))
+        self.assertEqual([datetime(2024, 1, 1), datetime(2024, 2, 1)], months)
+        self.assertEqual(["0 stars"], self.reviews(visit_repository.select_all()))
+        archived = run_sql("SELECT review FROM visits_archive ORDER BY id", tuples=True)
+        self.assertEqual([("4 stars",), ("2 stars",)], [tuple(row) for row in archived])
+        self.assertEqual([("Mordor", 0.0, 1)], [(location.name, average, ratings) for location, average, ratings in rating_repository.top_locations()])
+        self.assertEqual([], rating_repository.check())
+        self.assertEqual([], partition_repository.archive(date(2024, 3, 15)))
+
+
+class TestPartitions(unittest.TestCase):
+    # The Postgres side, with run_sql faked
+
+    def setUp(self):
+        self.queries = []
+        self.partition_names = []
+        self.original = (config.DATABASE_BACKEND, partition_repository.run_sql, unit_of_work.current, unit_of_work.transaction)
+        config.DATABASE_BACKEND = "postgres"
+        partition_repository.run_sql = self.fake_run_sql
+        unit_of_work.transaction = nullcontext
+        partition_repository.forget()
+
+    def tearDown(self):
+        config.DATABASE_BACKEND, partition_repository.run_sql, unit_of_work.current, unit_of_work.transaction = self.original
+        partition_repository.forget()
+
+    def fake_run_sql(self, sql, values=None, tuples=False):
+        self.queries.append((" ".join(sql.split()), values))
+        if "FROM pg_inherits" in sql:
+            return [(name,) for name in self.partition_names]
+        return []
+
+
+    def test_add_months(self):
+        self.assertEqual(datetime(2025, 2, 1), partition_repository.add_months(datetime(2024, 12, 1), 2))
+        self.assertEqual(datetime(2023, 12, 1), partition_repository.add_months(datetime(2024, 1, 1), -1))
+
+
+    def test_window(self):
+        conditions, values = partition_repository.window(date(2024, 1, 1), datetime(2024, 2, 1, 12, 0))
+        self.assertEqual(["visits.visited_at >= %s", "visits.visited_at < %s"], conditions)
+        self.assertEqual([datetime(2024, 1, 1), datetime(2024, 2, 1, 12, 0)], values)
+        self.assertEqual(("", []), partition_repository.window_where())
+
+
+    def test_ensure_makes_each_month_once(self):
+        partition_repository.ensure([datetime(2024, 1, 5), datetime(2024, 1, 20), datetime(2024, 2, 1)])
+        partition_repository.ensure([datetime(2024, 2, 28)])
+        self.assertEqual([
+            ("SELECT create_visits_partition(%s)", [datetime(2024, 1, 1)]),
+            ("SELECT create_visits_partition(%s)", [datetime(2024, 2, 1)]),
+        ], self.queries)
+
+
+    def test_ensure_checks_again_after_a_transaction(self):
+        # The partition could still be rolled back with the transaction
+        unit_of_work.current = lambda: object()
+        partition_repository.ensure([datetime(2024, 1, 5)])
+        partition_repository.ensure([datetime(2024, 1, 5)])
+        self.assertEqual(2, len(self.queries))
+
+
+    def test_ensure_does_nothing_on_sqlite(self):
+        config.DATABASE_BACKEND = "sqlite"
+        partition_repository.ensure([datetime(2024, 1, 5)])
+        self.assertEqual([], self.queries)
+
+
+    def test_archive_detaches_months_before_the_cutoff(self):
+        self.partition_names = ["visits_2024_01", "visits_2024_02", "visits_2024_03", "visits_legacy"]
+        months = partition_repository.archive(date(2024, 3, 1))
+        self.assertEqual([datetime(2024, 1, 1), datetime(2024, 2, 1)], months)
+        january = [sql for sql, _ in self.queries if "visits_2024_01" in sql]
+        self.assertEqual("LOCK TABLE visits_2024_01 IN SHARE MODE", january[0])
+        self.assertIn("FROM visits_2024_01 WHERE rating IS NOT NULL", january[1])
+        self.assertEqual("ALTER TABLE visits DETACH PARTITION visits_2024_01", january[2])
+        self.assertIn("SELECT count_covisits(", january[3])
+        self.assertEqual("ALTER TABLE visits_2024_01 SET SCHEMA visits_archive", january[4])
+        detached = [sql for sql, _ in self.queries if "DETACH" in sql]
+        self.assertEqual(["ALTER TABLE visits DETACH PARTITION visits_2024_01", "ALTER TABLE visits DETACH PARTITION visits_2024_02"], detached)
@@ -0,0 +1,172 @@
+import os
+import tempfile
+import unittest
+
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+from shared.db.connection_pool import close_pool
+from shared.db.run_sql import run_sql
+
+from app import app
+from models.location import Location
+from models.user import User
+from models.visit import Visit
+import repositories.location_repository as location_repository
+import repositories.rating_repository as rating_repository
+import repositories.user_repository as user_repository
+import repositories.visit_repository as visit_repository
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "db", "quest_advisor.sql")
+
+
+# Runs against a real SQLite file so the triggers in
+# db/quest_advisor.sqlite.sql are what keeps the totals
+class TestRatings(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original = (config.DATABASE_BACKEND, config.SQLITE_PATH)
+        config.DATABASE_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(self.directory.name, "quest_advisor.sqlite3")
+        close_pool()
+        sqlite_backend.load_schema(SCHEMA)
+        self.user = user_repository.save(User("Frodo Baggins"))
+        self.mordor, self.pony, self.shire = location_repository.save_many([
+            Location("Mordor", "Attractions"),
+            Location("The Prancing Pony", "Tavern"),
+            Location("The Green Dragon", "Tavern"),
+        ])
+
+    def tearDown(self):
+        close_pool()
+        config.DATABASE_BACKEND, config.SQLITE_PATH = self.original
+        self.directory.cleanup()
+
+    def visit(self, location, review, rating=None):
+        return visit_repository.save(Visit(self.user, location, review, rating=rating))
+
+    def ranking(self, category=None):
+        return [(location.name, average, ratings) for location, average, ratings in rating_repository.top_locations(category)]
+
+
+    def test_parse_rating(self):
+        self.assertEqual(0, rating_repository.parse_rating("0 stars, far too hot"))
+        self.assertEqual(1, rating_repository.parse_rating("1 Star. Never again"))
+        self.assertEqual(4, rating_repository.parse_rating("I'd give it 4/5"))
+        self.assertIsNone(rating_repository.parse_rating("10 stars"))
+        self.assertIsNone(rating_repository.parse_rating("Lovely beer"))
+        self.assertIsNone(rating_repository.parse_rating(None))
+
+
+    def test_save_rates_from_the_review_unless_given(self):
+        parsed = self.visit(self.pony, "4 stars, plenty of beer available")
+        given = self.visit(self.pony, "4 stars, but I've changed my mind", rating=2)
+        unrated = self.visit(self.pony, "Too crowded")
+        self.assertEqual((4, 2, None), (parsed.rating, given.rating, unrated.rating))
+        stored = [visit.rating for visit in visit_repository.select_all()]
+        self.assertEqual([4, 2, None], stored)
+
+
+    def test_save_many_rates_each_visit(self):
+        visit_repository.save_many([
+            Visit(self.user, self.mordor, "0 stars, far too hot"),
+            Visit(self.user, self.mordor, "5 stars, would visit again if I could"),
+        ])
+        self.assertEqual([("Mordor", 2.5, 2)], self.ranking())
+
+
+    def test_ranking_by_average_then_number_of_ratings(self):
+        self.visit(self.mordor, "1 star")
+        self.visit(self.pony, "4 stars")
+        self.visit(self.shire, "5 stars")
+        self.visit(self.shire, "3 stars")
+        self.visit(self.shire, "No stars given")
+        self.assertEqual([
+            ("The Green Dragon", 4.0, 2),
+            ("The Prancing Pony", 4.0, 1),
+            ("Mordor", 1.0, 1),
+        ], self.ranking())
+
+
+    def test_ranking_by_category(self):
+        self.visit(self.mordor, "5 stars")
+        self.visit(self.pony, "2 stars")
+        self.visit(self.shire, "3 stars")
+        self.assertEqual([("The Green Dragon", 3.0, 1), ("The Prancing Pony", 2.0, 1)], self.ranking("Tavern"))
+        self.assertEqual([("Mordor", 5.0, 1)], self.ranking("Attractions"))
+
+
+    def test_deleted_visits_leave_the_ranking(self):
+        first = self.visit(self.pony, "2 stars")
+        second = self.visit(self.pony, "4 stars")
+        self.visit(self.mordor, "1 star")
+        visit_repository.delete(first.id)
+        self.assertEqual([("The Prancing Pony", 4.0, 1), ("Mordor", 1.0, 1)], self.ranking())
+        visit_repository.delete_many([second.id])
+        location_repository.delete_all()
+        self.assertEqual([], self.ranking())
+
+
+    def test_changed_rating_location_and_category_are_followed(self):
+        visit = self.visit(self.pony, "2 stars")
+        self.visit(self.shire, "3 stars")
+        run_sql("UPDATE visits SET rating = 5 WHERE id = %s", [visit.id])
+        self.assertEqual([("The Prancing Pony", 5.0, 1), ("The Green Dragon", 3.0, 1)], self.ranking())
+        run_sql("UPDATE visits SET location_id = %s WHERE id = %s", [self.shire.id, visit.id])
+        self.assertEqual([("The Green Dragon", 4.0, 2)], self.ranking())
+        run_sql("UPDATE locations SET category = 'Inn' WHERE id = %s", [self.shire.id])
+        self.assertEqual([], self.ranking("Tavern"))
+        self.assertEqual([("The Green Dragon", 4.0, 2)], self.ranking("Inn"))
+        self.assertEqual([], rating_repository.check())
+
+
+    def test_backfill_rates_old_reviews(self):
+        for location, review in [(self.mordor, "0 stars, far too hot"), (self.pony, "Too crowded"), (self.pony, "3 stars")] * 3:
+            run_sql("INSERT INTO visits (user_id, location_id, review) VALUES (%s, %s, %s)", [self.user.id, location.id, review])
+        self.assertEqual([], self.ranking())
+        self.assertEqual(6, rating_repository.backfill(batch_size=2))
+        self.assertEqual([("The Prancing Pony", 3.0, 3), ("Mordor", 0.0, 3)], self.ranking())
+        self.assertEqual(0, rating_repository.backfill())
+
+
+    def test_check_finds_and_rebuild_fixes_drift(self):
+        self.visit(self.pony, "4 stars")
+        self.visit(self.pony, "2 stars")
+        run_sql("UPDATE location_ratings SET ratings = 7 WHERE location_id = %s", [self.pony.id])
+        run_sql("UPDATE location_ratings SET category = NULL WHERE location_id = %s", [self.pony.id])
+        run_sql("INSERT INTO location_ratings (location_id, category, ratings, rating_sum) VALUES (%s, 'Tavern', 1, 5)", [self.shire.id])
+        self.assertEqual([
+            (self.pony.id, (7, 6), (2, 6)),
+            (self.shire.id, (1, 5), (0, 0)),
+            (self.pony.id, None, None),
+        ], rating_repository.check())
+        rating_repository.rebuild()
+        self.assertEqual([], rating_repository.check())
+        self.assertEqual([("The Prancing Pony", 3.0, 2)], self.ranking())
+
+
+    def test_locations_page_ranks_without_reading_visits(self):
+        self.visit(self.pony, "4 stars")
+        self.visit(self.shire, "5 stars")
+        self.visit(self.mordor, "2 stars")
+        with self.assertLogs("db.queries", "DEBUG") as logs:
+            response = app.test_client().get("/locations?category=Tavern")
+        html = response.get_data(as_text=True)
+        self.assertEqual(200, response.status_code)
+        ranking = html[html.index("Top rated in Tavern"):html.index("All locations")]
+        self.assertLess(ranking.index("The Green Dragon"), ranking.index("The Prancing Pony"))
+        self.assertNotIn("Mordor", ranking)
+        statements = [record.query["fingerprint"] for record in logs.records if record.query["event"] == "sql"]
+        self.assertEqual(2, len(statements))
+        self.assertFalse(any("visits" in statement for statement in statements))
+
+
+    def test_new_visit_form_rating(self):
+        response = app.test_client().post("/visits", data={
+            "user_id": self.user.id, "location_id": self.pony.id, "review": "5 stars", "rating": "3",
+        })
+        self.assertEqual(302, response.status_code)
+        app.test_client().post("/visits", data={
+            "user_id": self.user.id, "location_id": self.pony.id, "review": "5 stars", "rating": "",
+        })
+        self.assertEqual([3, 5], [visit.rating for visit in visit_repository.select_all()])
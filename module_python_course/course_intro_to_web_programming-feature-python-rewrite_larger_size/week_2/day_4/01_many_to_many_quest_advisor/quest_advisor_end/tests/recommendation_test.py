@@ -0,0 +1,168 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+from shared.db.connection_pool import close_pool
+from shared.db.run_sql import run_sql
+
+from app import app
+from models.location import Location
+from models.user import User
+from models.visit import Visit
+import repositories.location_repository as location_repository
+import repositories.partition_repository as partition_repository
+import repositories.recommendation_repository as recommendation_repository
+import repositories.user_repository as user_repository
+import repositories.visit_repository as visit_repository
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "db", "quest_advisor.sql")
+
+
+# Runs against a real SQLite file so the triggers in
+# db/quest_advisor.sqlite.sql are what keeps the counts
+class TestRecommendations(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original = (config.DATABASE_BACKEND, config.SQLITE_PATH)
+        config.DATABASE_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(self.directory.name, "quest_advisor.sqlite3")
+        close_pool()
+        sqlite_backend.load_schema(SCHEMA)
+        self.frodo, self.sam, self.pippin = user_repository.save_many([User("Frodo Baggins"), User("Samwise Gamgee"), User("Peregrin Took")])
+        self.mordor, self.pony, self.dragon, self.rivendell = location_repository.save_many([
+            Location("Mordor", "Attractions"),
+            Location("The Prancing Pony", "Tavern"),
+            Location("The Green Dragon", "Tavern"),
+            Location("Rivendell", "Attractions"),
+        ])
+
+    def tearDown(self):
+        close_pool()
+        config.DATABASE_BACKEND, config.SQLITE_PATH = self.original
+        self.directory.cleanup()
+
+    def visit(self, user, location, visited_at=None):
+        return visit_repository.save(Visit(user, location, "Lovely", visited_at=visited_at))
+
+    def covisits(self):
+        sql = "SELECT location_id, other_location_id, users FROM location_covisits ORDER BY location_id, other_location_id"
+        return [tuple(row) for row in run_sql(sql, tuples=True)]
+
+    def similar(self, location):
+        return [(other.name, users) for other, users in recommendation_repository.similar_locations(location)]
+
+    def suggested(self, user):
+        return [location.name for location, score in recommendation_repository.suggested_locations(user)]
+
+
+    def test_pairs_count_users_not_visits(self):
+        self.visit(self.frodo, self.pony)
+        self.visit(self.frodo, self.pony)
+        self.visit(self.frodo, self.dragon)
+        self.visit(self.sam, self.dragon)
+        self.visit(self.sam, self.pony)
+        self.visit(self.sam, self.pony)
+        self.assertEqual([(self.pony.id, self.dragon.id, 2), (self.dragon.id, self.pony.id, 2)], self.covisits())
+
+
+    def test_save_many_counts_each_visit(self):
+        visit_repository.save_many([
+            Visit(self.frodo, self.mordor, "Hot"),
+            Visit(self.frodo, self.rivendell, "Elves"),
+            Visit(self.frodo, self.mordor, "Still hot"),
+        ])
+        self.assertEqual([(self.mordor.id, self.rivendell.id, 1), (self.rivendell.id, self.mordor.id, 1)], self.covisits())
+        self.assertEqual([], recommendation_repository.check())
+
+
+    def test_only_the_last_visit_unpairs(self):
+        first = self.visit(self.frodo, self.pony)
+        second = self.visit(self.frodo, self.pony)
+        self.visit(self.frodo, self.dragon)
+        visit_repository.delete(first.id)
+        self.assertEqual(2, len(self.covisits()))
+        visit_repository.delete_many([second.id])
+        self.assertEqual([], self.covisits())
+
+
+    def test_moved_visits_and_deleted_locations_are_followed(self):
+        moved = self.visit(self.frodo, self.pony)
+        self.visit(self.frodo, self.dragon)
+        self.visit(self.sam, self.dragon)
+        self.visit(self.sam, self.mordor)
+        run_sql("UPDATE visits SET location_id = %s WHERE id = %s", [self.mordor.id, moved.id])
+        self.assertEqual([("Mordor", 2)], self.similar(self.dragon))
+        run_sql("UPDATE visits SET user_id = %s WHERE id = %s", [self.pippin.id, moved.id])
+        self.assertEqual([("Mordor", 1)], self.similar(self.dragon))
+        run_sql("DELETE FROM locations WHERE id = %s", [self.mordor.id])
+        self.assertEqual([], self.covisits())
+        self.assertEqual([], recommendation_repository.check())
+
+
+    def test_similar_locations_most_shared_first(self):
+        for user in [self.frodo, self.sam, self.pippin]:
+            self.visit(user, self.pony)
+            self.visit(user, self.dragon)
+        self.visit(self.frodo, self.mordor)
+        self.visit(self.sam, self.rivendell)
+        self.assertEqual([("The Green Dragon", 3), ("Mordor", 1), ("Rivendell", 1)], self.similar(self.pony))
+        self.assertEqual([("The Green Dragon", 3)], [(other.name, users) for other, users in recommendation_repository.similar_locations(self.pony, limit=1)])
+
+
+    def test_suggestions_skip_where_the_user_has_been(self):
+        self.visit(self.frodo, self.pony)
+        self.visit(self.frodo, self.dragon)
+        self.visit(self.sam, self.pony)
+        self.visit(self.sam, self.rivendell)
+        self.visit(self.pippin, self.dragon)
+        self.visit(self.pippin, self.rivendell)
+        self.visit(self.pippin, self.mordor)
+        self.assertEqual(["Rivendell", "Mordor"], self.suggested(self.frodo))
+        self.assertEqual([], self.suggested(User("Nobody", 999)))
+
+
+    def test_archive_takes_old_visits_out(self):
+        self.visit(self.frodo, self.pony, datetime(2024, 1, 5))
+        self.visit(self.frodo, self.dragon, datetime(2024, 3, 5))
+        self.visit(self.frodo, self.dragon, datetime(2024, 1, 6))
+        self.visit(self.sam, self.dragon, datetime(2024, 1, 7))
+        self.visit(self.sam, self.mordor, datetime(2024, 1, 8))
+        partition_repository.archive(date(2024, 2, 1))
+        self.assertEqual([], self.covisits())
+        self.assertEqual([], recommendation_repository.check())
+
+
+    def test_check_finds_and_rebuild_fixes_drift(self):
+        self.visit(self.frodo, self.pony)
+        self.visit(self.frodo, self.dragon)
+        run_sql("UPDATE location_covisits SET users = 5 WHERE location_id = %s", [self.pony.id])
+        run_sql("INSERT INTO location_covisits (location_id, other_location_id, users) VALUES (%s, %s, 1)", [self.mordor.id, self.pony.id])
+        self.assertEqual([
+            (self.mordor.id, self.pony.id, 1, 0),
+            (self.pony.id, self.dragon.id, 5, 1),
+        ], recommendation_repository.check())
+        recommendation_repository.rebuild()
+        self.assertEqual([], recommendation_repository.check())
+        self.assertEqual(2, len(self.covisits()))
+
+
+    def test_pages_show_recommendations_without_reading_all_visits(self):
+        self.visit(self.frodo, self.pony)
+        self.visit(self.frodo, self.dragon)
+        self.visit(self.sam, self.pony)
+        self.visit(self.sam, self.mordor)
+        client = app.test_client()
+        with self.assertLogs("db.queries", "DEBUG") as logs:
+            html = client.get(f"/locations/{self.dragon.id}").get_data(as_text=True)
+        similar = html[html.index("also went to"):html.index("Visited by")]
+        self.assertIn("The Prancing Pony", similar)
+        self.assertIn("1 visitor in common", similar)
+        self.assertNotIn("Mordor", similar)
+        statements = [record.query["fingerprint"] for record in logs.records if record.query["event"] == "sql"]
+        self.assertEqual(3, len(statements))
+        html = client.get(f"/users/{self.frodo.id}").get_data(as_text=True)
+        self.assertIn("Mordor", html[html.index("You might like"):html.index("Visited:")])
@@ -0,0 +1,82 @@
+import time
+import unittest
+
+import shared.db.config as config
+import shared.db.table_cache as table_cache
+from shared.tests.doubles import FakeListenConnection
+
+from app import app
+from models.location import Location
+import repositories.location_repository as location_repository
+import repositories.user_repository as user_repository
+
+REPOSITORIES = [location_repository, user_repository]
+
+
+class TestTableCache(unittest.TestCase):
+
+    def setUp(self):
+        self.queries = []
+        self.connections = []
+        self.original = (config.TABLE_CACHE, config.DATABASE_BACKEND)
+        self.originals = [(module, module.run_sql) for module in REPOSITORIES]
+        for module in REPOSITORIES:
+            module.run_sql = self.fake_run_sql
+        config.TABLE_CACHE = True
+        config.DATABASE_BACKEND = "postgres"
+        table_cache.reset_stats()
+        self.assertTrue(table_cache.start(connect=self.connect).wait(2))
+
+    def tearDown(self):
+        table_cache.stop()
+        for module, original in self.originals:
+            module.run_sql = original
+        config.TABLE_CACHE, config.DATABASE_BACKEND = self.original
+
+    def connect(self, dsn):
+        connection = FakeListenConnection(dsn)
+        self.connections.append(connection)
+        return connection
+
+    def fake_run_sql(self, sql, values=None, tuples=False):
+        self.queries.append(sql)
+        if sql.startswith("SELECT name, id FROM users"):
+            return [("Frodo Baggins", 1)]
+        if sql.startswith("SELECT name, category, id FROM locations"):
+            return [("Mordor", "Attractions", 1)]
+        if sql.startswith("SELECT * FROM locations"):
+            return [{"id": int(values[0]), "name": "Mordor", "category": "Attractions"}]
+        if sql.startswith("INSERT INTO locations"):
+            return [{"id": 2}]
+        return []
+
+    def notify(self, payload):
+        handled = table_cache.stats()["notifications"] + 1
+        self.connections[-1].notify(payload)
+        deadline = time.monotonic() + 2
+        while table_cache.stats()["notifications"] < handled:
+            if time.monotonic() > deadline:
+                self.fail("timed out waiting for the listener")
+            time.sleep(0.001)
+
+
+    def test_new_visit_form_reads_users_and_locations_once(self):
+        client = app.test_client()
+        client.get("/visits/new")
+        client.get("/visits/new")
+        self.assertEqual(2, len(self.queries))
+
+
+    def test_another_process_changing_a_location_evicts_it(self):
+        location = location_repository.select(1)
+        self.assertIs(location, location_repository.select("1"))
+        self.notify(f"locations:{time.time()}:1")
+        self.assertIsNot(location, location_repository.select(1))
+        self.assertEqual(2, len(self.queries))
+
+
+    def test_saving_a_location_evicts_select_all(self):
+        location_repository.select_all()
+        location_repository.save(Location("The Prancing Pony", "Tavern"))
+        location_repository.select_all()
+        self.assertEqual(3, len(self.queries))
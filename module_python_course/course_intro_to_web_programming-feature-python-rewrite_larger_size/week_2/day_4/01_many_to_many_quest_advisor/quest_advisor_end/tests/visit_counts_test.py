@@ -0,0 +1,127 @@
+import os
+import statistics
+import tempfile
+import time
+import unittest
+from datetime import date, datetime, timedelta
+
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+from shared.db.connection_pool import close_pool
+from shared.db.run_sql import run_sql
+
+from app import app
+from models.location import Location
+from models.user import User
+from models.visit import Visit
+import repositories.location_repository as location_repository
+import repositories.user_repository as user_repository
+import repositories.visit_repository as visit_repository
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "db", "quest_advisor.sql")
+
+REPEATS = 500
+
+
+# Users who go back to the same places again and again, on a real SQLite file
+class TestVisitCounts(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original = (config.DATABASE_BACKEND, config.SQLITE_PATH)
+        config.DATABASE_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(self.directory.name, "quest_advisor.sqlite3")
+        close_pool()
+        sqlite_backend.load_schema(SCHEMA)
+        self.frodo, self.sam, self.pippin = user_repository.save_many([User("Frodo Baggins"), User("Samwise Gamgee"), User("Peregrin Took")])
+        self.mordor, self.pony, self.dragon = location_repository.save_many([
+            Location("Mordor", "Attractions"),
+            Location("The Prancing Pony", "Tavern"),
+            Location("The Green Dragon", "Tavern"),
+        ])
+        start = datetime(2024, 1, 1)
+        visit_repository.save_many(
+            [Visit(self.frodo, self.mordor, "Hot", visited_at=start + timedelta(hours=n)) for n in range(REPEATS)]
+            + [Visit(self.frodo, self.pony, "Cosy", visited_at=datetime(2024, 3, 2))]
+            + [Visit(self.sam, self.dragon, "Ale", visited_at=start + timedelta(days=n)) for n in range(REPEATS)]
+            + [Visit(self.sam, self.mordor, "Hotter", visited_at=datetime(2024, 2, 10))]
+        )
+
+    def tearDown(self):
+        close_pool()
+        config.DATABASE_BACKEND, config.SQLITE_PATH = self.original
+        self.directory.cleanup()
+
+    def rows_fetched(self, function):
+        with self.assertLogs("db.queries", "DEBUG") as logs:
+            function()
+        return sum(record.query["rows"] for record in logs.records if record.query["event"] == "sql")
+
+    def render(self, path, repeat=5):
+        client = app.test_client()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            html = client.get(path).get_data(as_text=True)
+            timings.append(time.perf_counter() - start)
+        return html, statistics.median(timings)
+
+
+    def test_one_row_per_location_with_counts_and_last_visit(self):
+        page = user_repository.locations(self.frodo)
+        self.assertEqual([
+            ("Mordor", REPEATS, datetime(2024, 1, 1) + timedelta(hours=REPEATS - 1)),
+            ("The Prancing Pony", 1, datetime(2024, 3, 2)),
+        ], [(location.name, visits, last) for location, visits, last in page.items])
+        self.assertIsNone(page.next_cursor)
+        page = location_repository.users(self.mordor)
+        self.assertEqual([("Frodo Baggins", REPEATS), ("Samwise Gamgee", 1)], [(user.name, visits) for user, visits, last in page.items])
+
+
+    def test_window_counts_only_visits_inside_it(self):
+        page = user_repository.locations(self.sam, since=date(2024, 2, 1), until=date(2024, 3, 1))
+        self.assertEqual([("Mordor", 1), ("The Green Dragon", 29)], [(location.name, visits) for location, visits, last in page.items])
+        page = location_repository.users(self.dragon, until=date(2024, 1, 11))
+        self.assertEqual([("Samwise Gamgee", 10, datetime(2024, 1, 10))], [(user.name, visits, last) for user, visits, last in page.items])
+        self.assertEqual([], location_repository.users(self.dragon, since=date(2030, 1, 1)).items)
+
+
+    def test_pages_by_id_both_ways(self):
+        page = location_repository.users(self.mordor, limit=1)
+        self.assertEqual(["Frodo Baggins"], [user.name for user, visits, last in page.items])
+        page = location_repository.users(self.mordor, after=page.next_cursor, limit=1)
+        self.assertEqual(["Samwise Gamgee"], [user.name for user, visits, last in page.items])
+        self.assertIsNone(page.next_cursor)
+        page = location_repository.users(self.mordor, before=page.prev_cursor, limit=1)
+        self.assertEqual(["Frodo Baggins"], [user.name for user, visits, last in page.items])
+        self.assertIsNone(page.prev_cursor)
+
+
+    def test_rows_transferred_drop_to_one_per_location(self):
+        # The old join brought back one row per visit
+        joined = "SELECT locations.* FROM locations INNER JOIN visits ON visits.location_id = locations.id WHERE user_id = %s"
+        self.assertEqual(REPEATS + 1, self.rows_fetched(lambda: run_sql(joined, [self.frodo.id])))
+        self.assertEqual(2, self.rows_fetched(lambda: user_repository.locations(self.frodo)))
+        self.assertEqual(2, self.rows_fetched(lambda: location_repository.users(self.mordor)))
+
+
+    def test_show_pages_render_counts_in_time_with_distinct_places(self):
+        html, heavy = self.render(f"/users/{self.frodo.id}")
+        visited = html[html.index("Visited:"):]
+        self.assertIn(f"Mordor</a> ({REPEATS} visits, last on 21 Jan 2024)", visited)
+        self.assertIn("The Prancing Pony</a> (1 visit, last on 02 Mar 2024)", visited)
+        self.assertEqual(2, visited.count("<li>"))
+        html, light = self.render(f"/users/{self.pippin.id}")
+        # 501 visits render as two lines, so the page takes about as long
+        # as one for a user with none. The bound is loose for slow machines.
+        self.assertLess(heavy, light * 3 + 0.05)
+        html = app.test_client().get(f"/locations/{self.mordor.id}").get_data(as_text=True)
+        self.assertIn(f"Frodo Baggins</a> ({REPEATS} visits", html)
+
+
+    def test_show_pages_link_to_the_next_page_with_the_window(self):
+        location_repository.save_many([Location(f"Tavern {n}", "Tavern") for n in range(60)])
+        visit_repository.save_many([Visit(self.pippin, Location("", "", id), "Ale", visited_at=datetime(2024, 5, 1)) for id in range(4, 64)])
+        html = app.test_client().get(f"/users/{self.pippin.id}?since=2024-04-01").get_data(as_text=True)
+        self.assertEqual(50, html[html.index("Visited:"):].count("<li>"))
+        self.assertIn(f"/users/{self.pippin.id}?after=53&amp;since=2024-04-01", html)
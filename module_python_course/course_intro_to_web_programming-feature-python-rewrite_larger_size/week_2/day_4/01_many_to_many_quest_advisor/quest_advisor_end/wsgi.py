@@ -0,0 +1,8 @@
+# The app as production servers load it, see gunicorn.conf.py
+
+from app import app
+
+# Jinja compiles each template the first time it is rendered. Doing them all
+# here, before the server forks, means every worker starts with them compiled.
+for template in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template)
@@ -1,11 +1,27 @@
-from flask import Flask, render_template
+import os
+
+from flask import Flask, jsonify, render_template
+
+import shared.db.instrumentation as instrumentation
+import shared.db.table_cache as table_cache
+import shared.db.unit_of_work as unit_of_work
+import shared.pagination as pagination
 
 from controllers.bitings_controller import bitings_blueprint
 from controllers.humans_controller import humans_blueprint
 from controllers.zombies_controller import zombies_blueprint
 from controllers.zombie_types_controller import zombie_types_blueprint
+import repositories.identity_map as identity_map
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+unit_of_work.init_app(app)
+table_cache.init_app(app)
+pagination.init_app(app)
+
+# Comma separated endpoints whose index pages are streamed, e.g.
+# STREAMED_ROUTES="bitings.bitings,zombies.zombies"
+app.config["STREAMED_ROUTES"] = set(filter(None, os.environ.get("STREAMED_ROUTES", "").split(",")))
 
 app.register_blueprint(bitings_blueprint)
 app.register_blueprint(humans_blueprint)
@@ -16,5 +32,16 @@ app.register_blueprint(zombie_types_blueprint)
 def main():
     return render_template('index.html')
 
+# Identity map hits and misses for each route since the app started
+@app.route("/stats/identity-map")
+def identity_map_stats():
+    return jsonify(identity_map.stats())
+
+# Hits, misses, evictions and notification lag for this worker's table cache
+@app.route("/stats/table-cache")
+def table_cache_stats():
+    return jsonify(table_cache.stats())
+
+# Development server only, see gunicorn.conf.py for serving in production
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,81 @@
+# Compares page latency under concurrent load for the pages that make two
+# independent queries, fetched one after the other (the sync path) or together
+# with asyncio.gather (the async views). An async page holds two pooled
+# connections at once, so raise DB_POOL_MAX_SIZE to at least twice --clients
+# to measure the queries rather than waits for the pool.
+#
+# Run from the app folder against a scratch database, it empties all tables:
+#
+#   DATABASE_URL="dbname='zombies_bench'" DB_POOL_MAX_SIZE=16 python -m benchmarks.async_views_benchmark --clients 8 --requests 200
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.benchmarks import report_latencies
+from shared.db.run_sql import run_sql
+
+import repositories.aio as aio
+import repositories.human_repository as human_repository
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+
+def seed(humans, zombies):
+    run_sql("TRUNCATE bitings, zombies, humans, zombie_types RESTART IDENTITY CASCADE")
+    run_sql("INSERT INTO zombie_types (name) SELECT 'Type ' || n FROM generate_series(1, 5) AS n")
+    run_sql("INSERT INTO humans (name) SELECT 'Human ' || n FROM generate_series(1, %s) AS n", [humans])
+    run_sql("INSERT INTO zombies (name, zombie_type_id) SELECT 'Zombie ' || n, 1 + mod(n, 5) FROM generate_series(1, %s) AS n", [zombies])
+    run_sql("INSERT INTO bitings (human_id, zombie_id) SELECT n, 1 + mod(n, %s) FROM generate_series(1, %s) AS n", [zombies, humans])
+    run_sql("ANALYZE")
+
+
+def sync_pages(id):
+    return [
+        lambda: (human_repository.select_all(), zombie_repository.select_all()),
+        lambda: (zombie_repository.select(id), zombie_type_repository.select_all()),
+    ]
+
+
+def async_pages(id):
+    return [
+        lambda: asyncio.run(gather(aio.human_repository.select_all(), aio.zombie_repository.select_all())),
+        lambda: asyncio.run(gather(aio.zombie_repository.select(id), aio.zombie_type_repository.select_all())),
+    ]
+
+
+async def gather(*fetches):
+    return await asyncio.gather(*fetches)
+
+
+def timed(page):
+    start = time.perf_counter()
+    page()
+    return time.perf_counter() - start
+
+
+def load(pages, clients, requests):
+    work = [pages[n % len(pages)] for n in range(requests)]
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        return list(executor.map(timed, work))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--humans", type=int, default=1000)
+    parser.add_argument("--zombies", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    seed(args.humans, args.zombies)
+    print(f"{args.clients} concurrent clients, new_biting / edit_zombie in turn")
+
+    load(sync_pages(1), args.clients, args.clients)
+    report_latencies("sync, queries one after the other", load(sync_pages(1), args.clients, args.requests))
+    report_latencies("async, queries gathered", load(async_pages(1), args.clients, args.requests))
+
+
+if __name__ == '__main__':
+    main()
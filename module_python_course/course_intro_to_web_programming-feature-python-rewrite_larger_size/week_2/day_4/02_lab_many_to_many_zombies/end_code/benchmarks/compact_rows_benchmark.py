@@ -0,0 +1,73 @@
+# Compares the memory and time it takes to load a large humans table the old
+# way, DictCursor rows turned into a plain class with a __dict__ per object,
+# against human_repository.select_all, which maps plain tuples positionally
+# onto the __slots__ Human model. Memory is the Python heap at its peak while
+# loading and what is still held by the finished list, from tracemalloc.
+#
+# Run from the app folder against a scratch database, it empties all tables:
+#
+#   DATABASE_URL="dbname='zombies_bench'" python -m benchmarks.compact_rows_benchmark --rows 1000000
+#   DB_BACKEND=sqlite DB_SQLITE_PATH=/tmp/bench.sqlite3 python -m benchmarks.compact_rows_benchmark
+
+import argparse
+import gc
+import tracemalloc
+
+import shared.db.bulk as bulk
+from shared.benchmarks import report, time_calls
+from shared.db.run_sql import run_sql
+
+import repositories.human_repository as human_repository
+
+
+class PlainHuman:
+    # Human as it was before it had __slots__
+    def __init__(self, name, id=None):
+        self.name = name
+        self.id = id
+
+
+def seed(rows, chunk=100000):
+    run_sql("DELETE FROM bitings")
+    run_sql("DELETE FROM humans")
+    for start in range(0, rows, chunk):
+        bulk.insert_many("humans", ["name"], [[f"Human {n}"] for n in range(start, min(rows, start + chunk))])
+
+
+def dict_rows():
+    return [PlainHuman(row["name"], row["id"]) for row in run_sql("SELECT * FROM humans")]
+
+
+def compact_rows():
+    return human_repository.select_all()
+
+
+def measure_memory(function):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        humans = function()
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return len(humans), held, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    print(f"select_all of {args.rows} humans")
+    for label, function in [("DictCursor + plain class", dict_rows), ("tuples + __slots__", compact_rows)]:
+        rows, held, peak = measure_memory(function)
+        if rows != args.rows:
+            raise RuntimeError(f"{label} loaded {rows} humans, expected {args.rows}")
+        report(label, time_calls(function, args.repeat))
+        print(f"{'':<45} peak {peak / 2 ** 20:10.1f} MB   held {held / 2 ** 20:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
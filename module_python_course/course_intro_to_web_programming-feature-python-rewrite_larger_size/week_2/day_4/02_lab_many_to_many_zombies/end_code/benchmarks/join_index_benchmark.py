@@ -0,0 +1,90 @@
+# Times lookups through the bitings join table in both directions, zombie to
+# victims (zombie_repository.select_victims_of_zombie) and human to zombies,
+# without and then with the indexes from db/migrations/001_bitings_join_indexes.sql.
+#
+# Run from the app folder against a scratch database, it empties all tables:
+#
+#   DATABASE_URL="dbname='zombies_bench'" python -m benchmarks.join_index_benchmark --rows 1000000
+
+import argparse
+import random
+import time
+
+from shared.benchmarks import report_latencies
+from shared.db.run_sql import run_sql
+
+import repositories.zombie_repository as zombie_repository
+
+INDEXES = {
+    "bitings_zombie_id_human_id_idx": "bitings (zombie_id, human_id)",
+    "bitings_human_id_zombie_id_idx": "bitings (human_id, zombie_id)",
+}
+
+
+def seed(rows, humans, zombies):
+    run_sql("TRUNCATE bitings, zombies, humans, zombie_types RESTART IDENTITY CASCADE")
+    run_sql("INSERT INTO zombie_types (name) SELECT 'Type ' || n FROM generate_series(1, 5) AS n")
+    run_sql("INSERT INTO humans (name) SELECT 'Human ' || n FROM generate_series(1, %s) AS n", [humans])
+    run_sql("INSERT INTO zombies (name, zombie_type_id) SELECT 'Zombie ' || n, 1 + mod(n, 5) FROM generate_series(1, %s) AS n", [zombies])
+    # Multiplying by primes scatters each zombie's bitings through the table,
+    # the way rows written over time would be, but the same way on every run
+    run_sql(
+        "INSERT INTO bitings (human_id, zombie_id) SELECT 1 + mod(n * 7919, %s), 1 + mod(n * 104729, %s) FROM generate_series(1, %s) AS n",
+        [humans, zombies, rows],
+    )
+
+
+def zombies_that_bit(human_id):
+    sql = "SELECT zombies.* FROM zombies INNER JOIN bitings ON bitings.zombie_id = zombies.id WHERE bitings.human_id = %s"
+    return run_sql(sql, [human_id])
+
+
+def drop_indexes():
+    for name in INDEXES:
+        run_sql(f"DROP INDEX IF EXISTS {name}")
+    run_sql("ANALYZE bitings")
+
+
+def create_indexes():
+    for name, columns in INDEXES.items():
+        run_sql(f"CREATE INDEX {name} ON {columns}")
+    run_sql("ANALYZE bitings")
+
+
+def latencies(function, ids):
+    timings = []
+    for id in ids:
+        start = time.perf_counter()
+        function(id)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure(label, zombie_ids, human_ids):
+    report_latencies(f"select_victims_of_zombie, {label}", latencies(zombie_repository.select_victims_of_zombie, zombie_ids))
+    report_latencies(f"zombies that bit a human, {label}", latencies(zombies_that_bit, human_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--humans", type=int, default=100000)
+    parser.add_argument("--zombies", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    seed(args.rows, args.humans, args.zombies)
+    print(f"{args.rows} bitings, {args.humans} humans, {args.zombies} zombies")
+    zombie_ids = [random.randint(1, args.zombies) for _ in range(args.lookups)]
+    human_ids = [random.randint(1, args.humans) for _ in range(args.lookups)]
+
+    drop_indexes()
+    measure("no indexes", zombie_ids, human_ids)
+    create_indexes()
+    measure("join indexes", zombie_ids, human_ids)
+
+
+if __name__ == '__main__':
+    main()
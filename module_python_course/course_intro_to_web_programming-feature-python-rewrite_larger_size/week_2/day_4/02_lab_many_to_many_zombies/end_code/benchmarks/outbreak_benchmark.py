@@ -0,0 +1,65 @@
+# Simulated bites per second for simulation.outbreak on a generated population,
+# by default 1M humans and nothing written to the database:
+#
+#   python -m benchmarks.outbreak_benchmark --humans 1000000
+#
+# With --save it also times writing the results back with bulk inserts. That
+# needs a scratch database, it empties all tables first:
+#
+#   DATABASE_URL="dbname='zombies_bench'" python -m benchmarks.outbreak_benchmark --save
+
+import argparse
+import time
+
+import numpy as np
+
+from shared.db.run_sql import run_sql
+
+from simulation.outbreak import Outbreak
+
+# Three zombie types, slow to fast
+BITE_RATES = {1: 0.3, 2: 0.8, 3: 1.5}
+
+
+def seed(humans, zombies):
+    run_sql("TRUNCATE bitings, zombies, humans, zombie_types RESTART IDENTITY CASCADE")
+    run_sql("INSERT INTO zombie_types (name) SELECT 'Type ' || n FROM generate_series(1, 3) AS n")
+    run_sql("INSERT INTO humans (name) SELECT 'Human ' || n FROM generate_series(1, %s) AS n", [humans])
+    run_sql("INSERT INTO zombies (name, zombie_type_id) SELECT 'Zombie ' || n, 1 + mod(n, 3) FROM generate_series(1, %s) AS n", [zombies])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--humans", type=int, default=1000000)
+    parser.add_argument("--zombies", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    if args.save:
+        seed(args.humans, args.zombies)
+    zombie_ids = np.arange(1, args.zombies + 1)
+    outbreak = Outbreak(np.arange(1, args.humans + 1), zombie_ids, 1 + zombie_ids % 3, BITE_RATES, seed=args.seed)
+    print(f"{args.humans} humans, {args.zombies} zombies")
+
+    total = 0
+    elapsed = 0.0
+    for step in range(1, args.steps + 1):
+        start = time.perf_counter()
+        bites = outbreak.step()
+        seconds = time.perf_counter() - start
+        total += bites
+        elapsed += seconds
+        print(f"step {step:>3}: {bites:>9} bites in {seconds * 1000:8.1f} ms   {outbreak.zombie_ids.size:>9} zombies")
+    print(f"{total} bites in {elapsed:.3f} s, {total / elapsed:,.0f} simulated bites/s")
+
+    if args.save:
+        start = time.perf_counter()
+        saved = outbreak.save()
+        seconds = time.perf_counter() - start
+        print(f"saved {saved} bitings and their zombies in {seconds:.3f} s, {saved / seconds:,.0f} bitings/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Times human_repository.select(id) with run_sql's prepared statement cache on
+# and off. Each call is one primary key lookup, so what is left to save is the
+# server parsing and planning the statement every time.
+#
+# Run from the app folder against a scratch database, it empties all tables:
+#
+#   DATABASE_URL="dbname='zombies_bench'" python -m benchmarks.prepared_statement_benchmark --calls 20000
+
+import argparse
+import random
+
+import shared.db.config as config
+import shared.db.prepared as prepared
+from shared.benchmarks import report, time_calls
+from shared.db.run_sql import run_sql
+
+import repositories.human_repository as human_repository
+
+
+def seed(rows):
+    run_sql("TRUNCATE bitings, zombies, humans, zombie_types RESTART IDENTITY CASCADE")
+    run_sql("INSERT INTO humans (name) SELECT 'Human ' || n FROM generate_series(1, %s) AS n", [rows])
+    run_sql("ANALYZE humans")
+
+
+def lookups(ids):
+    def select_all_ids():
+        for id in ids:
+            human_repository.select(id)
+    return select_all_ids
+
+
+def measure(label, cache_size, ids, repeat):
+    config.PREPARED_STATEMENT_CACHE_SIZE = cache_size
+    prepared.invalidate()
+    function = lookups(ids)
+    function()
+    timings = time_calls(function, repeat)
+    report(label, timings, len(ids))
+    print(f"{'':<45} {len(ids) / min(timings):10.0f} lookups/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    ids = [random.randint(1, args.rows) for _ in range(args.calls)]
+    cache_size = config.PREPARED_STATEMENT_CACHE_SIZE or 100
+
+    measure("select(id), statements re-planned", 0, ids, args.repeat)
+    measure("select(id), prepared statements", cache_size, ids, args.repeat)
+    print(prepared.stats())
+
+
+if __name__ == '__main__':
+    main()
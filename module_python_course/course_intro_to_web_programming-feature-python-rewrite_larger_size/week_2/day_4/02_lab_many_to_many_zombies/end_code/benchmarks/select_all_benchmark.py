@@ -0,0 +1,82 @@
+# Compares the joined select_all queries with the old one-query-per-row approach.
+#
+# Run from the app folder against a scratch database, it empties all tables:
+#
+#   DATABASE_URL="dbname='zombies_bench'" python -m benchmarks.select_all_benchmark --rows 100000
+
+import argparse
+import sys
+
+from shared.benchmarks import count_queries, report, time_calls
+from shared.db.run_sql import run_sql
+
+from models.biting import Biting
+from models.zombie import Zombie
+import repositories.biting_repository as biting_repository
+import repositories.human_repository as human_repository
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+REPOSITORIES = [biting_repository, human_repository, zombie_repository, zombie_type_repository]
+
+
+def seed(rows):
+    zombies = max(rows // 10, 1)
+    run_sql("TRUNCATE bitings, zombies, humans, zombie_types RESTART IDENTITY CASCADE")
+    run_sql("INSERT INTO zombie_types (name) SELECT 'Type ' || n FROM generate_series(1, 5) AS n")
+    run_sql("INSERT INTO humans (name) SELECT 'Human ' || n FROM generate_series(1, %s) AS n", [rows])
+    run_sql("INSERT INTO zombies (name, zombie_type_id) SELECT 'Zombie ' || n, 1 + mod(n, 5) FROM generate_series(1, %s) AS n", [zombies])
+    run_sql("INSERT INTO bitings (human_id, zombie_id) SELECT n, 1 + mod(n, %s) FROM generate_series(1, %s) AS n", [zombies, rows])
+    run_sql("ANALYZE")
+
+
+# The previous implementations, kept here as the baseline
+def select_all_bitings_per_row():
+    bitings = []
+    for result in run_sql("SELECT * FROM bitings"):
+        human = human_repository.select(result["human_id"])
+        zombie = select_zombie_per_row(result["zombie_id"])
+        bitings.append(Biting(human, zombie, result["id"]))
+    return bitings
+
+
+def select_all_zombies_per_row():
+    zombies = []
+    for result in run_sql("SELECT * FROM zombies"):
+        zombie_type = zombie_type_repository.select(result["zombie_type_id"])
+        zombies.append(Zombie(result["name"], zombie_type, result["id"]))
+    return zombies
+
+
+def select_zombie_per_row(id):
+    result = run_sql("SELECT * FROM zombies WHERE id = %s", [id])[0]
+    zombie_type = zombie_type_repository.select(result["zombie_type_id"])
+    return Zombie(result["name"], zombie_type, result["id"])
+
+
+def measure(label, function, repeat):
+    with count_queries(sys.modules[__name__], *REPOSITORIES) as counter:
+        function()
+    timings = time_calls(function, repeat)
+    report(label, timings, counter["queries"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-per-row", action="store_true", help="only time the joined queries")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    print(f"{args.rows} bitings, {max(args.rows // 10, 1)} zombies")
+
+    measure("biting_repository.select_all (join)", biting_repository.select_all, args.repeat)
+    measure("zombie_repository.select_all (join)", zombie_repository.select_all, args.repeat)
+    if not args.skip_per_row:
+        measure("bitings, one query per row", select_all_bitings_per_row, 1)
+        measure("zombies, one query per row", select_all_zombies_per_row, 1)
+
+
+if __name__ == '__main__':
+    main()
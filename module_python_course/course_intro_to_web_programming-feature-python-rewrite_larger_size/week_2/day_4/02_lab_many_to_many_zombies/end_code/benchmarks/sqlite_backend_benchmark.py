@@ -0,0 +1,82 @@
+# Compares per-request latency on the Postgres and SQLite backends by sending
+# the same requests to the app through Flask's test client, so the numbers
+# are the database and rendering time with no HTTP server in between.
+#
+# Run from the app folder. Postgres needs a scratch database, it empties all
+# tables; SQLite gets a new file in a temporary folder:
+#
+#   DATABASE_URL="dbname='zombies_bench'" python -m benchmarks.sqlite_backend_benchmark --requests 500
+#   python -m benchmarks.sqlite_backend_benchmark --backends sqlite
+
+import argparse
+import os
+import tempfile
+import time
+
+import shared.db.bulk as bulk
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+from shared.benchmarks import report_latencies
+from shared.db.connection_pool import close_pool
+from shared.db.run_sql import run_sql
+
+from app import app
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "db", "zombies.sql")
+
+REQUESTS = [
+    ("GET /humans", "get", "/humans", None),
+    ("GET /bitings", "get", "/bitings", None),
+    ("GET /zombies/1", "get", "/zombies/1", None),
+    ("POST /humans", "post", "/humans", {"name": "Benchmark"}),
+]
+
+
+def use_backend(backend, directory):
+    close_pool()
+    config.DATABASE_BACKEND = backend
+    if backend == "sqlite":
+        config.SQLITE_PATH = os.path.join(directory, "zombies.sqlite3")
+        sqlite_backend.load_schema(SCHEMA)
+    else:
+        run_sql("TRUNCATE bitings, zombies, humans, zombie_types RESTART IDENTITY CASCADE")
+
+
+def seed(rows):
+    bulk.insert_many("zombie_types", ["name"], [["Walker"], ["Runner"]])
+    bulk.insert_many("zombies", ["name", "zombie_type_id"], [[f"Zombie {n}", 1 + n % 2] for n in range(rows)])
+    bulk.insert_many("humans", ["name"], [[f"Human {n}"] for n in range(rows)])
+    bulk.insert_many("bitings", ["human_id", "zombie_id"], [[1 + n, 1 + n % 10] for n in range(rows)])
+
+
+def measure(backend, client, requests):
+    for label, method, path, data in REQUESTS:
+        send = getattr(client, method)
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = send(path, data=data)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{label} answered {response.status_code} on {backend}")
+        report_latencies(f"{backend:<8} {label}", latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default="postgres,sqlite")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends.split(","):
+            use_backend(backend, directory)
+            seed(args.rows)
+            measure(backend, client, args.requests)
+        close_pool()
+
+
+if __name__ == '__main__':
+    main()
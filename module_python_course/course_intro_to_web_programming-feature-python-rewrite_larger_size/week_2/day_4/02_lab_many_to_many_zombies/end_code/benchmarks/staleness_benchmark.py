@@ -0,0 +1,88 @@
+# Measures how long another process goes on reading a row from its table
+# cache (see shared/db/table_cache.py) after a write to it commits. One process
+# renames a zombie type over and over; a second one, with the cache on,
+# reads it through zombie_type_repository.select as fast as it can and
+# reports when it first sees each new name. The staleness window is the
+# time from the writer's commit to then. For comparison it runs again with
+# the cache off, where every read goes to Postgres.
+#
+# Run from the app folder against a scratch database loaded from
+# db/zombies.sql; both processes connect to the same local Postgres:
+#
+#   DATABASE_URL="dbname='zombies_bench'" python -m benchmarks.staleness_benchmark --writes 1000
+
+import argparse
+import multiprocessing
+import random
+import time
+
+import shared.db.config as config
+import shared.db.table_cache as table_cache
+from shared.benchmarks import report_latencies
+from shared.db.run_sql import run_sql
+
+from models.zombie_type import ZombieType
+import repositories.zombie_type_repository as zombie_type_repository
+
+
+def reader(id, cached, commands, results):
+    config.TABLE_CACHE = cached
+    listener = table_cache.start() if cached else None
+    if cached and (listener is None or not listener.wait(10)):
+        raise RuntimeError("the table cache needs Postgres and a listener that connects within 10 seconds")
+    zombie_type_repository.select(id)
+    results.put("ready")
+    reads = 0
+    reading = 0
+    for expected in iter(commands.get, None):
+        start = time.perf_counter()
+        while zombie_type_repository.select(id).name != expected:
+            reads += 1
+        results.put(time.time())
+        reading += time.perf_counter() - start
+    results.put((reads / reading, table_cache.stats()))
+
+
+def measure(cached, args):
+    zombie_type = ZombieType("Walker")
+    zombie_type_repository.save(zombie_type)
+    context = multiprocessing.get_context("spawn")
+    commands = context.Queue()
+    results = context.Queue()
+    process = context.Process(target=reader, args=(zombie_type.id, cached, commands, results))
+    process.start()
+    results.get(timeout=30)
+    pauses = random.Random(0)
+    windows = []
+    try:
+        for n in range(args.writes):
+            name = f"Walker {n}"
+            commands.put(name)
+            # Let the reader settle into reading the old name from its cache
+            time.sleep(pauses.uniform(0, args.pause))
+            run_sql("UPDATE zombie_types SET name = %s WHERE id = %s", [name, zombie_type.id])
+            committed = time.time()
+            windows.append(max(results.get(timeout=30) - committed, 0))
+        commands.put(None)
+        reads_per_second, stats = results.get(timeout=30)
+    finally:
+        process.join(30)
+        zombie_type_repository.delete(zombie_type.id)
+    label = "cache on" if cached else "cache off"
+    report_latencies(f"{label} staleness", windows)
+    print(f"{label:<45} max {max(windows) * 1000:10.1f} ms   {reads_per_second:10.0f} reads/s")
+    if cached:
+        print(f"{label:<45} {stats['notifications']} notifications, lag max {stats['lag_max'] * 1000:.1f} ms from the UPDATE")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writes", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.01, help="longest wait in seconds before each write")
+    args = parser.parse_args()
+    for cached in (True, False):
+        measure(cached, args)
+
+
+if __name__ == '__main__':
+    main()
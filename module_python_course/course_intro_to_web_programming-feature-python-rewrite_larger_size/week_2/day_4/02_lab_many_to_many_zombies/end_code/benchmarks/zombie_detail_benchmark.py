@@ -0,0 +1,65 @@
+# Compares the zombie detail page's queries for a zombie with many victims:
+# select_victims_of_zombie then select (three round trips) against the single
+# json_agg query in select_with_victims.
+#
+# Run from the app folder against a scratch database, it empties all tables:
+#
+#   DATABASE_URL="dbname='zombies_bench'" python -m benchmarks.zombie_detail_benchmark --victims 10000
+
+import argparse
+import time
+
+from shared.benchmarks import count_queries, report_latencies
+from shared.db.run_sql import run_sql
+
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+
+def seed(victims):
+    run_sql("TRUNCATE bitings, zombies, humans, zombie_types RESTART IDENTITY CASCADE")
+    run_sql("INSERT INTO zombie_types (name) VALUES ('Walker')")
+    run_sql("INSERT INTO zombies (name, zombie_type_id) VALUES ('Pete', 1), ('Ed', 1)")
+    run_sql("INSERT INTO humans (name) SELECT 'Human ' || n FROM generate_series(1, %s) AS n", [victims])
+    # Every human bitten by Pete, one in ten of them twice, plus some noise from Ed
+    run_sql("INSERT INTO bitings (human_id, zombie_id) SELECT n, 1 FROM generate_series(1, %s) AS n", [victims])
+    run_sql("INSERT INTO bitings (human_id, zombie_id) SELECT n, 1 FROM generate_series(1, %s, 10) AS n", [victims])
+    run_sql("INSERT INTO bitings (human_id, zombie_id) SELECT n, 2 FROM generate_series(1, %s, 3) AS n", [victims])
+    run_sql("ANALYZE")
+
+
+def separate_queries():
+    victims = zombie_repository.select_victims_of_zombie(1)
+    zombie = zombie_repository.select(1)
+    return zombie, victims
+
+
+def single_query():
+    return zombie_repository.select_with_victims(1)
+
+
+def measure(label, function, repeat):
+    with count_queries(zombie_repository, zombie_type_repository) as counter:
+        function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    report_latencies(f"{label}, {counter['queries']} queries", timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--victims", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    seed(args.victims)
+    print(f"zombie with {args.victims} victims")
+    measure("select_victims_of_zombie + select", separate_queries, args.repeat)
+    measure("select_with_victims (json_agg)", single_query, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,12 @@
+import asyncio
+
 from flask import Blueprint, Flask, redirect, render_template, request
 
+from controllers.rendering import render_index
+from controllers.uploads import csv_import
+
 from models.biting import Biting
+import repositories.aio as aio
 import repositories.biting_repository as biting_repository
 import repositories.human_repository as human_repository
 import repositories.zombie_repository as zombie_repository
@@ -10,15 +16,16 @@ bitings_blueprint = Blueprint("bitings", __name__)
 # INDEX
 @bitings_blueprint.route("/bitings")
 def bitings():
-    bitings = biting_repository.select_all()
-    return render_template("bitings/index.html", bitings=bitings)
+    return render_index("bitings/index.html", "bitings", biting_repository)
 
 
 # NEW
 @bitings_blueprint.route("/bitings/new")
-def new_biting():
-    humans = human_repository.select_all()
-    zombies = zombie_repository.select_all()
+async def new_biting():
+    humans, zombies = await asyncio.gather(
+        aio.human_repository.select_all(),
+        aio.zombie_repository.select_all(),
+    )
     return render_template("bitings/new.html", humans=humans, zombies=zombies)
 
 
@@ -34,6 +41,13 @@ def create_biting():
     return redirect("/bitings")
 
 
+# IMPORT
+# curl -X POST -T bitings.csv -H "Content-Type: text/csv" localhost:5000/bitings/import
+@bitings_blueprint.route("/bitings/import", methods=["POST"])
+def import_bitings():
+    return csv_import(biting_repository.import_csv)
+
+
 # EDIT
 @bitings_blueprint.route("/bitings/<id>/edit")
 def edit_biting(id):
@@ -1,4 +1,7 @@
-from flask import Blueprint, Flask, redirect, render_template, request
+from flask import Blueprint, Flask, abort, redirect, render_template, request
+
+from controllers.rendering import render_index
+from controllers.uploads import csv_import
 
 from models.human import Human
 import repositories.human_repository as human_repository
@@ -8,8 +11,7 @@ humans_blueprint = Blueprint("humans", __name__)
 # INDEX
 @humans_blueprint.route("/humans")
 def humans():
-    humans = human_repository.select_all()
-    return render_template("humans/index.html", humans=humans)
+    return render_index("humans/index.html", "humans", human_repository)
 
 
 # NEW
@@ -27,6 +29,13 @@ def create_human():
     return redirect("/humans")
 
 
+# IMPORT
+# curl -X POST -T humans.csv -H "Content-Type: text/csv" localhost:5000/humans/import
+@humans_blueprint.route("/humans/import", methods=["POST"])
+def import_humans():
+    return csv_import(human_repository.import_csv)
+
+
 # EDIT
 @humans_blueprint.route("/humans/<id>/edit")
 def edit_human(id):
@@ -46,5 +55,7 @@ def update_human(id):
 # DELETE
 @humans_blueprint.route("/humans/<id>/delete", methods=["POST"])
 def delete_human(id):
+    if human_repository.has_bitings(id):
+        abort(409, "This human has been bitten. Delete their bitings first.")
     human_repository.delete(id)
     return redirect("/humans")
@@ -0,0 +1,35 @@
+from flask import Response, current_app, render_template, request, stream_template
+
+# Jinja yields many tiny strings; sending them in chunks of about this many
+# characters keeps the number of writes down without delaying the first byte
+# by more than a screenful of HTML.
+STREAM_CHUNK_SIZE = 8192
+
+
+def render_index(template, name, repository, **context):
+    # Routes listed in STREAMED_ROUTES render every row as it comes off a
+    # server-side cursor, so the first byte goes out before the query has
+    # finished. Every other route renders one buffered page at a time.
+    if request.endpoint in current_app.config.get("STREAMED_ROUTES", ()):
+        context[name] = repository.iterate_all()
+        chunks = stream_template(template, page=None, **context)
+        return Response(_buffered(chunks), mimetype="text/html")
+    after = request.args.get("after", type=int)
+    before = request.args.get("before", type=int)
+    page = repository.select_page(after, before)
+    context[name] = page.items
+    return render_template(template, page=page, **context)
+
+
+def _buffered(chunks):
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= STREAM_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
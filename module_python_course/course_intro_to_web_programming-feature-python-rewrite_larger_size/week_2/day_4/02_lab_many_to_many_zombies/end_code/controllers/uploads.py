@@ -0,0 +1,15 @@
+from flask import jsonify, request
+
+
+def csv_import(import_csv):
+    # Takes the CSV either as the request body with Content-Type: text/csv,
+    # which is read straight off the connection, or as a multipart form field
+    # called file, which Werkzeug spools to a temporary file on disk
+    if request.mimetype == "text/csv":
+        file = request.stream
+    elif "file" in request.files:
+        file = request.files["file"].stream
+    else:
+        return jsonify(error="send a CSV file as the request body or as a form field called file"), 400
+    summary = import_csv(file)
+    return jsonify(summary), 400 if "error" in summary else 200
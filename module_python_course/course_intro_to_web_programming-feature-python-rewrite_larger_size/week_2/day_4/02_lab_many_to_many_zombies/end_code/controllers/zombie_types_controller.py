@@ -1,4 +1,4 @@
-from flask import Blueprint, Flask, redirect, render_template, request
+from flask import Blueprint, Flask, abort, redirect, render_template, request
 
 from models.zombie_type import ZombieType
 import repositories.zombie_type_repository as zombie_type_repository
@@ -45,5 +45,7 @@ def update_zombie(id):
 # DELETE
 @zombie_types_blueprint.route("/zombietypes/<id>/delete", methods=["POST"])
 def delete_zombie(id):
+    if zombie_type_repository.has_zombies(id):
+        abort(409, "There are zombies of this type. Delete or change them first.")
     zombie_type_repository.delete(id)
     return redirect("/zombietypes")
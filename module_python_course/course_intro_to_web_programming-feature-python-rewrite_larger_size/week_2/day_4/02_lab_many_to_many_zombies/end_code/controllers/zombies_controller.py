@@ -1,6 +1,13 @@
-from flask import Blueprint, Flask, redirect, render_template, request
+import asyncio
+
+from flask import Blueprint, Flask, abort, redirect, render_template, request
+
+from controllers.rendering import render_index
+from controllers.uploads import csv_import
 
 from models.zombie import Zombie
+import repositories.aio as aio
+import repositories.leaderboard_repository as leaderboard_repository
 import repositories.zombie_repository as zombie_repository
 import repositories.zombie_type_repository as zombie_type_repository
 
@@ -9,15 +16,36 @@ zombies_blueprint = Blueprint("zombies", __name__)
 # INDEX
 @zombies_blueprint.route("/zombies")
 def zombies():
-    zombies = zombie_repository.select_all()
-    return render_template("zombies/index.html", zombies=zombies)
+    return render_index("zombies/index.html", "zombies", zombie_repository)
+
+
+# LEADERBOARD
+@zombies_blueprint.route("/zombies/leaderboard")
+def leaderboard():
+    zombie_type_id = request.args.get("zombie_type_id", type=int)
+    page = leaderboard_repository.select_page(
+        zombie_type_id,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
+    zombie_types = zombie_type_repository.select_all()
+    page_args = {"zombie_type_id": zombie_type_id} if zombie_type_id is not None else {}
+    return render_template(
+        "zombies/leaderboard.html",
+        entries=page.items,
+        page=page,
+        page_args=page_args,
+        zombie_type_id=zombie_type_id,
+        zombie_types=zombie_types,
+    )
 
 
 # SHOW
 @zombies_blueprint.route("/zombies/<id>")
 def show_zombie(id):
-    victims = zombie_repository.select_victims_of_zombie(id)
-    zombie = zombie_repository.select(id)
+    zombie, victims = zombie_repository.select_with_victims(id)
+    if zombie is None:
+        abort(404)
     return render_template("zombies/show.html", victims=victims, zombie=zombie)
 
 
@@ -39,11 +67,20 @@ def create_zombie():
     return redirect("/zombies")
 
 
+# IMPORT
+# curl -X POST -T zombies.csv -H "Content-Type: text/csv" localhost:5000/zombies/import
+@zombies_blueprint.route("/zombies/import", methods=["POST"])
+def import_zombies():
+    return csv_import(zombie_repository.import_csv)
+
+
 # EDIT
 @zombies_blueprint.route("/zombies/<id>/edit")
-def edit_zombie(id):
-    zombie = zombie_repository.select(id)
-    zombie_types = zombie_type_repository.select_all()
+async def edit_zombie(id):
+    zombie, zombie_types = await asyncio.gather(
+        aio.zombie_repository.select(id),
+        aio.zombie_type_repository.select_all(),
+    )
     return render_template('zombies/edit.html', zombie=zombie, zombie_types=zombie_types)
 
 
@@ -61,5 +98,7 @@ def update_zombie(id):
 # DELETE
 @zombies_blueprint.route("/zombies/<id>/delete", methods=["POST"])
 def delete_zombie(id):
+    if zombie_repository.has_bitings(id):
+        abort(409, "This zombie has bitten someone. Delete its bitings first.")
     zombie_repository.delete(id)
     return redirect("/zombies")
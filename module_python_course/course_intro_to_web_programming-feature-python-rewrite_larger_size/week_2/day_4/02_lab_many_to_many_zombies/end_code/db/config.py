@@ -0,0 +1,3 @@
+# This app's database: dbname='zombies' on Postgres, db/zombies.sqlite3 on
+# SQLite. Every other setting is in shared/db/config.py
+DATABASE_NAME = "zombies"
@@ -0,0 +1,11 @@
+-- Adds the join indexes from zombies.sql to an existing database without
+-- locking bitings against writes while they build:
+--
+--   psql -d zombies -f db/migrations/001_bitings_join_indexes.sql
+--
+-- CONCURRENTLY cannot run inside a transaction, so run it with psql as above
+-- rather than through run_sql. Safe to run more than once.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bitings_zombie_id_human_id_idx ON bitings (zombie_id, human_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bitings_human_id_zombie_id_idx ON bitings (human_id, zombie_id);
+ANALYZE bitings;
@@ -0,0 +1,92 @@
+-- Adds zombie_bite_counts and the triggers that keep it up to date (see
+-- zombies.sql) to an existing database, and fills it from bitings:
+--
+--   psql -d zombies -f db/migrations/002_zombie_bite_counts.sql
+--
+-- It all runs in one transaction holding a SHARE lock on bitings, which
+-- blocks writes but not reads, so no bite can land between the count and
+-- the triggers going live. Safe to run more than once; a second run
+-- recounts from scratch.
+
+BEGIN;
+
+LOCK TABLE bitings IN SHARE MODE;
+
+CREATE TABLE IF NOT EXISTS zombie_bite_counts (
+    zombie_id INT PRIMARY KEY REFERENCES zombies(id) ON DELETE CASCADE,
+    zombie_type_id INT,
+    bites INT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS zombie_bite_counts_bites_idx ON zombie_bite_counts (bites, zombie_id);
+CREATE INDEX IF NOT EXISTS zombie_bite_counts_zombie_type_id_bites_idx ON zombie_bite_counts (zombie_type_id, bites, zombie_id);
+
+-- Statement triggers see every row a statement changed at once, so a COPY or
+-- multi-row INSERT updates each zombie's count once rather than once a row.
+-- New counts are upserted in zombie_id order, so concurrent inserts lock
+-- the rows they share in the same order rather than deadlocking.
+CREATE OR REPLACE FUNCTION count_bites() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM zombie_bite_counts;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE zombie_bite_counts AS counts SET bites = counts.bites - removed.bites
+        FROM (
+            SELECT zombie_id, COUNT(*) AS bites FROM old_bitings GROUP BY zombie_id
+        ) AS removed
+        WHERE counts.zombie_id = removed.zombie_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO zombie_bite_counts (zombie_id, zombie_type_id, bites)
+        SELECT zombies.id, zombies.zombie_type_id, added.bites
+        FROM (
+            SELECT zombie_id, COUNT(*) AS bites FROM new_bitings GROUP BY zombie_id
+        ) AS added
+        INNER JOIN zombies ON zombies.id = added.zombie_id
+        ORDER BY zombies.id
+        ON CONFLICT (zombie_id) DO UPDATE SET bites = zombie_bite_counts.bites + EXCLUDED.bites;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bitings_count_inserted ON bitings;
+CREATE TRIGGER bitings_count_inserted AFTER INSERT ON bitings
+    REFERENCING NEW TABLE AS new_bitings
+    FOR EACH STATEMENT EXECUTE FUNCTION count_bites();
+DROP TRIGGER IF EXISTS bitings_count_deleted ON bitings;
+CREATE TRIGGER bitings_count_deleted AFTER DELETE ON bitings
+    REFERENCING OLD TABLE AS old_bitings
+    FOR EACH STATEMENT EXECUTE FUNCTION count_bites();
+DROP TRIGGER IF EXISTS bitings_count_updated ON bitings;
+CREATE TRIGGER bitings_count_updated AFTER UPDATE ON bitings
+    REFERENCING OLD TABLE AS old_bitings NEW TABLE AS new_bitings
+    FOR EACH STATEMENT EXECUTE FUNCTION count_bites();
+DROP TRIGGER IF EXISTS bitings_count_truncated ON bitings;
+CREATE TRIGGER bitings_count_truncated AFTER TRUNCATE ON bitings
+    FOR EACH STATEMENT EXECUTE FUNCTION count_bites();
+
+CREATE OR REPLACE FUNCTION copy_zombie_type() RETURNS trigger AS $$
+BEGIN
+    UPDATE zombie_bite_counts SET zombie_type_id = NEW.zombie_type_id WHERE zombie_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS zombies_copy_zombie_type ON zombies;
+CREATE TRIGGER zombies_copy_zombie_type AFTER UPDATE OF zombie_type_id ON zombies
+    FOR EACH ROW WHEN (OLD.zombie_type_id IS DISTINCT FROM NEW.zombie_type_id)
+    EXECUTE FUNCTION copy_zombie_type();
+
+DELETE FROM zombie_bite_counts;
+INSERT INTO zombie_bite_counts (zombie_id, zombie_type_id, bites)
+SELECT zombies.id, zombies.zombie_type_id, COUNT(*)
+FROM bitings
+INNER JOIN zombies ON zombies.id = bitings.zombie_id
+GROUP BY zombies.id;
+
+COMMIT;
+
+ANALYZE zombie_bite_counts;
@@ -0,0 +1,87 @@
+-- Adds the triggers that tell shared/db/table_cache.py in every worker
+-- process which zombie types, zombies and humans changed (see zombies.sql)
+-- to an existing database:
+--
+--   psql -d zombies -f db/migrations/003_notify_table_changes.sql
+--
+-- Creating a trigger only takes a brief SHARE ROW EXCLUSIVE lock on its table.
+-- Safe to run more than once.
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS zombie_types_notify_inserted ON zombie_types;
+DROP TRIGGER IF EXISTS zombie_types_notify_deleted ON zombie_types;
+DROP TRIGGER IF EXISTS zombie_types_notify_updated ON zombie_types;
+DROP TRIGGER IF EXISTS zombie_types_notify_truncated ON zombie_types;
+DROP TRIGGER IF EXISTS zombies_notify_inserted ON zombies;
+DROP TRIGGER IF EXISTS zombies_notify_deleted ON zombies;
+DROP TRIGGER IF EXISTS zombies_notify_updated ON zombies;
+DROP TRIGGER IF EXISTS zombies_notify_truncated ON zombies;
+DROP TRIGGER IF EXISTS humans_notify_inserted ON humans;
+DROP TRIGGER IF EXISTS humans_notify_deleted ON humans;
+DROP TRIGGER IF EXISTS humans_notify_updated ON humans;
+DROP TRIGGER IF EXISTS humans_notify_truncated ON humans;
+
+-- Tells every worker process which rows of its cached tables changed, see
+-- shared/db/table_cache.py. One notification per statement, sent when the
+-- transaction commits, with the ids it changed; a statement that changed
+-- too many to fit in a notification, or a TRUNCATE, sends * for all of them.
+CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+DECLARE
+    ids TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT string_agg(id::TEXT, ',') INTO ids FROM new_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT string_agg(id::TEXT, ',') INTO ids FROM (SELECT id FROM old_rows UNION SELECT id FROM new_rows) AS changed;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT string_agg(id::TEXT, ',') INTO ids FROM old_rows;
+    END IF;
+    IF ids IS NULL AND TG_OP <> 'TRUNCATE' THEN
+        RETURN NULL;
+    END IF;
+    IF ids IS NULL OR length(ids) > 7000 THEN
+        ids := '*';
+    END IF;
+    PERFORM pg_notify('table_changes', TG_TABLE_NAME || ':' || extract(epoch FROM clock_timestamp()) || ':' || ids);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER zombie_types_notify_inserted AFTER INSERT ON zombie_types
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombie_types_notify_deleted AFTER DELETE ON zombie_types
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombie_types_notify_updated AFTER UPDATE ON zombie_types
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombie_types_notify_truncated AFTER TRUNCATE ON zombie_types
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
+CREATE TRIGGER zombies_notify_inserted AFTER INSERT ON zombies
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombies_notify_deleted AFTER DELETE ON zombies
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombies_notify_updated AFTER UPDATE ON zombies
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombies_notify_truncated AFTER TRUNCATE ON zombies
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
+CREATE TRIGGER humans_notify_inserted AFTER INSERT ON humans
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER humans_notify_deleted AFTER DELETE ON humans
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER humans_notify_updated AFTER UPDATE ON humans
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER humans_notify_truncated AFTER TRUNCATE ON humans
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
+COMMIT;
@@ -1,3 +1,4 @@
+DROP TABLE IF EXISTS zombie_bite_counts;
 DROP TABLE IF EXISTS bitings;
 DROP TABLE IF EXISTS humans;
 DROP TABLE IF EXISTS zombies;
@@ -24,3 +25,137 @@ CREATE TABLE bitings (
     zombie_id SERIAL REFERENCES zombies(id),
     human_id SERIAL REFERENCES humans(id)
 );
+
+-- One index for each direction of the join, zombie to victims and human to zombies
+CREATE INDEX bitings_zombie_id_human_id_idx ON bitings (zombie_id, human_id);
+CREATE INDEX bitings_human_id_zombie_id_idx ON bitings (human_id, zombie_id);
+
+-- How many times each zombie has bitten, kept up to date by the triggers
+-- below so the leaderboard never has to count bitings. zombie_type_id is
+-- copied from zombies so a leaderboard for one type is a single index range.
+CREATE TABLE zombie_bite_counts (
+    zombie_id INT PRIMARY KEY REFERENCES zombies(id) ON DELETE CASCADE,
+    zombie_type_id INT,
+    bites INT NOT NULL
+);
+
+CREATE INDEX zombie_bite_counts_bites_idx ON zombie_bite_counts (bites, zombie_id);
+CREATE INDEX zombie_bite_counts_zombie_type_id_bites_idx ON zombie_bite_counts (zombie_type_id, bites, zombie_id);
+
+-- postgres only
+-- Statement triggers see every row a statement changed at once, so a COPY or
+-- multi-row INSERT updates each zombie's count once rather than once a row.
+-- New counts are upserted in zombie_id order, so concurrent inserts lock
+-- the rows they share in the same order rather than deadlocking.
+CREATE OR REPLACE FUNCTION count_bites() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM zombie_bite_counts;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE zombie_bite_counts AS counts SET bites = counts.bites - removed.bites
+        FROM (
+            SELECT zombie_id, COUNT(*) AS bites FROM old_bitings GROUP BY zombie_id
+        ) AS removed
+        WHERE counts.zombie_id = removed.zombie_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO zombie_bite_counts (zombie_id, zombie_type_id, bites)
+        SELECT zombies.id, zombies.zombie_type_id, added.bites
+        FROM (
+            SELECT zombie_id, COUNT(*) AS bites FROM new_bitings GROUP BY zombie_id
+        ) AS added
+        INNER JOIN zombies ON zombies.id = added.zombie_id
+        ORDER BY zombies.id
+        ON CONFLICT (zombie_id) DO UPDATE SET bites = zombie_bite_counts.bites + EXCLUDED.bites;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bitings_count_inserted AFTER INSERT ON bitings
+    REFERENCING NEW TABLE AS new_bitings
+    FOR EACH STATEMENT EXECUTE FUNCTION count_bites();
+CREATE TRIGGER bitings_count_deleted AFTER DELETE ON bitings
+    REFERENCING OLD TABLE AS old_bitings
+    FOR EACH STATEMENT EXECUTE FUNCTION count_bites();
+CREATE TRIGGER bitings_count_updated AFTER UPDATE ON bitings
+    REFERENCING OLD TABLE AS old_bitings NEW TABLE AS new_bitings
+    FOR EACH STATEMENT EXECUTE FUNCTION count_bites();
+CREATE TRIGGER bitings_count_truncated AFTER TRUNCATE ON bitings
+    FOR EACH STATEMENT EXECUTE FUNCTION count_bites();
+
+CREATE OR REPLACE FUNCTION copy_zombie_type() RETURNS trigger AS $$
+BEGIN
+    UPDATE zombie_bite_counts SET zombie_type_id = NEW.zombie_type_id WHERE zombie_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER zombies_copy_zombie_type AFTER UPDATE OF zombie_type_id ON zombies
+    FOR EACH ROW WHEN (OLD.zombie_type_id IS DISTINCT FROM NEW.zombie_type_id)
+    EXECUTE FUNCTION copy_zombie_type();
+
+-- Tells every worker process which rows of its cached tables changed, see
+-- shared/db/table_cache.py. One notification per statement, sent when the
+-- transaction commits, with the ids it changed; a statement that changed
+-- too many to fit in a notification, or a TRUNCATE, sends * for all of them.
+CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+DECLARE
+    ids TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT string_agg(id::TEXT, ',') INTO ids FROM new_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT string_agg(id::TEXT, ',') INTO ids FROM (SELECT id FROM old_rows UNION SELECT id FROM new_rows) AS changed;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT string_agg(id::TEXT, ',') INTO ids FROM old_rows;
+    END IF;
+    IF ids IS NULL AND TG_OP <> 'TRUNCATE' THEN
+        RETURN NULL;
+    END IF;
+    IF ids IS NULL OR length(ids) > 7000 THEN
+        ids := '*';
+    END IF;
+    PERFORM pg_notify('table_changes', TG_TABLE_NAME || ':' || extract(epoch FROM clock_timestamp()) || ':' || ids);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER zombie_types_notify_inserted AFTER INSERT ON zombie_types
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombie_types_notify_deleted AFTER DELETE ON zombie_types
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombie_types_notify_updated AFTER UPDATE ON zombie_types
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombie_types_notify_truncated AFTER TRUNCATE ON zombie_types
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
+CREATE TRIGGER zombies_notify_inserted AFTER INSERT ON zombies
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombies_notify_deleted AFTER DELETE ON zombies
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombies_notify_updated AFTER UPDATE ON zombies
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER zombies_notify_truncated AFTER TRUNCATE ON zombies
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+
+CREATE TRIGGER humans_notify_inserted AFTER INSERT ON humans
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER humans_notify_deleted AFTER DELETE ON humans
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER humans_notify_updated AFTER UPDATE ON humans
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+CREATE TRIGGER humans_notify_truncated AFTER TRUNCATE ON humans
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change();
+-- end postgres only
@@ -0,0 +1,29 @@
+-- The zombie_bite_counts triggers from zombies.sql for the SQLite backend,
+-- run by "python -m shared.db.sqlite_backend db/zombies.sql" after that file.
+-- SQLite only has row triggers, so each bite is counted as it is written.
+
+CREATE TRIGGER bitings_count_inserted AFTER INSERT ON bitings
+BEGIN
+    INSERT INTO zombie_bite_counts (zombie_id, zombie_type_id, bites)
+    SELECT id, zombie_type_id, 1 FROM zombies WHERE id = NEW.zombie_id
+    ON CONFLICT (zombie_id) DO UPDATE SET bites = bites + 1;
+END;
+
+CREATE TRIGGER bitings_count_deleted AFTER DELETE ON bitings
+BEGIN
+    UPDATE zombie_bite_counts SET bites = bites - 1 WHERE zombie_id = OLD.zombie_id;
+END;
+
+CREATE TRIGGER bitings_count_updated AFTER UPDATE OF zombie_id ON bitings
+BEGIN
+    UPDATE zombie_bite_counts SET bites = bites - 1 WHERE zombie_id = OLD.zombie_id;
+    INSERT INTO zombie_bite_counts (zombie_id, zombie_type_id, bites)
+    SELECT id, zombie_type_id, 1 FROM zombies WHERE id = NEW.zombie_id
+    ON CONFLICT (zombie_id) DO UPDATE SET bites = bites + 1;
+END;
+
+CREATE TRIGGER zombies_copy_zombie_type AFTER UPDATE OF zombie_type_id ON zombies
+WHEN OLD.zombie_type_id IS NOT NEW.zombie_type_id
+BEGIN
+    UPDATE zombie_bite_counts SET zombie_type_id = NEW.zombie_type_id WHERE zombie_id = NEW.id;
+END;
@@ -0,0 +1,33 @@
+# Settings for serving the app in production with gunicorn (pip3 install gunicorn):
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# app.run() in app.py is the single-process development server; don't deploy it.
+# WEB_WORKERS, WEB_THREADS and BIND override the defaults below.
+
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "127.0.0.1:8000")
+
+# One process per core, each serving requests on a few threads. Threads
+# mostly wait on Postgres, so they share a core well.
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_class = "gthread"
+
+# Import wsgi.py (the app, its blueprints and compiled templates) once in the
+# master and fork the workers from it, rather than each worker starting cold
+preload_app = True
+
+
+def post_worker_init(worker):
+    # Every worker builds its own pool after the fork; open a connection per
+    # thread now instead of during its first requests
+    from shared.db.connection_pool import get_pool
+
+    try:
+        opened = get_pool().warm(threads)
+        worker.log.info("worker %s warmed %s database connections", worker.pid, opened)
+    except Exception as error:
+        worker.log.warning("worker %s could not warm its database pool: %s", worker.pid, error)
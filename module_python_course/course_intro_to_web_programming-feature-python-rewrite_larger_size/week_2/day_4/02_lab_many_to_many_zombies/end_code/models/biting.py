@@ -1,4 +1,6 @@
 class Biting:
+    __slots__ = ("human", "zombie", "id")
+
     def __init__(self, human, zombie, id=None):
         self.human = human
         self.zombie = zombie
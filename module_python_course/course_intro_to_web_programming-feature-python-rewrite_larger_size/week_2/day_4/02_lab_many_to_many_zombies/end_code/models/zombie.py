@@ -1,4 +1,6 @@
 class Zombie:
+    __slots__ = ("name", "zombie_type", "id")
+
     def __init__(self, name, zombie_type, id=None):
         self.name = name
         self.zombie_type = zombie_type
@@ -1,4 +1,6 @@
 class ZombieType:
+    __slots__ = ("name", "id")
+
     def __init__(self, name, id=None):
         self.name = name
         self.id = id
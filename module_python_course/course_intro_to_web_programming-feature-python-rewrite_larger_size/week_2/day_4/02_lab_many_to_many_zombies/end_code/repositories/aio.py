@@ -0,0 +1,34 @@
+import asyncio
+
+import repositories.biting_repository
+import repositories.human_repository
+import repositories.zombie_repository
+import repositories.zombie_type_repository
+
+# Awaitable versions of the repositories, for async views that need several
+# independent queries: asyncio.gather them and they run at the same time.
+#
+# psycopg2 blocks while a query runs (but lets go of the GIL), so each call
+# runs the ordinary repository function on a worker thread with its own
+# pooled connection. The thread gets a copy of the request context, so the
+# identity map on flask.g still works. Async views need: pip3 install "flask[async]"
+
+
+class AsyncRepository:
+
+    def __init__(self, repository):
+        self._repository = repository
+
+    def __getattr__(self, name):
+        function = getattr(self._repository, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(function, *args, **kwargs)
+
+        return call
+
+
+biting_repository = AsyncRepository(repositories.biting_repository)
+human_repository = AsyncRepository(repositories.human_repository)
+zombie_repository = AsyncRepository(repositories.zombie_repository)
+zombie_type_repository = AsyncRepository(repositories.zombie_type_repository)
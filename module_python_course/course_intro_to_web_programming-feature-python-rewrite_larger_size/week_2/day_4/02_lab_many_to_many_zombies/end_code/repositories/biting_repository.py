@@ -1,52 +1,150 @@
-from db.run_sql import run_sql
+import shared.db.bulk as bulk
+from shared.db.run_sql import run_sql, stream_sql
+import shared.pagination as pagination
+
 from models.biting import Biting
 from models.human import Human
 import repositories.human_repository as human_repository
+import repositories.identity_map as identity_map
 from models.zombie import Zombie
 import repositories.zombie_repository as zombie_repository
 
+SELECT_BITINGS = """
+    SELECT bitings.id,
+           humans.id AS human_id, humans.name AS human_name,
+           zombies.id AS zombie_id, zombies.name AS zombie_name,
+           zombie_types.id AS zombie_type_id, zombie_types.name AS zombie_type_name
+    FROM bitings
+    INNER JOIN humans ON humans.id = bitings.human_id
+    INNER JOIN zombies ON zombies.id = bitings.zombie_id
+    LEFT JOIN zombie_types ON zombie_types.id = zombies.zombie_type_id
+"""
+
+# The same in the order biting_from_tuple reads them
+SELECT_BITING_TUPLES = """
+    SELECT bitings.id, humans.name, humans.id,
+           zombies.name, zombies.id, zombie_types.name, zombie_types.id
+    FROM bitings
+    INNER JOIN humans ON humans.id = bitings.human_id
+    INNER JOIN zombies ON zombies.id = bitings.zombie_id
+    LEFT JOIN zombie_types ON zombie_types.id = zombies.zombie_type_id
+"""
+
 def save(biting):
     sql = "INSERT INTO bitings (human_id, zombie_id) VALUES (%s, %s) RETURNING id"
     values = [biting.human.id, biting.zombie.id]
     results = run_sql(sql, values)
     id = results[0]['id']
     biting.id = id
+    identity_map.add("bitings", biting)
+
+
+def save_many(bitings):
+    values = [[biting.human.id, biting.zombie.id] for biting in bitings]
+    ids = bulk.insert_many("bitings", ["human_id", "zombie_id"], values)
+    for biting, id in zip(bitings, ids):
+        biting.id = id
+        identity_map.add("bitings", biting)
+
+
+def import_csv(file):
+    return bulk.import_csv("bitings", {"human_id": "humans", "zombie_id": "zombies"}, file)
 
 
 def select_all():
+    sql = SELECT_BITING_TUPLES + " ORDER BY bitings.id"
+    humans = {}
+    zombies = {}
+    zombie_types = {}
+    return [biting_from_tuple(row, humans, zombies, zombie_types) for row in run_sql(sql, tuples=True)]
+
+
+def select_page(after=None, before=None, limit=pagination.PAGE_SIZE):
+    where, order, values = pagination.keyset("bitings.id", after, before, limit)
+    sql = f"{SELECT_BITINGS} {where} ORDER BY bitings.id {order} LIMIT %s"
+    results = run_sql(sql, values)
+    return pagination.page(bitings_from_rows(results), after, before, limit)
+
+
+def iterate_all(batch_size=2000):
+    sql = SELECT_BITING_TUPLES + " ORDER BY bitings.id"
+    # Only zombie types are shared while streaming; keeping every human and
+    # zombie around would grow with the table
+    zombie_types = {}
+    for row in stream_sql(sql, batch_size=batch_size, tuples=True):
+        yield biting_from_tuple(row, {}, {}, zombie_types)
+
+
+def bitings_from_rows(results):
+    # Rows repeat the same humans and zombies, so build each one only once
     bitings = []
-    sql = "SELECT * FROM bitings"
-    results = run_sql(sql)
+    humans = {}
+    zombies = {}
+    zombie_types = {}
     for result in results:
-        human = human_repository.select(result["human_id"])
-        zombie = zombie_repository.select(result["zombie_id"])
-        biting = Biting(human, zombie, result["id"])
+        biting = biting_from_row(result, humans, zombies, zombie_types)
         bitings.append(biting)
     return bitings
 
 
+def biting_from_row(row, humans, zombies, zombie_types):
+    human = humans.get(row["human_id"])
+    if human is None:
+        human = Human(row["human_name"], row["human_id"])
+        humans[human.id] = human
+    zombie = zombies.get(row["zombie_id"])
+    if zombie is None:
+        zombie_type = zombie_repository.zombie_type_from_row(row, zombie_types)
+        zombie = Zombie(row["zombie_name"], zombie_type, row["zombie_id"])
+        zombies[zombie.id] = zombie
+    return Biting(human, zombie, row["id"])
+
+
+def biting_from_tuple(row, humans, zombies, zombie_types):
+    id, human_name, human_id, zombie_name, zombie_id, zombie_type_name, zombie_type_id = row
+    human = humans.get(human_id)
+    if human is None:
+        human = humans[human_id] = Human(human_name, human_id)
+    zombie = zombies.get(zombie_id)
+    if zombie is None:
+        zombie_type = zombie_repository.shared_zombie_type(zombie_type_name, zombie_type_id, zombie_types)
+        zombie = zombies[zombie_id] = Zombie(zombie_name, zombie_type, zombie_id)
+    return Biting(human, zombie, id)
+
+
 def select(id):
+    biting = identity_map.get("bitings", id)
+    if biting is not None:
+        return biting
     sql = "SELECT * FROM bitings WHERE id = %s"
     values = [id]
     result = run_sql(sql, values)[0]
     human = human_repository.select(result["human_id"])
     zombie = zombie_repository.select(result["zombie_id"])
     biting = Biting(human, zombie, result["id"])
-    return biting
+    return identity_map.add("bitings", biting)
 
 
 def delete_all():
     sql = "DELETE FROM bitings"
     run_sql(sql)
+    identity_map.evict("bitings")
 
 
 def delete(id):
     sql = "DELETE FROM bitings WHERE id = %s"
     values = [id]
     run_sql(sql, values)
+    identity_map.evict("bitings", id)
+
+
+def delete_many(ids):
+    bulk.delete_many("bitings", ids)
+    identity_map.evict("bitings")
 
 
 def update(biting):
     sql = "UPDATE bitings SET (human_id, zombie_id) = (%s, %s) WHERE id = %s"
     values = [biting.human.id, biting.zombie.id, biting.id]
     run_sql(sql, values)
+    identity_map.evict("bitings", biting.id)
@@ -1,5 +1,13 @@
-from db.run_sql import run_sql
+import shared.db.bulk as bulk
+from shared.db.run_sql import run_sql, stream_sql
+import shared.db.table_cache as table_cache
+import shared.pagination as pagination
+
 from models.human import Human
+import repositories.identity_map as identity_map
+
+# Columns in Human's argument order, for reading whole tables as tuples
+SELECT_HUMAN_TUPLES = "SELECT name, id FROM humans"
 
 def save(human):
     sql = "INSERT INTO humans (name) VALUES (%s) RETURNING id"
@@ -7,38 +15,100 @@ def save(human):
     results = run_sql(sql, values)
     id = results[0]['id']
     human.id = id
+    identity_map.add("humans", human)
+    table_cache.evict("humans", [id])
+
+
+def save_many(humans):
+    values = [[human.name] for human in humans]
+    ids = bulk.insert_many("humans", ["name"], values)
+    for human, id in zip(humans, ids):
+        human.id = id
+        identity_map.add("humans", human)
+    table_cache.evict("humans", ids)
+
+
+def import_csv(file):
+    imported = bulk.import_csv("humans", {"name": None}, file)
+    table_cache.evict("humans")
+    return imported
 
 
 def select_all():
+    # A copy of the list, since the cached one is shared by every thread
+    return list(table_cache.fetch("humans", table_cache.ALL, _select_all))
+
+
+def _select_all():
+    return [Human(*row) for row in run_sql(SELECT_HUMAN_TUPLES, tuples=True)]
+
+
+def select_page(after=None, before=None, limit=pagination.PAGE_SIZE):
     humans = []
-    sql = "SELECT * FROM humans"
-    results = run_sql(sql)
+    where, order, values = pagination.keyset("id", after, before, limit)
+    sql = f"SELECT * FROM humans {where} ORDER BY id {order} LIMIT %s"
+    results = run_sql(sql, values)
     for result in results:
         human = Human(result["name"], result["id"])
         humans.append(human)
-    return humans
+    return pagination.page(humans, after, before, limit)
+
+
+def iterate_all(batch_size=2000):
+    sql = SELECT_HUMAN_TUPLES + " ORDER BY id"
+    for row in stream_sql(sql, batch_size=batch_size, tuples=True):
+        yield Human(*row)
 
 
 def select(id):
+    human = identity_map.get("humans", id)
+    if human is not None:
+        return human
+    human = table_cache.fetch("humans", id, lambda: _select(id))
+    return identity_map.add("humans", human)
+
+
+def _select(id):
     sql = "SELECT * FROM humans WHERE id = %s"
     values = [id]
     result = run_sql(sql, values)[0]
-    human = Human(result["name"], result["id"])
-    return human
+    return Human(result["name"], result["id"])
 
 
 def delete_all():
     sql = "DELETE FROM humans"
     run_sql(sql)
+    _evict(None)
 
 
 def delete(id):
     sql = "DELETE FROM humans WHERE id = %s"
     values = [id]
     run_sql(sql, values)
+    _evict(id)
+
+
+# The foreign key on bitings.human_id refuses to delete a row they still name
+def has_bitings(id):
+    sql = "SELECT 1 FROM bitings WHERE human_id = %s LIMIT 1"
+    values = [id]
+    return len(run_sql(sql, values)) > 0
+
+
+def delete_many(ids):
+    bulk.delete_many("humans", ids)
+    _evict(None)
 
 
 def update(human):
     sql = "UPDATE humans SET name = %s WHERE id = %s"
     values = [human.name, human.id]
     run_sql(sql, values)
+    _evict(human.id)
+
+
+# Cached bitings hold on to the human they were loaded with
+def _evict(id):
+    table_cache.evict("humans", None if id is None else [id])
+    identity_map.evict("humans", id)
+    identity_map.evict("bitings")
@@ -0,0 +1,66 @@
+import threading
+
+from flask import g, has_request_context, request
+
+# Entities loaded during a request are kept on flask.g, so they are dropped
+# when the request ends. Outside a request (console.py, scripts) nothing is
+# cached and every select goes to the database.
+
+_route_stats = {}
+_route_stats_lock = threading.Lock()
+
+
+def get(table, id):
+    if not has_request_context():
+        return None
+    entity = _entities().get((table, _normalise(id)))
+    _count("hits" if entity is not None else "misses")
+    return entity
+
+
+def add(table, entity):
+    if has_request_context() and entity.id is not None:
+        _entities()[(table, _normalise(entity.id))] = entity
+    return entity
+
+
+def evict(table, id=None):
+    if not has_request_context():
+        return
+    entities = _entities()
+    if id is not None:
+        entities.pop((table, _normalise(id)), None)
+        return
+    for key in [key for key in entities if key[0] == table]:
+        del entities[key]
+
+
+def stats():
+    with _route_stats_lock:
+        return {route: dict(counts) for route, counts in _route_stats.items()}
+
+
+def reset_stats():
+    with _route_stats_lock:
+        _route_stats.clear()
+
+
+def _entities():
+    if "identity_map" not in g:
+        g.identity_map = {}
+    return g.identity_map
+
+
+def _normalise(id):
+    # Ids arrive as strings from URLs and forms but as ints from the database
+    try:
+        return int(id)
+    except (TypeError, ValueError):
+        return id
+
+
+def _count(outcome):
+    route = request.endpoint or request.path
+    with _route_stats_lock:
+        counts = _route_stats.setdefault(route, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
@@ -0,0 +1,132 @@
+import argparse
+
+import shared.db.config as config
+from shared.db.run_sql import run_sql
+import shared.db.unit_of_work as unit_of_work
+import shared.pagination as pagination
+
+import repositories.zombie_repository as zombie_repository
+
+# The leaderboard reads zombie_bite_counts, which triggers on bitings keep
+# up to date (see db/zombies.sql), so a page costs an index range scan of
+# limit + 1 rows however many bites there are. Entries are (zombie, bites)
+# pairs, most bites first, ties broken by the newest zombie first.
+#
+# Cursors are "bites-zombie_id" strings, e.g. "12-345".
+
+SELECT_ENTRIES = """
+    SELECT counts.bites, zombies.name, zombies.id, zombie_types.name, zombie_types.id
+    FROM zombie_bite_counts AS counts
+    INNER JOIN zombies ON zombies.id = counts.zombie_id
+    LEFT JOIN zombie_types ON zombie_types.id = zombies.zombie_type_id
+"""
+
+# Every zombie whose stored count differs from a count of bitings
+SELECT_MISCOUNTS = """
+    SELECT COALESCE(counts.zombie_id, actual.zombie_id), COALESCE(counts.bites, 0), COALESCE(actual.bites, 0)
+    FROM zombie_bite_counts AS counts
+    FULL OUTER JOIN (
+        SELECT zombie_id, COUNT(*) AS bites FROM bitings GROUP BY zombie_id
+    ) AS actual ON actual.zombie_id = counts.zombie_id
+    WHERE COALESCE(counts.bites, 0) <> COALESCE(actual.bites, 0)
+    ORDER BY 1
+"""
+
+SELECT_MISTYPED = """
+    SELECT counts.zombie_id
+    FROM zombie_bite_counts AS counts
+    INNER JOIN zombies ON zombies.id = counts.zombie_id
+    WHERE counts.zombie_type_id IS DISTINCT FROM zombies.zombie_type_id
+    ORDER BY 1
+"""
+
+
+def select_page(zombie_type_id=None, after=None, before=None, limit=pagination.PAGE_SIZE):
+    after = parse_cursor(after)
+    before = parse_cursor(before)
+    conditions = ["counts.bites > 0"]
+    values = []
+    if zombie_type_id is not None:
+        conditions.append("counts.zombie_type_id = %s")
+        values.append(zombie_type_id)
+    order = "DESC"
+    if before is not None:
+        conditions.append("(counts.bites, counts.zombie_id) > (%s, %s)")
+        values.extend(before)
+        order = "ASC"
+    elif after is not None:
+        conditions.append("(counts.bites, counts.zombie_id) < (%s, %s)")
+        values.extend(after)
+    values.append(limit + 1)
+    sql = f"""{SELECT_ENTRIES}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY counts.bites {order}, counts.zombie_id {order}
+        LIMIT %s
+    """
+    zombie_types = {}
+    entries = []
+    for bites, *zombie in run_sql(sql, values, tuples=True):
+        entries.append((zombie_repository.zombie_from_tuple(zombie, zombie_types), bites))
+    return pagination.page(entries, after, before, limit, key=format_cursor)
+
+
+def format_cursor(entry):
+    zombie, bites = entry
+    return f"{bites}-{zombie.id}"
+
+
+def parse_cursor(cursor):
+    # A bad cursor from a hand-edited URL just means the first page
+    if cursor is None:
+        return None
+    bites, _, zombie_id = str(cursor).partition("-")
+    if not (bites.isdigit() and zombie_id.isdigit()):
+        return None
+    return int(bites), int(zombie_id)
+
+
+def check():
+    # Recounts every zombie's bites from bitings and returns a list of
+    # (zombie_id, stored, actual) for each count the triggers got wrong,
+    # plus (zombie_id, None, None) for a zombie type that was not copied
+    miscounts = [tuple(row) for row in run_sql(SELECT_MISCOUNTS, tuples=True)]
+    mistyped = [(row[0], None, None) for row in run_sql(SELECT_MISTYPED, tuples=True)]
+    return miscounts + mistyped
+
+
+def rebuild():
+    # In one transaction, with bitings locked against writes on Postgres
+    # (SQLite only ever has one writer), so no bite is missed or counted twice
+    with unit_of_work.transaction():
+        if config.DATABASE_BACKEND == "postgres":
+            run_sql("LOCK TABLE bitings IN SHARE MODE")
+        run_sql("DELETE FROM zombie_bite_counts")
+        run_sql("""
+            INSERT INTO zombie_bite_counts (zombie_id, zombie_type_id, bites)
+            SELECT zombies.id, zombies.zombie_type_id, COUNT(*)
+            FROM bitings
+            INNER JOIN zombies ON zombies.id = bitings.zombie_id
+            GROUP BY zombies.id
+        """)
+
+
+def main():
+    # python -m repositories.leaderboard_repository [--rebuild]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="recount from bitings if the check fails")
+    args = parser.parse_args()
+    problems = check()
+    for zombie_id, stored, actual in problems:
+        if stored is None:
+            print(f"zombie {zombie_id}: stored zombie type is out of date")
+        else:
+            print(f"zombie {zombie_id}: stored {stored} bites, bitings has {actual}")
+    if not problems:
+        print("zombie_bite_counts matches bitings")
+    elif args.rebuild:
+        rebuild()
+        print("rebuilt zombie_bite_counts from bitings")
+
+
+if __name__ == '__main__':
+    main()
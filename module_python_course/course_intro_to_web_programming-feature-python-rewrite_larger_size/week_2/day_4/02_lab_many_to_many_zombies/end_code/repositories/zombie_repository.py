@@ -1,52 +1,221 @@
-from db.run_sql import run_sql
+import json
+
+import shared.db.bulk as bulk
+import shared.db.config as config
+from shared.db.run_sql import run_sql, stream_sql
+import shared.db.table_cache as table_cache
+import shared.pagination as pagination
+
 from models.human import Human
 from models.zombie import Zombie
 from models.zombie_type import ZombieType
+import repositories.identity_map as identity_map
 import repositories.zombie_type_repository as zombie_type_repository
 
+SELECT_ZOMBIES = """
+    SELECT zombies.*, zombie_types.name AS zombie_type_name
+    FROM zombies
+    LEFT JOIN zombie_types ON zombie_types.id = zombies.zombie_type_id
+"""
+
+# The same in the order zombie_from_tuple reads them
+SELECT_ZOMBIE_TUPLES = """
+    SELECT zombies.name, zombies.id, zombie_types.name, zombie_types.id
+    FROM zombies
+    LEFT JOIN zombie_types ON zombie_types.id = zombies.zombie_type_id
+"""
+
+# The zombie, its type and every human it has bitten, with how many times,
+# as a JSON array in one row
+SELECT_ZOMBIE_WITH_VICTIMS = """
+    SELECT zombies.*, zombie_types.name AS zombie_type_name,
+           COALESCE((
+               SELECT json_agg(victims ORDER BY victims.id)
+               FROM (
+                   SELECT humans.id, humans.name, COUNT(*) AS bites
+                   FROM bitings
+                   INNER JOIN humans ON humans.id = bitings.human_id
+                   WHERE bitings.zombie_id = zombies.id
+                   GROUP BY humans.id
+               ) AS victims
+           ), '[]'::json) AS victims
+    FROM zombies
+    LEFT JOIN zombie_types ON zombie_types.id = zombies.zombie_type_id
+    WHERE zombies.id = %s
+"""
+
+# SQLite has no json_agg, it builds the same array as text
+SELECT_ZOMBIE_WITH_VICTIMS_SQLITE = """
+    SELECT zombies.*, zombie_types.name AS zombie_type_name,
+           (
+               SELECT json_group_array(json_object('id', victims.id, 'name', victims.name, 'bites', victims.bites))
+               FROM (
+                   SELECT humans.id, humans.name, COUNT(*) AS bites
+                   FROM bitings
+                   INNER JOIN humans ON humans.id = bitings.human_id
+                   WHERE bitings.zombie_id = zombies.id
+                   GROUP BY humans.id
+                   ORDER BY humans.id
+               ) AS victims
+           ) AS victims
+    FROM zombies
+    LEFT JOIN zombie_types ON zombie_types.id = zombies.zombie_type_id
+    WHERE zombies.id = %s
+"""
+
+# Cached zombies hold on to their zombie type
+table_cache.depends_on("zombies", "zombie_types")
+
 def save(zombie):
     sql = "INSERT INTO zombies (name, zombie_type_id) VALUES (%s, %s) RETURNING id"
     values = [zombie.name, zombie.zombie_type.id]
     results = run_sql(sql, values)
     id = results[0]['id']
     zombie.id = id
+    identity_map.add("zombies", zombie)
+    table_cache.evict("zombies", [id])
+
+
+def save_many(zombies):
+    values = [[zombie.name, zombie.zombie_type.id] for zombie in zombies]
+    ids = bulk.insert_many("zombies", ["name", "zombie_type_id"], values)
+    for zombie, id in zip(zombies, ids):
+        zombie.id = id
+        identity_map.add("zombies", zombie)
+    table_cache.evict("zombies", ids)
+
+
+def import_csv(file):
+    imported = bulk.import_csv("zombies", {"name": None, "zombie_type_id": "zombie_types"}, file)
+    table_cache.evict("zombies")
+    return imported
 
 
 def select_all():
+    # A copy of the list, since the cached one is shared by every thread
+    return list(table_cache.fetch("zombies", table_cache.ALL, _select_all))
+
+
+def _select_all():
+    sql = SELECT_ZOMBIE_TUPLES + " ORDER BY zombies.id"
+    zombie_types = {}
+    return [zombie_from_tuple(row, zombie_types) for row in run_sql(sql, tuples=True)]
+
+
+def select_page(after=None, before=None, limit=pagination.PAGE_SIZE):
     zombies = []
-    sql = "SELECT * FROM zombies"
-    results = run_sql(sql)
+    where, order, values = pagination.keyset("zombies.id", after, before, limit)
+    sql = f"{SELECT_ZOMBIES} {where} ORDER BY zombies.id {order} LIMIT %s"
+    results = run_sql(sql, values)
+    zombie_types = {}
     for result in results:
-        zombie_type = zombie_type_repository.select(result["zombie_type_id"])
-        zombie = Zombie(result["name"], zombie_type, result["id"])
+        zombie = zombie_from_row(result, zombie_types)
         zombies.append(zombie)
-    return zombies
+    return pagination.page(zombies, after, before, limit)
+
+
+def iterate_all(batch_size=2000):
+    sql = SELECT_ZOMBIE_TUPLES + " ORDER BY zombies.id"
+    zombie_types = {}
+    for row in stream_sql(sql, batch_size=batch_size, tuples=True):
+        yield zombie_from_tuple(row, zombie_types)
+
+
+def zombie_from_row(row, zombie_types):
+    zombie_type = zombie_type_from_row(row, zombie_types)
+    return Zombie(row["name"], zombie_type, row["id"])
+
+
+def zombie_from_tuple(row, zombie_types):
+    name, id, zombie_type_name, zombie_type_id = row
+    return Zombie(name, shared_zombie_type(zombie_type_name, zombie_type_id, zombie_types), id)
+
+
+def shared_zombie_type(name, id, zombie_types):
+    # Rows repeat the same few zombie types, so build each one only once
+    if id is None:
+        return None
+    zombie_type = zombie_types.get(id)
+    if zombie_type is None:
+        zombie_type = zombie_types[id] = ZombieType(name, id)
+    return zombie_type
+
+
+def zombie_type_from_row(row, zombie_types):
+    return shared_zombie_type(row["zombie_type_name"], row["zombie_type_id"], zombie_types)
 
 
 def select(id):
+    zombie = identity_map.get("zombies", id)
+    if zombie is not None:
+        return zombie
+    zombie = table_cache.fetch("zombies", id, lambda: _select(id))
+    return identity_map.add("zombies", zombie)
+
+
+def _select(id):
     sql = "SELECT * FROM zombies WHERE id = %s"
     values = [id]
     result = run_sql(sql, values)[0]
     zombie_type = zombie_type_repository.select(result["zombie_type_id"])
-    zombie = Zombie(result["name"], zombie_type, result["id"])
-    return zombie
+    return Zombie(result["name"], zombie_type, result["id"])
+
+
+def select_with_victims(id):
+    # Returns the zombie and a list of (human, times bitten) pairs, or
+    # (None, []) if there is no such zombie
+    if config.DATABASE_BACKEND == "sqlite":
+        results = run_sql(SELECT_ZOMBIE_WITH_VICTIMS_SQLITE, [id])
+    else:
+        results = run_sql(SELECT_ZOMBIE_WITH_VICTIMS, [id])
+    if not results:
+        return None, []
+    result = results[0]
+    zombie = identity_map.add("zombies", zombie_from_row(result, {}))
+    rows = result["victims"]
+    if isinstance(rows, str):
+        rows = json.loads(rows)
+    victims = [(Human(victim["name"], victim["id"]), victim["bites"]) for victim in rows]
+    return zombie, victims
 
 
 def delete_all():
     sql = "DELETE FROM zombies"
     run_sql(sql)
+    _evict(None)
 
 
 def delete(id):
     sql = "DELETE FROM zombies WHERE id = %s"
     values = [id]
     run_sql(sql, values)
+    _evict(id)
+
+
+# The foreign key on bitings.zombie_id refuses to delete a row they still name
+def has_bitings(id):
+    sql = "SELECT 1 FROM bitings WHERE zombie_id = %s LIMIT 1"
+    values = [id]
+    return len(run_sql(sql, values)) > 0
+
+
+def delete_many(ids):
+    bulk.delete_many("zombies", ids)
+    _evict(None)
 
 
 def update(zombie):
     sql = "UPDATE zombies SET (name, zombie_type_id) = (%s, %s) WHERE id = %s"
     values = [zombie.name, zombie.zombie_type.id, zombie.id]
     run_sql(sql, values)
+    _evict(zombie.id)
+
+
+# Cached bitings hold on to the zombie they were loaded with
+def _evict(id):
+    table_cache.evict("zombies", None if id is None else [id])
+    identity_map.evict("zombies", id)
+    identity_map.evict("bitings")
 
 
 def select_victims_of_zombie(id):
@@ -55,6 +224,6 @@ def select_victims_of_zombie(id):
     values = [id]
     results = run_sql(sql, values)
     for result in results:
-        human = Human(result["name"])
+        human = Human(result["name"], result["id"])
         victims.append(human)
     return victims
\ No newline at end of file
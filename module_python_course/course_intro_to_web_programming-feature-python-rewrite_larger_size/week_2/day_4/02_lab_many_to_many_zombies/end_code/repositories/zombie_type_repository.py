@@ -1,5 +1,9 @@
-from db.run_sql import run_sql
+import shared.db.bulk as bulk
+from shared.db.run_sql import run_sql
+import shared.db.table_cache as table_cache
+
 from models.zombie_type import ZombieType
+import repositories.identity_map as identity_map
 
 def save(zombie_type):
     sql = "INSERT INTO zombie_types (name) VALUES (%s) RETURNING id"
@@ -7,38 +11,79 @@ def save(zombie_type):
     results = run_sql(sql, values)
     id = results[0]['id']
     zombie_type.id = id
+    identity_map.add("zombie_types", zombie_type)
+    table_cache.evict("zombie_types", [id])
+
+
+def save_many(zombie_types):
+    values = [[zombie_type.name] for zombie_type in zombie_types]
+    ids = bulk.insert_many("zombie_types", ["name"], values)
+    for zombie_type, id in zip(zombie_types, ids):
+        zombie_type.id = id
+        identity_map.add("zombie_types", zombie_type)
+    table_cache.evict("zombie_types", ids)
 
 
 def select_all():
-    zombie_types = []
-    sql = "SELECT * FROM zombie_types"
-    results = run_sql(sql)
-    for result in results:
-        zombie_type = ZombieType(result["name"], result["id"])
-        zombie_types.append(zombie_type)
-    return zombie_types
+    # A copy of the list, since the cached one is shared by every thread
+    return list(table_cache.fetch("zombie_types", table_cache.ALL, _select_all))
+
+
+def _select_all():
+    sql = "SELECT name, id FROM zombie_types"
+    return [ZombieType(*row) for row in run_sql(sql, tuples=True)]
 
 
 def select(id):
+    zombie_type = identity_map.get("zombie_types", id)
+    if zombie_type is not None:
+        return zombie_type
+    zombie_type = table_cache.fetch("zombie_types", id, lambda: _select(id))
+    return identity_map.add("zombie_types", zombie_type)
+
+
+def _select(id):
     sql = "SELECT * FROM zombie_types WHERE id = %s"
     values = [id]
     result = run_sql(sql, values)[0]
-    zombie_type = ZombieType(result["name"], result["id"])
-    return zombie_type
+    return ZombieType(result["name"], result["id"])
 
 
 def delete_all():
     sql = "DELETE FROM zombie_types"
     run_sql(sql)
+    _evict(None)
 
 
 def delete(id):
     sql = "DELETE FROM zombie_types WHERE id = %s"
     values = [id]
     run_sql(sql, values)
+    _evict(id)
+
+
+# The foreign key on zombies.zombie_type_id refuses to delete a row they still name
+def has_zombies(id):
+    sql = "SELECT 1 FROM zombies WHERE zombie_type_id = %s LIMIT 1"
+    values = [id]
+    return len(run_sql(sql, values)) > 0
+
+
+def delete_many(ids):
+    bulk.delete_many("zombie_types", ids)
+    _evict(None)
 
 
 def update(zombie_type):
     sql = "UPDATE zombie_types SET name = %s WHERE id = %s"
     values = [zombie_type.name, zombie_type.id]
     run_sql(sql, values)
+    _evict(zombie_type.id)
+
+
+# Cached zombies and bitings hold on to the zombie type they were loaded with
+def _evict(id):
+    table_cache.evict("zombie_types", None if id is None else [id])
+    identity_map.evict("zombie_types", id)
+    identity_map.evict("zombies")
+    identity_map.evict("bitings")
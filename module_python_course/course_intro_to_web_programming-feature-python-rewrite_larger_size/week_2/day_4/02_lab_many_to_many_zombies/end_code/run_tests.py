@@ -0,0 +1,17 @@
+import unittest
+
+from tests.async_views_test import TestAsyncViews
+from tests.biting_repository_test import TestBitingRepository
+from tests.csv_import_test import TestCsvImport
+from tests.identity_map_test import TestIdentityMap
+from tests.outbreak_test import TestOutbreak
+from tests.pagination_test import TestHumansIndexPagination
+from tests.sqlite_backend_test import TestSqliteBackend
+from tests.leaderboard_test import TestLeaderboard
+from tests.streaming_test import TestStreamedIndexes
+from tests.table_cache_test import TestTableCache
+from tests.zombie_detail_test import TestZombieDetail
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+# What-if outbreaks over the humans and zombies in the database.
+#
+# Every step, each zombie makes a Poisson-distributed number of bite attempts,
+# on average the bite rate of its ZombieType. Each attempt picks a human at
+# random; a human who has not been bitten yet is bitten and turns into a
+# zombie of the same type as the one that bit them, ready to bite from the
+# next step. Humans who already have a biting in the database count as bitten
+# but never turn, since the lab keeps them as humans.
+#
+# The whole population is held in NumPy arrays (pip3 install numpy), so a
+# step costs a handful of array operations however many people there are.
+#
+#   python -m simulation.outbreak --steps 10 --rate Runner=1.5 --rate Walker=0.3 --save
+
+import argparse
+
+import numpy as np
+
+import shared.db.bulk as bulk
+
+import repositories.biting_repository as biting_repository
+import repositories.human_repository as human_repository
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+# Bites per zombie per step for types without a rate of their own
+DEFAULT_BITE_RATE = 0.5
+
+# Stands in for zombie_type_id NULL, which no SERIAL id can be
+NO_TYPE = 0
+
+
+class Outbreak:
+
+    def __init__(self, human_ids, zombie_ids, zombie_type_ids, bite_rates, bitten_human_ids=(), default_rate=DEFAULT_BITE_RATE, seed=None):
+        # bite_rates maps zombie_type_id to bites per zombie per step
+        self.human_ids = np.sort(np.asarray(human_ids, dtype=np.int64))
+        self.steps = 0
+        self._rng = np.random.default_rng(seed)
+        self._bitten = np.zeros(self.human_ids.size, dtype=bool)
+        self._bitten[self._human_indexes(bitten_human_ids)] = True
+
+        zombie_type_ids = np.asarray(zombie_type_ids, dtype=np.int64)
+        self._type_ids, kinds = np.unique(zombie_type_ids, return_inverse=True)
+        self._rates = np.array([bite_rates.get(type_id, default_rate) for type_id in self._type_ids.tolist()], dtype=float)
+        self._kinds = kinds.astype(np.int64)
+
+        # Zombies from the database come first; a zombie id of 0 means a
+        # turned human who has not been saved yet
+        self.zombie_ids = np.asarray(zombie_ids, dtype=np.int64)
+        self._loaded = self.zombie_ids.size
+        self._turned = []
+        self._bites = []
+        self._saved_bites = 0
+
+    def step(self):
+        if self.human_ids.size == 0:
+            # Nobody left to bite, and no range to pick victims from
+            self.steps += 1
+            return 0
+        attempts = self._rng.poisson(self._rates[self._kinds])
+        zombies = np.repeat(np.arange(attempts.size), attempts)
+        victims = self._rng.integers(0, self.human_ids.size, zombies.size)
+        # Shuffled so that when two zombies go for the same human in one
+        # step, either may be the one that gets them
+        order = self._rng.permutation(zombies.size)
+        zombies, victims = zombies[order], victims[order]
+        susceptible = ~self._bitten[victims]
+        zombies, victims = zombies[susceptible], victims[susceptible]
+        victims, first = np.unique(victims, return_index=True)
+        zombies = zombies[first]
+
+        self._bitten[victims] = True
+        self._bites.append((victims, zombies))
+        self._turned.append(victims)
+        self._kinds = np.concatenate([self._kinds, self._kinds[zombies]])
+        self.zombie_ids = np.concatenate([self.zombie_ids, np.zeros(victims.size, dtype=np.int64)])
+        self.steps += 1
+        return victims.size
+
+    def run(self, steps):
+        return [self.step() for _ in range(steps)]
+
+    def bites(self):
+        # Indexes into human_ids and zombie_ids of every bite so far, in order
+        if not self._bites:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        victims, zombies = zip(*self._bites)
+        return np.concatenate(victims), np.concatenate(zombies)
+
+    def turned_humans(self):
+        # Indexes into human_ids of the humans turned so far, in the order
+        # their zombies appear in zombie_ids
+        if not self._turned:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(self._turned)
+
+    def zombie_type_ids(self):
+        return self._type_ids[self._kinds]
+
+    def bitten_count(self):
+        return int(self._bitten.sum())
+
+    def save(self):
+        # Writes the zombies and bitings simulated since the last save with
+        # bulk inserts, and returns how many bitings were written
+        unsaved = np.flatnonzero(self.zombie_ids == 0)
+        if unsaved.size:
+            turned = self.turned_humans()[unsaved - self._loaded]
+            type_ids = self.zombie_type_ids()[unsaved].tolist()
+            rows = zip(
+                (f"Turned human {id}" for id in self.human_ids[turned].tolist()),
+                (None if type_id == NO_TYPE else type_id for type_id in type_ids),
+            )
+            ids = bulk.insert_many("zombies", ["name", "zombie_type_id"], rows)
+            if len(ids) != unsaved.size:
+                # Their bitings would have no zombie ids to refer to
+                raise RuntimeError(f"only {len(ids)} of {unsaved.size} turned humans were saved as zombies")
+            self.zombie_ids[unsaved] = ids
+
+        victims, zombies = self.bites()
+        victims, zombies = victims[self._saved_bites:], zombies[self._saved_bites:]
+        rows = zip(self.human_ids[victims].tolist(), self.zombie_ids[zombies].tolist())
+        ids = bulk.insert_many("bitings", ["human_id", "zombie_id"], rows)
+        self._saved_bites += len(ids)
+        return len(ids)
+
+    def _human_indexes(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        indexes = np.searchsorted(self.human_ids, ids)
+        known = indexes < self.human_ids.size
+        known[known] = self.human_ids[indexes[known]] == ids[known]
+        return indexes[known]
+
+
+def load(bite_rates, default_rate=DEFAULT_BITE_RATE, seed=None):
+    # bite_rates maps ZombieType names to bites per zombie per step
+    type_ids = {zombie_type.name: zombie_type.id for zombie_type in zombie_type_repository.select_all()}
+    unknown = set(bite_rates) - set(type_ids)
+    if unknown:
+        raise ValueError(f"no zombie types called {', '.join(sorted(unknown))}")
+    rates = {type_ids[name]: rate for name, rate in bite_rates.items()}
+
+    human_ids = np.fromiter((human.id for human in human_repository.iterate_all()), dtype=np.int64)
+    zombie_ids = []
+    zombie_type_ids = []
+    for zombie in zombie_repository.iterate_all():
+        zombie_ids.append(zombie.id)
+        zombie_type_ids.append(zombie.zombie_type.id if zombie.zombie_type is not None else NO_TYPE)
+    bitten = np.fromiter((biting.human.id for biting in biting_repository.iterate_all()), dtype=np.int64)
+    return Outbreak(human_ids, zombie_ids, zombie_type_ids, rates, bitten, default_rate, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--rate", action="append", default=[], metavar="TYPE=RATE", help="bites per step for zombies of a type")
+    parser.add_argument("--default-rate", type=float, default=DEFAULT_BITE_RATE)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--save", action="store_true", help="write the new zombies and bitings to the database")
+    args = parser.parse_args()
+
+    rates = {}
+    for rate in args.rate:
+        name, _, value = rate.rpartition("=")
+        rates[name] = float(value)
+    outbreak = load(rates, args.default_rate, args.seed)
+    print(f"{outbreak.human_ids.size} humans, {outbreak.zombie_ids.size} zombies, {outbreak.bitten_count()} already bitten")
+    for step, bites in enumerate(outbreak.run(args.steps), 1):
+        print(f"step {step:>4}: {bites:>10} bitten, {outbreak.bitten_count():>10} in total")
+    if args.save:
+        print(f"saved {outbreak.save()} bitings")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+
+from app import app
+import repositories.human_repository as human_repository
+import repositories.identity_map as identity_map
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+REPOSITORIES = [human_repository, zombie_repository, zombie_type_repository]
+
+
+class TestAsyncViews(unittest.TestCase):
+
+    def setUp(self):
+        # The first two queries of a page only get past the barrier if they
+        # are both in flight at once, so a serial view fails with a timeout
+        self.barrier = threading.Barrier(2, timeout=5)
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.originals = [(module, module.run_sql) for module in REPOSITORIES]
+        for module in REPOSITORIES:
+            module.run_sql = self.fake_run_sql
+        identity_map.reset_stats()
+
+    def tearDown(self):
+        for module, original in self.originals:
+            module.run_sql = original
+
+    def fake_run_sql(self, sql, values=None, tuples=False):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call <= 2:
+            self.barrier.wait()
+        if "FROM humans" in sql:
+            return [("Eddie", 7)] if tuples else [{"id": 7, "name": "Eddie"}]
+        if "FROM zombie_types" in sql:
+            return [("Walker", 3)] if tuples else [{"id": 3, "name": "Walker"}]
+        if "FROM zombies" in sql:
+            return [("Pete", 1, "Walker", 3)] if tuples else [{"id": 1, "name": "Pete", "zombie_type_id": 3, "zombie_type_name": "Walker"}]
+        return []
+
+    def get(self, path):
+        response = app.test_client().get(path)
+        self.assertEqual(200, response.status_code)
+        return response.get_data(as_text=True)
+
+
+    def test_edit_zombie_fetches_zombie_and_types_together(self):
+        html = self.get("/zombies/1/edit")
+        self.assertIn('value="Pete"', html)
+        self.assertIn("Walker", html)
+
+
+    def test_new_biting_fetches_humans_and_zombies_together(self):
+        html = self.get("/bitings/new")
+        self.assertIn("Eddie", html)
+        self.assertIn("Pete", html)
+
+
+    def test_worker_threads_share_the_request_identity_map(self):
+        self.get("/zombies/1/edit")
+        self.assertIn("zombies.edit_zombie", identity_map.stats())
@@ -0,0 +1,53 @@
+import unittest
+
+import repositories.biting_repository as biting_repository
+import repositories.human_repository as human_repository
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+REPOSITORIES = [biting_repository, human_repository, zombie_repository, zombie_type_repository]
+
+
+class TestBitingRepository(unittest.TestCase):
+
+    def setUp(self):
+        self.queries = []
+        # In SELECT_BITING_TUPLES order: biting id, human name and id,
+        # zombie name and id, zombie type name and id
+        self.rows = [
+            (1, "Coach", 10, "Pete", 20, "Walker", 30),
+            (2, "Nick", 11, "Pete", 20, "Walker", 30),
+            (3, "Nick", 11, "Ed", 21, None, None),
+        ]
+        self.originals = [(module, module.run_sql) for module in REPOSITORIES]
+        for module in REPOSITORIES:
+            module.run_sql = self.fake_run_sql
+
+    def tearDown(self):
+        for module, original in self.originals:
+            module.run_sql = original
+
+    def fake_run_sql(self, sql, values=None, tuples=False):
+        self.queries.append(sql)
+        self.assertTrue(tuples)
+        return self.rows
+
+
+    def test_select_all_runs_one_query(self):
+        biting_repository.select_all()
+        self.assertEqual(1, len(self.queries))
+
+
+    def test_select_all_builds_object_graph(self):
+        bitings = biting_repository.select_all()
+        self.assertEqual([1, 2, 3], [biting.id for biting in bitings])
+        self.assertEqual("Coach", bitings[0].human.name)
+        self.assertEqual("Pete", bitings[0].zombie.name)
+        self.assertEqual("Walker", bitings[0].zombie.zombie_type.name)
+        self.assertIsNone(bitings[2].zombie.zombie_type)
+
+
+    def test_select_all_shares_repeated_entities(self):
+        bitings = biting_repository.select_all()
+        self.assertIs(bitings[0].zombie, bitings[1].zombie)
+        self.assertIs(bitings[1].human, bitings[2].human)
@@ -0,0 +1,58 @@
+import io
+import unittest
+
+import shared.db.bulk as bulk
+import shared.db.config as config
+import shared.db.unit_of_work as unit_of_work
+from shared.tests.doubles import FakeConnection, FakePool
+
+from app import app
+
+SUMMARY = [
+    (None, 3, 1),
+    ("zombie_id is not the id of any of the zombies", 2, 2),
+]
+
+
+class TestCsvImport(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection(rows=lambda sql, values: SUMMARY)
+        self.pool = FakePool(lambda: self.connection)
+        self.originals = [(bulk, bulk.get_pool), (unit_of_work, unit_of_work.get_pool)]
+        self.original_chunk_size = config.COPY_CHUNK_SIZE
+        for module, _ in self.originals:
+            module.get_pool = lambda: self.pool
+        config.COPY_CHUNK_SIZE = 16
+
+    def tearDown(self):
+        for module, original in self.originals:
+            module.get_pool = original
+        config.COPY_CHUNK_SIZE = self.original_chunk_size
+
+
+    def test_endpoint_reads_request_body(self):
+        response = app.test_client().post("/bitings/import", data=b"\xef\xbb\xbfhuman_id,zombie_id\n1,2\n", content_type="text/csv")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, response.get_json()["inserted"])
+        self.assertEqual(b"1,2\n", b"".join(self.connection.chunks))
+        self.assertEqual((1, 1), (self.connection.commits, self.pool.returned))
+
+
+    def test_endpoint_reads_uploaded_file(self):
+        data = {"file": (io.BytesIO(b"name\nRochelle\nCoach\n"), "humans.csv")}
+        response = app.test_client().post("/humans/import", data=data, content_type="multipart/form-data")
+        self.assertEqual(200, response.status_code)
+        self.assertIn("INSERT INTO humans (name)", self.connection.statements[2])
+
+
+    def test_endpoint_without_a_file_is_a_bad_request(self):
+        self.assertEqual(400, app.test_client().post("/zombies/import").status_code)
+
+
+    def test_failed_import_is_a_server_error(self):
+        self.connection.fail(Exception("could not extend file"), containing="INSERT INTO humans")
+        with self.assertLogs("db.queries", "ERROR"), self.assertLogs(app.logger, "ERROR"):
+            response = app.test_client().post("/humans/import", data=b"name\nCoach\n", content_type="text/csv")
+        self.assertEqual(500, response.status_code)
+        self.assertEqual((0, 1), (self.connection.commits, self.connection.rollbacks))
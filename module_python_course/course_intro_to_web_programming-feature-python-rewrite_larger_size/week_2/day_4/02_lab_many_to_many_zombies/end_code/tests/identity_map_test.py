@@ -0,0 +1,95 @@
+import unittest
+
+from app import app
+from models.zombie import Zombie
+import repositories.identity_map as identity_map
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+REPOSITORIES = [zombie_repository, zombie_type_repository]
+
+
+class TestIdentityMap(unittest.TestCase):
+
+    def setUp(self):
+        self.queries = []
+        self.originals = [(module, module.run_sql) for module in REPOSITORIES]
+        for module in REPOSITORIES:
+            module.run_sql = self.fake_run_sql
+        identity_map.reset_stats()
+
+    def tearDown(self):
+        for module, original in self.originals:
+            module.run_sql = original
+
+    def fake_run_sql(self, sql, values=None):
+        self.queries.append(sql)
+        if sql.startswith("SELECT * FROM zombie_types"):
+            return [{"id": 3, "name": "Walker"}]
+        if sql.startswith("SELECT * FROM zombies"):
+            return [{"id": int(values[0]), "name": "Pete", "zombie_type_id": 3}]
+        return []
+
+
+    def test_repeated_select_returns_same_object_without_query(self):
+        with app.test_request_context("/zombies/1"):
+            zombie = zombie_repository.select("1")
+            self.assertIs(zombie, zombie_repository.select(1))
+        self.assertEqual(2, len(self.queries))
+
+
+    def test_related_entities_are_shared(self):
+        with app.test_request_context("/zombies/1"):
+            first = zombie_repository.select(1)
+            second = zombie_repository.select(2)
+            self.assertIs(first.zombie_type, second.zombie_type)
+        self.assertEqual(3, len(self.queries))
+
+
+    def test_nothing_is_cached_outside_a_request(self):
+        zombie_repository.select(1)
+        zombie_repository.select(1)
+        self.assertEqual(4, len(self.queries))
+
+
+    def test_each_request_starts_empty(self):
+        with app.test_request_context("/zombies/1"):
+            zombie_repository.select(1)
+        with app.test_request_context("/zombies/1"):
+            zombie_repository.select(1)
+        self.assertEqual(4, len(self.queries))
+
+
+    def test_update_evicts_entry(self):
+        with app.test_request_context("/zombies/1"):
+            zombie = zombie_repository.select(1)
+            zombie_repository.update(Zombie("Ed", zombie.zombie_type, 1))
+            self.assertIsNot(zombie, zombie_repository.select(1))
+
+
+    def test_zombie_type_update_evicts_cached_zombies(self):
+        with app.test_request_context("/zombies/1"):
+            zombie = zombie_repository.select(1)
+            zombie_type_repository.update(zombie.zombie_type)
+            self.assertIsNot(zombie, zombie_repository.select(1))
+
+
+    def test_delete_evicts_entry(self):
+        with app.test_request_context("/zombies/1"):
+            zombie = zombie_repository.select(1)
+            zombie_repository.delete(1)
+            self.assertIsNot(zombie, zombie_repository.select(1))
+
+
+    def test_hits_and_misses_are_counted_per_route(self):
+        with app.test_request_context("/zombies/1"):
+            zombie_repository.select(1)
+            zombie_repository.select(1)
+        self.assertEqual({"zombies.show_zombie": {"hits": 1, "misses": 2}}, identity_map.stats())
+
+
+    def test_stats_route_returns_counters(self):
+        with app.test_request_context("/zombies/1"):
+            zombie_repository.select(1)
+        response = app.test_client().get("/stats/identity-map")
+        self.assertEqual({"zombies.show_zombie": {"hits": 0, "misses": 2}}, response.get_json())
@@ -0,0 +1,171 @@
+import os
+import tempfile
+import unittest
+
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+from shared.db.connection_pool import close_pool
+from shared.db.run_sql import run_sql
+
+from app import app
+from models.biting import Biting
+from models.human import Human
+from models.zombie import Zombie
+from models.zombie_type import ZombieType
+import repositories.biting_repository as biting_repository
+import repositories.human_repository as human_repository
+import repositories.leaderboard_repository as leaderboard_repository
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "db", "zombies.sql")
+
+
+# Runs against a real SQLite file so the triggers in db/zombies.sqlite.sql
+# are what keeps the counts
+class TestLeaderboard(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original = (config.DATABASE_BACKEND, config.SQLITE_PATH)
+        config.DATABASE_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(self.directory.name, "zombies.sqlite3")
+        close_pool()
+        sqlite_backend.load_schema(SCHEMA)
+        self.walker = ZombieType("Walker")
+        self.runner = ZombieType("Runner")
+        zombie_type_repository.save_many([self.walker, self.runner])
+        self.zombies = [Zombie("Pete", self.walker), Zombie("Ed", self.runner), Zombie("Shaun", self.walker)]
+        zombie_repository.save_many(self.zombies)
+        self.humans = [Human(f"Human {number}") for number in range(6)]
+        human_repository.save_many(self.humans)
+
+    def tearDown(self):
+        close_pool()
+        config.DATABASE_BACKEND, config.SQLITE_PATH = self.original
+        self.directory.cleanup()
+
+    def bite(self, zombie, count):
+        bitings = [Biting(human, zombie) for human in self.humans[:count]]
+        biting_repository.save_many(bitings)
+        return bitings
+
+    def standings(self, **kwargs):
+        page = leaderboard_repository.select_page(**kwargs)
+        return [(zombie.name, bites) for zombie, bites in page.items]
+
+
+    def test_inserted_bitings_are_counted(self):
+        pete, ed, shaun = self.zombies
+        self.bite(pete, 2)
+        self.bite(ed, 3)
+        biting_repository.save(Biting(self.humans[5], shaun))
+        self.assertEqual([("Ed", 3), ("Pete", 2), ("Shaun", 1)], self.standings())
+
+
+    def test_deleted_bitings_are_uncounted(self):
+        pete, ed, _ = self.zombies
+        pete_bitings = self.bite(pete, 4)
+        ed_bitings = self.bite(ed, 3)
+        biting_repository.delete(pete_bitings[0].id)
+        biting_repository.delete_many([biting.id for biting in pete_bitings[1:3]])
+        biting_repository.delete_many([biting.id for biting in ed_bitings])
+        self.assertEqual([("Pete", 1)], self.standings())
+
+
+    def test_moved_biting_changes_both_counts(self):
+        pete, ed, _ = self.zombies
+        biting = self.bite(pete, 2)[0]
+        biting.zombie = ed
+        biting_repository.update(biting)
+        self.assertEqual([("Ed", 1), ("Pete", 1)], self.standings())
+
+
+    def test_leaderboard_by_zombie_type(self):
+        pete, ed, shaun = self.zombies
+        self.bite(pete, 1)
+        self.bite(ed, 5)
+        self.bite(shaun, 2)
+        self.assertEqual([("Shaun", 2), ("Pete", 1)], self.standings(zombie_type_id=self.walker.id))
+        self.assertEqual([("Ed", 5)], self.standings(zombie_type_id=self.runner.id))
+
+
+    def test_changing_zombie_type_moves_it_between_leaderboards(self):
+        pete = self.zombies[0]
+        self.bite(pete, 2)
+        pete.zombie_type = self.runner
+        zombie_repository.update(pete)
+        self.assertEqual([], self.standings(zombie_type_id=self.walker.id))
+        self.assertEqual([("Pete", 2)], self.standings(zombie_type_id=self.runner.id))
+
+
+    def test_pages_forwards_and_backwards(self):
+        pete, ed, shaun = self.zombies
+        self.bite(pete, 2)
+        self.bite(ed, 3)
+        self.bite(shaun, 2)
+        first = leaderboard_repository.select_page(limit=2)
+        self.assertEqual([("Ed", 3), ("Shaun", 2)], [(zombie.name, bites) for zombie, bites in first.items])
+        self.assertEqual(f"2-{shaun.id}", first.next_cursor)
+        self.assertIsNone(first.prev_cursor)
+        second = leaderboard_repository.select_page(after=first.next_cursor, limit=2)
+        self.assertEqual([("Pete", 2)], [(zombie.name, bites) for zombie, bites in second.items])
+        self.assertIsNone(second.next_cursor)
+        back = leaderboard_repository.select_page(before=second.prev_cursor, limit=2)
+        self.assertEqual([("Ed", 3), ("Shaun", 2)], [(zombie.name, bites) for zombie, bites in back.items])
+
+
+    def test_bad_cursor_gives_first_page(self):
+        self.bite(self.zombies[0], 1)
+        self.assertEqual([("Pete", 1)], self.standings(after="x-1"))
+
+
+    def test_page_reads_only_the_summary_table(self):
+        self.bite(self.zombies[0], 1)
+        queries = []
+        original = leaderboard_repository.run_sql
+        leaderboard_repository.run_sql = lambda sql, values=None, tuples=False: queries.append(sql) or original(sql, values, tuples)
+        try:
+            leaderboard_repository.select_page()
+        finally:
+            leaderboard_repository.run_sql = original
+        self.assertEqual(1, len(queries))
+        self.assertNotIn("bitings", queries[0])
+
+
+    def test_check_agrees_with_a_recount(self):
+        pete, ed, _ = self.zombies
+        bitings = self.bite(pete, 3)
+        self.bite(ed, 2)
+        biting_repository.delete(bitings[0].id)
+        self.assertEqual([], leaderboard_repository.check())
+
+
+    def test_check_finds_and_rebuild_fixes_drift(self):
+        pete, ed, _ = self.zombies
+        self.bite(pete, 3)
+        run_sql("UPDATE zombie_bite_counts SET bites = 7 WHERE zombie_id = %s", [pete.id])
+        run_sql("UPDATE zombie_bite_counts SET zombie_type_id = NULL WHERE zombie_id = %s", [pete.id])
+        run_sql("INSERT INTO zombie_bite_counts (zombie_id, zombie_type_id, bites) VALUES (%s, %s, 1)", [ed.id, self.runner.id])
+        self.assertEqual([(pete.id, 7, 3), (ed.id, 1, 0), (pete.id, None, None)], leaderboard_repository.check())
+        leaderboard_repository.rebuild()
+        self.assertEqual([], leaderboard_repository.check())
+        self.assertEqual([("Pete", 3)], self.standings())
+
+
+    def test_leaderboard_page_links_keep_zombie_type(self):
+        pete, _, shaun = self.zombies
+        self.bite(pete, 1)
+        self.bite(shaun, 2)
+        original = leaderboard_repository.select_page
+        leaderboard_repository.select_page = lambda *args, **kwargs: original(*args, **kwargs, limit=1)
+        try:
+            response = app.test_client().get(f"/zombies/leaderboard?zombie_type_id={self.walker.id}")
+        finally:
+            leaderboard_repository.select_page = original
+        html = response.get_data(as_text=True)
+        self.assertEqual(200, response.status_code)
+        self.assertIn("Shaun", html)
+        self.assertNotIn("Pete", html)
+        self.assertIn(f"after=2-{shaun.id}", html)
+        self.assertIn(f"zombie_type_id={self.walker.id}", html.split('class="pagination"')[1])
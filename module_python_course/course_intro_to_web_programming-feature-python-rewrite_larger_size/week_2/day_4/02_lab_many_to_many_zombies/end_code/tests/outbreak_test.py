@@ -0,0 +1,106 @@
+import unittest
+
+import shared.db.bulk as bulk
+
+# The simulation runs on NumPy, which the rest of the app does without
+try:
+    import numpy as np
+    from simulation.outbreak import NO_TYPE, Outbreak
+except ImportError:
+    np = None
+
+WALKER = 1
+RUNNER = 2
+
+
+@unittest.skipUnless(np, "the outbreak simulation needs numpy (pip3 install numpy)")
+class TestOutbreak(unittest.TestCase):
+
+    def setUp(self):
+        self.inserted = []
+        self.saved_limit = None
+        self.original_insert_many = bulk.insert_many
+        bulk.insert_many = self.fake_insert_many
+
+    def tearDown(self):
+        bulk.insert_many = self.original_insert_many
+
+    def fake_insert_many(self, table, columns, rows):
+        rows = list(rows)
+        self.inserted.append((table, rows))
+        rows = rows[:self.saved_limit]
+        first = 1000 * len(self.inserted)
+        return list(range(first, first + len(rows)))
+
+    def outbreak(self, rates, humans=1000, bitten=()):
+        human_ids = np.arange(1, humans + 1)
+        return Outbreak(human_ids, [10, 20, 30], [WALKER, RUNNER, NO_TYPE], rates, bitten, default_rate=0, seed=1)
+
+
+    def test_zombies_without_a_bite_rate_never_bite(self):
+        outbreak = self.outbreak({})
+        self.assertEqual([0, 0, 0], outbreak.run(3))
+
+
+    def test_zombies_without_humans_bite_nobody(self):
+        outbreak = Outbreak([], [1, 2], [WALKER, WALKER], {WALKER: 2.0})
+        self.assertEqual([0, 0, 0], outbreak.run(3))
+        self.assertEqual(3, outbreak.steps)
+
+
+    def test_each_human_is_bitten_at_most_once(self):
+        outbreak = self.outbreak({WALKER: 3, RUNNER: 3})
+        outbreak.run(6)
+        victims, zombies = outbreak.bites()
+        self.assertGreater(victims.size, 100)
+        self.assertEqual(victims.size, np.unique(victims).size)
+        self.assertEqual(victims.size, outbreak.bitten_count())
+
+
+    def test_humans_bitten_before_the_outbreak_are_not_bitten_again(self):
+        outbreak = self.outbreak({WALKER: 50}, humans=100, bitten=range(1, 51))
+        outbreak.run(3)
+        victims, zombies = outbreak.bites()
+        self.assertTrue(np.all(outbreak.human_ids[victims] > 50))
+
+
+    def test_turned_humans_take_the_type_of_their_zombie(self):
+        outbreak = self.outbreak({RUNNER: 2})
+        outbreak.run(4)
+        victims, zombies = outbreak.bites()
+        type_ids = outbreak.zombie_type_ids()
+        self.assertEqual({RUNNER}, set(type_ids[zombies].tolist()))
+        self.assertEqual({RUNNER}, set(type_ids[3:].tolist()))
+
+
+    def test_save_inserts_new_zombies_then_their_bitings(self):
+        outbreak = self.outbreak({WALKER: 2})
+        outbreak.run(3)
+        saved = outbreak.save()
+        (zombie_table, zombies), (biting_table, bitings) = self.inserted
+        self.assertEqual("zombies", zombie_table)
+        self.assertEqual("bitings", biting_table)
+        self.assertEqual(len(bitings), saved)
+        self.assertEqual({WALKER}, {type_id for name, type_id in zombies})
+        zombie_ids = {10, 20, 30} | set(range(1000, 1000 + len(zombies)))
+        self.assertTrue({zombie_id for human_id, zombie_id in bitings} <= zombie_ids)
+
+
+    def test_saving_again_only_writes_new_bites(self):
+        outbreak = self.outbreak({WALKER: 1})
+        outbreak.run(2)
+        first = outbreak.save()
+        outbreak.run(1)
+        second = outbreak.save()
+        victims, zombies = outbreak.bites()
+        self.assertEqual(victims.size, first + second)
+        self.assertNotIn(0, outbreak.zombie_ids.tolist())
+
+
+    def test_save_raises_when_zombies_are_not_all_saved(self):
+        outbreak = self.outbreak({WALKER: 2})
+        outbreak.run(2)
+        self.saved_limit = 1
+        with self.assertRaises(RuntimeError):
+            outbreak.save()
+        self.assertEqual(["zombies"], [table for table, rows in self.inserted])
@@ -0,0 +1,36 @@
+import unittest
+
+import shared.pagination as pagination
+
+from app import app
+import repositories.human_repository as human_repository
+
+
+class TestHumansIndexPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.queries = []
+        self.original_run_sql = human_repository.run_sql
+        human_repository.run_sql = self.fake_run_sql
+
+    def tearDown(self):
+        human_repository.run_sql = self.original_run_sql
+
+    def fake_run_sql(self, sql, values=None):
+        self.queries.append((sql, values))
+        limit = values[-1]
+        return [{"id": id, "name": f"Human {id}"} for id in range(11, 11 + limit)]
+
+
+    def test_index_passes_cursor_to_repository(self):
+        app.test_client().get("/humans?after=10")
+        sql, values = self.queries[0]
+        self.assertIn("WHERE id > %s", sql)
+        self.assertEqual([10, pagination.PAGE_SIZE + 1], values)
+
+
+    def test_index_links_to_next_and_previous_pages(self):
+        response = app.test_client().get("/humans?after=10")
+        html = response.get_data(as_text=True)
+        self.assertIn(f'href="/humans?after={10 + pagination.PAGE_SIZE}"', html)
+        self.assertIn('href="/humans?before=11"', html)
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+from shared.db.connection_pool import close_pool
+from shared.db.run_sql import run_sql
+
+from app import app
+from models.human import Human
+from models.zombie import Zombie
+from models.zombie_type import ZombieType
+import repositories.biting_repository as biting_repository
+import repositories.human_repository as human_repository
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "db", "zombies.sql")
+
+
+class TestSqliteBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original = (config.DATABASE_BACKEND, config.SQLITE_PATH)
+        config.DATABASE_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(self.directory.name, "zombies.sqlite3")
+        close_pool()
+        sqlite_backend.load_schema(SCHEMA)
+
+    def tearDown(self):
+        close_pool()
+        config.DATABASE_BACKEND, config.SQLITE_PATH = self.original
+        self.directory.cleanup()
+
+    def save_zombie(self, name="Pete"):
+        zombie_type = ZombieType("Walker")
+        zombie_type_repository.save(zombie_type)
+        zombie = Zombie(name, zombie_type)
+        zombie_repository.save(zombie)
+        return zombie
+
+
+    def test_save_gets_id_from_returning(self):
+        human_repository.save(Human("Coach"))
+        human = Human("Ellis")
+        human_repository.save(human)
+        self.assertEqual(2, human.id)
+        self.assertEqual(["Coach", "Ellis"], [human.name for human in human_repository.select_all()])
+
+
+    def test_save_many_and_delete_many(self):
+        humans = [Human(f"Human {number}") for number in range(5)]
+        human_repository.save_many(humans)
+        self.assertEqual([1, 2, 3, 4, 5], [human.id for human in humans])
+        human_repository.delete_many([2, 4])
+        self.assertEqual([1, 3, 5], [human.id for human in human_repository.select_all()])
+
+
+    def test_iterate_all_reads_in_batches(self):
+        human_repository.save_many([Human(f"Human {number}") for number in range(5)])
+        humans = list(human_repository.iterate_all(batch_size=2))
+        self.assertEqual([1, 2, 3, 4, 5], [human.id for human in humans])
+
+
+    def test_zombie_page_lists_victims(self):
+        zombie = self.save_zombie()
+        human = Human("Coach")
+        human_repository.save(human)
+        run_sql("INSERT INTO bitings (human_id, zombie_id) VALUES (%s, %s), (%s, %s)", [human.id, zombie.id] * 2)
+        html = app.test_client().get(f"/zombies/{zombie.id}").get_data(as_text=True)
+        self.assertIn("Pete", html)
+        self.assertIn("Coach (bitten 2 times)", html)
+
+
+    def test_zombie_without_victims(self):
+        zombie = self.save_zombie()
+        found, victims = zombie_repository.select_with_victims(zombie.id)
+        self.assertEqual("Walker", found.zombie_type.name)
+        self.assertEqual([], victims)
+
+
+    def test_new_biting_form_posts_through_unit_of_work(self):
+        zombie = self.save_zombie()
+        human = Human("Coach")
+        human_repository.save(human)
+        app.test_client().post("/bitings", data={"human_id": human.id, "zombie_id": zombie.id})
+        bitings = biting_repository.select_all()
+        self.assertEqual([("Pete", "Coach")], [(biting.zombie.name, biting.human.name) for biting in bitings])
+
+
+    def test_rows_named_by_a_foreign_key_are_not_deleted(self):
+        zombie = self.save_zombie()
+        human = Human("Coach")
+        human_repository.save(human)
+        run_sql("INSERT INTO bitings (human_id, zombie_id) VALUES (%s, %s)", [human.id, zombie.id])
+        client = app.test_client()
+        response = client.post(f"/zombies/{zombie.id}/delete")
+        self.assertEqual(409, response.status_code)
+        self.assertIn("Delete its bitings first", response.get_data(as_text=True))
+        self.assertEqual(409, client.post(f"/humans/{human.id}/delete").status_code)
+        self.assertEqual(409, client.post(f"/zombietypes/{zombie.zombie_type.id}/delete").status_code)
+        self.assertEqual(["Pete"], [zombie.name for zombie in zombie_repository.select_all()])
+        self.assertEqual(["Coach"], [human.name for human in human_repository.select_all()])
+
+
+    def test_rows_nothing_names_are_deleted(self):
+        zombie = self.save_zombie()
+        client = app.test_client()
+        self.assertEqual(302, client.post(f"/zombies/{zombie.id}/delete").status_code)
+        self.assertEqual(302, client.post(f"/zombietypes/{zombie.zombie_type.id}/delete").status_code)
+        self.assertEqual([], zombie_repository.select_all())
+        self.assertEqual([], zombie_type_repository.select_all())
@@ -0,0 +1,105 @@
+import unittest
+
+from app import app
+import repositories.biting_repository as biting_repository
+import repositories.human_repository as human_repository
+import repositories.zombie_repository as zombie_repository
+
+ROWS = {
+    biting_repository: [
+        {"id": id, "human_id": id, "human_name": f"Human {id}", "zombie_id": 1 + id % 3, "zombie_name": f"Zombie {1 + id % 3}", "zombie_type_id": 1, "zombie_type_name": "Walker"}
+        for id in range(1, 21)
+    ],
+    human_repository: [{"id": id, "name": f"Human <{id}>"} for id in range(1, 21)],
+    zombie_repository: [{"id": id, "name": f"Zombie {id}", "zombie_type_id": 1, "zombie_type_name": "Walker"} for id in range(1, 21)],
+}
+
+
+# The order each repository's tuple queries select their columns in
+COLUMNS = {
+    biting_repository: ["id", "human_name", "human_id", "zombie_name", "zombie_id", "zombie_type_name", "zombie_type_id"],
+    human_repository: ["name", "id"],
+    zombie_repository: ["name", "id", "zombie_type_name", "zombie_type_id"],
+}
+
+
+def as_tuple(row, columns):
+    return tuple(row[column] for column in columns)
+
+
+class TestStreamedIndexes(unittest.TestCase):
+
+    def setUp(self):
+        self.streamed = []
+        self.originals = [(module, module.run_sql, module.stream_sql) for module in ROWS]
+        for module, rows in ROWS.items():
+            module.run_sql = self.fake_run_sql(rows, COLUMNS[module])
+            module.stream_sql = self.fake_stream_sql(rows, COLUMNS[module])
+        self.original_routes = app.config["STREAMED_ROUTES"]
+
+    def tearDown(self):
+        for module, run_sql, stream_sql in self.originals:
+            module.run_sql = run_sql
+            module.stream_sql = stream_sql
+        app.config["STREAMED_ROUTES"] = self.original_routes
+
+    def fake_run_sql(self, rows, columns):
+        def run_sql(sql, values=None, tuples=False):
+            return [as_tuple(row, columns) for row in rows] if tuples else list(rows)
+        return run_sql
+
+    def fake_stream_sql(self, rows, columns):
+        def stream_sql(sql, values=None, batch_size=2000, tuples=False):
+            self.streamed.append(sql)
+            for row in rows:
+                yield as_tuple(row, columns) if tuples else row
+        return stream_sql
+
+    def get(self, path, streamed_routes):
+        app.config["STREAMED_ROUTES"] = streamed_routes
+        return app.test_client().get(path)
+
+
+    def test_buffered_route_reads_a_page(self):
+        self.get("/bitings", set())
+        self.assertEqual([], self.streamed)
+
+
+    def test_streamed_route_reads_from_cursor(self):
+        self.get("/bitings", {"bitings.bitings"})
+        self.assertEqual(1, len(self.streamed))
+
+
+    def test_streamed_response_is_sent_in_chunks(self):
+        with app.test_request_context("/bitings"):
+            app.config["STREAMED_ROUTES"] = {"bitings.bitings"}
+            response = app.view_functions["bitings.bitings"]()
+            self.assertNotIsInstance(response.response, list)
+            body = "".join(response.response)
+        self.assertEqual(1, len(self.streamed))
+        self.assertIn("Zombie 2 bit Human 1", body)
+
+
+    def test_only_selected_routes_are_streamed(self):
+        self.get("/humans", {"bitings.bitings"})
+        self.assertEqual([], self.streamed)
+
+
+    def test_bitings_output_matches_buffered(self):
+        buffered = self.get("/bitings", set()).get_data(as_text=True)
+        streamed = self.get("/bitings", {"bitings.bitings"}).get_data(as_text=True)
+        self.assertIn("Zombie 2 bit Human 1", streamed)
+        self.assertEqual(buffered, streamed)
+
+
+    def test_humans_output_matches_buffered(self):
+        buffered = self.get("/humans", set()).get_data(as_text=True)
+        streamed = self.get("/humans", {"humans.humans"}).get_data(as_text=True)
+        self.assertIn("Human &lt;20&gt;", streamed)
+        self.assertEqual(buffered, streamed)
+
+
+    def test_zombies_output_matches_buffered(self):
+        buffered = self.get("/zombies", set()).get_data(as_text=True)
+        streamed = self.get("/zombies", {"zombies.zombies"}).get_data(as_text=True)
+        self.assertEqual(buffered, streamed)
@@ -0,0 +1,96 @@
+import time
+import unittest
+
+import shared.db.config as config
+import shared.db.table_cache as table_cache
+from shared.tests.doubles import FakeListenConnection
+
+from app import app
+from models.zombie_type import ZombieType
+import repositories.human_repository as human_repository
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+REPOSITORIES = [human_repository, zombie_repository, zombie_type_repository]
+
+
+class TestTableCache(unittest.TestCase):
+
+    def setUp(self):
+        self.queries = []
+        self.connections = []
+        self.original = (config.TABLE_CACHE, config.DATABASE_BACKEND)
+        self.originals = [(module, module.run_sql) for module in REPOSITORIES]
+        for module in REPOSITORIES:
+            module.run_sql = self.fake_run_sql
+        config.TABLE_CACHE = True
+        config.DATABASE_BACKEND = "postgres"
+        table_cache.reset_stats()
+        self.listener = table_cache.start(connect=self.connect, retry_after=0.01)
+        self.assertTrue(self.listener.wait(2))
+
+    def tearDown(self):
+        table_cache.stop()
+        for module, original in self.originals:
+            module.run_sql = original
+        config.TABLE_CACHE, config.DATABASE_BACKEND = self.original
+
+    def connect(self, dsn):
+        connection = FakeListenConnection(dsn)
+        self.connections.append(connection)
+        return connection
+
+    def fake_run_sql(self, sql, values=None, tuples=False):
+        self.queries.append(sql)
+        if sql.startswith("SELECT name, id FROM zombie_types"):
+            return [("Walker", 3), ("Runner", 4)]
+        if sql.startswith("SELECT * FROM zombie_types"):
+            return [{"id": int(values[0]), "name": "Walker"}]
+        if sql.startswith("SELECT * FROM zombies"):
+            return [{"id": int(values[0]), "name": "Pete", "zombie_type_id": 3}]
+        if sql.startswith("SELECT * FROM humans"):
+            return [{"id": int(values[0]), "name": "Frodo"}]
+        return []
+
+    def notify(self, payload):
+        # Sends a notification and waits for the listener to handle it
+        handled = table_cache.stats()["notifications"] + 1
+        self.connections[-1].notify(payload)
+        self.wait_until(lambda: table_cache.stats()["notifications"] == handled)
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 2
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("timed out waiting for the listener")
+            time.sleep(0.001)
+
+
+    def test_select_and_select_all_are_shared_across_requests(self):
+        with app.test_request_context("/zombies/1"):
+            zombie = zombie_repository.select(1)
+            zombie_types = zombie_type_repository.select_all()
+        with app.test_request_context("/zombies/1"):
+            self.assertIs(zombie, zombie_repository.select("1"))
+            self.assertEqual(zombie_types, zombie_type_repository.select_all())
+            self.assertIsNot(zombie_types, zombie_type_repository.select_all())
+        self.assertEqual(3, len(self.queries))
+        self.assertEqual(3, table_cache.stats()["hits"])
+
+
+    def test_star_evicts_the_whole_table_and_its_dependents(self):
+        zombie_repository.select(1)
+        human_repository.select(1)
+        self.notify(f"zombie_types:{time.time()}:*")
+        stats = table_cache.stats()
+        self.assertEqual(0, stats["tables"]["zombie_types"])
+        self.assertEqual(0, stats["tables"]["zombies"])
+        self.assertEqual(1, stats["tables"]["humans"])
+        self.assertGreaterEqual(stats["lag_last"], 0)
+
+
+    def test_local_writes_evict_straight_away(self):
+        zombie_type_repository.select_all()
+        zombie_type_repository.update(ZombieType("Crawler", 3))
+        zombie_type_repository.select_all()
+        self.assertEqual(3, len(self.queries))
@@ -0,0 +1,51 @@
+import unittest
+
+from app import app
+import repositories.zombie_repository as zombie_repository
+import repositories.zombie_type_repository as zombie_type_repository
+
+REPOSITORIES = [zombie_repository, zombie_type_repository]
+
+
+class TestZombieDetail(unittest.TestCase):
+
+    def setUp(self):
+        self.queries = []
+        self.originals = [(module, module.run_sql) for module in REPOSITORIES]
+        for module in REPOSITORIES:
+            module.run_sql = self.fake_run_sql
+
+    def tearDown(self):
+        for module, original in self.originals:
+            module.run_sql = original
+
+    def fake_run_sql(self, sql, values=None):
+        self.queries.append(sql)
+        if values != [1] and values != ["1"]:
+            return []
+        victims = [{"id": 7, "name": "Eddie", "bites": 1}, {"id": 9, "name": "Coach", "bites": 3}]
+        return [{"id": 1, "name": "Pete", "zombie_type_id": 3, "zombie_type_name": "Walker", "victims": victims}]
+
+
+    def test_zombie_and_victims_come_from_one_query(self):
+        zombie, victims = zombie_repository.select_with_victims(1)
+        self.assertEqual(1, len(self.queries))
+        self.assertIn("json_agg", self.queries[0])
+        self.assertEqual("Walker", zombie.zombie_type.name)
+        self.assertEqual([(7, "Eddie", 1), (9, "Coach", 3)], [(human.id, human.name, bites) for human, bites in victims])
+
+
+    def test_missing_zombie(self):
+        self.assertEqual((None, []), zombie_repository.select_with_victims(2))
+
+
+    def test_show_page_lists_victims_with_bite_counts(self):
+        response = app.test_client().get("/zombies/1")
+        html = response.get_data(as_text=True)
+        self.assertEqual(1, len(self.queries))
+        self.assertIn("Eddie</li>", html)
+        self.assertIn("Coach (bitten 3 times)", html)
+
+
+    def test_show_page_for_missing_zombie_is_not_found(self):
+        self.assertEqual(404, app.test_client().get("/zombies/2").status_code)
@@ -0,0 +1,4 @@
+# Code shared by the week 2 apps: run_sql and the rest of the database code
+# in shared.db. Install it once, from the week_2 directory, with
+#   pip3 install -e .
+# so that every app imports the same copy and a fix here reaches them all.
@@ -0,0 +1,47 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+# Timing and reporting for the apps' benchmarks/ scripts
+
+
+@contextmanager
+def count_queries(*modules):
+    # Wraps the run_sql each module imported, so every statement it sends is counted
+    counter = {"queries": 0}
+    originals = [(module, module.run_sql) for module in modules]
+    for module, original in originals:
+        module.run_sql = _counting(original, counter)
+    try:
+        yield counter
+    finally:
+        for module, original in originals:
+            module.run_sql = original
+
+
+def _counting(run_sql, counter):
+    def counting_run_sql(sql, values=None, tuples=False):
+        counter["queries"] += 1
+        return run_sql(sql, values, tuples)
+    return counting_run_sql
+
+
+def time_calls(function, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, timings, queries=None):
+    line = f"{label:<45} median {statistics.median(timings) * 1000:10.1f} ms   best {min(timings) * 1000:10.1f} ms"
+    if queries is not None:
+        line += f"   {queries} queries"
+    print(line)
+
+
+def report_latencies(label, latencies):
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"{label:<45} p50 {percentiles[49] * 1000:10.1f} ms   p99 {percentiles[98] * 1000:10.1f} ms   {len(latencies)} samples")
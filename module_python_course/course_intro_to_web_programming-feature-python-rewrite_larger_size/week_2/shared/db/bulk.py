@@ -0,0 +1,263 @@
+import codecs
+import csv
+import time
+
+import psycopg2
+import psycopg2.extras as ext
+
+import shared.db.config as config
+from shared.db.connection_pool import get_pool
+import shared.db.instrumentation as instrumentation
+import shared.db.unit_of_work as unit_of_work
+
+
+def insert_many(table, columns, rows):
+    # Inserts all rows in one transaction and returns their new ids, in order.
+    # On Postgres the ids are reserved from the table's sequence first and
+    # sent with the rows, in a multi-row INSERT for moderate batches and
+    # streamed with COPY for large ones. Neither reads them back with
+    # INSERT ... RETURNING id, whose order is not promised (see _reserve_ids).
+    # Inside a unit of work the rows become part of its transaction instead.
+    # A failed insert is rolled back, recorded and raised.
+    rows = list(rows)
+    if not rows:
+        return []
+    ids = []
+    pool = None
+    conn = None
+    failure = None
+    unit = unit_of_work.current()
+    started = time.perf_counter()
+    try:
+        pool, conn = _connection(unit)
+        cur = conn.cursor()
+        if config.DATABASE_BACKEND == "sqlite":
+            ids = _insert_rows(cur, table, columns, rows)
+        elif len(rows) < config.BULK_COPY_THRESHOLD:
+            ids = _insert_values(cur, table, columns, rows)
+        else:
+            ids = _copy(cur, table, columns, rows)
+        if unit is None:
+            conn.commit()
+        cur.close()
+    except (Exception, psycopg2.DatabaseError) as error:
+        failure = error
+        ids = []
+        _failed(unit, conn)
+        raise
+    finally:
+        if pool is not None and conn is not None:
+            pool.putconn(conn)
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+        instrumentation.record(sql, time.perf_counter() - started, len(ids), failure)
+    return ids
+
+
+def delete_many(table, ids):
+    ids = list(ids)
+    if not ids:
+        return
+    pool = None
+    conn = None
+    failure = None
+    sql = f"DELETE FROM {table} WHERE id = ANY(%s)"
+    unit = unit_of_work.current()
+    started = time.perf_counter()
+    try:
+        pool, conn = _connection(unit)
+        cur = conn.cursor()
+        cur.execute(sql, [[int(id) for id in ids]])
+        if unit is None:
+            conn.commit()
+        cur.close()
+    except (Exception, psycopg2.DatabaseError) as error:
+        failure = error
+        _failed(unit, conn)
+        raise
+    finally:
+        if pool is not None and conn is not None:
+            pool.putconn(conn)
+        instrumentation.record(sql, time.perf_counter() - started, 0 if failure else len(ids), failure)
+
+
+def import_csv(table, columns, file):
+    # Loads a CSV file with a header row into table and returns a summary of
+    # the rows inserted and rejected. columns maps each CSV column to the
+    # table its value must be an id of, or None for plain text.
+    #
+    # The file is read COPY_CHUNK_SIZE bytes at a time and copied into a
+    # temporary staging table, so it is never all in memory at once. Valid
+    # rows then go into table in one INSERT ... SELECT; the rest are counted
+    # by reason, with the number of the first data row to fail that way.
+    # Inside a unit of work the import becomes part of its transaction.
+    #
+    # A file that cannot be imported gives {"error": ...} back; a failed
+    # import is rolled back, recorded and raised.
+    if config.DATABASE_BACKEND == "sqlite":
+        return {"error": "importing CSV files needs COPY, which only the Postgres backend has"}
+    header = _csv_header(file)
+    if header is None or sorted(header) != sorted(columns):
+        return {"error": f"the first line must be a header naming the columns {', '.join(columns)}"}
+    staging = f"staging_{table}"
+    summary = {"inserted": 0, "rejected": 0, "errors": {}}
+    pool = None
+    conn = None
+    failure = None
+    unit = unit_of_work.current()
+    started = time.perf_counter()
+    try:
+        pool, conn = _connection(unit)
+        cur = conn.cursor()
+        staging_columns = ", ".join(f"{column} TEXT" for column in columns)
+        cur.execute(f"CREATE TEMPORARY TABLE {staging} (csv_row BIGSERIAL, {staging_columns}) ON COMMIT DROP")
+        sql = f"COPY {staging} ({', '.join(header)}) FROM STDIN WITH (FORMAT csv)"
+        cur.copy_expert(sql, file, size=config.COPY_CHUNK_SIZE)
+        cur.execute(_import_sql(table, columns, staging))
+        for error, rows, first_row in cur.fetchall():
+            if error is None:
+                summary["inserted"] = rows
+            else:
+                summary["rejected"] += rows
+                summary["errors"][error] = {"rows": rows, "first_row": first_row}
+        # A unit of work may import into the same table again before it commits
+        cur.execute(f"DROP TABLE {staging}")
+        if unit is None:
+            conn.commit()
+        cur.close()
+    except (Exception, psycopg2.DatabaseError) as error:
+        failure = error
+        summary["inserted"] = 0
+        _failed(unit, conn)
+        raise
+    finally:
+        if pool is not None and conn is not None:
+            pool.putconn(conn)
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        instrumentation.record(sql, time.perf_counter() - started, summary["inserted"], failure)
+    return summary
+
+
+def _connection(unit):
+    # Returns (pool, connection); pool is None when the connection belongs to
+    # a unit of work and must not be given back here
+    if unit is not None:
+        return None, unit.connection()
+    pool = get_pool()
+    return pool, pool.getconn()
+
+
+def _failed(unit, conn):
+    if unit is not None:
+        unit.fail()
+    elif conn is not None and not conn.closed:
+        conn.rollback()
+
+
+def _csv_header(file):
+    line = file.readline()
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    line = line.lstrip(codecs.BOM_UTF8.decode("utf-8")).strip()
+    if not line:
+        return None
+    return [column.strip() for column in next(csv.reader([line]))]
+
+
+def _import_sql(table, columns, staging):
+    # parsed turns id columns into ints (NULL if they are not whole numbers),
+    # checked joins them to the tables they refer to and names the first
+    # problem with each row, and inserted writes the rows without one
+    parsed = ["csv_row"]
+    selected = ["parsed.csv_row"]
+    joins = []
+    problems = []
+    for column, references in columns.items():
+        selected.append(f"parsed.{column}")
+        if references is None:
+            parsed.append(column)
+            continue
+        parsed.append(f"{column} AS {column}_text")
+        parsed.append(f"CASE WHEN {column} ~ '^\\s*[0-9]{{1,9}}\\s*$' THEN {column}::INT END AS {column}")
+        joins.append(f"LEFT JOIN {references} AS {column}_reference ON {column}_reference.id = parsed.{column}")
+        problems.append(f"WHEN parsed.{column}_text IS NULL THEN '{column} is missing'")
+        problems.append(f"WHEN parsed.{column} IS NULL THEN '{column} is not a whole number'")
+        problems.append(f"WHEN {column}_reference.id IS NULL THEN '{column} is not the id of any of the {references}'")
+    error = f"CASE {' '.join(problems)} END" if problems else "NULL::TEXT"
+    return f"""
+        WITH parsed AS (
+            SELECT {', '.join(parsed)} FROM {staging}
+        ), checked AS (
+            SELECT {', '.join(selected)}, {error} AS error
+            FROM parsed {' '.join(joins)}
+        ), inserted AS (
+            INSERT INTO {table} ({', '.join(columns)})
+            SELECT {', '.join(columns)} FROM checked WHERE error IS NULL ORDER BY csv_row
+        )
+        SELECT error, COUNT(*), MIN(csv_row) FROM checked GROUP BY error
+    """
+
+
+def _reserve_ids(cur, table, count):
+    # Each row is inserted with the id it is returned with. A multi-row
+    # INSERT ... RETURNING id does not promise to give its ids back in the
+    # order of the rows, so callers zipping them onto their models could
+    # pair a model with another row's id.
+    cur.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+        [table, count],
+    )
+    return sorted(result[0] for result in cur.fetchall())
+
+
+def _insert_values(cur, table, columns, rows):
+    ids = _reserve_ids(cur, table, len(rows))
+    sql = f"INSERT INTO {table} (id, {', '.join(columns)}) VALUES %s"
+    ext.execute_values(cur, sql, [[id] + list(row) for id, row in zip(ids, rows)], page_size=config.BULK_PAGE_SIZE)
+    return ids
+
+
+def _insert_rows(cur, table, columns, rows):
+    # SQLite runs in-process, so one INSERT per row costs no round trips and
+    # gives each id in order, which a multi-row RETURNING does not promise
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    ids = []
+    for row in rows:
+        cur.execute(sql, row)
+        ids.append(cur.lastrowid)
+    return ids
+
+
+def _copy(cur, table, columns, rows):
+    ids = _reserve_ids(cur, table, len(rows))
+    sql = f"COPY {table} (id, {', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cur.copy_expert(sql, CsvStream([id] + list(row) for id, row in zip(ids, rows)))
+    return ids
+
+
+class CsvStream:
+    # A read-only file that encodes rows as CSV only as COPY asks for them,
+    # so a large batch is never held in memory as one big string.
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += ",".join(_csv_field(value) for value in row) + "\n"
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def _csv_field(value):
+    # COPY reads an unquoted empty field as NULL and a quoted one as ''
+    if value is None:
+        return ""
+    if isinstance(value, (bool, int, float)):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
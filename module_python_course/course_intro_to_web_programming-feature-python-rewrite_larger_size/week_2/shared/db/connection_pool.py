@@ -0,0 +1,243 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions as extensions
+
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+
+# The pool hands out Postgres or SQLite connections, see _new_pool, so
+# failing to roll back, ping or close one raises either kind of error
+DATABASE_ERRORS = (psycopg2.Error, sqlite3.Error)
+
+
+class PoolError(Exception):
+    pass
+
+
+class ConnectionPool:
+
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=30, health_check_after=30, connect=psycopg2.connect):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._connect = connect
+        self._condition = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._counters = {
+            "opened": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+        }
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append((self._open(), time.monotonic()))
+
+
+    def getconn(self):
+        while True:
+            conn, idle_since = self._checkout()
+            if conn is None:
+                return self._open_reserved()
+            if self._is_healthy(conn, idle_since):
+                return conn
+            with self._condition:
+                self._counters["health_check_failures"] += 1
+            self._discard(conn)
+
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except DATABASE_ERRORS:
+                discard = True
+        with self._condition:
+            if not (discard or conn.closed or self._closed):
+                self._idle.append((conn, time.monotonic()))
+                self._condition.notify()
+                return
+        self._discard(conn)
+
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        except BaseException:
+            self.putconn(conn, discard=bool(conn.closed))
+            raise
+        self.putconn(conn)
+
+
+    def warm(self, size=None):
+        # Opens connections up front, up to size (default min_size), so the
+        # first requests a new process serves do not pay for connecting
+        size = min(self.min_size if size is None else size, self.max_size)
+        conns = []
+        try:
+            for _ in range(size):
+                conns.append(self.getconn())
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+        return len(conns)
+
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._counters)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["min_size"] = self.min_size
+            stats["max_size"] = self.max_size
+        return stats
+
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._condition.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            waited = False
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    self._counters["checkouts"] += 1
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    # Reserve the slot now and connect outside the lock
+                    self._size += 1
+                    self._counters["checkouts"] += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolError(f"no connection available after {self.timeout} seconds")
+                if not waited:
+                    self._counters["waits"] += 1
+                    waited = True
+                self._condition.wait(remaining)
+
+
+    def _open(self):
+        conn = self._connect(self.dsn)
+        self._counters["opened"] += 1
+        return conn
+
+
+    def _open_reserved(self):
+        try:
+            conn = self._connect(self.dsn)
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._counters["opened"] += 1
+        return conn
+
+
+    def _is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            cur.close()
+            conn.rollback()
+        except DATABASE_ERRORS:
+            return False
+        return True
+
+
+    def _discard(self, conn):
+        try:
+            if not conn.closed:
+                conn.close()
+        except DATABASE_ERRORS:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._counters["closed"] += 1
+            self._condition.notify()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool, _pool_pid
+    # A forked worker must not share its parent's sockets, so each process
+    # builds its own pool the first time it needs one.
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = _new_pool()
+            _pool_pid = pid
+    return _pool
+
+
+def _new_pool():
+    if config.DATABASE_BACKEND == "sqlite":
+        # Idle SQLite connections stay open for the life of the process and
+        # a local file cannot drop them, so they are never pinged
+        return ConnectionPool(
+            config.SQLITE_PATH,
+            min_size=config.POOL_MIN_SIZE,
+            max_size=config.POOL_MAX_SIZE,
+            timeout=config.POOL_TIMEOUT,
+            health_check_after=float("inf"),
+            connect=sqlite_backend.connect,
+        )
+    if config.DATABASE_BACKEND != "postgres":
+        raise ValueError(f"DATABASE_BACKEND must be 'postgres' or 'sqlite', not {config.DATABASE_BACKEND!r}")
+    return ConnectionPool(
+        config.DATABASE_URL,
+        min_size=config.POOL_MIN_SIZE,
+        max_size=config.POOL_MAX_SIZE,
+        timeout=config.POOL_TIMEOUT,
+        health_check_after=config.POOL_HEALTH_CHECK_AFTER,
+    )
+
+
+def close_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+        _pool_pid = None
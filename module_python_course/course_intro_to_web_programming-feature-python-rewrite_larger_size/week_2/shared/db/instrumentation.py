@@ -0,0 +1,121 @@
+import json
+import logging
+import re
+import threading
+from collections import Counter
+
+import shared.db.config as config
+
+try:
+    from flask import g, has_request_context, request
+except ImportError:
+    # Scripts without Flask still get statement logs, just no request summary
+    g = request = None
+
+    def has_request_context():
+        return False
+
+# Every statement run_sql sends is logged to "db.queries" as one line of JSON:
+# DEBUG for each statement, INFO for the summary at the end of a request,
+# WARNING when a request repeats a statement, ERROR when a statement fails.
+# The same fields are attached to the log record as record.query.
+log = logging.getLogger("db.queries")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"%s|%\(\w+\)s")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+class RepeatedQueryError(Exception):
+    pass
+
+
+class QueryLog:
+    # The statements one request has run, kept on flask.g as g.queries
+
+    def __init__(self):
+        self.statements = []
+        self.counts = Counter()
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, statement):
+        with self._lock:
+            self.statements.append(statement)
+            self.total_ms += statement["ms"]
+            self.counts[statement["fingerprint"]] += 1
+            return self.counts[statement["fingerprint"]]
+
+    def repeated(self):
+        return {fingerprint: count for fingerprint, count in self.counts.most_common() if count > config.QUERY_REPEAT_LIMIT}
+
+    def summary(self):
+        return {
+            "statements": len(self.statements),
+            "ms": round(self.total_ms, 3),
+            "rows": sum(statement["rows"] for statement in self.statements),
+            "fingerprints": len(self.counts),
+            "repeated": self.repeated(),
+        }
+
+
+def fingerprint(sql):
+    # The shape of a statement with its values taken out, so that the same
+    # query run for different ids counts as the same statement
+    sql = _STRING.sub("?", sql)
+    sql = _PARAMETER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _LIST.sub("(?)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def record(sql, seconds, rows, error=None):
+    statement = {"fingerprint": fingerprint(sql), "ms": round(seconds * 1000, 3), "rows": rows}
+    if error is not None:
+        statement["error"] = str(error).strip()
+        _log(logging.ERROR, "sql_error", statement)
+    else:
+        _log(logging.DEBUG, "sql", statement)
+    queries = current()
+    if queries is None:
+        return
+    count = queries.add(statement)
+    if count == config.QUERY_REPEAT_LIMIT + 1:
+        _repeated(statement["fingerprint"], count)
+
+
+def current():
+    if not has_request_context():
+        return None
+    if "queries" not in g:
+        g.queries = QueryLog()
+    return g.queries
+
+
+def init_app(app):
+    app.teardown_request(_log_summary)
+
+
+def _repeated(fingerprint, count):
+    if config.QUERY_REPEAT_ACTION == "ignore":
+        return
+    _log(logging.WARNING, "repeated_sql", {"fingerprint": fingerprint, "count": count, "limit": config.QUERY_REPEAT_LIMIT})
+    if config.QUERY_REPEAT_ACTION == "raise":
+        raise RepeatedQueryError(f"ran more than {config.QUERY_REPEAT_LIMIT} times in one request: {fingerprint}")
+
+
+def _log_summary(exception=None):
+    queries = g.pop("queries", None)
+    if queries is not None:
+        _log(logging.INFO, "request_sql", queries.summary())
+
+
+def _log(level, event, fields):
+    if not log.isEnabledFor(level):
+        return
+    fields = dict(fields, event=event)
+    if has_request_context():
+        fields["endpoint"] = request.endpoint
+    log.log(level, json.dumps(fields), extra={"query": fields})
@@ -0,0 +1,183 @@
+import itertools
+import re
+import threading
+import weakref
+from collections import OrderedDict
+
+import psycopg2
+import psycopg2.errors
+
+import shared.db.config as config
+
+# Statements that get the same plan every time and are worth preparing
+_PREPARABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+_SCHEMA_CHANGE = re.compile(r"^\s*(CREATE|ALTER|DROP)\b", re.IGNORECASE)
+# A quoted string or identifier, or a placeholder outside of one
+_PLACEHOLDER = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|%%|%s")
+
+# Prepared statements live in the server session, so they are tracked per
+# connection. Connections are only ever used by one thread at a time.
+_connections = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_names = itertools.count(1)
+_schema_version = 0
+_counters = {"prepared": 0, "executed": 0, "evicted": 0, "invalidated": 0}
+
+
+class _Statements:
+
+    def __init__(self):
+        self.prepared = OrderedDict()
+        self.seen = OrderedDict()
+        self.unpreparable = set()
+        self.schema_version = _schema_version
+
+    def is_hot(self, sql):
+        count = self.seen.pop(sql, 0) + 1
+        if count >= config.PREPARE_THRESHOLD:
+            return True
+        self.seen[sql] = count
+        while len(self.seen) > 4 * config.PREPARED_STATEMENT_CACHE_SIZE:
+            self.seen.popitem(last=False)
+        return False
+
+
+def execute(conn, cur, sql, values=None, in_transaction=False):
+    # Runs sql on cur like cur.execute, but once a statement has been seen
+    # PREPARE_THRESHOLD times on this connection it is PREPAREd and from then
+    # on sent as EXECUTE, so the server skips parsing and planning it.
+    # in_transaction means earlier statements in the open transaction must
+    # survive, so nothing here may roll it back.
+    if config.DATABASE_BACKEND == "sqlite":
+        # sqlite3 already keeps each connection's compiled statements
+        cur.execute(sql, values)
+        return
+    if _SCHEMA_CHANGE.match(sql):
+        cur.execute(sql, values)
+        invalidate()
+        return
+    if config.PREPARED_STATEMENT_CACHE_SIZE <= 0 or not _PREPARABLE.match(sql) or isinstance(values, dict):
+        cur.execute(sql, values)
+        return
+
+    statements = _statements_for(conn)
+    if statements.schema_version != _schema_version:
+        _deallocate_all(cur, statements)
+
+    name = statements.prepared.get(sql)
+    if name is None:
+        if sql in statements.unpreparable or not statements.is_hot(sql):
+            cur.execute(sql, values)
+            return
+        name = _prepare(conn, cur, statements, sql, values, in_transaction)
+        if name is None:
+            cur.execute(sql, values)
+            return
+    else:
+        statements.prepared.move_to_end(sql)
+
+    try:
+        _execute_prepared(cur, name, values)
+    except psycopg2.errors.FeatureNotSupported:
+        # "cached plan must not change result type": a table was altered by
+        # another process, so start again from unprepared statements
+        if in_transaction:
+            invalidate()
+            raise
+        conn.rollback()
+        invalidate()
+        _deallocate_all(cur, statements)
+        cur.execute(sql, values)
+
+
+def invalidate():
+    # Every connection drops its prepared statements before its next use
+    global _schema_version
+    with _lock:
+        _schema_version += 1
+        _counters["invalidated"] += 1
+
+
+def stats():
+    with _lock:
+        return dict(_counters)
+
+
+def _statements_for(conn):
+    statements = _connections.get(conn)
+    if statements is None:
+        with _lock:
+            statements = _connections.setdefault(conn, _Statements())
+    return statements
+
+
+def _prepare(conn, cur, statements, sql, values, in_transaction=False):
+    numbered, count = _numbered(sql)
+    if count != len(values or []):
+        statements.unpreparable.add(sql)
+        return None
+    name = f"run_sql_{next(_names)}"
+    try:
+        if in_transaction:
+            cur.execute("SAVEPOINT prepare_statement")
+        cur.execute(f"PREPARE {name} AS {numbered}")
+        if in_transaction:
+            cur.execute("RELEASE SAVEPOINT prepare_statement")
+    except psycopg2.Error:
+        # e.g. a parameter whose type the server cannot work out on its own
+        if in_transaction:
+            cur.execute("ROLLBACK TO SAVEPOINT prepare_statement")
+        else:
+            conn.rollback()
+        statements.unpreparable.add(sql)
+        return None
+    statements.prepared[sql] = name
+    _count("prepared")
+    while len(statements.prepared) > config.PREPARED_STATEMENT_CACHE_SIZE:
+        _, evicted = statements.prepared.popitem(last=False)
+        cur.execute(f"DEALLOCATE {evicted}")
+        _count("evicted")
+    return name
+
+
+def _execute_prepared(cur, name, values):
+    if values:
+        placeholders = ", ".join(["%s"] * len(values))
+        cur.execute(f"EXECUTE {name} ({placeholders})", values)
+    else:
+        cur.execute(f"EXECUTE {name}")
+    _count("executed")
+
+
+def _deallocate_all(cur, statements):
+    if statements.prepared:
+        cur.execute("DEALLOCATE ALL")
+    statements.prepared.clear()
+    statements.seen.clear()
+    statements.unpreparable.clear()
+    statements.schema_version = _schema_version
+
+
+def _numbered(sql):
+    # PREPARE takes $1, $2, ... where psycopg2 takes %s. A %s inside quotes
+    # is left alone and not counted, so the count falls short of the values
+    # and the statement is never prepared: psycopg2 would have put a value
+    # there, which $1 inside a string cannot do.
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        text = match.group()
+        if text[0] in "'\"":
+            return text.replace("%%", "%")
+        if text == "%%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    return _PLACEHOLDER.sub(replace, sql), count
+
+
+def _count(counter):
+    with _lock:
+        _counters[counter] += 1
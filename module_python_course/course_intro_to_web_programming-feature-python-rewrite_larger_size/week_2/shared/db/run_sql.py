@@ -0,0 +1,75 @@
+import time
+import uuid
+
+import psycopg2
+import psycopg2.extras as ext
+
+from shared.db.connection_pool import get_pool
+import shared.db.instrumentation as instrumentation
+import shared.db.prepared as prepared
+import shared.db.unit_of_work as unit_of_work
+
+def run_sql(sql, values = None, tuples = False):
+    # Rows come back as DictRows, or with tuples=True as plain tuples in
+    # SELECT order, which take about half the memory for callers that map
+    # them straight onto models by position
+    results = []
+    pool = None
+    conn = None
+    failure = None
+    unit = unit_of_work.current()
+    started = time.perf_counter()
+    try:
+        if unit is not None:
+            conn = unit.connection()
+        else:
+            pool = get_pool()
+            conn = pool.getconn()
+        cur = conn.cursor(cursor_factory=None if tuples else ext.DictCursor)
+        prepared.execute(conn, cur, sql, values, in_transaction=unit is not None)
+        if unit is None:
+            conn.commit()
+        if cur.description is not None:
+            results = cur.fetchall()
+        cur.close()
+    except (Exception, psycopg2.DatabaseError) as error:
+        # Logged as a failure rather than as a query with no rows, then
+        # raised, so the caller cannot mistake it for an empty result
+        failure = error
+        if unit is not None:
+            unit.fail()
+        raise
+    finally:
+        if conn is not None and unit is None:
+            pool.putconn(conn)
+        instrumentation.record(sql, time.perf_counter() - started, len(results), failure)
+    return results
+
+
+def stream_sql(sql, values = None, batch_size = 2000, tuples = False):
+    # Rows come from a named (server-side) cursor, batch_size at a time, so a
+    # whole table can be scanned without loading it into memory. The pooled
+    # connection stays checked out until the generator is exhausted or closed.
+    pool = None
+    conn = None
+    failure = None
+    rows = 0
+    started = time.perf_counter()
+    try:
+        pool = get_pool()
+        conn = pool.getconn()
+        cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=None if tuples else ext.DictCursor)
+        cur.itersize = batch_size
+        cur.execute(sql, values)
+        for row in cur:
+            rows += 1
+            yield row
+        cur.close()
+        conn.commit()
+    except (Exception, psycopg2.DatabaseError) as error:
+        failure = error
+        raise
+    finally:
+        if conn is not None:
+            pool.putconn(conn)
+        instrumentation.record(sql, time.perf_counter() - started, rows, failure)
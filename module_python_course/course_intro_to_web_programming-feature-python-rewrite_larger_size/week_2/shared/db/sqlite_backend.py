@@ -0,0 +1,225 @@
+import functools
+import json
+import os
+import re
+import sqlite3
+import sys
+
+import psycopg2.extensions as extensions
+
+import shared.db.config as config
+
+# With DATABASE_BACKEND = "sqlite" the connection pool hands out these
+# connections to a local SQLite file instead of connections to Postgres, so
+# the apps run without a database server. The repositories keep writing
+# Postgres SQL and translate() rewrites what SQLite spells differently:
+#
+#   %s placeholders          ?
+#   column = ANY(%s)         column IN (SELECT value FROM json_each(?)), the
+#                            list of values is sent as one JSON array
+#   INSERT ... RETURNING     native from SQLite 3.35, re-read by rowid before
+#
+# Anything else Postgres-only (COPY, json_agg, PREPARE, server-side cursors)
+# has to be avoided or given its own SQLite path by the caller.
+#
+# Connections are opened in WAL mode, so readers never wait for the writer,
+# and are kept open by the pool for the life of the process.
+
+NATIVE_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+_PLACEHOLDER = re.compile(r"=\s*ANY\s*\(\s*%s\s*\)|%%|%s", re.IGNORECASE)
+_RETURNING = re.compile(r"^\s*INSERT\s+INTO\s+(\w+)\b(.*?)\s+RETURNING\s+(.+?)\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+_WRITE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+# Schema files mark what SQLite cannot run, such as PL/pgSQL triggers, with
+# these lines; a file next to them ending .sqlite.sql has SQLite's version
+_POSTGRES_ONLY = re.compile(r"^-- postgres only$.*?^-- end postgres only$", re.MULTILINE | re.DOTALL)
+
+_SCHEMA_RULES = [
+    (re.compile(r"\b(BIG)?SERIAL\s+PRIMARY\s+KEY\b", re.IGNORECASE), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\b(BIG)?SERIAL\b", re.IGNORECASE), "INTEGER"),
+    (re.compile(r"\bDROP\s+TABLE\s+(?!IF\s+EXISTS\b)", re.IGNORECASE), "DROP TABLE IF EXISTS "),
+    (re.compile(r"\bINDEX\s+CONCURRENTLY\b", re.IGNORECASE), "INDEX"),
+]
+
+
+def _boolean(value):
+    # Postgres accepts 'True' and 'False' for a BOOLEAN, so forms send those
+    return value.lower() in (b"1", b"t", b"true")
+
+
+sqlite3.register_converter("BOOLEAN", _boolean)
+
+
+class Connection:
+    # Just enough of a psycopg2 connection for run_sql, bulk and the pool
+
+    def __init__(self, path):
+        # Pooled connections move between threads, one user at a time
+        self._conn = sqlite3.connect(
+            path,
+            timeout=config.POOL_TIMEOUT,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        # In WAL mode a commit is still atomic with NORMAL, it is only the
+        # last few commits that can be lost if the machine loses power
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self.closed = 0
+
+    def cursor(self, name=None, cursor_factory=None):
+        # Every cursor reads a SELECT as it goes, named or not. Asking for any
+        # cursor_factory gets rows that can be indexed by column name like a
+        # DictRow, otherwise they are plain tuples as from psycopg2
+        cursor = self._conn.cursor()
+        if cursor_factory is None:
+            cursor.row_factory = None
+        return Cursor(cursor)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+        self.closed = 1
+
+    def get_transaction_status(self):
+        if self._conn.in_transaction:
+            return extensions.TRANSACTION_STATUS_INTRANS
+        return extensions.TRANSACTION_STATUS_IDLE
+
+
+class Cursor:
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._rows = None
+        self.itersize = 2000
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, sql, values=None):
+        translated, arrays, returning = translate(sql, NATIVE_RETURNING)
+        values = list(values or [])
+        for index in arrays:
+            values[index] = json.dumps(list(values[index]))
+        self._rows = None
+        self._cursor.execute(translated, values)
+        if returning is not None:
+            table, columns = returning
+            self._cursor.execute(f"SELECT {columns} FROM {table} WHERE rowid = ?", [self._cursor.lastrowid])
+        elif self._cursor.description is not None and _WRITE.match(translated):
+            # SQLite will not commit while a RETURNING statement still has
+            # rows to give, so they are read now, as psycopg2 would
+            self._rows = self._cursor.fetchall()
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=None):
+        size = self.itersize if size is None else size
+        if self._rows is None:
+            return self._cursor.fetchmany(size)
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        if self._rows is None:
+            return self._cursor.fetchall()
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany()
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._cursor.close()
+
+
+def connect(path):
+    return Connection(path)
+
+
+@functools.lru_cache(maxsize=512)
+def translate(sql, native_returning=True):
+    # Returns the SQLite statement, the positions of the values that are
+    # lists for = ANY(%s), and for INSERT ... RETURNING on an old SQLite the
+    # (table, columns) to read back afterwards, else None
+    arrays = []
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group() == "%%":
+            return "%"
+        count += 1
+        if match.group() == "%s":
+            return "?"
+        arrays.append(count - 1)
+        return "IN (SELECT value FROM json_each(?))"
+
+    translated = _PLACEHOLDER.sub(replace, sql)
+    returning = None
+    if not native_returning:
+        match = _RETURNING.match(translated)
+        if match is not None:
+            table, insert, columns = match.groups()
+            translated = f"INSERT INTO {table}{insert}"
+            returning = (table, columns)
+    return translated, tuple(arrays), returning
+
+
+def translate_schema(sql):
+    sql = _POSTGRES_ONLY.sub("", sql)
+    for pattern, replacement in _SCHEMA_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def load_schema(schema_path, path=None):
+    # Creates the tables from one of the Postgres schema files in an app's db/
+    with open(schema_path) as file:
+        sql = translate_schema(file.read())
+    sqlite_only = os.path.splitext(schema_path)[0] + ".sqlite.sql"
+    if os.path.exists(sqlite_only):
+        with open(sqlite_only) as file:
+            sql += "\n" + file.read()
+    conn = sqlite3.connect(path or config.SQLITE_PATH)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(sql)
+    finally:
+        conn.close()
+
+
+def main():
+    # python -m shared.db.sqlite_backend db/zombies.sql
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m shared.db.sqlite_backend SCHEMA_FILE")
+    load_schema(sys.argv[1])
+    print(f"created {config.SQLITE_PATH} from {sys.argv[1]}")
+
+
+if __name__ == '__main__':
+    main()
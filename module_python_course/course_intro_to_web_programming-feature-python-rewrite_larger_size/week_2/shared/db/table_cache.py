@@ -0,0 +1,254 @@
+import logging
+import os
+import select
+import socket
+import threading
+import time
+
+import psycopg2
+
+import shared.db.config as config
+import shared.db.unit_of_work as unit_of_work
+
+# A cache of select(id) and select_all() results that lives as long as the
+# process, shared by all its threads, and kept coherent with the other
+# worker processes through Postgres LISTEN/NOTIFY. Triggers on the cached
+# tables (see notify_table_change() in the schema) send
+#
+#   <table>:<seconds since the epoch>:<id>,<id>,...   or   <table>:<seconds>:*
+#
+# on the table_changes channel when a transaction that changed them commits,
+# and a listener thread in every process evicts those rows, and the table's
+# select_all(), from its own copy.
+#
+# A row can be stale from the writer's commit until the listener has read
+# the notification, normally a millisecond or two on one host; see
+# benchmarks/staleness_benchmark.py. Nothing is served from the cache while
+# the listener is not connected, since notifications sent meanwhile are
+# lost, and the cache is emptied whenever it connects again. Statements in
+# a unit of work go straight to the database, so they see the transaction's
+# own writes and never cache rows that could still be rolled back.
+#
+# Only on Postgres, and only with DB_TABLE_CACHE=on; otherwise fetch() just
+# calls its loader.
+
+CHANNEL = "table_changes"
+
+# The key select_all() results are kept under
+ALL = "all"
+
+logger = logging.getLogger("db.table_cache")
+
+_lock = threading.Lock()
+_entries = {}
+_generations = {}
+_epoch = 0
+_dependents = {}
+_stats = {"hits": 0, "misses": 0, "notifications": 0, "evictions": 0, "lag_last": None, "lag_max": None}
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+class Listener:
+
+    def __init__(self, dsn, connect=psycopg2.connect, poll_interval=1.0, retry_after=1.0):
+        self.dsn = dsn
+        self.poll_interval = poll_interval
+        self.retry_after = retry_after
+        self._connect = connect
+        self._listening = threading.Event()
+        self._stopping = threading.Event()
+        # stop() writes to this to wake the thread from select()
+        self._wakeup, self._waker = socket.socketpair()
+        self._thread = None
+
+    @property
+    def listening(self):
+        return self._listening.is_set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="table-cache-listener", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        return self._listening.wait(timeout)
+
+    def stop(self):
+        self._stopping.set()
+        self._waker.send(b"\0")
+        if self._thread is not None:
+            self._thread.join()
+        self._wakeup.close()
+        self._waker.close()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = self._connect(self.dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                # Anything cached before now may have changed unnoticed
+                clear()
+                self._listening.set()
+                self._listen(conn)
+            except (psycopg2.Error, OSError) as error:
+                logger.warning("table cache listener lost its connection, retrying in %ss: %s", self.retry_after, error)
+            finally:
+                self._listening.clear()
+                clear()
+                if conn is not None and not conn.closed:
+                    conn.close()
+            self._stopping.wait(self.retry_after)
+
+    def _listen(self, conn):
+        while not self._stopping.is_set():
+            readable, _, _ = select.select([conn, self._wakeup], [], [], self.poll_interval)
+            if conn in readable:
+                conn.poll()
+            while conn.notifies:
+                handle(conn.notifies.pop(0).payload)
+
+
+def start(connect=psycopg2.connect, retry_after=1.0):
+    # Starts this process's listener, once per process since a forked
+    # worker cannot share its parent's connection or thread
+    global _listener, _listener_pid
+    if not config.TABLE_CACHE or config.DATABASE_BACKEND != "postgres":
+        return None
+    pid = os.getpid()
+    if _listener is not None and _listener_pid == pid:
+        return _listener
+    with _listener_lock:
+        if _listener is None or _listener_pid != pid:
+            _listener = Listener(config.DATABASE_URL, connect=connect, retry_after=retry_after)
+            _listener_pid = pid
+            _listener.start()
+    return _listener
+
+
+def stop():
+    global _listener, _listener_pid
+    with _listener_lock:
+        listener = _listener if _listener_pid == os.getpid() else None
+        _listener = _listener_pid = None
+    if listener is not None:
+        listener.stop()
+    clear()
+
+
+def init_app(app):
+    # Web servers fork their workers after importing the app, so each one
+    # starts its listener with its first request
+    @app.before_request
+    def start_listener():
+        start()
+
+
+def enabled():
+    return (
+        config.TABLE_CACHE
+        and _listener is not None
+        and _listener_pid == os.getpid()
+        and _listener.listening
+        and unit_of_work.current() is None
+    )
+
+
+def fetch(table, key, load):
+    # The cached value for key, or load() and cache its result. A value is
+    # only kept if nothing in the table was evicted while it was loading,
+    # otherwise it might be from before the change.
+    if not enabled():
+        return load()
+    key = _normalise(key)
+    with _lock:
+        entries = _entries.get(table, {})
+        if key in entries:
+            _stats["hits"] += 1
+            return entries[key]
+        _stats["misses"] += 1
+        generation = (_epoch, _generations.get(table, 0))
+    value = load()
+    with _lock:
+        if value is not None and generation == (_epoch, _generations.get(table, 0)):
+            _entries.setdefault(table, {})[key] = value
+    return value
+
+
+def evict(table, ids=None):
+    # Drops the rows with these ids and the table's select_all(), or the
+    # whole table for ids=None, along with every table that depends on it
+    with _lock:
+        _evict(table, ids, set())
+
+
+def depends_on(table, *others):
+    # Cached rows of table hold on to rows of the others, so any change to
+    # the others evicts all of table
+    with _lock:
+        for other in others:
+            _dependents.setdefault(other, set()).add(table)
+
+
+def clear():
+    global _epoch
+    with _lock:
+        _entries.clear()
+        _epoch += 1
+
+
+def handle(payload):
+    try:
+        table, sent_at, ids = payload.split(":", 2)
+        lag = time.time() - float(sent_at)
+        ids = None if ids == "*" else [_normalise(id) for id in ids.split(",")]
+    except ValueError:
+        logger.warning("table cache emptied after an unreadable notification %r", payload)
+        clear()
+        return
+    with _lock:
+        _stats["notifications"] += 1
+        _stats["lag_last"] = lag
+        _stats["lag_max"] = lag if _stats["lag_max"] is None else max(lag, _stats["lag_max"])
+        _evict(table, ids, set())
+
+
+def stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["tables"] = {table: len(entries) for table, entries in _entries.items()}
+    stats["listening"] = _listener is not None and _listener.listening
+    return stats
+
+
+def reset_stats():
+    with _lock:
+        _stats.update(hits=0, misses=0, notifications=0, evictions=0, lag_last=None, lag_max=None)
+
+
+def _evict(table, ids, seen):
+    if table in seen:
+        return
+    seen.add(table)
+    _generations[table] = _generations.get(table, 0) + 1
+    entries = _entries.get(table, {})
+    if ids is None:
+        _stats["evictions"] += len(entries)
+        entries.clear()
+    else:
+        for key in list(ids) + [ALL]:
+            if entries.pop(key, None) is not None:
+                _stats["evictions"] += 1
+    for dependent in _dependents.get(table, ()):
+        _evict(dependent, None, seen)
+
+
+def _normalise(id):
+    # Ids arrive as strings from URLs, forms and notifications
+    try:
+        return int(id)
+    except (TypeError, ValueError):
+        return id
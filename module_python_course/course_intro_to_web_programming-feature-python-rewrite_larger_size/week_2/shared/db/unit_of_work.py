@@ -0,0 +1,114 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
+import shared.db.config as config
+from shared.db.connection_pool import get_pool
+
+try:
+    from flask import g, request
+except ImportError:
+    # Scripts without Flask can still use transaction()
+    g = request = None
+
+# While a unit of work is active, run_sql sends every statement down one
+# pooled connection in one transaction instead of checking out a connection
+# and committing per statement. The work is committed once at the end, or
+# rolled back if anything raised or any statement failed, so it either all
+# happens or none of it does.
+#
+# init_app(app) gives each request whose method is in UNIT_OF_WORK_METHODS
+# its own unit of work. Scripts can use "with unit_of_work.transaction():".
+
+_current = contextvars.ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWorkFailed(Exception):
+    pass
+
+
+class UnitOfWork:
+
+    def __init__(self):
+        self.failed = False
+        self._pool = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def connection(self):
+        # Checked out on first use, so requests that never touch the
+        # database never hold a connection
+        with self._lock:
+            if self._conn is None:
+                self._pool = get_pool()
+                self._conn = self._pool.getconn()
+            return self._conn
+
+    def fail(self):
+        self.failed = True
+
+    def finish(self, commit=True):
+        # Returns True if the work was committed
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is None:
+            return commit and not self.failed
+        committed = False
+        try:
+            if commit and not self.failed:
+                conn.commit()
+                committed = True
+            else:
+                conn.rollback()
+        finally:
+            self._pool.putconn(conn)
+        return committed
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def transaction():
+    unit = UnitOfWork()
+    token = _current.set(unit)
+    try:
+        yield unit
+    except BaseException:
+        unit.finish(commit=False)
+        raise
+    finally:
+        _current.reset(token)
+    if not unit.finish():
+        raise UnitOfWorkFailed("a statement failed, so the transaction was rolled back")
+
+
+def init_app(app):
+    app.before_request(_begin_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_abandon_request)
+
+
+def _begin_request():
+    if request.method in config.UNIT_OF_WORK_METHODS:
+        g.unit_of_work = UnitOfWork()
+        _current.set(g.unit_of_work)
+
+
+def _finish_request(response):
+    unit = g.pop("unit_of_work", None)
+    if unit is None:
+        return response
+    _current.set(None)
+    if not unit.finish(commit=response.status_code < 500) and response.status_code < 500:
+        raise UnitOfWorkFailed("a statement failed, so the request's changes were rolled back")
+    return response
+
+
+def _abandon_request(exception=None):
+    # Only still set if the view raised before after_request ran
+    unit = g.pop("unit_of_work", None)
+    if unit is not None:
+        _current.set(None)
+        unit.finish(commit=False)
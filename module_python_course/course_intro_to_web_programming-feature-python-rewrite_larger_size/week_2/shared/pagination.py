@@ -0,0 +1,52 @@
+from jinja2 import ChoiceLoader, PackageLoader
+
+PAGE_SIZE = 50
+
+
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+# Keyset pagination: a page is the rows either side of a cursor id, so the
+# database never has to count past the rows it skips the way OFFSET does.
+# Returns the WHERE and ORDER BY direction to splice into a query ending in
+# "LIMIT %s", plus the values for it. One extra row is asked for to find out
+# whether there is another page. Any other conditions, such as a date window,
+# are ANDed in with their values.
+def keyset(column, after=None, before=None, limit=PAGE_SIZE, conditions=(), values=()):
+    conditions = list(conditions)
+    values = list(values)
+    order = "ASC"
+    if before is not None:
+        conditions.append(f"{column} < %s")
+        values.append(before)
+        order = "DESC"
+    elif after is not None:
+        conditions.append(f"{column} > %s")
+        values.append(after)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, order, values + [limit + 1]
+
+
+def page(items, after=None, before=None, limit=PAGE_SIZE, key=None):
+    # key(item) is the cursor for an item, its id unless given
+    cursor = key or (lambda item: item.id)
+    more = len(items) > limit
+    items = items[:limit]
+    if before is not None:
+        items.reverse()
+        next_cursor = cursor(items[-1]) if items else None
+        prev_cursor = cursor(items[0]) if more else None
+    else:
+        next_cursor = cursor(items[-1]) if more else None
+        prev_cursor = cursor(items[0]) if after is not None and items else None
+    return Page(items, next_cursor, prev_cursor)
+
+
+# Lets the app's templates {% include "pagination.html" %}, the Previous and
+# Next links for a page. Templates of the same name in the app come first.
+def init_app(app):
+    app.jinja_loader = ChoiceLoader([app.jinja_loader, PackageLoader("shared", "templates")])
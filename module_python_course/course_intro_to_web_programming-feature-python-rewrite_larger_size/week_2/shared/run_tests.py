@@ -0,0 +1,18 @@
+# The tests of the shared code; from the week_2 directory run
+#   python -m shared.run_tests
+
+import unittest
+
+from shared.tests.bulk_test import TestBulk
+from shared.tests.connection_pool_test import TestConnectionPool
+from shared.tests.csv_import_test import TestCsvImport
+from shared.tests.instrumentation_test import TestInstrumentation
+from shared.tests.pagination_test import TestPagination
+from shared.tests.prepared_test import TestPreparedStatements
+from shared.tests.sqlite_backend_test import TestSqliteBackend
+from shared.tests.table_cache_test import TestTableCache
+from shared.tests.unit_of_work_test import TestUnitOfWork
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+from flask import Flask, redirect, request
+
+import shared.db.instrumentation as instrumentation
+import shared.db.unit_of_work as unit_of_work
+from shared.db.run_sql import run_sql
+import shared.pagination as pagination
+
+# A small app wired up the way the week 2 apps are, for testing the shared
+# code that runs per request
+app = Flask(__name__)
+instrumentation.init_app(app)
+unit_of_work.init_app(app)
+pagination.init_app(app)
+
+
+@app.route("/humans")
+def humans():
+    return {"humans": len(run_sql("SELECT * FROM humans"))}
+
+
+@app.route("/bitings", methods=["POST"])
+def create_biting():
+    human = run_sql("SELECT * FROM humans WHERE id = %s", [request.form["human_id"]])[0]
+    zombie = run_sql("SELECT * FROM zombies WHERE id = %s", [request.form["zombie_id"]])[0]
+    run_sql("SELECT * FROM zombie_types WHERE id = %s", [zombie["zombie_type_id"]])
+    run_sql("INSERT INTO bitings (human_id, zombie_id) VALUES (%s, %s) RETURNING id", [human["id"], zombie["id"]])
+    return redirect("/bitings")
+
+
+@app.route("/humans/<id>/delete", methods=["POST"])
+def delete_human(id):
+    run_sql("DELETE FROM humans WHERE id = %s", [id])
+    return redirect("/humans")
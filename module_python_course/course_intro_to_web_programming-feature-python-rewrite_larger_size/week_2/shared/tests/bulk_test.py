@@ -0,0 +1,79 @@
+import unittest
+
+import shared.db.bulk as bulk
+import shared.db.config as config
+from shared.db.bulk import CsvStream
+from shared.tests.doubles import FakeConnection, FakePool
+
+
+def reserved_ids(sql, values):
+    # Sequence values may come back in any order
+    return [(id,) for id in reversed(range(101, 101 + values[1]))]
+
+
+class TestBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection(rows=reserved_ids)
+        self.inserted = []
+        self.original_get_pool = bulk.get_pool
+        self.original_execute_values = bulk.ext.execute_values
+        self.original_threshold = config.BULK_COPY_THRESHOLD
+        bulk.get_pool = lambda: FakePool(lambda: self.connection)
+        bulk.ext.execute_values = self.fake_execute_values
+        config.BULK_COPY_THRESHOLD = 2
+
+    def tearDown(self):
+        bulk.get_pool = self.original_get_pool
+        bulk.ext.execute_values = self.original_execute_values
+        config.BULK_COPY_THRESHOLD = self.original_threshold
+
+    def fake_execute_values(self, cur, sql, rows, page_size=100):
+        self.connection.statements.append(sql)
+        self.inserted.extend(rows)
+
+
+    def test_csv_stream_quotes_strings_and_leaves_nulls_empty(self):
+        stream = CsvStream([[1, 'Ed "Eddie"', None], [2, "", True]])
+        self.assertEqual('1,"Ed ""Eddie""",\n2,"",True\n', stream.read())
+
+
+    def test_csv_stream_reads_in_chunks(self):
+        stream = CsvStream([[id, "Human " + str(id)] for id in range(50)])
+        chunks = []
+        chunk = stream.read(10)
+        while chunk:
+            self.assertLessEqual(len(chunk), 10)
+            chunks.append(chunk)
+            chunk = stream.read(10)
+        self.assertEqual(CsvStream([[id, "Human " + str(id)] for id in range(50)]).read(), "".join(chunks))
+
+
+    def test_large_batch_is_copied_with_reserved_ids(self):
+        ids = bulk.insert_many("humans", ["name"], [["Nick"], ["Ellis"], ["Coach"]])
+        self.assertEqual([101, 102, 103], ids)
+        self.assertEqual("COPY humans (id, name) FROM STDIN WITH (FORMAT csv)", self.connection.statements[1])
+        self.assertEqual('101,"Nick"\n102,"Ellis"\n103,"Coach"\n', "".join(self.connection.chunks))
+        self.assertEqual(1, self.connection.commits)
+
+
+    def test_small_batch_is_inserted_with_reserved_ids(self):
+        config.BULK_COPY_THRESHOLD = 5
+        ids = bulk.insert_many("humans", ["name"], [["Nick"], ["Ellis"]])
+        self.assertEqual([101, 102], ids)
+        self.assertEqual("INSERT INTO humans (id, name) VALUES %s", self.connection.statements[1])
+        self.assertEqual([[101, "Nick"], [102, "Ellis"]], self.inserted)
+        self.assertEqual(1, self.connection.commits)
+
+
+    def test_failed_batch_is_rolled_back_and_raised(self):
+        self.connection.fail(Exception("duplicate key value violates unique constraint"), containing="COPY")
+        with self.assertLogs("db.queries", "ERROR"):
+            with self.assertRaisesRegex(Exception, "duplicate key"):
+                bulk.insert_many("humans", ["name"], [["Nick"], ["Ellis"], ["Coach"]])
+        self.assertEqual((0, 1), (self.connection.commits, self.connection.rollbacks))
+
+
+    def test_empty_batch_does_nothing(self):
+        self.assertEqual([], bulk.insert_many("humans", ["name"], []))
+        self.assertEqual([], self.connection.statements)
@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import unittest
+
+import psycopg2
+import psycopg2.extensions as extensions
+
+from shared.db.connection_pool import ConnectionPool, PoolError
+from shared.tests.doubles import FakeConnection
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ConnectionPool("dbname='zombies'", min_size=1, max_size=2, timeout=0.05, connect=FakeConnection)
+
+
+    def test_pool_opens_min_size_connections_up_front(self):
+        stats = self.pool.stats()
+        self.assertEqual(1, stats["size"])
+        self.assertEqual(1, stats["idle"])
+        self.assertEqual(1, stats["opened"])
+
+
+    def test_connections_are_reused(self):
+        conn = self.pool.getconn()
+        self.pool.putconn(conn)
+        self.assertIs(conn, self.pool.getconn())
+        self.assertEqual(1, self.pool.stats()["opened"])
+
+
+    def test_pool_grows_up_to_max_size(self):
+        first = self.pool.getconn()
+        second = self.pool.getconn()
+        self.assertIsNot(first, second)
+        self.assertEqual(2, self.pool.stats()["in_use"])
+
+
+    def test_checkout_times_out_when_exhausted(self):
+        self.pool.getconn()
+        self.pool.getconn()
+        with self.assertRaises(PoolError):
+            self.pool.getconn()
+        self.assertEqual(1, self.pool.stats()["timeouts"])
+
+
+    def test_waiting_checkout_gets_returned_connection(self):
+        self.pool.timeout = 5
+        first = self.pool.getconn()
+        self.pool.getconn()
+        received = []
+        waiter = threading.Thread(target=lambda: received.append(self.pool.getconn()))
+        waiter.start()
+        self.pool.putconn(first)
+        waiter.join()
+        self.assertEqual([first], received)
+
+
+    def test_open_transaction_is_rolled_back_on_return(self):
+        conn = self.pool.getconn()
+        conn.status = extensions.TRANSACTION_STATUS_INERROR
+        self.pool.putconn(conn)
+        self.assertEqual(1, conn.rollbacks)
+
+
+    def test_sqlite_errors_discard_the_connection_and_free_its_slot(self):
+        conn = self.pool.getconn()
+        conn.status = extensions.TRANSACTION_STATUS_INTRANS
+        conn.error = sqlite3.OperationalError("disk I/O error")
+        self.pool.putconn(conn)
+        stats = self.pool.stats()
+        self.assertEqual(0, stats["size"])
+        self.assertEqual(1, stats["closed"])
+        self.pool.health_check_after = 0
+        conn = self.pool.getconn()
+        self.pool.putconn(conn)
+        conn.error = sqlite3.DatabaseError("database disk image is malformed")
+        self.assertIsNot(conn, self.pool.getconn())
+        self.assertEqual(1, self.pool.stats()["health_check_failures"])
+
+
+    def test_closed_connection_is_replaced_on_checkout(self):
+        conn = self.pool.getconn()
+        self.pool.putconn(conn)
+        conn.closed = 2
+        replacement = self.pool.getconn()
+        self.assertIsNot(conn, replacement)
+        self.assertEqual(1, self.pool.stats()["health_check_failures"])
+
+
+    def test_stale_connection_failing_ping_is_replaced(self):
+        self.pool.health_check_after = 0
+        conn = self.pool.getconn()
+        conn.fail(psycopg2.OperationalError("server closed the connection unexpectedly"))
+        self.pool.putconn(conn)
+        replacement = self.pool.getconn()
+        self.assertIsNot(conn, replacement)
+        self.assertTrue(conn.closed)
+
+
+    def test_discarded_connection_frees_its_slot(self):
+        self.pool.getconn()
+        conn = self.pool.getconn()
+        self.pool.putconn(conn, discard=True)
+        self.assertEqual(1, self.pool.stats()["size"])
+        self.pool.getconn()
+
+
+    def test_warm_opens_connections_up_to_max_size(self):
+        self.assertEqual(2, self.pool.warm(5))
+        stats = self.pool.stats()
+        self.assertEqual(2, stats["size"])
+        self.assertEqual(2, stats["idle"])
+
+
+    def test_closed_pool_refuses_checkouts(self):
+        self.pool.close()
+        with self.assertRaises(PoolError):
+            self.pool.getconn()
+
+
+    def test_invalid_sizes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool("dbname='zombies'", min_size=3, max_size=2, connect=FakeConnection)
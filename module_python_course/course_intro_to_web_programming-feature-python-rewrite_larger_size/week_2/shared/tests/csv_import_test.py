@@ -0,0 +1,88 @@
+import io
+import unittest
+
+import shared.db.bulk as bulk
+import shared.db.config as config
+import shared.db.unit_of_work as unit_of_work
+from shared.tests.doubles import FakeConnection, FakePool
+
+SUMMARY = [
+    (None, 3, 1),
+    ("zombie_id is not the id of any of the zombies", 2, 2),
+]
+
+
+class TestCsvImport(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection(rows=lambda sql, values: SUMMARY)
+        self.pool = FakePool(lambda: self.connection)
+        self.originals = [(bulk, bulk.get_pool), (unit_of_work, unit_of_work.get_pool)]
+        self.original_chunk_size = config.COPY_CHUNK_SIZE
+        for module, _ in self.originals:
+            module.get_pool = lambda: self.pool
+        config.COPY_CHUNK_SIZE = 16
+
+    def tearDown(self):
+        for module, original in self.originals:
+            module.get_pool = original
+        config.COPY_CHUNK_SIZE = self.original_chunk_size
+
+    def import_bitings(self, text):
+        return bulk.import_csv("bitings", {"human_id": "humans", "zombie_id": "zombies"}, io.BytesIO(text.encode("utf-8")))
+
+
+    def test_rows_are_copied_into_staging_in_header_order(self):
+        self.import_bitings("zombie_id,human_id\n1,2\n")
+        self.assertIn("COPY staging_bitings (zombie_id, human_id) FROM STDIN", self.connection.statements[1])
+
+
+    def test_file_is_read_in_chunks(self):
+        rows = "".join(f"{id},{id}\n" for id in range(100))
+        self.import_bitings("human_id,zombie_id\n" + rows)
+        self.assertTrue(all(len(chunk) <= 16 for chunk in self.connection.chunks))
+        self.assertEqual(rows, b"".join(self.connection.chunks).decode("utf-8"))
+
+
+    def test_foreign_keys_are_checked_against_their_tables(self):
+        self.import_bitings("human_id,zombie_id\n1,2\n")
+        sql = self.connection.statements[2]
+        self.assertIn("LEFT JOIN humans AS human_id_reference", sql)
+        self.assertIn("LEFT JOIN zombies AS zombie_id_reference", sql)
+        self.assertIn("INSERT INTO bitings (human_id, zombie_id)", sql)
+
+
+    def test_summary_counts_inserted_and_rejected_rows(self):
+        summary = self.import_bitings("human_id,zombie_id\n1,2\n")
+        self.assertEqual(3, summary["inserted"])
+        self.assertEqual(2, summary["rejected"])
+        self.assertEqual({"rows": 2, "first_row": 2}, summary["errors"]["zombie_id is not the id of any of the zombies"])
+
+
+    def test_wrong_header_is_rejected_before_copying(self):
+        summary = self.import_bitings("human,zombie\n1,2\n")
+        self.assertIn("error", summary)
+        self.assertEqual([], self.connection.statements)
+
+
+    def test_import_commits_and_drops_its_staging_table(self):
+        self.import_bitings("human_id,zombie_id\n1,2\n")
+        self.assertEqual("DROP TABLE staging_bitings", self.connection.statements[-1])
+        self.assertEqual((1, 1), (self.connection.commits, self.pool.returned))
+
+
+    def test_failed_import_is_rolled_back_and_raised(self):
+        self.connection.fail(Exception("could not extend file"), containing="INSERT INTO bitings")
+        with self.assertLogs("db.queries", "ERROR") as logs:
+            with self.assertRaisesRegex(Exception, "could not extend file"):
+                self.import_bitings("human_id,zombie_id\n1,2\n")
+        self.assertIn("could not extend file", logs.records[0].query["error"])
+        self.assertEqual((0, 1, 1), (self.connection.commits, self.connection.rollbacks, self.pool.returned))
+
+
+    def test_import_inside_a_unit_of_work_is_part_of_its_transaction(self):
+        with unit_of_work.transaction():
+            self.import_bitings("human_id,zombie_id\n1,2\n")
+            self.assertEqual(0, self.connection.commits)
+        self.assertEqual(1, len(self.pool.connections))
+        self.assertEqual((1, 1), (self.connection.commits, self.pool.returned))
@@ -0,0 +1,151 @@
+import socket
+
+import psycopg2
+import psycopg2.extensions as extensions
+
+import shared.db.table_cache as table_cache
+
+# Stand-ins for psycopg2 and the connection pool, shared by the tests of the
+# db code. A connection keeps every statement sent on it; rows decides what
+# each statement returns and fail() which of them raise.
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rows = []
+
+    def execute(self, sql, values=None):
+        self.connection.sent(sql, values)
+        self.rows = self.connection.rows(sql, values)
+        self.description = [("id",)] if self.rows else None
+
+    def copy_expert(self, sql, file, size=8192):
+        chunk = file.read(size)
+        while chunk:
+            self.connection.chunks.append(chunk)
+            chunk = file.read(size)
+        self.connection.sent(sql)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self, dsn=None, rows=None):
+        self.dsn = dsn
+        self.rows = rows or (lambda sql, values: [])
+        self.statements = []
+        self.values = []
+        self.chunks = []
+        self.failures = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = 0
+        # Raised by every call, as a failing SQLite connection would
+        self.error = None
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def fail(self, error, containing="", once=False):
+        # Statements containing the text raise error from now on, or only the
+        # next one of them if once is set
+        self.failures.append((containing, error, once))
+
+    def sent(self, sql, values=None):
+        self.statements.append(sql)
+        self.values.append(values)
+        if self.error is not None:
+            raise self.error
+        for failure in self.failures:
+            containing, error, once = failure
+            if containing in sql:
+                if once:
+                    self.failures.remove(failure)
+                raise error
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+        if self.error is not None:
+            raise self.error
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        if self.error is not None:
+            raise self.error
+        self.closed = 1
+
+
+class FakePool:
+    # Hands out a new connection from connect for every checkout
+
+    def __init__(self, connect=FakeConnection):
+        self.connect = connect
+        self.connections = []
+        self.returned = 0
+
+    def getconn(self):
+        conn = self.connect()
+        self.connections.append(conn)
+        return conn
+
+    def putconn(self, conn):
+        self.returned += 1
+
+
+class FakeListenConnection:
+    # Stands in for the table cache listener's connection. The test sends
+    # notifications down a socket so that select() wakes up as it would for
+    # a real one.
+
+    def __init__(self, dsn):
+        self.reader, self.writer = socket.socketpair()
+        self.notifies = []
+        self.pending = []
+        self.executed = []
+        self.autocommit = False
+        self.broken = False
+        self.closed = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+    def fileno(self):
+        return self.reader.fileno()
+
+    def poll(self):
+        self.reader.recv(4096)
+        if self.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.notifies.extend(self.pending)
+        self.pending = []
+
+    def notify(self, payload):
+        self.pending.append(extensions.Notify(1, table_cache.CHANNEL, payload))
+        self.writer.send(b"!")
+
+    def drop(self):
+        self.broken = True
+        self.writer.send(b"!")
+
+    def close(self):
+        self.closed = 1
+        self.reader.close()
+        self.writer.close()
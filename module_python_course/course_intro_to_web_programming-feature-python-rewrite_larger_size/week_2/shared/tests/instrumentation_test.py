@@ -0,0 +1,90 @@
+import json
+import unittest
+
+from flask import g
+
+import shared.db.config as config
+import shared.db.instrumentation as instrumentation
+import shared.db.run_sql
+from shared.db.run_sql import run_sql
+from shared.tests.app import app
+from shared.tests.doubles import FakeConnection, FakePool
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection(rows=lambda sql, values: [{"id": 1}, {"id": 2}])
+        self.connection.fail(Exception('relation "missing_table" does not exist'), containing="missing_table")
+        self.original_get_pool = shared.db.run_sql.get_pool
+        shared.db.run_sql.get_pool = lambda: FakePool(lambda: self.connection)
+        self.original_limit = config.QUERY_REPEAT_LIMIT
+        self.original_action = config.QUERY_REPEAT_ACTION
+        config.QUERY_REPEAT_LIMIT = 3
+
+    def tearDown(self):
+        shared.db.run_sql.get_pool = self.original_get_pool
+        config.QUERY_REPEAT_LIMIT = self.original_limit
+        config.QUERY_REPEAT_ACTION = self.original_action
+
+    def select_humans(self, count):
+        for id in range(count):
+            run_sql("SELECT * FROM humans WHERE id = %s", [id])
+
+
+    def test_fingerprint_ignores_values_and_spacing(self):
+        self.assertEqual(
+            "SELECT * FROM humans WHERE id = ? AND name = ? AND zombie_id IN (?)",
+            instrumentation.fingerprint("SELECT *\n  FROM humans WHERE id = 12 AND name = 'O''Neil' AND zombie_id IN (%s, %s, 3)"),
+        )
+
+
+    def test_request_keeps_statement_timings_and_rows(self):
+        with app.test_request_context("/humans"):
+            self.select_humans(2)
+            statements = g.queries.statements
+        self.assertEqual(["SELECT * FROM humans WHERE id = ?"] * 2, [statement["fingerprint"] for statement in statements])
+        self.assertEqual([2, 2], [statement["rows"] for statement in statements])
+        self.assertTrue(all(statement["ms"] >= 0 for statement in statements))
+
+
+    def test_repeated_statement_is_logged_once(self):
+        with app.test_request_context("/bitings"):
+            with self.assertLogs("db.queries", "WARNING") as logs:
+                self.select_humans(6)
+        self.assertEqual(1, len(logs.records))
+        query = logs.records[0].query
+        self.assertEqual("repeated_sql", query["event"])
+        self.assertEqual("SELECT * FROM humans WHERE id = ?", query["fingerprint"])
+        self.assertEqual(query, json.loads(logs.records[0].getMessage()))
+
+
+    def test_repeated_statement_can_fail_the_request(self):
+        config.QUERY_REPEAT_ACTION = "raise"
+        with app.test_request_context("/bitings"):
+            with self.assertLogs("db.queries", "WARNING"):
+                with self.assertRaises(instrumentation.RepeatedQueryError):
+                    self.select_humans(4)
+
+
+    def test_statements_outside_a_request_are_not_counted(self):
+        config.QUERY_REPEAT_ACTION = "raise"
+        self.select_humans(6)
+
+
+    def test_errors_are_logged_instead_of_printed(self):
+        with self.assertLogs("db.queries", "ERROR") as logs:
+            with self.assertRaisesRegex(Exception, "does not exist"):
+                run_sql("SELECT * FROM missing_table")
+        self.assertIn("does not exist", logs.records[0].query["error"])
+
+
+    def test_summary_is_logged_when_the_request_ends(self):
+        with self.assertLogs("db.queries", "INFO") as logs:
+            with app.test_request_context("/humans"):
+                self.select_humans(4)
+                app.do_teardown_request()
+        summary = [record.query for record in logs.records if record.query["event"] == "request_sql"][0]
+        self.assertEqual(4, summary["statements"])
+        self.assertEqual(8, summary["rows"])
+        self.assertEqual({"SELECT * FROM humans WHERE id = ?": 4}, summary["repeated"])
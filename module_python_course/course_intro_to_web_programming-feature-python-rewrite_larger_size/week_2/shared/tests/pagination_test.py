@@ -0,0 +1,79 @@
+import unittest
+from types import SimpleNamespace
+
+from flask import render_template_string
+
+import shared.pagination as pagination
+from shared.tests.app import app
+
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.humans = [SimpleNamespace(id=id) for id in range(1, 8)]
+
+
+    def test_first_page_asks_for_one_extra_row(self):
+        self.assertEqual(("", "ASC", [4]), pagination.keyset("id", limit=3))
+
+
+    def test_after_cursor_reads_forwards(self):
+        self.assertEqual(("WHERE id > %s", "ASC", [3, 4]), pagination.keyset("id", after=3, limit=3))
+
+
+    def test_before_cursor_reads_backwards(self):
+        self.assertEqual(("WHERE id < %s", "DESC", [5, 4]), pagination.keyset("id", before=5, limit=3))
+
+
+    def test_first_page_has_only_next_cursor(self):
+        page = pagination.page(self.humans[0:4], limit=3)
+        self.assertEqual([1, 2, 3], [human.id for human in page.items])
+        self.assertEqual(3, page.next_cursor)
+        self.assertIsNone(page.prev_cursor)
+
+
+    def test_middle_page_has_both_cursors(self):
+        page = pagination.page(self.humans[3:7], after=3, limit=3)
+        self.assertEqual([4, 5, 6], [human.id for human in page.items])
+        self.assertEqual(6, page.next_cursor)
+        self.assertEqual(4, page.prev_cursor)
+
+
+    def test_last_page_has_only_prev_cursor(self):
+        page = pagination.page(self.humans[6:7], after=6, limit=3)
+        self.assertIsNone(page.next_cursor)
+        self.assertEqual(7, page.prev_cursor)
+
+
+    def test_backwards_page_is_put_back_in_order(self):
+        rows = list(reversed(self.humans[0:4]))
+        page = pagination.page(rows, before=5, limit=3)
+        self.assertEqual([2, 3, 4], [human.id for human in page.items])
+        self.assertEqual(4, page.next_cursor)
+        self.assertEqual(2, page.prev_cursor)
+
+
+    def test_backwards_page_reaching_the_start_has_no_prev_cursor(self):
+        rows = list(reversed(self.humans[0:2]))
+        page = pagination.page(rows, before=3, limit=3)
+        self.assertEqual([1, 2], [human.id for human in page.items])
+        self.assertIsNone(page.prev_cursor)
+
+
+    def test_other_conditions_are_anded_with_the_cursor(self):
+        where, order, values = pagination.keyset("id", after=3, limit=3, conditions=["name = %s"], values=["Coach"])
+        self.assertEqual("WHERE name = %s AND id > %s", where)
+        self.assertEqual(["Coach", 3, 4], values)
+
+
+    def test_key_gives_the_cursors(self):
+        page = pagination.page(self.humans[3:7], after=3, limit=3, key=lambda human: f"h{human.id}")
+        self.assertEqual(("h6", "h4"), (page.next_cursor, page.prev_cursor))
+
+
+    def test_apps_can_include_the_links_template(self):
+        page = pagination.page(self.humans[3:7], after=3, limit=3)
+        with app.test_request_context("/humans"):
+            html = render_template_string('{% include "pagination.html" %}', page=page, page_args={"name": "Coach"})
+        self.assertIn('href="/humans?before=4&amp;name=Coach"', html)
+        self.assertIn('href="/humans?after=6&amp;name=Coach"', html)
@@ -0,0 +1,122 @@
+import unittest
+
+import psycopg2.errors
+
+import shared.db.config as config
+import shared.db.prepared as prepared
+from shared.tests.doubles import FakeConnection
+
+
+class TestPreparedStatements(unittest.TestCase):
+
+    def setUp(self):
+        self.original_size = config.PREPARED_STATEMENT_CACHE_SIZE
+        self.original_threshold = config.PREPARE_THRESHOLD
+        config.PREPARED_STATEMENT_CACHE_SIZE = 2
+        config.PREPARE_THRESHOLD = 2
+        self.conn = FakeConnection()
+        self.cur = self.conn.cursor()
+
+    def tearDown(self):
+        config.PREPARED_STATEMENT_CACHE_SIZE = self.original_size
+        config.PREPARE_THRESHOLD = self.original_threshold
+
+    def run_select(self, id, sql="SELECT * FROM humans WHERE id = %s"):
+        prepared.execute(self.conn, self.cur, sql, [id])
+
+    def sent(self):
+        return self.conn.statements
+
+
+    def test_first_run_is_not_prepared(self):
+        self.run_select(1)
+        self.assertEqual(["SELECT * FROM humans WHERE id = %s"], self.sent())
+
+
+    def test_hot_statement_is_prepared_once_then_executed(self):
+        for id in range(1, 4):
+            self.run_select(id)
+        sent = self.sent()
+        name = sent[1].split()[1]
+        self.assertEqual(f"PREPARE {name} AS SELECT * FROM humans WHERE id = $1", sent[1])
+        self.assertEqual([(f"EXECUTE {name} (%s)", [2]), (f"EXECUTE {name} (%s)", [3])], list(zip(self.conn.statements, self.conn.values))[2:])
+
+
+    def test_literal_percent_is_unescaped(self):
+        sql = "SELECT * FROM humans WHERE name LIKE 'A%%' AND id > %s"
+        self.run_select(1, sql)
+        self.run_select(1, sql)
+        self.assertTrue(self.sent()[1].endswith("name LIKE 'A%' AND id > $1"))
+
+
+    def test_quoted_text_is_unescaped_but_not_numbered(self):
+        sql = "SELECT 'It''s 100%%', name AS \"100%%\" FROM humans WHERE id = %s"
+        self.run_select(1, sql)
+        self.run_select(1, sql)
+        self.assertTrue(self.sent()[1].endswith("SELECT 'It''s 100%', name AS \"100%\" FROM humans WHERE id = $1"))
+
+
+    def test_placeholder_inside_quotes_is_never_prepared(self):
+        sql = "SELECT * FROM humans WHERE name LIKE '%s' OR id = %s"
+        for id in range(1, 4):
+            prepared.execute(self.conn, self.cur, sql, ["Coach", id])
+        self.assertEqual([sql] * 3, self.sent())
+
+
+    def test_connections_prepare_separately(self):
+        self.run_select(1)
+        self.run_select(2)
+        other = FakeConnection()
+        prepared.execute(other, other.cursor(), "SELECT * FROM humans WHERE id = %s", [3])
+        self.assertEqual([("SELECT * FROM humans WHERE id = %s", [3])], list(zip(other.statements, other.values)))
+
+
+    def test_least_recently_used_statement_is_deallocated(self):
+        for table in ["humans", "zombies", "humans", "bitings"]:
+            self.run_select(1, f"SELECT * FROM {table} WHERE id = %s")
+            self.run_select(1, f"SELECT * FROM {table} WHERE id = %s")
+        deallocated = [sql for sql in self.sent() if sql.startswith("DEALLOCATE")]
+        zombies = [sql for sql in self.sent() if sql.startswith("PREPARE") and "zombies" in sql][0]
+        self.assertEqual([f"DEALLOCATE {zombies.split()[1]}"], deallocated)
+
+
+    def test_schema_change_deallocates_everything(self):
+        self.run_select(1)
+        self.run_select(2)
+        prepared.execute(self.conn, self.cur, "ALTER TABLE humans ADD COLUMN age INT")
+        self.run_select(3)
+        self.assertEqual(["DEALLOCATE ALL", "SELECT * FROM humans WHERE id = %s"], self.sent()[-2:])
+
+
+    def test_changed_result_type_falls_back_to_plain_statement(self):
+        self.run_select(1)
+        self.run_select(2)
+        self.conn.fail(psycopg2.errors.FeatureNotSupported("cached plan must not change result type"), once=True)
+        self.run_select(3)
+        self.assertEqual(1, self.conn.rollbacks)
+        self.assertEqual(("SELECT * FROM humans WHERE id = %s", [3]), (self.conn.statements[-1], self.conn.values[-1]))
+
+
+    def test_disabled_cache_sends_statements_unchanged(self):
+        config.PREPARED_STATEMENT_CACHE_SIZE = 0
+        for id in range(1, 4):
+            self.run_select(id)
+        self.assertEqual(["SELECT * FROM humans WHERE id = %s"] * 3, self.sent())
+
+
+    def test_failed_prepare_inside_a_transaction_only_undoes_itself(self):
+        self.conn.fail(psycopg2.errors.IndeterminateDatatype("could not determine data type of parameter $1"), containing="PREPARE")
+        for id in range(1, 3):
+            prepared.execute(self.conn, self.cur, "SELECT %s", [id], in_transaction=True)
+        self.assertEqual(0, self.conn.rollbacks)
+        self.assertEqual("SAVEPOINT prepare_statement", self.sent()[1])
+        self.assertEqual(["ROLLBACK TO SAVEPOINT prepare_statement", "SELECT %s"], self.sent()[-2:])
+
+
+    def test_changed_result_type_inside_a_transaction_is_raised(self):
+        self.run_select(1)
+        self.run_select(2)
+        self.conn.fail(psycopg2.errors.FeatureNotSupported("cached plan must not change result type"), once=True)
+        with self.assertRaises(psycopg2.errors.FeatureNotSupported):
+            prepared.execute(self.conn, self.cur, "SELECT * FROM humans WHERE id = %s", [3], in_transaction=True)
+        self.assertEqual(0, self.conn.rollbacks)
@@ -0,0 +1,19 @@
+DROP TABLE IF EXISTS bitings;
+DROP TABLE IF EXISTS humans;
+DROP TABLE IF EXISTS zombies;
+
+CREATE TABLE humans (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255)
+);
+
+CREATE TABLE zombies (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255)
+);
+
+CREATE TABLE bitings (
+    id SERIAL PRIMARY KEY,
+    zombie_id INT REFERENCES zombies(id),
+    human_id INT REFERENCES humans(id)
+);
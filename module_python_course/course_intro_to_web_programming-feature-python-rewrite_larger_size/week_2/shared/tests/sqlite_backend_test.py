@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import shared.db.bulk as bulk
+import shared.db.config as config
+import shared.db.sqlite_backend as sqlite_backend
+import shared.db.unit_of_work as unit_of_work
+from shared.db.connection_pool import close_pool, get_pool
+from shared.db.run_sql import run_sql, stream_sql
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "schema.sql")
+
+
+class TestSqliteBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original = (config.DATABASE_BACKEND, config.SQLITE_PATH)
+        config.DATABASE_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(self.directory.name, "shared.sqlite3")
+        close_pool()
+        sqlite_backend.load_schema(SCHEMA)
+
+    def tearDown(self):
+        close_pool()
+        config.DATABASE_BACKEND, config.SQLITE_PATH = self.original
+        self.directory.cleanup()
+
+    def save_human(self, name):
+        return run_sql("INSERT INTO humans (name) VALUES (%s) RETURNING id", [name])[0]["id"]
+
+    def names(self):
+        return [row[0] for row in run_sql("SELECT name FROM humans ORDER BY id", tuples=True)]
+
+
+    def test_placeholders_are_translated(self):
+        sql, arrays, returning = sqlite_backend.translate("SELECT * FROM humans WHERE name LIKE '%%' || %s AND id = %s")
+        self.assertEqual("SELECT * FROM humans WHERE name LIKE '%' || ? AND id = ?", sql)
+        self.assertEqual((), arrays)
+        self.assertIsNone(returning)
+
+
+    def test_any_becomes_in_over_a_json_array(self):
+        sql, arrays, _ = sqlite_backend.translate("DELETE FROM humans WHERE name = %s OR id = ANY(%s)")
+        self.assertEqual("DELETE FROM humans WHERE name = ? OR id IN (SELECT value FROM json_each(?))", sql)
+        self.assertEqual((1,), arrays)
+
+
+    def test_schema_serial_columns_become_integer_keys(self):
+        with open(SCHEMA) as file:
+            sql = sqlite_backend.translate_schema(file.read())
+        self.assertNotIn("SERIAL", sql)
+        self.assertIn("id INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+
+
+    def test_connections_use_wal_and_stay_open(self):
+        for _ in range(5):
+            run_sql("SELECT * FROM humans")
+        self.assertEqual("wal", run_sql("PRAGMA journal_mode")[0][0])
+        self.assertEqual(1, get_pool().stats()["opened"])
+
+
+    def test_insert_gets_id_from_returning(self):
+        self.save_human("Coach")
+        self.assertEqual(2, self.save_human("Ellis"))
+        self.assertEqual(["Coach", "Ellis"], self.names())
+
+
+    def test_returning_is_emulated_on_old_sqlite(self):
+        original = sqlite_backend.NATIVE_RETURNING
+        sqlite_backend.NATIVE_RETURNING = False
+        try:
+            id = self.save_human("Coach")
+        finally:
+            sqlite_backend.NATIVE_RETURNING = original
+        self.assertEqual(1, id)
+        self.assertEqual(["Coach"], self.names())
+
+
+    def test_insert_many_and_delete_many(self):
+        ids = bulk.insert_many("humans", ["name"], [[f"Human {number}"] for number in range(5)])
+        self.assertEqual([1, 2, 3, 4, 5], ids)
+        bulk.delete_many("humans", [2, 4])
+        self.assertEqual(["Human 0", "Human 2", "Human 4"], self.names())
+
+
+    def test_stream_sql_reads_in_batches(self):
+        bulk.insert_many("humans", ["name"], [[f"Human {number}"] for number in range(5)])
+        rows = list(stream_sql("SELECT id FROM humans ORDER BY id", batch_size=2, tuples=True))
+        self.assertEqual([(1,), (2,), (3,), (4,), (5,)], rows)
+
+
+    def test_foreign_keys_are_enforced(self):
+        with self.assertLogs("db.queries", "ERROR") as logs:
+            with self.assertRaises(sqlite3.IntegrityError):
+                run_sql("INSERT INTO bitings (human_id, zombie_id) VALUES (%s, %s)", [1, 99])
+        self.assertIn("FOREIGN KEY constraint failed", logs.output[0])
+        self.assertEqual([], run_sql("SELECT * FROM bitings"))
+
+
+    def test_failed_unit_of_work_rolls_back(self):
+        with self.assertRaises(sqlite3.IntegrityError):
+            with unit_of_work.transaction():
+                self.save_human("Coach")
+                run_sql("INSERT INTO bitings (human_id, zombie_id) VALUES (%s, %s)", [1, 99])
+        self.assertEqual([], self.names())
+
+
+    def test_unit_of_work_with_a_caught_failure_still_rolls_back(self):
+        with self.assertRaises(unit_of_work.UnitOfWorkFailed):
+            with unit_of_work.transaction():
+                self.save_human("Coach")
+                try:
+                    run_sql("INSERT INTO bitings (human_id, zombie_id) VALUES (%s, %s)", [1, 99])
+                except sqlite3.IntegrityError:
+                    pass
+        self.assertEqual([], self.names())
@@ -0,0 +1,144 @@
+import time
+import unittest
+
+import shared.db.config as config
+import shared.db.table_cache as table_cache
+import shared.db.unit_of_work as unit_of_work
+from shared.tests.doubles import FakeListenConnection
+
+
+class TestTableCache(unittest.TestCase):
+
+    def setUp(self):
+        self.loads = []
+        self.connections = []
+        self.original = (config.TABLE_CACHE, config.DATABASE_BACKEND)
+        config.TABLE_CACHE = True
+        config.DATABASE_BACKEND = "postgres"
+        table_cache.depends_on("zombies", "zombie_types")
+        table_cache.reset_stats()
+        self.listener = table_cache.start(connect=self.connect, retry_after=0.01)
+        self.assertTrue(self.listener.wait(2))
+
+    def tearDown(self):
+        table_cache.stop()
+        config.TABLE_CACHE, config.DATABASE_BACKEND = self.original
+
+    def connect(self, dsn):
+        connection = FakeListenConnection(dsn)
+        self.connections.append(connection)
+        return connection
+
+    def fetch(self, table, key):
+        def load():
+            self.loads.append((table, key))
+            return {"table": table, "key": key}
+        return table_cache.fetch(table, key, load)
+
+    def notify(self, payload):
+        # Sends a notification and waits for the listener to handle it
+        handled = table_cache.stats()["notifications"] + 1
+        self.connections[-1].notify(payload)
+        self.wait_until(lambda: table_cache.stats()["notifications"] == handled)
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 2
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("timed out waiting for the listener")
+            time.sleep(0.001)
+
+
+    def test_listener_listens_on_its_own_connection(self):
+        self.assertEqual(["LISTEN table_changes"], self.connections[0].executed)
+        self.assertTrue(self.connections[0].autocommit)
+        self.assertIs(self.listener, table_cache.start(connect=self.connect))
+
+
+    def test_values_are_loaded_once_for_ids_and_strings_alike(self):
+        row = self.fetch("humans", 1)
+        self.assertIs(row, self.fetch("humans", "1"))
+        self.fetch("humans", table_cache.ALL)
+        self.fetch("humans", table_cache.ALL)
+        self.assertEqual([("humans", 1), ("humans", table_cache.ALL)], self.loads)
+        self.assertEqual(2, table_cache.stats()["hits"])
+
+
+    def test_notification_evicts_rows_and_select_all(self):
+        self.fetch("humans", 1)
+        self.fetch("humans", 2)
+        self.fetch("humans", table_cache.ALL)
+        self.notify(f"humans:{time.time()}:1")
+        self.assertEqual(2, table_cache.stats()["evictions"])
+        self.fetch("humans", 1)
+        self.fetch("humans", 2)
+        self.fetch("humans", table_cache.ALL)
+        self.assertEqual(5, len(self.loads))
+        self.assertEqual(3, table_cache.stats()["tables"]["humans"])
+
+
+    def test_star_evicts_the_whole_table_and_its_dependents(self):
+        self.fetch("zombie_types", 3)
+        self.fetch("zombies", 1)
+        self.fetch("humans", 1)
+        self.notify(f"zombie_types:{time.time()}:*")
+        stats = table_cache.stats()
+        self.assertEqual(0, stats["tables"]["zombie_types"])
+        self.assertEqual(0, stats["tables"]["zombies"])
+        self.assertEqual(1, stats["tables"]["humans"])
+        self.assertGreaterEqual(stats["lag_last"], 0)
+
+
+    def test_local_evict_happens_straight_away(self):
+        self.fetch("humans", 1)
+        table_cache.evict("humans", [1])
+        self.fetch("humans", 1)
+        self.assertEqual(2, len(self.loads))
+
+
+    def test_row_loaded_across_a_change_is_not_kept(self):
+        def load():
+            self.notify(f"humans:{time.time()}:7")
+            return "loaded before the change"
+        table_cache.fetch("humans", 7, load)
+        self.assertEqual(0, table_cache.stats()["tables"].get("humans", 0))
+
+
+    def test_unit_of_work_bypasses_the_cache(self):
+        with unit_of_work.transaction():
+            self.fetch("humans", 1)
+            self.fetch("humans", 1)
+        self.assertEqual(2, len(self.loads))
+        self.assertEqual({}, table_cache.stats()["tables"])
+
+
+    def test_lost_connection_empties_the_cache_until_listening_again(self):
+        self.fetch("humans", 1)
+        first = self.connections[0]
+        with self.assertLogs("db.table_cache", "WARNING"):
+            first.drop()
+            self.wait_until(lambda: len(self.connections) == 2 and self.listener.listening)
+        self.assertTrue(first.closed)
+        self.assertEqual({}, table_cache.stats()["tables"])
+        self.fetch("humans", 1)
+        self.fetch("humans", 1)
+        self.assertEqual(2, len(self.loads))
+
+
+    def test_unreadable_notification_empties_the_cache(self):
+        self.fetch("humans", 1)
+        with self.assertLogs("db.table_cache", "WARNING"):
+            self.connections[-1].notify("humans")
+            self.wait_until(lambda: table_cache.stats()["tables"] == {})
+
+
+    def test_nothing_is_cached_without_the_setting_or_on_sqlite(self):
+        config.TABLE_CACHE = False
+        self.fetch("humans", 1)
+        self.fetch("humans", 1)
+        config.TABLE_CACHE = True
+        config.DATABASE_BACKEND = "sqlite"
+        table_cache.stop()
+        self.assertIsNone(table_cache.start(connect=self.connect))
+        self.fetch("humans", 1)
+        self.assertEqual(3, len(self.loads))
@@ -0,0 +1,110 @@
+import unittest
+
+import shared.db.run_sql
+import shared.db.unit_of_work as unit_of_work
+from shared.db.run_sql import run_sql
+from shared.tests.app import app
+from shared.tests.doubles import FakeConnection, FakePool
+
+ROWS = {
+    "FROM humans": [{"id": 1, "name": "Coach"}],
+    "FROM zombies": [{"id": 2, "name": "Pete", "zombie_type_id": 3}],
+    "FROM zombie_types": [{"id": 3, "name": "Walker"}],
+    "INSERT INTO bitings": [{"id": 4}],
+}
+
+
+class TestUnitOfWork(unittest.TestCase):
+
+    def setUp(self):
+        self.broken = False
+        self.pool = FakePool(self.connect)
+        self.originals = [(shared.db.run_sql, shared.db.run_sql.get_pool), (unit_of_work, unit_of_work.get_pool)]
+        for module, _ in self.originals:
+            module.get_pool = lambda: self.pool
+
+    def tearDown(self):
+        for module, original in self.originals:
+            module.get_pool = original
+
+    def connect(self):
+        conn = FakeConnection(rows=lambda sql, values: next((rows for key, rows in ROWS.items() if key in sql), []))
+        conn.fail(Exception("syntax error"), containing="broken")
+        if self.broken:
+            conn.fail(Exception("syntax error"), containing="DELETE")
+        return conn
+
+    def post_biting(self):
+        return app.test_client().post("/bitings", data={"human_id": "1", "zombie_id": "2"})
+
+
+    def test_request_runs_on_one_connection_and_commits_once(self):
+        response = self.post_biting()
+        self.assertEqual(302, response.status_code)
+        self.assertEqual(1, len(self.pool.connections))
+        conn = self.pool.connections[0]
+        self.assertEqual(4, len(conn.statements))
+        self.assertEqual(1, conn.commits)
+        self.assertEqual(1, self.pool.returned)
+
+
+    def test_failed_statement_rolls_back_the_whole_request(self):
+        self.broken = True
+        with self.assertLogs("db.queries", "ERROR"), self.assertLogs(app.logger, "ERROR"):
+            response = app.test_client().post("/humans/1/delete")
+        self.assertEqual(500, response.status_code)
+        conn = self.pool.connections[0]
+        self.assertEqual(0, conn.commits)
+        self.assertEqual(1, conn.rollbacks)
+        self.assertEqual(1, self.pool.returned)
+
+
+    def test_get_requests_are_not_wrapped(self):
+        with app.test_request_context("/humans", method="GET"):
+            app.preprocess_request()
+            self.assertIsNone(unit_of_work.current())
+
+
+    def test_exception_in_view_rolls_back(self):
+        with app.test_request_context("/bitings", method="POST"):
+            app.preprocess_request()
+            run_sql("SELECT * FROM humans WHERE id = %s", [1])
+            app.do_teardown_request(RuntimeError("view failed"))
+            self.assertIsNone(unit_of_work.current())
+        conn = self.pool.connections[0]
+        self.assertEqual((0, 1), (conn.commits, conn.rollbacks))
+
+
+    def test_request_without_statements_takes_no_connection(self):
+        with app.test_request_context("/bitings", method="POST"):
+            app.preprocess_request()
+            app.process_response(app.response_class())
+        self.assertEqual([], self.pool.connections)
+
+
+    def test_transaction_context_for_scripts(self):
+        with unit_of_work.transaction():
+            run_sql("SELECT * FROM humans WHERE id = %s", [1])
+            run_sql("SELECT * FROM zombies WHERE id = %s", [2])
+        conn = self.pool.connections[0]
+        self.assertEqual((2, 1), (len(conn.statements), conn.commits))
+        self.assertIsNone(unit_of_work.current())
+
+
+    def test_transaction_context_rolls_back_and_reraises(self):
+        with self.assertLogs("db.queries", "ERROR"):
+            with self.assertRaisesRegex(Exception, "syntax error"):
+                with unit_of_work.transaction():
+                    run_sql("broken")
+        self.assertEqual(1, self.pool.connections[0].rollbacks)
+
+
+    def test_transaction_context_raises_when_a_caught_error_rolled_it_back(self):
+        with self.assertLogs("db.queries", "ERROR"):
+            with self.assertRaises(unit_of_work.UnitOfWorkFailed):
+                with unit_of_work.transaction():
+                    try:
+                        run_sql("broken")
+                    except Exception:
+                        pass
+        self.assertEqual(1, self.pool.connections[0].rollbacks)